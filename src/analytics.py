@@ -0,0 +1,424 @@
+import threading
+import pymysql
+import db_utils
+from table_config import get_pk_columns
+
+# NumPy is optional: without it analytics mode is simply unavailable and the
+# reports keep running on the server through db_utils.
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# =============================================================================
+# SNAPSHOT LAYOUT
+# =============================================================================
+# Every table the analytics reports need, with the columns we keep.
+#   "key"     -> the table's own ID column. Rows are stored by dictionary code,
+#                so the table can be joined to with a plain array lookup.
+#   column kinds:
+#     "str"   -> object array (display values only)
+#     "num"   -> float64 array, NULL becomes NaN
+#     <Table> -> ID column dictionary-encoded against that table's key domain
+#
+# Tables without a "key" are fact tables and are stored row by row, with a
+# {primary key: row slot} index so a changed row can be patched in place.
+#
+# Keeping it current: while change capture (cdc.py) is installed, refresh()
+# reads the ChangeLog entries since the last load and re-reads only those
+# rows. A deleted fact row keeps its slot with every ID set to NULL (-1), so
+# the reports skip it. Deletes and key changes in keyed tables cascade to
+# other tables without being logged, and very large batches are cheaper to
+# reload, so both reload the whole snapshot. Without change capture, a table
+# is reloaded when its information_schema fingerprint changes.
+
+SNAPSHOT_TABLES = {
+    "Region": {"key": "region_id", "columns": {"region_name": "str"}},
+    "City": {"key": "city_id", "columns": {"region_id": "Region"}},
+    "Gym": {"key": "gym_id", "columns": {"city_id": "City"}},
+    "Tournament": {"key": "tournament_id", "columns": {"city_id": "City"}},
+    "Trainer": {"key": "trainer_id", "columns": {"name": "str", "region_id": "Region"}},
+    "PokemonSpecies": {"key": "species_id", "columns": {"species_name": "str"}},
+    "GymBadge": {"columns": {"gym_id": "Gym"}},
+    "TournamentEntry": {"columns": {"trainer_id": "Trainer"}},
+    "RegisteredPokemon": {"columns": {"species_id": "PokemonSpecies", "level": "num"}},
+    "Match_Table": {"columns": {"trainer1_id": "Trainer", "trainer2_id": "Trainer", "winner_id": "Trainer"}},
+}
+
+FETCH_CHUNK = 10000
+DELTA_LIMIT = 50000  # more pending changes than this -> full reload
+ROW_CHUNK = 500      # primary keys per re-read query
+
+
+class IdDictionary:
+    """
+    Append-only dictionary encoding for one ID domain (e.g. all trainer IDs).
+    Codes are never reassigned, so arrays encoded earlier stay valid when a
+    table is reloaded; rows that disappear are masked out instead.
+    """
+
+    def __init__(self):
+        self.codes = {}
+        self.values = []
+
+    def __len__(self):
+        return len(self.values)
+
+    def encode(self, raw_values):
+        out = np.empty(len(raw_values), dtype=np.int64)
+        codes = self.codes
+        for i, val in enumerate(raw_values):
+            if val is None:
+                out[i] = -1
+                continue
+            code = codes.get(val)
+            if code is None:
+                code = len(self.values)
+                codes[val] = code
+                self.values.append(val)
+            out[i] = code
+        return out
+
+
+def _lookup(values, codes, fill):
+    """Gather values[codes] with `fill` wherever the code is NULL or unknown."""
+    result = np.full(len(codes), fill, dtype=values.dtype)
+    valid = (codes >= 0) & (codes < len(values))
+    result[valid] = values[codes[valid]]
+    return result
+
+
+def _padded(arr, size):
+    """arr extended to `size` with its NULL value (False / None / NaN / -1)."""
+    if len(arr) >= size:
+        return arr
+    fills = {np.dtype(bool): False, np.dtype(object): None, np.dtype(np.float64): np.nan}
+    padded = np.full(size, fills.get(arr.dtype, -1), dtype=arr.dtype)
+    padded[:len(arr)] = arr
+    return padded
+
+
+def _count_by(codes, size):
+    valid = codes[(codes >= 0) & (codes < size)]
+    return np.bincount(valid, minlength=size)
+
+
+# =============================================================================
+# SNAPSHOT
+# =============================================================================
+
+class AnalyticsSnapshot:
+    """
+    Columnar, NumPy-backed copy of the tables behind the heavy reports.
+    Build it once with refresh(); later refresh() calls apply the rows that
+    changed since (see the notes at the top of the module). Threads sharing
+    a snapshot hold `lock` around refresh() and the reports.
+    """
+
+    def __init__(self, conn):
+        if np is None:
+            raise ImportError("Analytics mode requires numpy (pip install numpy).")
+        self.conn = conn
+        self.domains = {name: IdDictionary() for name, spec in SNAPSHOT_TABLES.items() if spec.get("key")}
+        self.tables = {}
+        self.row_slots = {}   # fact table -> {primary key tuple: row index}
+        self.fingerprints = {}
+        self.changes = None   # db_utils.ChangeCursor while change capture is installed
+        self.generation = 0
+        self._report_cache = {}
+        self.lock = threading.Lock()
+
+    # --- LOADING ---
+    def _columns(self, table_name):
+        spec = SNAPSHOT_TABLES[table_name]
+        key = spec.get("key")
+        pk_cols = [] if key else get_pk_columns(table_name)
+        return list(dict.fromkeys(([key] if key else pk_cols) + list(spec["columns"]))), pk_cols
+
+    def _encode(self, kind, values):
+        if kind == "str":
+            return np.array(values, dtype=object)
+        if kind == "num":
+            arr = np.array(values, dtype=object)
+            arr[np.equal(arr, None)] = np.nan
+            return arr.astype(np.float64)
+        return self.domains[kind].encode(values)
+
+    def _load_table(self, table_name):
+        spec = SNAPSHOT_TABLES[table_name]
+        clean_table = db_utils.validate_identifier(table_name)
+        key = spec.get("key")
+        cols, pk_cols = self._columns(table_name)
+        clean_cols = [db_utils.validate_identifier(c) for c in cols]
+
+        raw = {c: [] for c in cols}
+        with self.conn.cursor(pymysql.cursors.SSCursor) as cursor:
+            cursor.execute(f"SELECT {', '.join(clean_cols)} FROM {clean_table}")
+            while True:
+                rows = cursor.fetchmany(FETCH_CHUNK)
+                if not rows:
+                    break
+                for c, values in zip(cols, zip(*rows)):
+                    raw[c].extend(values)
+
+        columns = {col: self._encode(kind, raw[col]) for col, kind in spec["columns"].items()}
+
+        if key:
+            # Scatter rows into code order so other tables can join by lookup
+            domain = self.domains[table_name]
+            codes = domain.encode(raw[key])
+            size = len(domain)
+            by_code = {"present": np.zeros(size, dtype=bool)}
+            by_code["present"][codes] = True
+            for col, arr in columns.items():
+                target = _padded(arr[:0], size)
+                target[codes] = arr
+                by_code[col] = target
+            columns = by_code
+        else:
+            self.row_slots[table_name] = dict(zip(zip(*(raw[c] for c in pk_cols)), range(len(raw[cols[0]]))))
+
+        self.tables[table_name] = columns
+
+    def _read_rows(self, table_name, pk_dicts):
+        """Current rows for the given primary keys (deleted ones are simply absent)."""
+        cols, _ = self._columns(table_name)
+        pk_cols = list(pk_dicts[0])
+        match = "(" + " AND ".join(f"{db_utils.validate_identifier(c)} = %s" for c in pk_cols) + ")"
+        rows = []
+        with self.conn.cursor(pymysql.cursors.DictCursor) as cursor:
+            for start in range(0, len(pk_dicts), ROW_CHUNK):
+                chunk = pk_dicts[start:start + ROW_CHUNK]
+                cursor.execute(f"SELECT {', '.join(db_utils.validate_identifier(c) for c in cols)} "
+                               f"FROM {db_utils.validate_identifier(table_name)} WHERE "
+                               + " OR ".join([match] * len(chunk)),
+                               [pk[c] for pk in chunk for c in pk_cols])
+                rows.extend(cursor.fetchall())
+        return rows
+
+    def _patch_keyed(self, table_name, rows):
+        spec = SNAPSHOT_TABLES[table_name]
+        domain = self.domains[table_name]
+        codes = domain.encode([row[spec["key"]] for row in rows])
+        columns = self.tables[table_name]
+        for col in columns:
+            columns[col] = _padded(columns[col], len(domain))
+        columns["present"][codes] = True
+        for col, kind in spec["columns"].items():
+            columns[col][codes] = self._encode(kind, [row[col] for row in rows])
+
+    def _patch_facts(self, table_name, pk_tuples, rows):
+        spec = SNAPSHOT_TABLES[table_name]
+        _, pk_cols = self._columns(table_name)
+        slots = self.row_slots[table_name]
+        columns = self.tables[table_name]
+        current = {tuple(row[c] for c in pk_cols): row for row in rows}
+        gone = [slots[pk] for pk in pk_tuples if pk not in current and pk in slots]
+        for arr in columns.values():
+            arr[gone] = _padded(arr[:0], 1)[0]
+        for pk in current:
+            if pk not in slots:
+                slots[pk] = len(slots)
+        size = len(slots)
+        targets = [slots[pk] for pk in current]
+        for col, kind in spec["columns"].items():
+            columns[col] = _padded(columns[col], size)
+            columns[col][targets] = self._encode(kind, [row[col] for row in current.values()])
+
+    def _apply_changes(self):
+        """
+        Re-reads the rows ChangeLog lists since the last refresh. Returns the
+        tables that changed, or None if the snapshot must be reloaded instead.
+        """
+        changes = []
+        while True:
+            batch = self.changes.read(self.conn, limit=FETCH_CHUNK)
+            self.changes.advance(batch)
+            changes += [c for c in batch if c['table_name'] in SNAPSHOT_TABLES]
+            if len(changes) > DELTA_LIMIT:
+                return None
+            if len(batch) < FETCH_CHUNK:
+                break
+        by_table = {}
+        for change in changes:
+            if change['operation'] == "DELETE" and SNAPSHOT_TABLES[change['table_name']].get("key"):
+                return None
+            pks = by_table.setdefault(change['table_name'], {})
+            pks[tuple(sorted(change['pk'].items()))] = change['pk']
+        for table_name, pks in by_table.items():
+            rows = self._read_rows(table_name, list(pks.values()))
+            if SNAPSHOT_TABLES[table_name].get("key"):
+                self._patch_keyed(table_name, rows)
+            else:
+                _, pk_cols = self._columns(table_name)
+                self._patch_facts(table_name, [tuple(pk[c] for c in pk_cols) for pk in pks.values()], rows)
+        return list(by_table)
+
+    def _reload(self, force):
+        """Reloads the tables whose fingerprint changed (all of them with force)."""
+        seq = db_utils.get_change_watermark(self.conn)  # taken first: changes made during the load are re-read
+        prints = db_utils.get_change_fingerprints(self.conn, SNAPSHOT_TABLES)
+        reloaded = []
+        for table_name in SNAPSHOT_TABLES:
+            fingerprint = prints[table_name]
+            if not force and table_name in self.tables and fingerprint is not None \
+                    and self.fingerprints.get(table_name) == fingerprint:
+                continue
+            self._load_table(table_name)
+            self.fingerprints[table_name] = fingerprint
+            reloaded.append(table_name)
+        if force:
+            self.changes = db_utils.ChangeCursor(seq) if seq is not None else None
+        return reloaded
+
+    def refresh(self, force=False):
+        """Brings the snapshot up to date. Returns the list of tables that changed."""
+        changed = None
+        if not force and self.changes is not None and len(self.tables) == len(SNAPSHOT_TABLES):
+            changed = self._apply_changes()
+        if changed is None:
+            changed = self._reload(force or self.changes is not None)
+        if changed:
+            self.generation += 1
+            self._report_cache.clear()
+        return changed
+
+    # --- JOIN HELPERS ---
+    def _keyed(self, table_name, col):
+        """Column of a keyed table, padded to the current domain size."""
+        return _padded(self.tables[table_name][col], len(self.domains[table_name]))
+
+    def _present(self, table_name, codes):
+        """Inner-join mask: code is non-NULL and the row exists in table_name."""
+        return _lookup(self._keyed(table_name, "present"), codes, False)
+
+    def _city_region(self, city_codes):
+        """City code -> region code, -1 if the city or its region is missing."""
+        region = _lookup(self._keyed("City", "region_id"), city_codes, -1)
+        region[~self._present("Region", region)] = -1
+        return region
+
+    def _cached(self, name, builder):
+        if name not in self._report_cache:
+            self._report_cache[name] = builder()
+        return self._report_cache[name]
+
+    # --- REPORTS (same output as the db_utils versions) ---
+    def get_region_power_report(self):
+        return self._cached("region_power", self._build_region_power)
+
+    def _build_region_power(self):
+        n_regions = len(self.domains["Region"])
+
+        winners = self.tables["Match_Table"]["winner_id"]
+        winners = winners[self._present("Trainer", winners)]
+        win_region = _lookup(self._keyed("Trainer", "region_id"), winners, -1)
+        match_wins = _count_by(win_region, n_regions)
+
+        badge_gyms = self.tables["GymBadge"]["gym_id"]
+        badge_gyms = badge_gyms[self._present("Gym", badge_gyms)]
+        badge_cities = _lookup(self._keyed("Gym", "city_id"), badge_gyms, -1)
+        badge_cities = badge_cities[self._present("City", badge_cities)]
+        badges = _count_by(self._city_region(badge_cities), n_regions)
+
+        tour_present = self._keyed("Tournament", "present")
+        tour_cities = self._keyed("Tournament", "city_id")[tour_present]
+        tour_cities = tour_cities[self._present("City", tour_cities)]
+        hosted = _count_by(self._city_region(tour_cities), n_regions)
+
+        regions = np.flatnonzero(self._keyed("Region", "present"))
+        order = np.lexsort((-hosted[regions], -match_wins[regions]))
+        names = self._keyed("Region", "region_name")
+        return [
+            {
+                "region_name": names[r],
+                "match_wins": int(match_wins[r]),
+                "badges_awarded": int(badges[r]),
+                "tournaments_hosted": int(hosted[r]),
+            }
+            for r in regions[order]
+        ]
+
+    def get_species_mvp_report(self, limit=15):
+        rows = self._cached("species_mvp", self._build_species_mvp)
+        return rows[:limit]
+
+    def _build_species_mvp(self):
+        n_species = len(self.domains["PokemonSpecies"])
+        species = self.tables["RegisteredPokemon"]["species_id"]
+        levels = self.tables["RegisteredPokemon"]["level"]
+        keep = self._present("PokemonSpecies", species)
+        species, levels = species[keep], levels[keep]
+
+        counts = np.bincount(species, minlength=n_species)
+        has_level = ~np.isnan(levels)
+        level_sum = np.bincount(species[has_level], weights=levels[has_level], minlength=n_species)
+        level_n = np.bincount(species[has_level], minlength=n_species)
+        max_level = np.full(n_species, -np.inf)
+        np.maximum.at(max_level, species[has_level], levels[has_level])
+
+        candidates = np.flatnonzero(counts >= 5)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            avg = np.round(level_sum[candidates] / level_n[candidates], 2)
+        # NULL averages sort last under DESC, as in MySQL
+        sort_avg = np.where(np.isnan(avg), -np.inf, avg)
+        order = np.lexsort((-counts[candidates], -sort_avg))
+        names = self._keyed("PokemonSpecies", "species_name")
+        report = []
+        for i in order:
+            s = candidates[i]
+            report.append({
+                "species_name": names[s],
+                "registered_count": int(counts[s]),
+                "avg_level": None if np.isnan(avg[i]) else float(avg[i]),
+                "max_level": None if np.isinf(max_level[s]) else int(max_level[s]),
+            })
+        return report
+
+    def get_underrated_trainer_report(self):
+        return self._cached("underrated", self._build_underrated)
+
+    def _build_underrated(self):
+        n_trainers = len(self.domains["Trainer"])
+        matches = self.tables["Match_Table"]
+        t1, t2, winner = matches["trainer1_id"], matches["trainer2_id"], matches["winner_id"]
+
+        played = _count_by(t1, n_trainers) + _count_by(t2, n_trainers)
+        wins = _count_by(t1[(t1 >= 0) & (winner == t1)], n_trainers) \
+            + _count_by(t2[(t2 >= 0) & (winner == t2)], n_trainers)
+        entered = _count_by(self.tables["TournamentEntry"]["trainer_id"], n_trainers)
+
+        trainers = np.flatnonzero(self._keyed("Trainer", "present"))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            ratio = wins[trainers] / played[trainers]
+        keep = (played[trainers] >= 10) & (ratio >= 0.6) & (entered[trainers] <= 3)
+        trainers, ratio = trainers[keep], np.round(ratio[keep], 3)
+        order = np.lexsort((entered[trainers], -ratio))[:25]
+
+        names = self._keyed("Trainer", "name")
+        ids = self.domains["Trainer"].values
+        return [
+            {
+                "trainer_id": ids[t],
+                "name": names[t],
+                "wins": int(wins[t]),
+                "matches_played": int(played[t]),
+                "tournaments_entered": int(entered[t]),
+                "win_ratio": float(r),
+            }
+            for t, r in zip(trainers[order], ratio[order])
+        ]
+
+
+def create_snapshot(conn):
+    """Builds a snapshot, or returns None if numpy is missing or the load fails."""
+    try:
+        snapshot = AnalyticsSnapshot(conn)
+        snapshot.refresh(force=True)
+        return snapshot
+    except ImportError as e:
+        print(e)
+        return None
+    except (pymysql.Error, ValueError) as e:
+        print(f"Analytics Error: {e}")
+        return None
@@ -0,0 +1,470 @@
+import argparse
+import contextlib
+import datetime
+import decimal
+import getpass
+import gzip
+import hashlib
+import json
+import os
+import queue
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pymysql
+import cdc
+import db_utils
+import dependencies
+from pool import ConnectionPool
+
+# =============================================================================
+# BACKUP & RESTORE
+# =============================================================================
+# dump(): every table is cut into primary-key ranges of about chunk_rows rows
+# and the ranges are dumped in parallel by `jobs` worker connections. All
+# workers read from the same point in time: while a global read lock is held
+# (FLUSH TABLES WITH READ LOCK), each worker opens
+# START TRANSACTION WITH CONSISTENT SNAPSHOT, then the lock is released, so
+# writes are blocked for milliseconds, not for the whole dump.
+# Each range goes to <table>.<nnnn>.jsonl.gz (one JSON array per row, in the
+# column order recorded in manifest.json, with the row count and sha256).
+#
+# restore(): checks every checksum, then loads tables level by level in FK
+# order (tables nothing references first, Match_Table and friends last), with
+# the chunks of a level loaded in parallel, one transaction per chunk.
+#
+# Tables that triggers fill from other tables (DERIVED_TABLES) are neither
+# dumped nor loaded. The load connections set @skip_derived_tables, which the
+# counting procedures in schema.sql check, so parallel chunks do not fight
+# over the same HeadToHead/ActivityRollup rows; restore() recomputes both
+# tables in one pass once the load is done. A chunk that hits a deadlock or a
+# lost connection is retried (LOAD_RETRY_SECONDS).
+#
+# ChangeLog (LOCAL_TABLES) belongs to the server it was written on and is not
+# dumped either. While restore() runs, the change-capture triggers are dropped
+# and then reinstalled, so the restored rows are not logged one by one.
+
+MANIFEST = "manifest.json"
+FORMAT_VERSION = 1
+CHUNK_ROWS = 50_000
+INSERT_BATCH = 1000
+LOAD_RETRY_SECONDS = [1, 2, 5]
+SKIP_DERIVED = "SET @skip_derived_tables = 1"
+DERIVED_TABLES = {"HeadToHead": db_utils.rebuild_head_to_head, "ActivityRollup": db_utils.rebuild_rollups}
+LOCAL_TABLES = ("ChangeLog",)
+SKIPPED_TABLES = {*DERIVED_TABLES, *LOCAL_TABLES}
+
+
+def _encode(val):
+    if isinstance(val, (datetime.date, datetime.datetime, datetime.time)):
+        return val.isoformat()
+    if isinstance(val, datetime.timedelta):
+        return str(val)
+    if isinstance(val, decimal.Decimal):
+        return str(val)  # exact; MySQL converts it back on insert
+    if isinstance(val, bytes):
+        return {"$hex": val.hex()}
+    return str(val)
+
+
+def _decode_row(row):
+    return [bytes.fromhex(v["$hex"]) if isinstance(v, dict) and "$hex" in v else v for v in row]
+
+
+class _HashingWriter:
+    """File wrapper that hashes the compressed bytes as they are written."""
+
+    def __init__(self, path):
+        self.file = open(path, "wb")
+        self.sha256 = hashlib.sha256()
+
+    def write(self, data):
+        self.sha256.update(data)
+        return self.file.write(data)
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+# =============================================================================
+# SCHEMA HELPERS
+# =============================================================================
+
+def list_tables(conn):
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            SELECT TABLE_NAME FROM information_schema.TABLES
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_TYPE = 'BASE TABLE'
+            ORDER BY TABLE_NAME
+        """)
+        return [row['TABLE_NAME'] for row in cursor.fetchall()]
+
+
+def list_columns(conn, table_name):
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            SELECT COLUMN_NAME FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+              AND EXTRA NOT LIKE '%%GENERATED%%'
+            ORDER BY ORDINAL_POSITION
+        """, (table_name,))
+        return [row['COLUMN_NAME'] for row in cursor.fetchall()]
+
+
+def table_levels(graph, tables):
+    """{table: level}: 0 for tables without parents, else 1 + deepest parent (self-references ignored)."""
+    parents = {t: set() for t in tables}
+    for edges in graph.children.values():
+        for edge in edges:
+            if edge.child in parents and edge.parent in parents and edge.parent != edge.child:
+                parents[edge.child].add(edge.parent)
+    levels = {}
+
+    def level(table, visiting=()):
+        if table not in levels:
+            if table in visiting:
+                return 0  # FK cycle: break it here
+            levels[table] = 1 + max((level(p, visiting + (table,)) for p in parents[table]), default=-1)
+        return levels[table]
+
+    for table in tables:
+        level(table)
+    return levels
+
+
+# =============================================================================
+# DUMP
+# =============================================================================
+
+def open_snapshot(conn, jobs):
+    """
+    Opens `jobs` connections that all see the same snapshot.
+    Returns (connections, info); needs RELOAD for the global lock, otherwise
+    falls back to a single (still consistent) connection.
+    """
+    coordinator = db_utils.clone_connection(conn)
+    if coordinator is None:
+        raise pymysql.OperationalError("Could not open a backup connection.")
+    workers = []
+    info = {"locked": False}
+    try:
+        with coordinator.cursor() as cursor:
+            try:
+                cursor.execute("FLUSH TABLES WITH READ LOCK")
+                info["locked"] = True
+            except pymysql.Error as e:
+                print(f"Backup: global read lock unavailable ({e}); dumping with one connection.")
+                jobs = 1
+            for _ in range(jobs):
+                worker = db_utils.clone_connection(conn)
+                if worker is None:
+                    raise pymysql.OperationalError("Could not open a backup connection.")
+                workers.append(worker)
+                with worker.cursor() as wc:
+                    wc.execute("SET SESSION TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+                    wc.execute("START TRANSACTION WITH CONSISTENT SNAPSHOT, READ ONLY")
+            try:
+                cursor.execute("SHOW MASTER STATUS")
+                status = cursor.fetchone()
+                if status:
+                    info["binlog_file"], info["binlog_position"] = status['File'], status['Position']
+            except pymysql.Error:
+                pass
+            if info["locked"]:
+                cursor.execute("UNLOCK TABLES")
+    except pymysql.Error:
+        for worker in workers:
+            worker.close()
+        raise
+    finally:
+        coordinator.close()
+    return workers, info
+
+
+def _dump_chunk(conn, table_name, columns, pk_cols, low, high, path):
+    where, params = db_utils.pk_range_where(pk_cols, low, high)
+    sql = f"SELECT {', '.join(columns)} FROM {table_name}{where}"
+    if pk_cols:
+        sql += f" ORDER BY {', '.join(pk_cols)}"
+
+    rows = 0
+    raw = _HashingWriter(path)
+    try:
+        with gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6) as out, \
+                conn.cursor(pymysql.cursors.SSCursor) as cursor:
+            cursor.execute(sql, params)
+            while True:
+                batch = cursor.fetchmany(5000)
+                if not batch:
+                    break
+                out.write("".join(json.dumps(list(r), default=_encode, ensure_ascii=False) + "\n"
+                                  for r in batch).encode("utf-8"))
+                rows += len(batch)
+    finally:
+        raw.close()
+    return rows, raw.sha256.hexdigest()
+
+
+def dump(conn, out_dir, jobs=None, chunk_rows=CHUNK_ROWS, tables=None, progress=None):
+    """
+    Writes a consistent, chunked backup to out_dir and returns the manifest.
+    progress(done_chunks, total_chunks) is called as chunks finish.
+    """
+    jobs = jobs or os.cpu_count() or 1
+    os.makedirs(out_dir, exist_ok=True)
+    graph = dependencies.load_graph(conn)
+    if graph is None:
+        raise pymysql.OperationalError("Could not read the FK graph.")
+    tables = [db_utils.validate_identifier(t) for t in (tables or list_tables(conn)) if t not in SKIPPED_TABLES]
+    levels = table_levels(graph, tables)
+
+    workers, info = open_snapshot(conn, jobs)
+    idle = queue.Queue()
+    for worker in workers:
+        idle.put(worker)
+    manifest = {"version": FORMAT_VERSION, "database": conn.db.decode() if isinstance(conn.db, bytes) else conn.db,
+                "created_at": datetime.datetime.now().isoformat(timespec="seconds"), "snapshot": info, "tables": {}}
+    try:
+        tasks = []
+        first = workers[0]
+        for table in sorted(tables, key=lambda t: (levels[t], t)):
+            pk_cols = graph.primary_keys.get(table, [])
+            columns = list_columns(first, table)
+            entry = {"level": levels[table], "columns": columns, "primary_key": pk_cols, "chunks": []}
+            manifest["tables"][table] = entry
+            for i, (low, high) in enumerate(db_utils.chunk_bounds(first, table, pk_cols, chunk_rows)):
+                chunk = {"file": f"{table}.{i:04d}.jsonl.gz"}
+                entry["chunks"].append(chunk)
+                tasks.append((table, columns, pk_cols, low, high, chunk))
+
+        done = 0
+
+        def run(task):
+            table, columns, pk_cols, low, high, chunk = task
+            worker = idle.get()
+            try:
+                chunk["rows"], chunk["sha256"] = _dump_chunk(worker, table, columns, pk_cols, low, high,
+                                                             os.path.join(out_dir, chunk["file"]))
+            finally:
+                idle.put(worker)
+
+        with ThreadPoolExecutor(max_workers=len(workers)) as executor:
+            for _ in executor.map(run, tasks):
+                done += 1
+                if progress:
+                    progress(done, len(tasks))
+    finally:
+        for worker in workers:
+            try:
+                worker.rollback()  # ends the read-only snapshot
+            finally:
+                worker.close()
+
+    for entry in manifest["tables"].values():
+        entry["rows"] = sum(c["rows"] for c in entry["chunks"])
+    with open(os.path.join(out_dir, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, default=_encode)
+    return manifest
+
+# =============================================================================
+# VERIFY & RESTORE
+# =============================================================================
+
+def load_manifest(backup_dir):
+    with open(os.path.join(backup_dir, MANIFEST), encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("version") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported backup format version: {manifest.get('version')}")
+    return manifest
+
+
+def _read_chunk(backup_dir, chunk):
+    """Rows of a chunk file; raises ValueError if the checksum or row count does not match."""
+    with open(os.path.join(backup_dir, chunk["file"]), "rb") as f:
+        data = f.read()
+    if hashlib.sha256(data).hexdigest() != chunk["sha256"]:
+        raise ValueError(f"{chunk['file']}: checksum mismatch")
+    rows = [_decode_row(json.loads(line)) for line in gzip.decompress(data).splitlines() if line]
+    if len(rows) != chunk["rows"]:
+        raise ValueError(f"{chunk['file']}: expected {chunk['rows']} rows, found {len(rows)}")
+    return rows
+
+
+def verify(backup_dir):
+    """Checks every chunk against the manifest. Returns a list of problems ([] = intact)."""
+    problems = []
+    for entry in load_manifest(backup_dir)["tables"].values():
+        for chunk in entry["chunks"]:
+            try:
+                _read_chunk(backup_dir, chunk)
+            except (OSError, ValueError) as e:
+                problems.append(str(e))
+    return problems
+
+
+def _verify_entry(backup_dir, entry):
+    problems = []
+    for chunk in entry["chunks"]:
+        path = os.path.join(backup_dir, chunk["file"])
+        if not os.path.exists(path):
+            problems.append(f"{chunk['file']}: missing")
+            continue
+        with open(path, "rb") as f:
+            if hashlib.sha256(f.read()).hexdigest() != chunk["sha256"]:
+                problems.append(f"{chunk['file']}: checksum mismatch")
+    return problems
+
+
+def _load(conn, backup_dir, entries, jobs, truncate, progress):
+    by_level = {}
+    for table, entry in entries.items():
+        by_level.setdefault(entry["level"], []).append(table)
+
+    if truncate:
+        with conn.cursor() as cursor:
+            cursor.execute(SKIP_DERIVED)
+            for level in sorted(by_level, reverse=True):
+                for table in by_level[level]:
+                    cursor.execute(f"DELETE FROM {db_utils.validate_identifier(table)}")
+
+    loaded = dict.fromkeys(entries, 0)
+    total = sum(len(e["chunks"]) for e in entries.values())
+    done = 0
+    load_pool = ConnectionPool(conn, size=jobs, for_read=False)
+
+    def load(task):
+        table, chunk = task
+        entry = entries[table]
+        rows = _read_chunk(backup_dir, chunk)
+        sql = (f"INSERT INTO {db_utils.validate_identifier(table)} "
+               f"({', '.join(db_utils.validate_identifier(c) for c in entry['columns'])}) "
+               f"VALUES ({', '.join(['%s'] * len(entry['columns']))})")
+        for attempt in range(len(LOAD_RETRY_SECONDS) + 1):
+            try:
+                with load_pool.connection() as worker:
+                    worker.begin()
+                    try:
+                        with worker.cursor() as cursor:
+                            cursor.execute(SKIP_DERIVED)
+                            for start in range(0, len(rows), INSERT_BATCH):
+                                cursor.executemany(sql, rows[start:start + INSERT_BATCH])
+                        worker.commit()
+                    except pymysql.Error:
+                        with contextlib.suppress(pymysql.Error):
+                            worker.rollback()
+                        raise
+                return table, len(rows)
+            except pymysql.Error as e:
+                if not db_utils.is_transient_error(e) or attempt == len(LOAD_RETRY_SECONDS):
+                    raise
+                print(f"Backup: {chunk['file']}: {e}; retrying in {LOAD_RETRY_SECONDS[attempt]}s")
+                time.sleep(LOAD_RETRY_SECONDS[attempt])
+
+    try:
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            for level in sorted(by_level):
+                # A level starts only when its parents are fully loaded
+                tasks = [(t, c) for t in by_level[level] for c in entries[t]["chunks"]]
+                for table, count in executor.map(load, tasks):
+                    loaded[table] += count
+                    done += 1
+                    if progress:
+                        progress(done, total)
+    finally:
+        load_pool.close()
+    return loaded
+
+
+def restore(conn, backup_dir, jobs=None, truncate=False, tables=None, progress=None):
+    """
+    Loads a backup into the (already created) schema. Tables must be empty
+    unless truncate=True, which deletes their rows first (children first).
+    Change capture and the DERIVED_TABLES triggers are suspended during the
+    load, and DERIVED_TABLES are rebuilt afterwards.
+    Returns {table: rows inserted}; raises on the first chunk that still
+    fails after its retries.
+    """
+    jobs = jobs or os.cpu_count() or 1
+    manifest = load_manifest(backup_dir)
+    entries = {t: e for t, e in manifest["tables"].items()
+               if (not tables or t in tables) and t not in SKIPPED_TABLES}
+    problems = [p for t in entries for p in _verify_entry(backup_dir, entries[t])]
+    if problems:
+        raise ValueError("Backup is damaged: " + "; ".join(problems[:5]))
+
+    suspended = cdc.installed_tables(conn)
+    if suspended is None or (suspended and not cdc.uninstall_triggers(conn, suspended)):
+        raise pymysql.OperationalError("Could not suspend the change-capture triggers.")
+    try:
+        loaded = _load(conn, backup_dir, entries, jobs, truncate, progress)
+        if truncate or any(loaded.values()):
+            for table, rebuild in DERIVED_TABLES.items():
+                if rebuild(conn) is None:
+                    raise pymysql.OperationalError(f"Could not rebuild {table}.")
+    finally:
+        if suspended and not cdc.install_triggers(conn, suspended):
+            print("Backup: change capture was not reinstalled; run `python src/cdc.py install`.")
+        with contextlib.suppress(pymysql.Error), conn.cursor() as cursor:
+            cursor.execute("SET @skip_derived_tables = NULL")
+    return loaded
+
+
+# =============================================================================
+# COMMAND LINE
+# =============================================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Parallel consistent backup and restore of the league database.")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--user", default="root")
+    parser.add_argument("--password", default=None, help="Prompted for if omitted")
+    parser.add_argument("--db", default="pokemon_league_db")
+    parser.add_argument("--jobs", type=int, default=None, help="Worker connections (default: CPU count)")
+    sub = parser.add_subparsers(dest="kind", required=True)
+    p = sub.add_parser("dump", help="Write a backup directory")
+    p.add_argument("dir")
+    p.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    p.add_argument("--tables", nargs="*", default=None)
+    p = sub.add_parser("restore", help="Load a backup directory into an existing schema")
+    p.add_argument("dir")
+    p.add_argument("--truncate", action="store_true", help="Delete existing rows first")
+    p.add_argument("--tables", nargs="*", default=None)
+    p = sub.add_parser("verify", help="Check chunk checksums and row counts")
+    p.add_argument("dir")
+
+    args = parser.parse_args(argv)
+    if args.kind == "verify":
+        problems = verify(args.dir)
+        for problem in problems:
+            print(problem)
+        print("Backup is intact." if not problems else f"{len(problems)} problem(s) found.")
+        return 1 if problems else 0
+
+    password = args.password if args.password is not None else getpass.getpass("Password: ")
+    conn = db_utils.get_db_connection(args.host, args.user, password, args.db)
+    if not conn:
+        return 1
+    start = time.perf_counter()
+    try:
+        if args.kind == "dump":
+            manifest = dump(conn, args.dir, args.jobs, args.chunk_rows, args.tables)
+            rows = sum(e["rows"] for e in manifest["tables"].values())
+            chunks = sum(len(e["chunks"]) for e in manifest["tables"].values())
+            print(f"Dumped {rows:,} rows from {len(manifest['tables'])} tables in {chunks} chunks "
+                  f"in {time.perf_counter() - start:.1f}s")
+        else:
+            loaded = restore(conn, args.dir, args.jobs, args.truncate, args.tables)
+            print(f"Restored {sum(loaded.values()):,} rows into {len(loaded)} tables "
+                  f"in {time.perf_counter() - start:.1f}s")
+    except (pymysql.Error, OSError, ValueError) as e:
+        print(f"Backup Error: {e}")
+        return 1
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
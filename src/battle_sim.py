@@ -0,0 +1,397 @@
+import argparse
+import getpass
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+import pymysql
+import db_utils
+
+# NumPy is optional for the rest of the app; the simulator needs it.
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# =============================================================================
+# BATTLE MODEL
+# =============================================================================
+# A deliberately small model that only uses what the schema stores:
+#   - stats from PokemonSpecies base stats scaled by RegisteredPokemon.level
+#     (HP = 2*base*L/100 + L + 10, others = 2*base*L/100 + 5)
+#   - each turn both active Pokémon pick one of their damaging moves
+#     (RegisteredPokemonMove -> Move, Status moves skipped) at random; a
+#     Pokémon without one uses a typeless fallback move
+#   - the faster one strikes first; hits roll against Move.accuracy
+#   - damage = ((2L/5 + 2) * power * atk/def / 50 + 2) * STAB * type * rand(0.85, 1)
+#   - fainted Pokémon are replaced by the next in line (highest level first)
+# Species carry a single attack/defense pair, so Physical and Special moves
+# use the same stats. Battles still undecided after MAX_TURNS are draws.
+
+TEAM_SIZE = 6
+MAX_MOVES = 4
+MAX_TURNS = 200
+DEFAULT_LEVEL = 50
+FALLBACK_MOVE = {"power": 50, "accuracy": 100, "type": -1}
+STAB = 1.5
+DEFAULT_TRIALS = 2000
+
+
+def _stat(base, level):
+    return np.floor(2.0 * base * level / 100.0) + 5
+
+
+def _hp(base, level):
+    return np.floor(2.0 * base * level / 100.0) + level + 10
+
+
+def _fetch(conn, sql, params=None):
+    with conn.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def load_teams(conn, trainer_ids=None):
+    """
+    Builds battle teams from the database.
+    Returns (teams, eff): teams maps trainer_id -> dict of NumPy arrays (one
+    entry per Pokémon, best TEAM_SIZE by level); eff is the type chart.
+    Errors are raised to the caller.
+    """
+    import matchups  # shares the type chart definition
+    type_ids, _, eff = matchups.load_type_chart(conn)
+    type_index = {t: i for i, t in enumerate(type_ids)}
+
+    where, params = "", None
+    if trainer_ids is not None:
+        trainer_ids = list(dict.fromkeys(trainer_ids))
+        if not trainer_ids:
+            return {}, eff
+        where = f"WHERE RP.trainer_id IN ({', '.join(['%s'] * len(trainer_ids))})"
+        params = trainer_ids
+
+    pokemon = _fetch(conn, f"""
+        SELECT RP.pokemon_id, RP.trainer_id, RP.level,
+               PS.base_hp, PS.base_attack, PS.base_defense, PS.base_speed,
+               PS.primary_type_id, PS.secondary_type_id
+        FROM RegisteredPokemon RP
+        JOIN PokemonSpecies PS ON RP.species_id = PS.species_id
+        {where}
+        ORDER BY RP.trainer_id, RP.level DESC, RP.pokemon_id
+    """, params)
+
+    by_trainer = {}
+    for row in pokemon:
+        if row['trainer_id'] is None:
+            continue
+        team = by_trainer.setdefault(row['trainer_id'], [])
+        if len(team) < TEAM_SIZE:
+            team.append(row)
+
+    selected = [row['pokemon_id'] for team in by_trainer.values() for row in team]
+    moves = {}
+    for start in range(0, len(selected), 1000):
+        chunk = selected[start:start + 1000]
+        for row in _fetch(conn, f"""
+            SELECT RPM.pokemon_id, M.power, M.accuracy, M.type_id
+            FROM RegisteredPokemonMove RPM
+            JOIN Move M ON RPM.move_id = M.move_id
+            WHERE M.category <> 'Status' AND M.power > 0
+              AND RPM.pokemon_id IN ({', '.join(['%s'] * len(chunk))})
+            ORDER BY RPM.pokemon_id, M.power DESC
+        """, chunk):
+            known = moves.setdefault(row['pokemon_id'], [])
+            if len(known) < MAX_MOVES:
+                known.append({"power": row['power'], "accuracy": row['accuracy'] if row['accuracy'] is not None else 100,
+                              "type": type_index.get(row['type_id'], -1)})
+
+    teams = {trainer_id: _build_team(rows, moves, type_index) for trainer_id, rows in by_trainer.items()}
+    return teams, eff
+
+
+def _build_team(rows, moves, type_index):
+    n = len(rows)
+    level = np.array([r['level'] or DEFAULT_LEVEL for r in rows], dtype=np.float64)
+    team = {
+        "level": level,
+        "hp": _hp(np.array([r['base_hp'] for r in rows], dtype=np.float64), level),
+        "atk": _stat(np.array([r['base_attack'] for r in rows], dtype=np.float64), level),
+        "def": _stat(np.array([r['base_defense'] for r in rows], dtype=np.float64), level),
+        "spd": _stat(np.array([r['base_speed'] for r in rows], dtype=np.float64), level),
+        "types": np.array([[type_index.get(r['primary_type_id'], -1), type_index.get(r['secondary_type_id'], -1)]
+                           for r in rows], dtype=np.int64).reshape(n, 2),
+        "power": np.zeros((n, MAX_MOVES)),
+        "accuracy": np.zeros((n, MAX_MOVES)),
+        "move_type": np.full((n, MAX_MOVES), -1, dtype=np.int64),
+        "n_moves": np.zeros(n, dtype=np.int64),
+    }
+    for i, r in enumerate(rows):
+        known = moves.get(r['pokemon_id']) or [FALLBACK_MOVE]
+        for m, move in enumerate(known):
+            team["power"][i, m] = move["power"]
+            team["accuracy"][i, m] = move["accuracy"] / 100.0
+            team["move_type"][i, m] = move["type"]
+        team["n_moves"][i] = len(known)
+    return team
+
+
+def _type_multiplier(eff, move_types, defender_types):
+    """(n_att, MAX_MOVES) move types vs (n_def, 2) typings -> (n_att, MAX_MOVES, n_def)."""
+    mult = np.ones(move_types.shape + (len(defender_types),))
+    valid_move = move_types >= 0
+    for k in range(2):
+        d = defender_types[:, k]
+        has = d >= 0
+        block = eff[np.maximum(move_types, 0)[..., None], np.maximum(d, 0)[None, None, :]]
+        mult *= np.where(valid_move[..., None] & has[None, None, :], block, 1.0)
+    return mult
+
+
+def _base_damage(attacker, defender, eff):
+    """Expected damage before the random roll, shape (n_att, MAX_MOVES, n_def)."""
+    stab = np.ones(attacker["move_type"].shape)
+    for k in range(2):
+        own = attacker["types"][:, k][:, None]
+        stab = np.where((attacker["move_type"] >= 0) & (attacker["move_type"] == own), STAB, stab)
+    core = ((2.0 * attacker["level"] / 5.0 + 2.0)[:, None, None] * attacker["power"][..., None]
+            * attacker["atk"][:, None, None] / defender["def"][None, None, :] / 50.0 + 2.0)
+    return core * (stab[..., None] * _type_multiplier(eff, attacker["move_type"], defender["types"]))
+
+
+def simulate_pair(team_a, team_b, eff, trials=DEFAULT_TRIALS, rng=None):
+    """
+    Runs `trials` independent battles at once (one array lane per trial).
+    Returns (wins_a, wins_b, draws).
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    if team_a is None or team_b is None:
+        if team_a is None and team_b is None:
+            return 0, 0, trials
+        return (0, trials, 0) if team_a is None else (trials, 0, 0)
+
+    dmg_ab = _base_damage(team_a, team_b, eff)
+    dmg_ba = _base_damage(team_b, team_a, eff)
+    hp_a = np.tile(team_a["hp"], (trials, 1))
+    hp_b = np.tile(team_b["hp"], (trials, 1))
+    lanes = np.arange(trials)
+    ongoing = np.ones(trials, dtype=bool)
+
+    def strike(attacker, active_att, active_def, base):
+        move = np.minimum((rng.random(trials) * attacker["n_moves"][active_att]).astype(np.int64), MAX_MOVES - 1)
+        hit = rng.random(trials) < attacker["accuracy"][active_att, move]
+        roll = rng.uniform(0.85, 1.0, trials)
+        return np.where(hit, np.floor(base[active_att, move, active_def] * roll), 0.0)
+
+    for _ in range(MAX_TURNS):
+        if not ongoing.any():
+            break
+        ia = np.argmax(hp_a > 0, axis=1)
+        ib = np.argmax(hp_b > 0, axis=1)
+        spd_a, spd_b = team_a["spd"][ia], team_b["spd"][ib]
+        a_first = (spd_a > spd_b) | ((spd_a == spd_b) & (rng.random(trials) < 0.5))
+        hit_ab = strike(team_a, ia, ib, dmg_ab)
+        hit_ba = strike(team_b, ib, ia, dmg_ba)
+
+        # Faster side strikes; the slower one only answers if it survived
+        hp_b[lanes, ib] -= np.where(ongoing & a_first, hit_ab, 0.0)
+        hp_a[lanes, ia] -= np.where(ongoing & ~a_first, hit_ba, 0.0)
+        hp_b[lanes, ib] -= np.where(ongoing & ~a_first & (hp_a[lanes, ia] > 0), hit_ab, 0.0)
+        hp_a[lanes, ia] -= np.where(ongoing & a_first & (hp_b[lanes, ib] > 0), hit_ba, 0.0)
+
+        ongoing = (hp_a > 0).any(axis=1) & (hp_b > 0).any(axis=1)
+
+    alive_a = (hp_a > 0).any(axis=1)
+    alive_b = (hp_b > 0).any(axis=1)
+    wins_a = int((alive_a & ~alive_b).sum())
+    wins_b = int((alive_b & ~alive_a).sum())
+    return wins_a, wins_b, trials - wins_a - wins_b
+
+# =============================================================================
+# PARALLEL RUNS
+# =============================================================================
+
+def _simulate_chunk(args):
+    """Worker entry point: one chunk of pairs with only the teams it needs."""
+    teams, eff, pairs, trials, seed = args
+    rng = np.random.default_rng(seed)
+    results = []
+    for a, b in pairs:
+        results.append((a, b) + simulate_pair(teams.get(a), teams.get(b), eff, trials, rng))
+    return results
+
+
+def simulate_pairs(teams, eff, pairs, trials=DEFAULT_TRIALS, workers=None, seed=None, progress=None):
+    """
+    Simulates every (trainer1_id, trainer2_id) pair. Pairs are split into
+    chunks and spread over a process pool (workers=1 runs inline).
+    `progress(done_pairs, total_pairs)` is called as chunks finish.
+    Returns (rows, stats); rows carry win probabilities, stats the throughput.
+    """
+    if np is None:
+        raise ImportError("The battle simulator requires numpy (pip install numpy).")
+    pairs = list(dict.fromkeys(pairs))
+    workers = workers or os.cpu_count() or 1
+    n_chunks = max(1, min(len(pairs), workers * 4))
+    size = math.ceil(len(pairs) / n_chunks) if pairs else 1
+    chunks = [pairs[i:i + size] for i in range(0, len(pairs), size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(chunks))
+    jobs = [({t: teams[t] for pair in chunk for t in pair if t in teams}, eff, chunk, trials, s)
+            for chunk, s in zip(chunks, seeds)]
+
+    start = time.perf_counter()
+    raw, done = [], 0
+    if workers == 1 or len(jobs) == 1:
+        results = map(_simulate_chunk, jobs)
+        pool = None
+    else:
+        pool = ProcessPoolExecutor(max_workers=workers)
+        results = pool.map(_simulate_chunk, jobs)
+    try:
+        for chunk_result in results:
+            raw.extend(chunk_result)
+            done += len(chunk_result)
+            if progress:
+                progress(done, len(pairs))
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    elapsed = time.perf_counter() - start
+
+    rows = [
+        {
+            "trainer1_id": a, "trainer2_id": b,
+            "trainer1_win_prob": round((wa + 0.5 * dr) / trials, 4),
+            "trainer2_win_prob": round((wb + 0.5 * dr) / trials, 4),
+            "draw_rate": round(dr / trials, 4),
+        }
+        for a, b, wa, wb, dr in raw
+    ]
+    total_trials = trials * len(pairs)
+    stats = {
+        "pairs": len(pairs), "trials": total_trials, "workers": workers, "seconds": elapsed,
+        "trials_per_sec": total_trials / elapsed if elapsed > 0 else 0.0,
+    }
+    return rows, stats
+
+
+def predict_match(conn, trainer1_id, trainer2_id, trials=DEFAULT_TRIALS, seed=None):
+    """Win probabilities for one pairing. Returns None (and prints why) on error."""
+    try:
+        teams, eff = load_teams(conn, [trainer1_id, trainer2_id])
+        rows, stats = simulate_pairs(teams, eff, [(trainer1_id, trainer2_id)], trials, workers=1, seed=seed)
+        return {**rows[0], "trials_per_sec": round(stats["trials_per_sec"])}
+    except (pymysql.Error, ImportError) as e:
+        print(f"Simulation Error: {e}")
+        return None
+
+# =============================================================================
+# BACKTEST
+# =============================================================================
+
+def backtest(conn, tournament_id=None, trials=DEFAULT_TRIALS, workers=None, seed=None, progress=None):
+    """
+    Replays recorded matches (both trainers and a winner set) and compares
+    the simulated favourite with Match_Table.winner_id.
+    Returns a summary dict with accuracy, Brier score and log loss.
+    """
+    sql = """
+        SELECT tournament_id, match_number, trainer1_id, trainer2_id, winner_id
+        FROM Match_Table
+        WHERE trainer1_id IS NOT NULL AND trainer2_id IS NOT NULL AND winner_id IS NOT NULL
+    """
+    params = None
+    if tournament_id:
+        sql += " AND tournament_id = %s"
+        params = (tournament_id,)
+    matches = _fetch(conn, sql, params)
+    if not matches:
+        return {"matches": 0}
+
+    teams, eff = load_teams(conn, [m[k] for m in matches for k in ('trainer1_id', 'trainer2_id')])
+    # Simulate each unordered pairing once
+    pairs = list(dict.fromkeys(tuple(sorted((m['trainer1_id'], m['trainer2_id']))) for m in matches))
+    rows, stats = simulate_pairs(teams, eff, pairs, trials, workers, seed, progress)
+    prob = {(r['trainer1_id'], r['trainer2_id']): r['trainer1_win_prob'] for r in rows}
+
+    correct = 0
+    brier = 0.0
+    log_loss = 0.0
+    for m in matches:
+        a, b = sorted((m['trainer1_id'], m['trainer2_id']))
+        p_a = prob[(a, b)]
+        p_winner = p_a if m['winner_id'] == a else 1.0 - p_a
+        # Laplace smoothing: a favourite that never lost in N trials is not a certainty
+        p_winner = (p_winner * trials + 1.0) / (trials + 2.0)
+        correct += p_winner > 0.5
+        brier += (1.0 - p_winner) ** 2
+        log_loss -= math.log(p_winner)
+
+    n = len(matches)
+    return {
+        "matches": n,
+        "pairs": stats["pairs"],
+        "accuracy": round(correct / n, 4),
+        "brier_score": round(brier / n, 4),
+        "log_loss": round(log_loss / n, 4),
+        "trials": stats["trials"],
+        "seconds": round(stats["seconds"], 2),
+        "trials_per_sec": round(stats["trials_per_sec"]),
+    }
+
+# =============================================================================
+# COMMAND LINE
+# =============================================================================
+
+def print_progress(done, total):
+    sys.stderr.write(f"\r{done:,}/{total:,} pairings simulated")
+    sys.stderr.flush()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Monte Carlo battle simulator over registered rosters.")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--user", default="root")
+    parser.add_argument("--password", default=None, help="Prompted for if omitted")
+    parser.add_argument("--db", default="pokemon_league_db")
+    parser.add_argument("--trials", type=int, default=DEFAULT_TRIALS)
+    parser.add_argument("--workers", type=int, default=None, help="Processes (default: CPU count)")
+    parser.add_argument("--seed", type=int, default=None)
+    sub = parser.add_subparsers(dest="kind", required=True)
+
+    p = sub.add_parser("pair", help="Win probabilities for two trainers")
+    p.add_argument("trainer1_id")
+    p.add_argument("trainer2_id")
+    p = sub.add_parser("backtest", help="Check predictions against recorded winners")
+    p.add_argument("--tournament", default=None, help="Limit to one tournament_id")
+
+    args = parser.parse_args(argv)
+    if np is None:
+        print("The battle simulator requires numpy (pip install numpy).")
+        return 1
+    password = args.password if args.password is not None else getpass.getpass("Password: ")
+    conn = db_utils.get_db_connection(args.host, args.user, password, args.db)
+    if not conn:
+        return 1
+
+    try:
+        if args.kind == "pair":
+            result = predict_match(conn, args.trainer1_id, args.trainer2_id, args.trials, args.seed)
+        else:
+            result = backtest(conn, args.tournament, args.trials, args.workers, args.seed, print_progress)
+            sys.stderr.write("\n")
+    except pymysql.Error as e:
+        print(f"Simulation Error: {e}")
+        return 1
+    finally:
+        conn.close()
+
+    if not result:
+        return 1
+    for key, val in result.items():
+        print(f"{key:>20}: {val}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
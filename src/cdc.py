@@ -0,0 +1,165 @@
+import argparse
+import getpass
+import sys
+import pymysql
+import db_utils
+from table_config import TABLE_CONFIG, get_pk_columns
+
+# =============================================================================
+# CHANGE CAPTURE TRIGGERS
+# =============================================================================
+# Every TABLE_CONFIG table gets AFTER INSERT/UPDATE/DELETE triggers that
+# append (table, primary key as JSON, operation) to ChangeLog. An UPDATE
+# that changes the primary key is logged as DELETE of the old key plus
+# INSERT of the new one, so readers never have to track renames.
+#
+# MySQL does not fire triggers for ON DELETE/UPDATE CASCADE actions, so
+# rows changed by a cascade are not logged; views refresh those on reload.
+
+OPERATIONS = {"ins": "INSERT", "upd": "UPDATE", "del": "DELETE"}
+
+
+def trigger_name(table_name, op):
+    return f"trg_cdc_{table_name}_{op}"
+
+
+def _log_insert(table_name, pk_cols, row_alias, operation):
+    pairs = ", ".join(f"'{c}', {row_alias}.{c}" for c in pk_cols)
+    return (f"INSERT INTO ChangeLog (table_name, pk_value, operation) "
+            f"VALUES ('{table_name}', JSON_OBJECT({pairs}), '{operation}')")
+
+
+def trigger_statements(table_name):
+    """CREATE TRIGGER statements for one table (each runs as a single statement, no DELIMITER)."""
+    clean_table = db_utils.validate_identifier(table_name)
+    pk_cols = [db_utils.validate_identifier(c) for c in get_pk_columns(clean_table)]
+    if not pk_cols:
+        return []
+    same_key = " AND ".join(f"OLD.{c} <=> NEW.{c}" for c in pk_cols)
+    return [
+        f"CREATE TRIGGER {trigger_name(clean_table, 'ins')} AFTER INSERT ON {clean_table} FOR EACH ROW "
+        + _log_insert(clean_table, pk_cols, "NEW", "INSERT"),
+
+        f"CREATE TRIGGER {trigger_name(clean_table, 'upd')} AFTER UPDATE ON {clean_table} FOR EACH ROW\n"
+        f"BEGIN\n"
+        f"    IF {same_key} THEN\n"
+        f"        {_log_insert(clean_table, pk_cols, 'NEW', 'UPDATE')};\n"
+        f"    ELSE\n"
+        f"        {_log_insert(clean_table, pk_cols, 'OLD', 'DELETE')};\n"
+        f"        {_log_insert(clean_table, pk_cols, 'NEW', 'INSERT')};\n"
+        f"    END IF;\n"
+        f"END",
+
+        f"CREATE TRIGGER {trigger_name(clean_table, 'del')} AFTER DELETE ON {clean_table} FOR EACH ROW "
+        + _log_insert(clean_table, pk_cols, "OLD", "DELETE"),
+    ]
+
+
+def drop_statements(table_name):
+    clean_table = db_utils.validate_identifier(table_name)
+    return [f"DROP TRIGGER IF EXISTS {trigger_name(clean_table, op)}" for op in OPERATIONS]
+
+
+def install_triggers(conn, tables=None):
+    """(Re)creates the change-capture triggers. Returns the tables covered, [] on error."""
+    tables = list(tables or TABLE_CONFIG)
+    try:
+        with conn.cursor() as cursor:
+            for table in tables:
+                for sql in drop_statements(table) + trigger_statements(table):
+                    cursor.execute(sql)
+        return tables
+    except (pymysql.Error, ValueError) as e:
+        print(f"CDC Error: {e}")
+        return []
+
+
+def uninstall_triggers(conn, tables=None):
+    try:
+        with conn.cursor() as cursor:
+            for table in tables or TABLE_CONFIG:
+                for sql in drop_statements(table):
+                    cursor.execute(sql)
+        return True
+    except (pymysql.Error, ValueError) as e:
+        print(f"CDC Error: {e}")
+        return False
+
+
+def installed_tables(conn):
+    """Tables that currently have change-capture triggers, or None on error."""
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                SELECT DISTINCT EVENT_OBJECT_TABLE AS table_name FROM information_schema.TRIGGERS
+                WHERE TRIGGER_SCHEMA = DATABASE() AND TRIGGER_NAME LIKE %s
+                ORDER BY table_name
+            """, ("trg\\_cdc\\_%",))
+            return [row['table_name'] for row in cursor.fetchall()]
+    except pymysql.Error as e:
+        print(f"CDC Error: {e}")
+        return None
+
+
+def prune_changes(conn, keep_days=7):
+    """Deletes ChangeLog entries older than keep_days. Returns rows removed (-1 on error)."""
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("DELETE FROM ChangeLog WHERE changed_at < NOW(6) - INTERVAL %s DAY", (keep_days,))
+            return cursor.rowcount
+    except pymysql.Error as e:
+        print(f"CDC Error: {e}")
+        return -1
+
+# =============================================================================
+# COMMAND LINE
+# =============================================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage change-capture triggers for the ChangeLog table.")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--user", default="root")
+    parser.add_argument("--password", default=None, help="Prompted for if omitted")
+    parser.add_argument("--db", default="pokemon_league_db")
+    sub = parser.add_subparsers(dest="kind", required=True)
+    sub.add_parser("install", help="Create triggers on every TABLE_CONFIG table")
+    sub.add_parser("uninstall", help="Drop the triggers")
+    sub.add_parser("print-sql", help="Print the trigger DDL instead of running it")
+    p = sub.add_parser("prune", help="Delete old ChangeLog entries")
+    p.add_argument("--keep-days", type=int, default=7)
+
+    args = parser.parse_args(argv)
+    if args.kind == "print-sql":
+        print("DELIMITER $$")
+        for table in TABLE_CONFIG:
+            for sql in trigger_statements(table):
+                print(sql + "$$\n")
+        print("DELIMITER ;")
+        return 0
+
+    password = args.password if args.password is not None else getpass.getpass("Password: ")
+    conn = db_utils.get_db_connection(args.host, args.user, password, args.db)
+    if not conn:
+        return 1
+    try:
+        if args.kind == "install":
+            tables = install_triggers(conn)
+            if not tables:
+                return 1
+            print(f"Change capture installed on {len(tables)} tables.")
+        elif args.kind == "uninstall":
+            if not uninstall_triggers(conn):
+                return 1
+            print("Change capture triggers removed.")
+        else:
+            removed = prune_changes(conn, args.keep_days)
+            if removed < 0:
+                return 1
+            print(f"Removed {removed:,} change log entries.")
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
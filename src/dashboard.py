@@ -0,0 +1,89 @@
+import argparse
+import getpass
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+import db_utils
+from pool import ConnectionPool
+
+# =============================================================================
+# REPORT DASHBOARD
+# =============================================================================
+# Runs every analytical report at once, each on its own pooled connection,
+# so the whole dashboard takes as long as the slowest report instead of the
+# sum of all of them. Results are handed to on_result as each one finishes.
+
+# (key, title, report function, keyword arguments)
+PANELS = [
+    ("gym_leader_cheat_sheet", "Gym Leader Cheat Sheet", db_utils.get_gym_leader_cheat_sheet, {}),
+    ("tournament_snapshot", "Tournament Snapshot", db_utils.get_tournament_snapshot, {}),
+    ("underrated_trainers", "Underrated Trainers", db_utils.get_underrated_trainer_report, {}),
+    ("region_power", "Region Power", db_utils.get_region_power_report, {}),
+    ("species_mvp", "Species MVP", db_utils.get_species_mvp_report, {}),
+    ("badge_leaderboard", "Badge Leaderboard", db_utils.query_badge_leaderboard, {}),
+    ("elite_pokemon", "Elite Pokemon", db_utils.query_elite_pokemon, {}),
+    ("active_region_insights", "Active Region Insights", db_utils.query_active_region_insights, {}),
+]
+
+
+def run_panels(pool, on_result, panels=None, should_stop=None):
+    """
+    Runs the panels concurrently (one thread and pooled connection each, up
+    to pool.size at a time) and calls on_result(key, rows, seconds) as each
+    finishes. Returns the wall-clock time for the whole dashboard.
+    should_stop() is checked before a queued panel starts.
+    """
+    panels = PANELS if panels is None else panels
+    start = time.perf_counter()
+
+    def run(panel):
+        key, _, func, kwargs = panel
+        if should_stop and should_stop():
+            return
+        t0 = time.perf_counter()
+        try:
+            with pool.connection() as conn:
+                rows = func(conn, **kwargs)
+        except Exception as e:
+            print(f"Dashboard Error ({key}): {e}")
+            rows = None
+        on_result(key, rows, time.perf_counter() - t0)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(pool.size, len(panels)))) as executor:
+        list(executor.map(run, panels))
+    return time.perf_counter() - start
+
+# =============================================================================
+# COMMAND LINE
+# =============================================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run every dashboard report in parallel and print timings.")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--user", default="root")
+    parser.add_argument("--password", default=None, help="Prompted for if omitted")
+    parser.add_argument("--db", default="pokemon_league_db")
+    parser.add_argument("--connections", type=int, default=len(PANELS), help="Pool size (1 = sequential)")
+
+    args = parser.parse_args(argv)
+    password = args.password if args.password is not None else getpass.getpass("Password: ")
+    conn = db_utils.get_db_connection(args.host, args.user, password, args.db)
+    if not conn:
+        return 1
+    pool = ConnectionPool(conn, size=args.connections)
+    timings = []
+    try:
+        wall = run_panels(pool, lambda key, rows, seconds: timings.append((key, rows, seconds)))
+    finally:
+        pool.close()
+        conn.close()
+
+    for key, rows, seconds in timings:
+        status = f"{len(rows):,} rows" if rows is not None else "failed"
+        print(f"{key:<24} {status:>12} {seconds:7.2f}s")
+    print(f"Dashboard ready in {wall:.2f}s (sum of report times {sum(t for _, _, t in timings):.2f}s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,10 @@
 import pymysql
 import re
+import contextlib
 import datetime
+import json
+import time
+from table_config import get_pk_columns
 
 # =============================================================================
 # SECURITY & VALIDATION HELPER
@@ -22,11 +26,12 @@ def validate_identifier(identifier):
 # CONNECTION & ID GENERATION
 # =============================================================================
 
-def get_db_connection(host, user, password, db_name):
+def get_db_connection(host, user, password, db_name, port=3306):
     """Establishes a connection to the MySQL database."""
     try:
         connection = pymysql.connect(
             host=host,
+            port=port,
             user=user,
             password=password,
             database=db_name,
@@ -38,6 +43,55 @@ def get_db_connection(host, user, password, db_name):
         print(f"Error connecting to MySQL: {e}")
         return None
 
+def get_routed_connection(host, user, password, db_name, replicas, port=3306, **options):
+    """
+    Connects to a primary plus read replicas ("host" or "host:port" strings).
+    Returns a routing.RoutedConnection that sends reads to the replicas and
+    writes to the primary, or None if the primary is unreachable.
+    Unreachable replicas are left out (with a printed warning).
+    """
+    import routing
+    primary = get_db_connection(host, user, password, db_name, port)
+    if primary is None:
+        return None
+    members = []
+    for text in replicas:
+        replica_host, replica_port = routing.parse_host(text)
+        conn = get_db_connection(replica_host, user, password, db_name, replica_port)
+        if conn is None:
+            print(f"Replica {text} skipped.")
+            continue
+        members.append(routing.Replica(conn, text.strip()))
+    return routing.RoutedConnection(primary, members, **options)
+
+def use_primary(conn):
+    """Context manager that keeps reads on the primary (no-op without replicas)."""
+    pinned = getattr(conn, "pinned", None)
+    return pinned() if pinned else contextlib.nullcontext()
+
+def clone_connection(conn, cursorclass=None, for_read=False):
+    """
+    Opens a second connection with the same credentials as `conn`.
+    Used for server-side streaming and background work so the main
+    connection is never blocked. With for_read=True and a routed
+    connection, the clone targets the replica reads currently go to.
+    """
+    if for_read and hasattr(conn, "read_target"):
+        conn = conn.read_target()
+    try:
+        return pymysql.connect(
+            host=conn.host,
+            port=conn.port,
+            user=conn.user,
+            password=conn.password,
+            database=conn.db,
+            cursorclass=cursorclass or pymysql.cursors.DictCursor,
+            autocommit=True
+        )
+    except pymysql.Error as e:
+        print(f"Error connecting to MySQL: {e}")
+        return None
+
 def increment_alpha_part(alpha_str):
     chars = list(alpha_str)
     i = len(chars) - 1
@@ -50,49 +104,66 @@ def increment_alpha_part(alpha_str):
             return "".join(chars)
     return 'A' + "".join(chars)
 
+def next_id_after(current_id, prefix):
+    """Returns the ID that follows `current_id` (e.g. TASH999 -> TASI001)."""
+    if not current_id:
+        return f"{prefix}AAA001"
+
+    match = re.search(r'([A-Z]+)(\d{3})$', current_id[len(prefix):])
+
+    if not match:
+        return f"{prefix}AAA001"
+
+    alpha_part = match.group(1)
+    number_part = int(match.group(2))
+
+    next_number = number_part + 1
+    next_alpha = alpha_part
+
+    if next_number > 999:
+        next_number = 1
+        next_alpha = increment_alpha_part(alpha_part)
+
+    return f"{prefix}{next_alpha}{next_number:03d}"
+
 def get_next_id(connection, table_name, id_column, prefix):
     """
     Generates the next ID. 
     SECURE: Validates table/column names, Parameterizes the LIKE clause.
     """
-    # 1. Validate Identifiers (Cannot be parameterized)
-    clean_table = validate_identifier(table_name)
-    clean_col = validate_identifier(id_column)
+    ids = allocate_ids(connection, table_name, id_column, prefix, 1)
+    return ids[0] if ids else None
 
+def allocate_ids(connection, table_name, id_column, prefix, count):
+    """
+    Generates a block of `count` consecutive IDs with a single query.
+    Returns [] on error.
+    """
     try:
-        with connection.cursor() as cursor:
+        # 1. Validate Identifiers (Cannot be parameterized)
+        clean_table = validate_identifier(table_name)
+        clean_col = validate_identifier(id_column)
+
+        # Read the newest ID from the primary: a lagging replica would hand out taken IDs
+        with use_primary(connection), connection.cursor() as cursor:
             # 2. Parameterize Values (%s)
             sql = f"SELECT {clean_col} FROM {clean_table} WHERE {clean_col} LIKE %s ORDER BY {clean_col} DESC LIMIT 1"
             cursor.execute(sql, (f"{prefix}%",))
             result = cursor.fetchone()
 
-            if not result:
-                return f"{prefix}AAA001"
-            
-            current_id = result[clean_col]
-            match = re.search(r'([A-Z]+)(\d{3})$', current_id[len(prefix):])
-            
-            if not match:
-                return f"{prefix}AAA001"
-
-            alpha_part = match.group(1)
-            number_part = int(match.group(2))
-            
-            next_number = number_part + 1
-            next_alpha = alpha_part
-            
-            if next_number > 999:
-                next_number = 1
-                next_alpha = increment_alpha_part(alpha_part)
-            
-            return f"{prefix}{next_alpha}{next_number:03d}"
+        current_id = result[clean_col] if result else None
+        ids = []
+        for _ in range(count):
+            current_id = next_id_after(current_id, prefix)
+            ids.append(current_id)
+        return ids
             
     except pymysql.Error as e:
         print(f"Error generating ID: {e}")
-        return None
+        return []
     except ValueError as ve:
         print(ve)
-        return None
+        return []
 
 # =============================================================================
 # VIEW, SEARCH & RECENT FUNCTIONALITY
@@ -144,6 +215,7 @@ def get_searchable_columns(conn, table_name):
                 FROM information_schema.columns
                 WHERE table_schema = DATABASE()
                 AND table_name = %s
+                ORDER BY ordinal_position
             """
             cursor.execute(sql, (clean_table,))
             rows = cursor.fetchall()
@@ -155,99 +227,146 @@ def get_searchable_columns(conn, table_name):
         print(ve)
         return []
 
+def get_primary_key_columns(conn, table_name):
+    """Primary key columns of a table in key order: TABLE_CONFIG's, else the schema's ([] if none)."""
+    clean_table = validate_identifier(table_name)
+    pk_cols = get_pk_columns(clean_table)
+    if pk_cols:
+        return pk_cols
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            SELECT COLUMN_NAME FROM information_schema.KEY_COLUMN_USAGE
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND CONSTRAINT_NAME = 'PRIMARY'
+            ORDER BY ORDINAL_POSITION
+        """, (clean_table,))
+        return [row['COLUMN_NAME'] for row in cursor.fetchall()]
+
 def view_table(conn, table_name, limit=100):
     try:
         clean_table = validate_identifier(table_name)
         with conn.cursor() as cursor:
             # Table name is validated f-string, Limit is parameterized
             sql = f"SELECT * FROM {clean_table} LIMIT %s"
-            cursor.execute(sql, (limit,))
+            cursor.execute(with_time_limit(sql), (limit,))
             return cursor.fetchall()
     except (pymysql.Error, ValueError) as e:
         print(f"Error viewing table: {e}")
         return []
 
-def search_table(conn, table_name, search_term):
-    try:
-        clean_table = validate_identifier(table_name)
+def build_search_query(conn, table_name, search_term):
+    """
+    Builds the filter SQL used by search_table.
+    Returns (sql, params), or (None, None) if no column can match the term.
+    """
+    clean_table = validate_identifier(table_name)
 
-        # Retrieve searchable columns and types
-        cols = get_searchable_columns(conn, clean_table)
+    # Retrieve searchable columns and types
+    cols = get_searchable_columns(conn, clean_table)
 
-        if not cols:
-            return []
+    if not cols:
+        return None, None
 
-        # Attempt to interpret search term as int/float/date to enable numeric/date searches
-        is_int = False
-        is_float = False
-        is_date = False
-        num_val = None
-        date_val = None
+    # Attempt to interpret search term as int/float/date to enable numeric/date searches
+    is_int = False
+    is_float = False
+    is_date = False
+    num_val = None
+    date_val = None
+    try:
+        num_val = int(search_term)
+        is_int = True
+    except Exception:
         try:
-            num_val = int(search_term)
-            is_int = True
+            num_val = float(search_term)
+            is_float = True
         except Exception:
-            try:
-                num_val = float(search_term)
-                is_float = True
-            except Exception:
-                num_val = None
+            num_val = None
 
-        # parse date (YYYY-MM-DD or YYYY-MM-DD HH:MM:SS or YYYY)
-        for fmt in ("%Y-%m-%d", "%Y-%m-%d %H:%M:%S", "%Y"):
-            try:
-                dt = datetime.datetime.strptime(search_term, fmt)
-                is_date = True
-                # normalize to YYYY-MM-DD for DATE comparisons; if format was year only, keep year
-                date_val = dt.date().isoformat() if fmt != "%Y" else dt.year
-                break
-            except Exception:
-                continue
+    # parse date (YYYY-MM-DD or YYYY-MM-DD HH:MM:SS or YYYY)
+    for fmt in ("%Y-%m-%d", "%Y-%m-%d %H:%M:%S", "%Y"):
+        try:
+            dt = datetime.datetime.strptime(search_term, fmt)
+            is_date = True
+            # normalize to YYYY-MM-DD for DATE comparisons; if format was year only, keep year
+            date_val = dt.date().isoformat() if fmt != "%Y" else dt.year
+            break
+        except Exception:
+            continue
 
-        clauses = []
-        params = []
+    clauses = []
+    params = []
 
-        text_types = {'char', 'varchar', 'text', 'mediumtext', 'longtext', 'enum'}
-        numeric_types = {'int', 'bigint', 'smallint', 'mediumint', 'decimal', 'float', 'double', 'tinyint'}
-        date_types = {'date', 'datetime', 'timestamp', 'year', 'time'}
+    text_types = {'char', 'varchar', 'text', 'mediumtext', 'longtext', 'enum'}
+    numeric_types = {'int', 'bigint', 'smallint', 'mediumint', 'decimal', 'float', 'double', 'tinyint'}
+    date_types = {'date', 'datetime', 'timestamp', 'year', 'time'}
 
-        for col, dtype in cols:
-            try:
-                clean_col = validate_identifier(col)
-            except ValueError:
-                continue
-
-            if dtype in text_types:
-                clauses.append(f"LOWER({clean_col}) LIKE LOWER(%s)")
-                params.append(f"%{search_term}%")
-
-            if dtype in numeric_types and (is_int or is_float):
-                clauses.append(f"{clean_col} = %s")
-                params.append(num_val)
-
-            if dtype in date_types and is_date:
-                # If search was year-only, compare YEAR(), else DATE()
-                if isinstance(date_val, int):
-                    clauses.append(f"YEAR({clean_col}) = %s")
-                    params.append(date_val)
-                else:
-                    clauses.append(f"DATE({clean_col}) = %s")
-                    params.append(date_val)
-
-        if not clauses:
-            return []
+    for col, dtype in cols:
+        try:
+            clean_col = validate_identifier(col)
+        except ValueError:
+            continue
+
+        if dtype in text_types:
+            clauses.append(f"LOWER({clean_col}) LIKE LOWER(%s)")
+            params.append(f"%{search_term}%")
+
+        if dtype in numeric_types and (is_int or is_float):
+            clauses.append(f"{clean_col} = %s")
+            params.append(num_val)
+
+        if dtype in date_types and is_date:
+            # If search was year-only, compare YEAR(), else DATE()
+            if isinstance(date_val, int):
+                clauses.append(f"YEAR({clean_col}) = %s")
+                params.append(date_val)
+            else:
+                clauses.append(f"DATE({clean_col}) = %s")
+                params.append(date_val)
 
-        where_clause = " OR ".join(clauses)
-        sql = f"SELECT * FROM {clean_table} WHERE {where_clause}"
+    if not clauses:
+        return None, None
+
+    where_clause = " OR ".join(clauses)
+    sql = f"SELECT * FROM {clean_table} WHERE {where_clause}"
+    return sql, tuple(params)
+
+def search_table(conn, table_name, search_term, limit=None, offset=0):
+    """
+    Rows of table_name matching the term. limit/offset page through them
+    ("load more"), ordered by primary key so pages neither repeat nor skip rows.
+    """
+    try:
+        sql, params = build_search_query(conn, table_name, search_term)
+        if not sql:
+            return []
+        if limit is not None:
+            pk_cols = get_primary_key_columns(conn, table_name)
+            if pk_cols:
+                sql += f" ORDER BY {', '.join(validate_identifier(c) for c in pk_cols)}"
+            sql += " LIMIT %s OFFSET %s"
+            params += (limit, offset)
 
         with conn.cursor() as cursor:
-            cursor.execute(sql, tuple(params))
+            cursor.execute(with_time_limit(sql), params)
             return cursor.fetchall()
 
     except (pymysql.Error, ValueError) as e:
         print(f"Error searching table: {e}")
         return []
 
+def count_search_matches(conn, table_name, search_term):
+    """How many rows search_table would return (0 if no column can match), or None on error."""
+    try:
+        sql, params = build_search_query(conn, table_name, search_term)
+        if not sql:
+            return 0
+        with conn.cursor() as cursor:
+            cursor.execute(with_time_limit(f"SELECT COUNT(*) AS n FROM ({sql}) AS matches"), params)
+            return int(cursor.fetchone()['n'])
+    except (pymysql.Error, ValueError) as e:
+        print(f"Error counting matches: {e}")
+        return None
+
 def search_global(conn, search_term):
     tables = get_all_tables(conn)
     results = {}
@@ -257,6 +376,32 @@ def search_global(conn, search_term):
             results[table] = matches
     return results
 
+def get_display_names(conn, table_name, pk_col, display_col, keys, chunk_size=1000):
+    """
+    Resolves many IDs to their display value with one IN (...) query per
+    `chunk_size` keys. Returns {key: display_value}; unknown keys are absent.
+    """
+    keys = [k for k in dict.fromkeys(keys) if k is not None]
+    if not keys:
+        return {}
+    try:
+        clean_table = validate_identifier(table_name)
+        clean_pk = validate_identifier(pk_col)
+        clean_display = validate_identifier(display_col)
+        names = {}
+        with conn.cursor() as cursor:
+            for i in range(0, len(keys), chunk_size):
+                chunk = keys[i:i + chunk_size]
+                placeholders = ", ".join(["%s"] * len(chunk))
+                sql = f"SELECT {clean_pk} AS k, {clean_display} AS v FROM {clean_table} WHERE {clean_pk} IN ({placeholders})"
+                cursor.execute(sql, chunk)
+                for row in cursor.fetchall():
+                    names[row['k']] = row['v']
+        return names
+    except (pymysql.Error, ValueError) as e:
+        print(f"Error resolving display names: {e}")
+        return {}
+
 def get_recent_records(conn, table_name, pk_col=None, limit=5):
     try:
         clean_table = validate_identifier(table_name)
@@ -273,6 +418,324 @@ def get_recent_records(conn, table_name, pk_col=None, limit=5):
         print(f"Error fetching recent records: {e}")
         return []
 
+# =============================================================================
+# STREAMING (SERVER-SIDE CURSORS)
+# =============================================================================
+
+def stream_query(conn, sql, params=None, chunk_size=1000, timeout_ms=0, on_connect=None):
+    """
+    Yields the result of `sql` in lists of at most `chunk_size` dict rows.
+    Runs on a cloned connection with an unbuffered (server-side) cursor, so
+    memory stays constant no matter how large the result is.
+    timeout_ms > 0 adds a server-side time limit; on_connect(stream_conn) is
+    called before the query starts so the caller can kill_query() it.
+    Errors are raised to the caller, which decides how to report them.
+    """
+    stream_conn = clone_connection(conn, cursorclass=pymysql.cursors.SSDictCursor, for_read=True)
+    if stream_conn is None:
+        raise pymysql.OperationalError("Could not open a streaming connection.")
+    if on_connect:
+        on_connect(stream_conn)
+    try:
+        with stream_conn.cursor() as cursor:
+            cursor.execute(with_time_limit(sql, timeout_ms), params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield rows
+    finally:
+        stream_conn.close()
+
+def stream_table(conn, table_name, chunk_size=1000, columns=None):
+    clean_table = validate_identifier(table_name)
+    select = ", ".join(validate_identifier(c) for c in columns) if columns else "*"
+    yield from stream_query(conn, f"SELECT {select} FROM {clean_table}", chunk_size=chunk_size)
+
+def estimate_row_count(conn, table_name):
+    """Cheap row estimate from table statistics (used for progress bars)."""
+    try:
+        clean_table = validate_identifier(table_name)
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT table_rows FROM information_schema.tables "
+                "WHERE table_schema = DATABASE() AND table_name = %s",
+                (clean_table,)
+            )
+            row = cursor.fetchone()
+            if not row:
+                return None
+            return row.get('TABLE_ROWS') if 'TABLE_ROWS' in row else row.get('table_rows')
+    except (pymysql.Error, ValueError) as e:
+        print(f"Error estimating rows: {e}")
+        return None
+
+def get_table_fingerprints(conn):
+    """
+    {table_name: (update_time, table_rows)} for every table in the schema.
+    Cheap change detection for in-memory caches: a changed tuple means the
+    table was written since the cache was built.
+    """
+    with conn.cursor() as cursor:
+        try:
+            # MySQL 8 caches table statistics for a day by default
+            cursor.execute("SET SESSION information_schema_stats_expiry = 0")
+        except pymysql.Error:
+            pass
+        cursor.execute("""
+            SELECT table_name, update_time, table_rows
+            FROM information_schema.tables
+            WHERE table_schema = DATABASE()
+        """)
+        rows = cursor.fetchall()
+    prints = {}
+    for row in rows:
+        row = {k.lower(): v for k, v in row.items()}
+        prints[row["table_name"]] = (row["update_time"], row["table_rows"])
+    return prints
+
+def get_change_fingerprints(conn, tables):
+    """
+    {table: fingerprint} for `tables` (None if a table does not exist), for
+    caches that reload a table when its fingerprint changes. InnoDB reports
+    update_time as NULL for tables not written since the server started, so
+    for those MAX(first primary key column), an index lookup, is added to
+    the table_rows estimate instead of treating the table as changed.
+    """
+    prints = get_table_fingerprints(conn)
+    result = {}
+    for table in tables:
+        fingerprint = prints.get(table)
+        if fingerprint is not None and fingerprint[0] is None:
+            pk_cols = get_primary_key_columns(conn, table)
+            if pk_cols:
+                with conn.cursor() as cursor:
+                    cursor.execute(f"SELECT MAX({validate_identifier(pk_cols[0])}) AS max_key "
+                                   f"FROM {validate_identifier(table)}")
+                    fingerprint += (cursor.fetchone()['max_key'],)
+        result[table] = fingerprint
+    return result
+
+# =============================================================================
+# PRIMARY KEY RANGES
+# =============================================================================
+# Tables are split into (low, high] ranges of their primary key, compared
+# with row constructors for composite keys. None means "open ended", so a
+# list of ranges from chunk_bounds() always covers every row, including rows
+# inserted after the boundaries were read.
+
+def pk_compare(pk_cols, op):
+    """'col > %s' or '(a, b) > (%s, %s)' for composite keys."""
+    cols = [validate_identifier(c) for c in pk_cols]
+    if len(cols) == 1:
+        return f"{cols[0]} {op} %s"
+    return f"({', '.join(cols)}) {op} ({', '.join(['%s'] * len(cols))})"
+
+def pk_range_where(pk_cols, low, high):
+    """(WHERE clause or '', params) selecting low < pk <= high."""
+    clauses, params = [], []
+    if low is not None:
+        clauses.append(pk_compare(pk_cols, ">"))
+        params += list(low)
+    if high is not None:
+        clauses.append(pk_compare(pk_cols, "<="))
+        params += list(high)
+    return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+def chunk_bounds(conn, table_name, pk_cols, chunk_rows, low=None, high=None):
+    """
+    Primary-key ranges [(low, k1), (k1, k2), ..., (kn, high)] of about
+    chunk_rows rows each, covering (low, high]. Each boundary is one
+    index-only LIMIT/OFFSET step from the previous one.
+    """
+    if not pk_cols:
+        return [(None, None)]
+    clean_table = validate_identifier(table_name)
+    order = ", ".join(validate_identifier(c) for c in pk_cols)
+    bounds, last = [], low
+    with conn.cursor(pymysql.cursors.Cursor) as cursor:
+        while True:
+            where, params = pk_range_where(pk_cols, last, high)
+            cursor.execute(f"SELECT {order} FROM {clean_table}{where} ORDER BY {order} LIMIT 1 OFFSET %s",
+                           params + [max(1, chunk_rows) - 1])
+            row = cursor.fetchone()
+            if row is None or (high is not None and tuple(row) == tuple(high)):
+                break
+            last = tuple(row)
+            bounds.append(last)
+    edges = [low] + bounds + [high]
+    return list(zip(edges[:-1], edges[1:]))
+
+# =============================================================================
+# QUERY DEADLINES & CANCELLATION
+# =============================================================================
+# Browse, search and report reads carry a MAX_EXECUTION_TIME optimizer hint,
+# so MySQL itself aborts them (error 3024) instead of running until done.
+# A statement can also be stopped early with kill_query(), which sends
+# KILL QUERY from a side connection (error 1317 on the victim).
+
+QUERY_TIMEOUT_MS = 30000  # 0 disables the limit
+QUERY_TIMEOUT_ERROR = 3024
+QUERY_KILLED_ERROR = 1317
+_SQL_TOKENS = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"|[()]|\bSELECT\b", re.I)
+
+def with_time_limit(sql, timeout_ms=None):
+    """
+    Adds /*+ MAX_EXECUTION_TIME(ms) */ to the top-level SELECT (the hint is
+    ignored on subqueries). Defaults to QUERY_TIMEOUT_MS; statements without
+    a top-level SELECT are returned unchanged.
+    """
+    timeout_ms = QUERY_TIMEOUT_MS if timeout_ms is None else timeout_ms
+    if not timeout_ms:
+        return sql
+    depth = 0
+    for token in _SQL_TOKENS.finditer(sql):
+        text = token.group()
+        if text == "(":
+            depth += 1
+        elif text == ")":
+            depth -= 1
+        elif depth == 0 and text.upper() == "SELECT":
+            return f"{sql[:token.end()]} /*+ MAX_EXECUTION_TIME({int(timeout_ms)}) */{sql[token.end():]}"
+    return sql
+
+def set_query_timeout(timeout_ms):
+    global QUERY_TIMEOUT_MS
+    QUERY_TIMEOUT_MS = max(0, int(timeout_ms))
+
+def query_stop_reason(error):
+    """'timed out' / 'cancelled' for errors caused by a deadline or kill_query(), else None."""
+    code = error.args[0] if isinstance(error, pymysql.Error) and error.args else None
+    return {QUERY_TIMEOUT_ERROR: "timed out", QUERY_KILLED_ERROR: "cancelled"}.get(code)
+
+def kill_query(conn):
+    """
+    Stops the statement currently running on `conn` by sending KILL QUERY
+    from a short-lived side connection. `conn` itself stays usable.
+    Returns True if the KILL was sent.
+    """
+    side_conn = clone_connection(conn)
+    if side_conn is None:
+        return False
+    try:
+        with side_conn.cursor() as cursor:
+            cursor.execute("KILL QUERY %s", (conn.thread_id(),))
+        return True
+    except pymysql.Error as e:
+        print(f"Cancel Error: {e}")
+        return False
+    finally:
+        side_conn.close()
+
+# =============================================================================
+# CHANGE LOG (CDC)
+# =============================================================================
+# ChangeLog is filled by the triggers cdc.py installs on every TABLE_CONFIG
+# table. Readers keep the last seq they applied (their watermark) and ask
+# only for newer entries, which is an index range scan on the primary key.
+#
+# A seq is taken when the row is inserted, not when its transaction commits,
+# so a long transaction can commit seq 41 after seq 42 was already read.
+# ChangeCursor remembers the seqs it skipped over and asks for them again on
+# every read until they appear or CHANGE_GAP_SECONDS pass (a rolled-back
+# insert leaves a gap that never fills).
+
+CHANGE_GAP_SECONDS = 120
+CHANGE_GAP_LIMIT = 1000  # most missing seqs tracked at once (the newest are kept)
+
+def get_change_watermark(conn):
+    """Latest ChangeLog seq (0 if empty), or None if change capture is not installed."""
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT COALESCE(MAX(seq), 0) AS seq FROM ChangeLog")
+            return int(cursor.fetchone()['seq'])
+    except pymysql.Error:
+        return None
+
+def get_changes_since(conn, since_seq, limit=1000, table_name=None, also_seqs=()):
+    """
+    ChangeLog entries with seq > since_seq (or seq in also_seqs), oldest
+    first, at most `limit`. Each row has seq, table_name, pk (dict of PK
+    columns) and operation.
+    """
+    sql = "SELECT seq, table_name, pk_value, operation FROM ChangeLog WHERE seq > %s"
+    params = [since_seq]
+    if also_seqs:
+        sql = ("SELECT seq, table_name, pk_value, operation FROM ChangeLog "
+               f"WHERE (seq > %s OR seq IN ({', '.join(['%s'] * len(also_seqs))}))")
+        params.extend(also_seqs)
+    if table_name:
+        sql += " AND table_name = %s"
+        params.append(validate_identifier(table_name))
+    sql += " ORDER BY seq LIMIT %s"
+    params.append(limit)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+    except pymysql.Error as e:
+        print(f"Error reading changes: {e}")
+        return []
+    for row in rows:
+        pk = row.pop('pk_value')
+        row['pk'] = json.loads(pk) if isinstance(pk, (str, bytes)) else pk
+    return rows
+
+class ChangeCursor:
+    """A ChangeLog watermark plus the seqs below it that have not committed yet."""
+
+    def __init__(self, seq, grace_seconds=CHANGE_GAP_SECONDS):
+        self.seq = seq
+        self.gaps = {}  # missing seq -> time.monotonic() when it was first skipped
+        self.grace_seconds = grace_seconds
+
+    def read(self, conn, limit=1000):
+        """Entries after the watermark and any late ones that filled a gap."""
+        return get_changes_since(conn, self.seq, limit, also_seqs=sorted(self.gaps))
+
+    def advance(self, changes, now=None):
+        """Moves past `changes` (as returned by read), remembering the seqs skipped over."""
+        now = time.monotonic() if now is None else now
+        seen = {change['seq'] for change in changes}
+        for seq in seen:
+            self.gaps.pop(seq, None)
+        top = max(seen, default=self.seq)
+        if top > self.seq:
+            seq = top - 1
+            missing = 0
+            while seq > self.seq and missing < CHANGE_GAP_LIMIT:
+                if seq not in seen:
+                    self.gaps[seq] = now
+                    missing += 1
+                seq -= 1
+            self.seq = top
+        for seq, since in list(self.gaps.items()):
+            if now - since > self.grace_seconds:
+                del self.gaps[seq]
+        if len(self.gaps) > CHANGE_GAP_LIMIT:
+            for seq in sorted(self.gaps)[:len(self.gaps) - CHANGE_GAP_LIMIT]:
+                del self.gaps[seq]
+
+def get_rows_by_pk(conn, table_name, pk_dicts, chunk_size=500):
+    """Fetches the current rows for a list of {pk_col: value} dicts (missing rows are skipped)."""
+    if not pk_dicts:
+        return []
+    try:
+        clean_table = validate_identifier(table_name)
+        pk_cols = [validate_identifier(c) for c in pk_dicts[0]]
+        match = "(" + " AND ".join(f"{c} = %s" for c in pk_cols) + ")"
+        rows = []
+        with conn.cursor() as cursor:
+            for start in range(0, len(pk_dicts), chunk_size):
+                chunk = pk_dicts[start:start + chunk_size]
+                sql = f"SELECT * FROM {clean_table} WHERE " + " OR ".join([match] * len(chunk))
+                cursor.execute(sql, [pk[c] for pk in chunk for c in pk_cols])
+                rows.extend(cursor.fetchall())
+        return rows
+    except (pymysql.Error, ValueError, KeyError) as e:
+        print(f"Error fetching rows: {e}")
+        return []
+
 # =============================================================================
 # UPDATE & DELETE FUNCTIONALITY (SECURE)
 # =============================================================================
@@ -301,12 +764,16 @@ def update_record(conn, table_name, pk_dict, updates_dict):
         params = tuple(list(updates_dict.values()) + list(pk_dict.values()))
         
         with conn.cursor() as cursor:
+            old = _result_row_before(cursor, table_name, where_str, pk_dict)
             cursor.execute(sql, params)
-            return True # Return True even if 0 rows updated (query succeeded)
+            changed = cursor.rowcount > 0
             
     except (pymysql.Error, ValueError) as e:
         print(f"Error updating record: {e}")
         return False
+    if old and changed:
+        _notify_match_listeners(conn, RESULT_EVENTS[table_name] + "_changed", {**old, **updates_dict, "old": old})
+    return True # Return True even if 0 rows updated (query succeeded)
 
 def delete_record(conn, table_name, pk_dict):
     if not pk_dict:
@@ -323,8 +790,9 @@ def delete_record(conn, table_name, pk_dict):
         params = tuple(pk_dict.values())
         
         with conn.cursor() as cursor:
+            old = _result_row_before(cursor, table_name, where_str, pk_dict)
             cursor.execute(sql, params)
-            return True
+            deleted = cursor.rowcount > 0
             
     except pymysql.Error as e:
         if e.args[0] == 1451:
@@ -335,6 +803,16 @@ def delete_record(conn, table_name, pk_dict):
     except ValueError as ve:
         print(ve)
         return False
+    if old and deleted:
+        _notify_match_listeners(conn, RESULT_EVENTS[table_name] + "_deleted", old)
+    return True
+
+def _result_row_before(cursor, table_name, where_str, pk_dict):
+    """The row about to change, for the match listeners (None for tables they do not follow)."""
+    if table_name not in RESULT_EVENTS or not _match_listeners:
+        return None
+    cursor.execute(f"SELECT * FROM {table_name} WHERE {where_str}", tuple(pk_dict.values()))
+    return cursor.fetchone()
 
 # =============================================================================
 # COMPLEX RELATIONSHIP QUERIES (Static SQL is safe)
@@ -342,8 +820,7 @@ def delete_record(conn, table_name, pk_dict):
 # These functions use hardcoded SQL strings, so they are naturally safe 
 # from injection unless you concatenate input into them (which we are not).
 
-def get_manages_report(conn):
-    sql = """
+MANAGES_REPORT_SQL = """
         SELECT R.region_name, LS.theme, T.tournament_name, G.gym_name
         FROM Region R
         JOIN LeagueSeason LS ON R.region_id = LS.region_id
@@ -352,16 +829,18 @@ def get_manages_report(conn):
         JOIN Gym G ON C.city_id = G.city_id
         ORDER BY R.region_name, LS.year;
     """
+
+def get_manages_report(conn):
+    sql = MANAGES_REPORT_SQL
     try:
         with conn.cursor() as cursor:
-            cursor.execute(sql)
+            cursor.execute(with_time_limit(sql))
             return cursor.fetchall()
     except pymysql.Error as e:
         print(f"Report Error: {e}")
         return []
 
-def get_assigned_to_gym_report(conn):
-    sql = """
+ASSIGNED_TO_GYM_REPORT_SQL = """
         SELECT LS.year, LS.theme, R.region_name, G.gym_name, TR.name
         FROM GymSeasonRegistry GSR
         JOIN LeagueSeason LS ON GSR.season_id = LS.season_id
@@ -372,16 +851,18 @@ def get_assigned_to_gym_report(conn):
         JOIN Region R ON C.region_id = R.region_id
         ORDER BY LS.year DESC, R.region_name;
     """
+
+def get_assigned_to_gym_report(conn):
+    sql = ASSIGNED_TO_GYM_REPORT_SQL
     try:
         with conn.cursor() as cursor:
-            cursor.execute(sql)
+            cursor.execute(with_time_limit(sql))
             return cursor.fetchall()
     except pymysql.Error as e:
         print(f"Report Error: {e}")
         return []
 
-def get_pokemon_abilities_report(conn):
-    sql = """
+POKEMON_ABILITIES_REPORT_SQL = """
         SELECT RP.nickname, S.species_name, A.ability_name, A.effect_description
         FROM RegisteredPokemon RP
         JOIN PokemonSpecies S ON RP.species_id = S.species_id
@@ -389,9 +870,12 @@ def get_pokemon_abilities_report(conn):
         JOIN Ability A ON PSA.ability_id = A.ability_id
         LIMIT 50;
     """
+
+def get_pokemon_abilities_report(conn):
+    sql = POKEMON_ABILITIES_REPORT_SQL
     try:
         with conn.cursor() as cursor:
-            cursor.execute(sql)
+            cursor.execute(with_time_limit(sql))
             return cursor.fetchall()
     except pymysql.Error as e:
         print(f"Report Error: {e}")
@@ -427,13 +911,14 @@ def get_gym_leader_cheat_sheet(conn, limit=15):
     try:
         with conn.cursor() as cursor:
             cursor.execute("SET SESSION group_concat_max_len = 4096")
-            cursor.execute(sql, (limit,))
+            cursor.execute(with_time_limit(sql), (limit,))
             return cursor.fetchall()
     except pymysql.Error as e:
         print(f"Report Error: {e}")
         return []
 
-def get_tournament_snapshot(conn):
+def get_tournament_snapshot(conn, as_of=None):
+    """Top 5 species per upcoming tournament; as_of (a date) replaces today for reproducible runs."""
     sql = """
         WITH species_usage AS (
             SELECT 
@@ -447,7 +932,7 @@ def get_tournament_snapshot(conn):
             JOIN TournamentEntry TE ON T.tournament_id = TE.tournament_id
             JOIN RegisteredPokemon RP ON RP.trainer_id = TE.trainer_id
             JOIN PokemonSpecies PS ON RP.species_id = PS.species_id
-            WHERE T.start_date >= CURDATE()
+            WHERE T.start_date >= COALESCE(%s, CURDATE())
             GROUP BY T.tournament_id, T.tournament_name, T.start_date, PS.species_name
         )
         SELECT tournament_name, start_date, species_name, usage_count, rank_in_tournament
@@ -457,7 +942,7 @@ def get_tournament_snapshot(conn):
     """
     try:
         with conn.cursor() as cursor:
-            cursor.execute(sql)
+            cursor.execute(with_time_limit(sql), (as_of,))
             return cursor.fetchall()
     except pymysql.Error as e:
         print(f"Report Error: {e}")
@@ -504,7 +989,7 @@ def get_underrated_trainer_report(conn):
     """
     try:
         with conn.cursor() as cursor:
-            cursor.execute(sql)
+            cursor.execute(with_time_limit(sql))
             return cursor.fetchall()
     except pymysql.Error as e:
         print(f"Report Error: {e}")
@@ -546,7 +1031,7 @@ def get_region_power_report(conn):
     """
     try:
         with conn.cursor() as cursor:
-            cursor.execute(sql)
+            cursor.execute(with_time_limit(sql))
             return cursor.fetchall()
     except pymysql.Error as e:
         print(f"Report Error: {e}")
@@ -568,7 +1053,7 @@ def get_species_mvp_report(conn, limit=15):
     """
     try:
         with conn.cursor() as cursor:
-            cursor.execute(sql, (limit,))
+            cursor.execute(with_time_limit(sql), (limit,))
             return cursor.fetchall()
     except pymysql.Error as e:
         print(f"Report Error: {e}")
@@ -606,7 +1091,7 @@ def query_trainers_with_min_wins(conn, tournament_name, min_wins=50):
                 print("Params:", (tournament_name, min_wins))
             except Exception:
                 pass
-            cursor.execute(sql, (tournament_name, min_wins))
+            cursor.execute(with_time_limit(sql), (tournament_name, min_wins))
             return cursor.fetchall()
     except pymysql.Error as e:
         print(f"Query Error: {e}")
@@ -627,7 +1112,7 @@ def query_pokemon_by_trainer(conn, trainer_id):
                 print("Params:", (trainer_id,))
             except Exception:
                 pass
-            cursor.execute(sql, (trainer_id,))
+            cursor.execute(with_time_limit(sql), (trainer_id,))
             return cursor.fetchall()
     except pymysql.Error as e:
         print(f"Query Error: {e}")
@@ -652,7 +1137,7 @@ def query_average_level_for_tournament(conn, tournament_name):
                 print("Params:", (tournament_name,))
             except Exception:
                 pass
-            cursor.execute(sql, (tournament_name,))
+            cursor.execute(with_time_limit(sql), (tournament_name,))
             return cursor.fetchall()
     except pymysql.Error as e:
         print(f"Query Error: {e}")
@@ -672,7 +1157,7 @@ def query_species_by_prefix(conn, prefix):
                 print("Params:", (f"{prefix}%",))
             except Exception:
                 pass
-            cursor.execute(sql, (f"{prefix}%",))
+            cursor.execute(with_time_limit(sql), (f"{prefix}%",))
             return cursor.fetchall()
     except pymysql.Error as e:
         print(f"Query Error: {e}")
@@ -693,7 +1178,7 @@ def query_badge_leaderboard(conn, limit=10):
     """
     try:
         with conn.cursor() as cursor:
-            cursor.execute(sql, (limit,))
+            cursor.execute(with_time_limit(sql), (limit,))
             return cursor.fetchall()
     except pymysql.Error as e:
         print(f"Query Error: {e}")
@@ -716,7 +1201,7 @@ def query_elite_pokemon(conn, min_level=85):
     """
     try:
         with conn.cursor() as cursor:
-            cursor.execute(sql, (min_level,))
+            cursor.execute(with_time_limit(sql), (min_level,))
             return cursor.fetchall()
     except pymysql.Error as e:
         print(f"Query Error: {e}")
@@ -739,7 +1224,7 @@ def query_active_region_insights(conn):
     """
     try:
         with conn.cursor() as cursor:
-            cursor.execute(sql)
+            cursor.execute(with_time_limit(sql))
             return cursor.fetchall()
     except pymysql.Error as e:
         print(f"Query Error: {e}")
@@ -749,6 +1234,33 @@ def query_active_region_insights(conn):
 # MATCH HELPERS
 # =============================================================================
 
+# Callbacks run after a match or gym battle is written: fn(conn, event, record).
+#   "match_inserted"        record = the inserted Match_Table row
+#   "match_winner_changed"  record = the row after the update, plus "old_winner_id"
+#   "match_changed"         record = the row after update_record, plus "old" (the row before)
+#   "match_deleted"         record = the row delete_record removed
+#   "gym_battle_inserted", "gym_battle_changed", "gym_battle_deleted": the same for GymBattle
+# Used by ratings.py to keep derived data current without a rescan. Rows that
+# change through other paths (cascades, bulk loads, raw SQL) are not reported.
+RESULT_EVENTS = {"Match_Table": "match", "GymBattle": "gym_battle"}
+_match_listeners = []
+
+def register_match_listener(listener):
+    if listener not in _match_listeners:
+        _match_listeners.append(listener)
+
+def unregister_match_listener(listener):
+    if listener in _match_listeners:
+        _match_listeners.remove(listener)
+
+def _notify_match_listeners(conn, event, record):
+    for listener in list(_match_listeners):
+        try:
+            listener(conn, event, record)
+        except Exception as e:
+            # The match itself is already stored; a failing listener must not undo that
+            print(f"Match listener error ({event}): {e}")
+
 def validate_match_winner(trainer1_id, trainer2_id, winner_id):
     if winner_id is None:
         return True
@@ -783,17 +1295,179 @@ def insert_match(conn, match_record):
     try:
         with conn.cursor() as cursor:
             cursor.execute(sql, vals)
-            return True
     except pymysql.Error as e:
         print(f"Error inserting match: {e}")
         return False
+    _notify_match_listeners(conn, "match_inserted", dict(match_record))
+    return True
 
-def update_match_winner(conn, tournament_id, match_number, new_winner_id):
+def insert_gym_battle(conn, battle_record):
+    """Inserts one GymBattle row and reports it to the match listeners. Returns True on success."""
+    cols = [validate_identifier(k) for k in battle_record.keys()]
+    sql = f"INSERT INTO GymBattle ({', '.join(cols)}) VALUES ({', '.join(['%s'] * len(cols))})"
     try:
         with conn.cursor() as cursor:
+            cursor.execute(sql, list(battle_record.values()))
+    except pymysql.Error as e:
+        print(f"Error inserting gym battle: {e}")
+        return False
+    _notify_match_listeners(conn, "gym_battle_inserted", dict(battle_record))
+    return True
+
+MATCH_LOOKUP_CHUNK = 1000
+
+def existing_values(cursor, table_name, column, values):
+    """The subset of `values` present in table_name.column, in IN (...) batches."""
+    clean_table, clean_col = validate_identifier(table_name), validate_identifier(column)
+    values = list(values)
+    found = set()
+    for start in range(0, len(values), MATCH_LOOKUP_CHUNK):
+        chunk = values[start:start + MATCH_LOOKUP_CHUNK]
+        cursor.execute(f"SELECT {clean_col} FROM {clean_table} WHERE {clean_col} IN ({', '.join(['%s'] * len(chunk))})", chunk)
+        found.update(row[column] for row in cursor.fetchall())
+    return found
+
+def _existing_match_keys(cursor, keys):
+    """The subset of (tournament_id, match_number) keys already in Match_Table."""
+    spans = {}
+    for tid, number in keys:
+        low, high = spans.get(tid, (number, number))
+        spans[tid] = (min(low, number), max(high, number))
+    found = set()
+    spans = list(spans.items())
+    for start in range(0, len(spans), MATCH_LOOKUP_CHUNK):
+        chunk = spans[start:start + MATCH_LOOKUP_CHUNK]
+        # One primary-key range per tournament instead of one probe per match
+        cursor.execute(
+            "SELECT tournament_id, match_number FROM Match_Table WHERE "
+            + " OR ".join(["(tournament_id = %s AND match_number BETWEEN %s AND %s)"] * len(chunk)),
+            [v for tid, (low, high) in chunk for v in (tid, low, high)])
+        found.update((row['tournament_id'], row['match_number']) for row in cursor.fetchall())
+    return found & set(keys)
+
+def validate_matches(conn, match_records):
+    """
+    Checks a batch of Match_Table records the way the schema would, with a
+    few batched lookups instead of one round trip per row: required key,
+    winner is a participant, (tournament_id, match_number) unique within the
+    batch and the table, tournament and trainers exist. The lookups read the
+    primary, so rows created moments ago are seen even behind a lagging replica.
+    Returns [(index, reason)] for the records that would be rejected.
+    """
+    rejects = {}
+    keys = {}
+    for i, record in enumerate(match_records):
+        try:
+            if record.get('tournament_id') is None or record.get('match_number') is None:
+                raise ValueError("tournament_id and match_number are required")
+            for col in record:
+                validate_identifier(col)
+            validate_match_winner(record.get('trainer1_id'), record.get('trainer2_id'), record.get('winner_id'))
+            key = (record['tournament_id'], int(record['match_number']))
+            if key in keys:
+                raise ValueError(f"Duplicate of record {keys[key]} in this batch")
+            keys[key] = i
+        except (ValueError, TypeError) as e:
+            rejects[i] = str(e)
+    if not keys:
+        return sorted(rejects.items())
+
+    candidates = [i for i in range(len(match_records)) if i not in rejects]
+    trainers = {match_records[i].get(c) for i in candidates for c in ('trainer1_id', 'trainer2_id', 'winner_id')}
+    trainers.discard(None)
+    with use_primary(conn), conn.cursor() as cursor:
+        tournaments = existing_values(cursor, "Tournament", "tournament_id", {k[0] for k in keys})
+        known_trainers = existing_values(cursor, "Trainer", "trainer_id", trainers)
+        taken = _existing_match_keys(cursor, list(keys))
+    for key in taken:
+        rejects[keys[key]] = f"Match {key[1]} already exists in tournament {key[0]}"
+    for i in candidates:
+        record = match_records[i]
+        if i in rejects:
+            continue
+        if record['tournament_id'] not in tournaments:
+            rejects[i] = f"Tournament {record['tournament_id']} does not exist"
+            continue
+        unknown = [record[c] for c in ('trainer1_id', 'trainer2_id', 'winner_id')
+                   if record.get(c) is not None and record[c] not in known_trainers]
+        if unknown:
+            rejects[i] = f"Trainer {unknown[0]} does not exist"
+    return sorted(rejects.items())
+
+def is_transient_error(error):
+    """Deadlock, lock wait timeout or lost connection: retry the whole transaction, not single rows."""
+    import routing
+    return isinstance(error, pymysql.InterfaceError) or (
+        bool(error.args) and error.args[0] in routing.CONNECTION_ERRORS | {1205, 1213})
+
+def insert_matches(conn, match_records, batch_size=1000, all_or_nothing=False):
+    """
+    Batched insert_match. The whole batch is validated first (validate_matches),
+    then the valid records are inserted with multi-row statements of up to
+    batch_size rows in a single transaction. If the server rejects a statement
+    (e.g. a concurrent writer took a match number after validation), its rows
+    are rolled back to a savepoint and retried one by one.
+    all_or_nothing=True inserts nothing if any record is rejected.
+    Returns (number inserted, [(index, reason)] for the rejected records).
+    """
+    if not match_records:
+        return 0, []
+    try:
+        rejects = validate_matches(conn, match_records)
+    except pymysql.Error as e:
+        print(f"Error inserting matches: {e}")
+        return 0, [(i, str(e)) for i in range(len(match_records))]
+    rejected = {i for i, _ in rejects}
+    valid = [(i, r) for i, r in enumerate(match_records) if i not in rejected]
+    if not valid or (rejects and all_or_nothing):
+        return 0, rejects
+
+    # Records with the same columns share one statement
+    groups = {}
+    for i, record in valid:
+        groups.setdefault(tuple(record), []).append((i, record))
+    failed = []
+    try:
+        conn.begin()
+        with conn.cursor() as cursor:
+            for cols, items in groups.items():
+                sql = f"INSERT INTO Match_Table ({', '.join(cols)}) VALUES ({', '.join(['%s'] * len(cols))})"
+                for start in range(0, len(items), batch_size):
+                    batch = items[start:start + batch_size]
+                    cursor.execute("SAVEPOINT match_batch")
+                    try:
+                        cursor.executemany(sql, [[r[c] for c in cols] for _, r in batch])
+                    except pymysql.Error as e:
+                        if all_or_nothing or is_transient_error(e):
+                            raise
+                        # executemany may have sent several statements and only the
+                        # last failed: undo the whole batch, then isolate the bad rows
+                        cursor.execute("ROLLBACK TO SAVEPOINT match_batch")
+                        for i, record in batch:
+                            try:
+                                cursor.execute(sql, [record[c] for c in cols])
+                            except pymysql.Error as row_error:
+                                if is_transient_error(row_error):
+                                    raise
+                                failed.append((i, f"Database rejected row: {row_error.args[-1]}"))
+        conn.commit()
+    except pymysql.Error as e:
+        conn.rollback()
+        print(f"Error inserting matches: {e}")
+        return 0, sorted(rejects + [(i, str(e)) for i in range(len(match_records)) if i not in rejected])
+    failed_ids = {i for i, _ in failed}
+    for i, record in valid:
+        if i not in failed_ids:
+            _notify_match_listeners(conn, "match_inserted", dict(record))
+    return len(valid) - len(failed), sorted(rejects + failed)
+
+def update_match_winner(conn, tournament_id, match_number, new_winner_id):
+    try:
+        # The participants must be read from the primary the UPDATE goes to
+        with use_primary(conn), conn.cursor() as cursor:
             # Get participants
             cursor.execute(
-                "SELECT trainer1_id, trainer2_id FROM Match_Table WHERE tournament_id = %s AND match_number = %s",
+                "SELECT * FROM Match_Table WHERE tournament_id = %s AND match_number = %s",
                 (tournament_id, match_number)
             )
             row = cursor.fetchone()
@@ -807,7 +1481,277 @@ def update_match_winner(conn, tournament_id, match_number, new_winner_id):
                 "UPDATE Match_Table SET winner_id = %s WHERE tournament_id = %s AND match_number = %s",
                 (new_winner_id, tournament_id, match_number)
             )
-            return cursor.rowcount > 0
+            updated = cursor.rowcount > 0
     except (pymysql.Error, ValueError) as e:
         print(f"Error updating winner: {e}")
-        return False
\ No newline at end of file
+        return False
+    if updated and row['winner_id'] != new_winner_id:
+        _notify_match_listeners(conn, "match_winner_changed",
+                                {**row, "winner_id": new_winner_id, "old_winner_id": row['winner_id']})
+    return updated
+
+# =============================================================================
+# HEAD-TO-HEAD
+# =============================================================================
+# HeadToHead holds one row per trainer pair (smaller ID first), kept current
+# by the trg_h2h_* triggers in schema.sql, so these are index lookups rather
+# than scans of Match_Table on trainer1_id and trainer2_id.
+
+def _head_to_head_row(row, flipped):
+    """Turns a HeadToHead row into the record of one side (flipped: that side is trainer_b)."""
+    wins, losses = (row['b_wins'], row['a_wins']) if flipped else (row['a_wins'], row['b_wins'])
+    return {
+        "matches": row['matches'], "wins": wins, "losses": losses,
+        "undecided": row['undecided'],  # no winner recorded (Match_Table has no draws)
+        "last_match_date": row['last_match_date'],
+        "last_tournament_id": row['last_tournament_id'],
+        "last_match_number": row['last_match_number'],
+    }
+
+def get_head_to_head(conn, trainer_id, opponent_id):
+    """
+    trainer_id's record against opponent_id: {'matches', 'wins', 'losses',
+    'undecided', 'last_match_date', 'last_tournament_id', 'last_match_number'}
+    (all zero / None if they never met). None on error.
+    """
+    a, b = sorted((trainer_id, opponent_id))
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT * FROM HeadToHead WHERE trainer_a = %s AND trainer_b = %s", (a, b))
+            row = cursor.fetchone()
+    except pymysql.Error as e:
+        print(f"Error reading head-to-head: {e}")
+        return None
+    if row is None or a == b:
+        row = {"matches": 0, "a_wins": 0, "b_wins": 0, "undecided": 0, "last_match_date": None,
+               "last_tournament_id": None, "last_match_number": None}
+    return _head_to_head_row(row, trainer_id != a)
+
+def get_rivals(conn, trainer_id, limit=20):
+    """trainer_id's opponents, most matches first: get_head_to_head records plus 'opponent_id'."""
+    sql = """
+        SELECT * FROM (
+            SELECT trainer_b AS opponent_id, 0 AS flipped, H.* FROM HeadToHead H WHERE trainer_a = %s
+            UNION ALL
+            SELECT trainer_a AS opponent_id, 1 AS flipped, H.* FROM HeadToHead H WHERE trainer_b = %s
+        ) R
+        ORDER BY matches DESC, opponent_id
+        LIMIT %s
+    """
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(with_time_limit(sql), (trainer_id, trainer_id, int(limit)))
+            rows = cursor.fetchall()
+    except (pymysql.Error, ValueError) as e:
+        print(f"Error reading rivals: {e}")
+        return []
+    return [{"opponent_id": row['opponent_id'], **_head_to_head_row(row, row['flipped'])} for row in rows]
+
+def rebuild_head_to_head(conn):
+    """Recomputes HeadToHead from Match_Table in one pass. Returns the number of pairs, or None on error."""
+    sql = """
+        INSERT INTO HeadToHead (trainer_a, trainer_b, matches, a_wins, b_wins, undecided,
+                                last_match_date, last_tournament_id, last_match_number)
+        SELECT a, b, COUNT(*), SUM(winner_id <=> a), SUM(winner_id <=> b), SUM(winner_id IS NULL),
+               MAX(CASE WHEN rn = 1 THEN match_date END),
+               MAX(CASE WHEN rn = 1 THEN tournament_id END),
+               MAX(CASE WHEN rn = 1 THEN match_number END)
+        FROM (
+            SELECT LEAST(trainer1_id, trainer2_id) AS a, GREATEST(trainer1_id, trainer2_id) AS b,
+                   winner_id, match_date, tournament_id, match_number,
+                   ROW_NUMBER() OVER (PARTITION BY LEAST(trainer1_id, trainer2_id), GREATEST(trainer1_id, trainer2_id)
+                                      ORDER BY match_date DESC, round_number DESC, match_number DESC) AS rn
+            FROM Match_Table
+            WHERE trainer1_id IS NOT NULL AND trainer2_id IS NOT NULL AND trainer1_id <> trainer2_id
+        ) M
+        GROUP BY a, b
+    """
+    try:
+        conn.begin()
+        with use_primary(conn), conn.cursor() as cursor:
+            cursor.execute("DELETE FROM HeadToHead")
+            cursor.execute(sql)
+            pairs = cursor.rowcount
+        conn.commit()
+        return pairs
+    except pymysql.Error as e:
+        conn.rollback()
+        print(f"Error rebuilding head-to-head: {e}")
+        return None
+
+# =============================================================================
+# INGEST CHECKPOINTS
+# =============================================================================
+# ingest.py stores how far it has read each source in IngestCheckpoint. The
+# checkpoint is saved with the cursor of the transaction that inserts the
+# events, so the rows and the position are committed together.
+
+def get_ingest_checkpoint(conn, source):
+    """(file_id, byte_offset) last committed for `source`, (None, 0) if none, None on error."""
+    try:
+        with use_primary(conn), conn.cursor() as cursor:
+            cursor.execute("SELECT file_id, byte_offset FROM IngestCheckpoint WHERE source = %s", (source,))
+            row = cursor.fetchone()
+    except pymysql.Error as e:
+        print(f"Checkpoint Error: {e}")
+        return None
+    return (row['file_id'], int(row['byte_offset'])) if row else (None, 0)
+
+def save_ingest_checkpoint(cursor, source, file_id, byte_offset, events):
+    """Moves `source` to byte_offset; run inside the transaction that stored the events."""
+    cursor.execute(
+        "INSERT INTO IngestCheckpoint (source, file_id, byte_offset, events) VALUES (%s, %s, %s, %s) "
+        "ON DUPLICATE KEY UPDATE file_id = VALUES(file_id), byte_offset = VALUES(byte_offset), "
+        "events = events + VALUES(events)",
+        (source, file_id, byte_offset, events))
+
+# =============================================================================
+# ACTIVITY ROLLUPS
+# =============================================================================
+# ActivityRollup holds event counts per day and per month (see schema.sql).
+# A date range is answered from the month rows for the whole months inside it
+# plus the day rows at either end, so even a range of several years reads a
+# few hundred rows per dimension value.
+
+# metric -> (FROM clause, date column, {dimension: id expression})
+ROLLUP_SOURCES = {
+    "match": ("Match_Table M LEFT JOIN Tournament T ON T.tournament_id = M.tournament_id "
+              "LEFT JOIN City C ON C.city_id = T.city_id", "M.match_date",
+              {"tournament": "M.tournament_id", "region": "C.region_id", "season": "T.season_id"}),
+    "gym_battle": ("GymBattle B LEFT JOIN Gym G ON G.gym_id = B.gym_id "
+                   "LEFT JOIN City C ON C.city_id = G.city_id", "B.battle_date",
+                   {"gym": "B.gym_id", "region": "C.region_id"}),
+    "pokemon_registration": ("RegisteredPokemon P LEFT JOIN Trainer T ON T.trainer_id = P.trainer_id",
+                             "P.registration_date", {"species": "P.species_id", "region": "T.region_id"}),
+    "tournament_entry": ("TournamentEntry E LEFT JOIN Tournament T ON T.tournament_id = E.tournament_id",
+                         "E.registration_date", {"tournament": "E.tournament_id", "season": "T.season_id"}),
+}
+ROLLUP_DIMENSION_TABLES = {"tournament": "Tournament", "gym": "Gym", "region": "Region",
+                           "species": "PokemonSpecies", "season": "LeagueSeason"}
+ROLLUP_GRAINS = ("day", "week", "month", "year")
+
+def _as_date(value):
+    return datetime.date.fromisoformat(value) if isinstance(value, str) else value
+
+def _next_month(day):
+    return (day.replace(day=1) + datetime.timedelta(days=32)).replace(day=1)
+
+def rollup_ranges(start, end):
+    """
+    Splits [start, end] into the first-of-month bounds of the whole months
+    inside it ((first, last) or None) and the day ranges before and after them.
+    """
+    start, end = _as_date(start), _as_date(end)
+    first = start if start.day == 1 else _next_month(start)
+    after = end + datetime.timedelta(days=1)  # first day after the whole months
+    if after.day != 1:
+        after = end.replace(day=1)
+    if first >= after:
+        return None, [(start, end)]
+    months = (first, after - datetime.timedelta(days=1))
+    days = [(lo, hi) for lo, hi in ((start, first - datetime.timedelta(days=1)), (after, end)) if lo <= hi]
+    return months, days
+
+def _rollup_where(metric, dimension, dim_ids, start, end, days_only=False):
+    if metric not in ROLLUP_SOURCES:
+        raise ValueError(f"Unknown rollup metric: {metric}")
+    if dimension != "all" and dimension not in ROLLUP_SOURCES[metric][2]:
+        raise ValueError(f"{metric} has no {dimension} rollup")
+    months, days = (None, [(_as_date(start), _as_date(end))]) if days_only else rollup_ranges(start, end)
+    buckets, params = [], [metric, dimension]
+    if months:
+        buckets.append("(grain = 'month' AND bucket BETWEEN %s AND %s)")
+        params.extend(months)
+    for lo, hi in days:
+        buckets.append("(grain = 'day' AND bucket BETWEEN %s AND %s)")
+        params.extend((lo, hi))
+    where = f"WHERE metric = %s AND dimension = %s AND ({' OR '.join(buckets)})"
+    if dimension == "all":
+        dim_ids = [""]
+    if dim_ids is not None:
+        where += f" AND dim_id IN ({', '.join(['%s'] * len(dim_ids))})"
+        params.extend(dim_ids)
+    return where, params
+
+def get_rollup_totals(conn, metric, start, end, dimension="all", dim_ids=None):
+    """
+    Events per dimension value between start and end (inclusive dates):
+    {dim_id: events}, {'': events} for dimension 'all'. dim_ids limits the
+    result to those values. Returns {} on error.
+    """
+    try:
+        if dim_ids is not None and not dim_ids:
+            return {}
+        where, params = _rollup_where(metric, dimension, dim_ids, start, end)
+        with conn.cursor() as cursor:
+            cursor.execute(f"SELECT dim_id, SUM(events) AS events FROM ActivityRollup {where} GROUP BY dim_id", params)
+            return {row['dim_id']: int(row['events']) for row in cursor.fetchall()}
+    except (pymysql.Error, ValueError) as e:
+        print(f"Rollup Error: {e}")
+        return {}
+
+def get_rollup_series(conn, metric, start, end, grain="day", dimension="all", dim_id=""):
+    """
+    Events per day, week (starting Monday), month or year between start and
+    end for one dimension value, as [{'bucket': first day, 'events': n}] in
+    date order. Buckets without events are left out. Returns [] on error.
+    """
+    try:
+        if grain not in ROLLUP_GRAINS:
+            raise ValueError(f"Unknown grain: {grain}")
+        where, params = _rollup_where(metric, dimension, [dim_id], start, end, days_only=grain in ("day", "week"))
+        with conn.cursor() as cursor:
+            cursor.execute(f"SELECT bucket, events FROM ActivityRollup {where}", params)
+            rows = cursor.fetchall()
+    except (pymysql.Error, ValueError) as e:
+        print(f"Rollup Error: {e}")
+        return []
+
+    series = {}
+    for row in rows:
+        day = _as_date(row['bucket'])
+        if grain == "week":
+            day -= datetime.timedelta(days=day.weekday())
+        elif grain == "month":
+            day = day.replace(day=1)
+        elif grain == "year":
+            day = day.replace(month=1, day=1)
+        series[day] = series.get(day, 0) + int(row['events'])
+    return [{"bucket": day, "events": series[day]} for day in sorted(series)]
+
+def rebuild_rollups(conn, metrics=None):
+    """
+    Recomputes ActivityRollup (or only `metrics`) from the source tables: one
+    scan per metric and dimension for the day rows, then the month rows from
+    the day rows. Returns the number of rollup rows, or None on error.
+    """
+    metrics = list(metrics or ROLLUP_SOURCES)
+    try:
+        conn.begin()
+        with use_primary(conn), conn.cursor() as cursor:
+            total = 0
+            for metric in metrics:
+                from_clause, date_col, dimensions = ROLLUP_SOURCES[metric]
+                cursor.execute("DELETE FROM ActivityRollup WHERE metric = %s", (metric,))
+                for dimension, id_expr in [("all", None)] + list(dimensions.items()):
+                    if id_expr:
+                        select_id, where, group = id_expr, f" AND {id_expr} IS NOT NULL", f"{id_expr}, {date_col}"
+                    else:
+                        select_id, where, group = "''", "", date_col
+                    cursor.execute(
+                        f"INSERT INTO ActivityRollup (metric, dimension, dim_id, grain, bucket, events) "
+                        f"SELECT %s, %s, {select_id}, 'day', {date_col}, COUNT(*) FROM {from_clause} "
+                        f"WHERE {date_col} IS NOT NULL{where} GROUP BY {group}", (metric, dimension))
+                    total += cursor.rowcount
+                cursor.execute(
+                    "INSERT INTO ActivityRollup (metric, dimension, dim_id, grain, bucket, events) "
+                    "SELECT metric, dimension, dim_id, 'month', DATE_FORMAT(bucket, '%%Y-%%m-01'), SUM(events) "
+                    "FROM ActivityRollup WHERE metric = %s AND grain = 'day' "
+                    "GROUP BY metric, dimension, dim_id, DATE_FORMAT(bucket, '%%Y-%%m-01')", (metric,))
+                total += cursor.rowcount
+        conn.commit()
+        return total
+    except (pymysql.Error, KeyError) as e:
+        conn.rollback()
+        print(f"Error rebuilding rollups: {e}")
+        return None
@@ -0,0 +1,257 @@
+import argparse
+import getpass
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pymysql
+import db_utils
+import dependencies
+import routing
+from backup import SKIPPED_TABLES, list_columns, list_tables, table_levels
+from pool import ConnectionPool
+
+# =============================================================================
+# CHUNKED TABLE DIFF
+# =============================================================================
+# Compares a table on two databases (source -> target) without copying it:
+#   1. The primary key is cut into ranges of about chunk_rows rows.
+#   2. Each side computes (COUNT(*), BIT_XOR of a 64-bit MD5 row hash) per
+#      range in the database; both sides run at the same time, and only the
+#      two numbers per range cross the network.
+#   3. Ranges with equal checksums are done. A differing range is split into
+#      `fanout` smaller ranges and compared again, until it holds at most
+#      leaf_rows rows; only those leaves are fetched and compared row by row.
+# The differences become INSERT / UPDATE / DELETE statements that make the
+# target equal to the source. Trigger-maintained tables (backup.DERIVED_TABLES)
+# are not compared: the target's triggers update them as the statements run.
+# Neither is ChangeLog, which each server writes for itself.
+
+CHUNK_ROWS = 100_000
+LEAF_ROWS = 500
+FANOUT = 16
+
+
+def row_hash_sql(columns):
+    """
+    64-bit hash of a row. Each value is prefixed with its length, so a '#'
+    inside a value cannot shift the separators (('a#', 'b') vs ('a', '#b')),
+    and the ISNULL flags keep NULL and '' apart.
+    """
+    cols = [db_utils.validate_identifier(c) for c in columns]
+    values = ", ".join(f"CHAR_LENGTH({c}), {c}" for c in cols)
+    nulls = ", ".join(f"ISNULL({c})" for c in cols)
+    return f"CAST(CONV(LEFT(MD5(CONCAT_WS('#', {values}, CONCAT({nulls}))), 16), 16, 10) AS UNSIGNED)"
+
+
+def chunk_checksum(conn, table_name, columns, pk_cols, low, high):
+    """(row count, xor of row hashes) for low < pk <= high."""
+    where, params = db_utils.pk_range_where(pk_cols, low, high)
+    sql = (f"SELECT COUNT(*) AS n, COALESCE(BIT_XOR({row_hash_sql(columns)}), 0) AS h "
+           f"FROM {db_utils.validate_identifier(table_name)}{where}")
+    with conn.cursor() as cursor:
+        cursor.execute(sql, params)
+        row = cursor.fetchone()
+    return int(row['n']), int(row['h'])
+
+
+def fetch_range(conn, table_name, columns, pk_cols, low, high, key_cols):
+    """{key tuple: row} for low < pk <= high."""
+    where, params = db_utils.pk_range_where(pk_cols, low, high)
+    sql = (f"SELECT {', '.join(db_utils.validate_identifier(c) for c in columns)} "
+           f"FROM {db_utils.validate_identifier(table_name)}{where}")
+    with conn.cursor() as cursor:
+        cursor.execute(sql, params)
+        return {tuple(r[c] for c in key_cols): r for r in cursor.fetchall()}
+
+
+def diff_table(source_pool, target_pool, executor, table_name, columns, pk_cols,
+               chunk_rows=CHUNK_ROWS, leaf_rows=LEAF_ROWS, fanout=FANOUT):
+    """
+    Returns {'insert': [rows], 'update': [(pk_dict, {col: new})], 'delete': [pk_dict],
+    'checksums': ranges compared, 'rows_fetched': rows transferred}.
+    """
+    def on(pool_, func, *args):
+        def run():
+            with pool_.connection() as conn:
+                return func(conn, *args)
+        return executor.submit(run)
+
+    result = {"insert": [], "update": [], "delete": [], "checksums": 0, "rows_fetched": 0}
+    key_cols = pk_cols or columns  # without a primary key a row is identified by all its values
+    with source_pool.connection() as conn:
+        pending = db_utils.chunk_bounds(conn, table_name, pk_cols, chunk_rows)
+    if not pk_cols:
+        pending, leaf_rows = [(None, None)], float("inf")  # no key to range over: compare whole table
+
+    while pending:
+        checks = [(rng, on(source_pool, chunk_checksum, table_name, columns, pk_cols, *rng),
+                   on(target_pool, chunk_checksum, table_name, columns, pk_cols, *rng)) for rng in pending]
+        result["checksums"] += len(checks)
+        leaves, splits = [], []
+        for rng, src_future, dst_future in checks:
+            src, dst = src_future.result(), dst_future.result()
+            if src == dst:
+                continue
+            biggest = max(src[0], dst[0])
+            if biggest <= leaf_rows:
+                leaves.append(rng)
+            else:
+                # Split along the side that has the rows
+                side = source_pool if src[0] >= dst[0] else target_pool
+                splits.append((rng, on(side, db_utils.chunk_bounds, table_name, pk_cols,
+                                       -(-biggest // fanout), *rng)))
+        pending = []
+        for rng, future in splits:
+            parts = future.result()
+            if len(parts) > 1:
+                pending.extend(parts)
+            else:
+                leaves.append(rng)
+
+        fetches = [(on(source_pool, fetch_range, table_name, columns, pk_cols, *rng, key_cols),
+                    on(target_pool, fetch_range, table_name, columns, pk_cols, *rng, key_cols)) for rng in leaves]
+        for src_future, dst_future in fetches:
+            src_rows, dst_rows = src_future.result(), dst_future.result()
+            result["rows_fetched"] += len(src_rows) + len(dst_rows)
+            for pk, row in src_rows.items():
+                other = dst_rows.get(pk)
+                if other is None:
+                    result["insert"].append(row)
+                elif other != row:
+                    changes = {c: row[c] for c in columns if row[c] != other[c]}
+                    result["update"].append((dict(zip(key_cols, pk)), changes))
+            result["delete"].extend(dict(zip(key_cols, pk)) for pk in dst_rows.keys() - src_rows.keys())
+    return result
+
+
+def diff_statements(table_name, diff, literal):
+    """(delete, update, insert) statement lists; literal(value) quotes a value for SQL."""
+    table = db_utils.validate_identifier(table_name)
+    match = lambda pk: " AND ".join(f"{c} <=> {literal(v)}" for c, v in pk.items())
+    deletes = [f"DELETE FROM {table} WHERE {match(pk)};" for pk in diff["delete"]]
+    updates = [f"UPDATE {table} SET {', '.join(f'{c} = {literal(v)}' for c, v in changes.items())} "
+               f"WHERE {match(pk)};" for pk, changes in diff["update"]]
+    inserts = [f"INSERT INTO {table} ({', '.join(row)}) VALUES ({', '.join(literal(v) for v in row.values())});"
+               for row in diff["insert"]]
+    return deletes, updates, inserts
+
+
+def diff_databases(source, target, tables=None, jobs=4, chunk_rows=CHUNK_ROWS, leaf_rows=LEAF_ROWS):
+    """
+    Diffs every table (or `tables`). Returns (diffs {table: diff}, statements):
+    statements delete children first and insert parents first, so they can be
+    applied in order with foreign key checks on.
+    """
+    graph = dependencies.load_graph(source)
+    if graph is None:
+        raise pymysql.OperationalError("Could not read the FK graph.")
+    tables = [db_utils.validate_identifier(t) for t in (tables or list_tables(source)) if t not in SKIPPED_TABLES]
+    target_tables = set(list_tables(target))
+    missing = [t for t in tables if t not in target_tables]
+    if missing:
+        raise ValueError(f"Missing on target: {', '.join(missing)}")
+    levels = table_levels(graph, tables)
+
+    source_pool = ConnectionPool(source, size=jobs)
+    target_pool = ConnectionPool(target, size=jobs)
+    diffs = {}
+    try:
+        # Two checksums per range run at once, so allow both pools to be busy
+        with ThreadPoolExecutor(max_workers=jobs * 2) as executor:
+            for table in tables:
+                target_cols = set(list_columns(target, table))
+                columns = [c for c in list_columns(source, table) if c in target_cols]
+                pk_cols = graph.primary_keys.get(table, [])
+                diffs[table] = diff_table(source_pool, target_pool, executor, table, columns, pk_cols,
+                                          chunk_rows, leaf_rows)
+    finally:
+        source_pool.close()
+        target_pool.close()
+
+    literal = target.literal
+    deletes, updates, inserts = [], [], []
+    for table in sorted(tables, key=lambda t: levels[t], reverse=True):
+        deletes += diff_statements(table, diffs[table], literal)[0]
+    for table in sorted(tables, key=lambda t: levels[t]):
+        _, table_updates, table_inserts = diff_statements(table, diffs[table], literal)
+        updates += table_updates
+        inserts += table_inserts
+    return diffs, deletes + inserts + updates
+
+
+def apply_statements(conn, statements):
+    """Runs the statements in one transaction. Returns True on success."""
+    try:
+        conn.begin()
+        with conn.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+        conn.commit()
+        return True
+    except pymysql.Error as e:
+        conn.rollback()
+        print(f"Sync Error: {e}")
+        return False
+
+# =============================================================================
+# COMMAND LINE
+# =============================================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Diff two league databases by chunk checksums and print the SQL to sync them.")
+    parser.add_argument("--host", default="localhost", help="Source host[:port]")
+    parser.add_argument("--user", default="root")
+    parser.add_argument("--password", default=None, help="Prompted for if omitted")
+    parser.add_argument("--db", default="pokemon_league_db")
+    parser.add_argument("--target-host", default=None, help="Defaults to --host")
+    parser.add_argument("--target-user", default=None, help="Defaults to --user")
+    parser.add_argument("--target-password", default=None, help="Defaults to --password")
+    parser.add_argument("--target-db", required=True)
+    parser.add_argument("--tables", nargs="*", default=None)
+    parser.add_argument("--jobs", type=int, default=4)
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--leaf-rows", type=int, default=LEAF_ROWS)
+    parser.add_argument("-o", "--output", default=None, help="Write the sync SQL here (default: stdout)")
+    parser.add_argument("--apply", action="store_true", help="Run the sync SQL on the target")
+
+    args = parser.parse_args(argv)
+    password = args.password if args.password is not None else getpass.getpass("Password: ")
+    host, port = routing.parse_host(args.host)
+    target_host, target_port = routing.parse_host(args.target_host or args.host)
+    source = db_utils.get_db_connection(host, args.user, password, args.db, port)
+    target = db_utils.get_db_connection(target_host, args.target_user or args.user,
+                                        args.target_password if args.target_password is not None else password,
+                                        args.target_db, target_port)
+    if not source or not target:
+        return 1
+    start = time.perf_counter()
+    try:
+        diffs, statements = diff_databases(source, target, args.tables, args.jobs, args.chunk_rows, args.leaf_rows)
+        elapsed = time.perf_counter() - start
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                f.writelines(sql + "\n" for sql in statements)
+        elif not args.apply:
+            for sql in statements:
+                print(sql)
+        if args.apply and statements and not apply_statements(target, statements):
+            return 1
+    except (pymysql.Error, ValueError) as e:
+        print(f"Diff Error: {e}")
+        return 1
+    finally:
+        source.close()
+        target.close()
+
+    for table, diff in diffs.items():
+        if diff["insert"] or diff["update"] or diff["delete"]:
+            print(f"-- {table}: +{len(diff['insert'])} ~{len(diff['update'])} -{len(diff['delete'])}", file=sys.stderr)
+    checksums = sum(d["checksums"] for d in diffs.values())
+    fetched = sum(d["rows_fetched"] for d in diffs.values())
+    print(f"-- {len(statements):,} statements; {checksums:,} range checksums, {fetched:,} rows fetched "
+          f"in {elapsed:.1f}s{' (applied)' if args.apply else ''}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,249 @@
+import argparse
+import collections
+import getpass
+import sys
+import pymysql
+import db_utils
+
+# =============================================================================
+# FOREIGN KEY DEPENDENCY GRAPH
+# =============================================================================
+# The graph is read from information_schema once (every FK, composite ones
+# included, with its ON DELETE rule). delete_impact() then walks it breadth-
+# first from one record: each level sends one batched IN (...) query per FK
+# edge (chunked) for all rows found on the previous level, instead of probing
+# row by row. Following the ON DELETE rules:
+#   CASCADE              -> the child rows are deleted too (and walked further)
+#   SET NULL             -> the child rows lose their reference
+#   RESTRICT / NO ACTION -> the child rows make the delete fail (error 1451)
+
+FKEdge = collections.namedtuple("FKEdge", "name child child_cols parent parent_cols rule")
+
+CHUNK_SIZE = 1000
+MAX_IMPACT_ROWS = 200_000  # stop walking (and flag the result as a lower bound) past this
+
+
+class DependencyGraph:
+    def __init__(self, primary_keys, edges):
+        self.primary_keys = primary_keys          # table -> [pk columns]
+        self.children = collections.defaultdict(list)  # parent table -> [FKEdge]
+        for edge in edges:
+            self.children[edge.parent].append(edge)
+
+    def referencing_tables(self, table_name):
+        return sorted({edge.child for edge in self.children.get(table_name, [])})
+
+    def needed_columns(self, table_name):
+        """Columns to fetch for a row so its own key and its children's FKs can be followed."""
+        cols = list(self.primary_keys.get(table_name, []))
+        for edge in self.children.get(table_name, []):
+            cols += [c for c in edge.parent_cols if c not in cols]
+        return cols
+
+
+def load_graph(conn):
+    """Builds the DependencyGraph for the current database. Returns None on error."""
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                SELECT TABLE_NAME, COLUMN_NAME
+                FROM information_schema.KEY_COLUMN_USAGE
+                WHERE TABLE_SCHEMA = DATABASE() AND CONSTRAINT_NAME = 'PRIMARY'
+                ORDER BY TABLE_NAME, ORDINAL_POSITION
+            """)
+            pk_rows = cursor.fetchall()
+            cursor.execute("""
+                SELECT KCU.CONSTRAINT_NAME, KCU.TABLE_NAME, KCU.COLUMN_NAME,
+                       KCU.REFERENCED_TABLE_NAME, KCU.REFERENCED_COLUMN_NAME, RC.DELETE_RULE
+                FROM information_schema.KEY_COLUMN_USAGE KCU
+                JOIN information_schema.REFERENTIAL_CONSTRAINTS RC
+                  ON RC.CONSTRAINT_SCHEMA = KCU.CONSTRAINT_SCHEMA
+                 AND RC.CONSTRAINT_NAME = KCU.CONSTRAINT_NAME
+                 AND RC.TABLE_NAME = KCU.TABLE_NAME
+                WHERE KCU.TABLE_SCHEMA = DATABASE() AND KCU.REFERENCED_TABLE_NAME IS NOT NULL
+                ORDER BY KCU.TABLE_NAME, KCU.CONSTRAINT_NAME, KCU.ORDINAL_POSITION
+            """)
+            fk_rows = cursor.fetchall()
+    except pymysql.Error as e:
+        print(f"Dependency Graph Error: {e}")
+        return None
+
+    primary_keys = collections.defaultdict(list)
+    for row in pk_rows:
+        primary_keys[row['TABLE_NAME']].append(row['COLUMN_NAME'])
+
+    grouped = {}
+    for row in fk_rows:
+        key = (row['TABLE_NAME'], row['CONSTRAINT_NAME'])
+        if key not in grouped:
+            grouped[key] = {"parent": row['REFERENCED_TABLE_NAME'], "rule": row['DELETE_RULE'],
+                            "child_cols": [], "parent_cols": []}
+        grouped[key]["child_cols"].append(row['COLUMN_NAME'])
+        grouped[key]["parent_cols"].append(row['REFERENCED_COLUMN_NAME'])
+    edges = [FKEdge(name, child, tuple(g["child_cols"]), g["parent"], tuple(g["parent_cols"]), g["rule"])
+             for (child, name), g in grouped.items()]
+    return DependencyGraph(dict(primary_keys), edges)
+
+# =============================================================================
+# IMPACT ANALYSIS
+# =============================================================================
+
+def _fetch_children(cursor, edge, parent_keys, columns, chunk_size):
+    """Child rows (only `columns`) whose FK matches any of parent_keys, in IN (...) batches."""
+    child = db_utils.validate_identifier(edge.child)
+    child_cols = [db_utils.validate_identifier(c) for c in edge.child_cols]
+    select = ", ".join(db_utils.validate_identifier(c) for c in columns)
+    if len(child_cols) == 1:
+        target, holder = child_cols[0], "%s"
+    else:
+        target = "(" + ", ".join(child_cols) + ")"
+        holder = "(" + ", ".join(["%s"] * len(child_cols)) + ")"
+    rows = []
+    for start in range(0, len(parent_keys), chunk_size):
+        chunk = parent_keys[start:start + chunk_size]
+        sql = f"SELECT DISTINCT {select} FROM {child} WHERE {target} IN ({', '.join([holder] * len(chunk))})"
+        cursor.execute(db_utils.with_time_limit(sql), [v for key in chunk for v in key])
+        rows.extend(cursor.fetchall())
+    return rows
+
+
+def delete_impact(conn, graph, table_name, pk_dict, chunk_size=CHUNK_SIZE, max_rows=MAX_IMPACT_ROWS):
+    """
+    What deleting one record would do, as {
+        'direct': {table: rows referencing the record itself},
+        'deleted': {table: rows removed by cascades},
+        'set_null': {table: rows whose reference becomes NULL},
+        'blocked_by': {table: rows whose RESTRICT/NO ACTION FK makes the delete fail},
+        'levels': number of graph levels walked, 'queries': statements sent,
+        'truncated': True if max_rows was hit (counts are then lower bounds),
+    } or None on error.
+    """
+    root = db_utils.get_rows_by_pk(conn, table_name, [pk_dict])
+    if not root:
+        return None
+    deleted = collections.defaultdict(set)
+    set_null = collections.defaultdict(set)
+    blocked = collections.defaultdict(set)
+    direct = collections.Counter()
+
+    def pk_of(table, row):
+        return tuple(row[c] for c in graph.primary_keys.get(table, row.keys()))
+
+    deleted[table_name].add(pk_of(table_name, root[0]))
+    frontier = {table_name: root}
+    levels = queries = seen = 0
+    truncated = False
+    try:
+        with conn.cursor() as cursor:
+            while frontier and not truncated:
+                levels += 1
+                next_frontier = collections.defaultdict(list)
+                for parent, rows in frontier.items():
+                    for edge in graph.children.get(parent, []):
+                        keys = list({tuple(r[c] for c in edge.parent_cols) for r in rows})
+                        keys = [k for k in keys if None not in k]
+                        if not keys:
+                            continue
+                        columns = graph.needed_columns(edge.child) or list(edge.child_cols)
+                        children = _fetch_children(cursor, edge, keys, columns, chunk_size)
+                        queries += -(-len(keys) // chunk_size)
+                        if levels == 1:
+                            direct[edge.child] += len(children)
+                        for child_row in children:
+                            pk = pk_of(edge.child, child_row)
+                            if edge.rule == "CASCADE":
+                                if pk in deleted[edge.child]:
+                                    continue  # reached by another path (or a cycle)
+                                deleted[edge.child].add(pk)
+                                next_frontier[edge.child].append(child_row)
+                            elif edge.rule == "SET NULL":
+                                set_null[edge.child].add(pk)
+                            else:
+                                blocked[edge.child].add(pk)
+                            seen += 1
+                        if seen >= max_rows:
+                            truncated = True
+                            break
+                    if truncated:
+                        break
+                frontier = next_frontier
+    except (pymysql.Error, ValueError, KeyError) as e:
+        print(f"Dependency Error: {e}")
+        return None
+
+    deleted[table_name].discard(pk_of(table_name, root[0]))
+    counts = lambda groups: {t: len(keys) for t, keys in groups.items() if keys}
+    return {
+        "direct": dict(direct),
+        "deleted": counts(deleted),
+        # rows that are deleted anyway are not also reported as nulled
+        "set_null": counts({t: keys - deleted.get(t, set()) for t, keys in set_null.items()}),
+        "blocked_by": counts(blocked),
+        "levels": levels,
+        "queries": queries,
+        "truncated": truncated,
+    }
+
+
+def describe_impact(impact):
+    """Multi-line summary of delete_impact() for confirmations and the CLI."""
+    if impact is None:
+        return "Dependent rows could not be checked."
+    fmt = lambda groups: ", ".join(f"{t} {n:,}" for t, n in sorted(groups.items(), key=lambda kv: -kv[1]))
+    more = "+" if impact["truncated"] else ""
+    lines = []
+    if impact["blocked_by"]:
+        lines.append(f"Will FAIL: referenced by {fmt(impact['blocked_by'])}{more}")
+    if impact["deleted"]:
+        lines.append(f"Also deletes {sum(impact['deleted'].values()):,}{more} rows: {fmt(impact['deleted'])}")
+    if impact["set_null"]:
+        lines.append(f"Clears references in {sum(impact['set_null'].values()):,}{more} rows: {fmt(impact['set_null'])}")
+    if not lines:
+        lines.append("No other rows reference this record.")
+    return "\n".join(lines)
+
+# =============================================================================
+# COMMAND LINE
+# =============================================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Show what deleting a record would cascade to.")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--user", default="root")
+    parser.add_argument("--password", default=None, help="Prompted for if omitted")
+    parser.add_argument("--db", default="pokemon_league_db")
+    parser.add_argument("table")
+    parser.add_argument("key", nargs="+", help="Primary key value, or col=value pairs for composite keys")
+
+    args = parser.parse_args(argv)
+    password = args.password if args.password is not None else getpass.getpass("Password: ")
+    conn = db_utils.get_db_connection(args.host, args.user, password, args.db)
+    if not conn:
+        return 1
+    try:
+        graph = load_graph(conn)
+        if graph is None:
+            return 1
+        pk_cols = graph.primary_keys.get(args.table, [])
+        if all("=" in k for k in args.key):
+            pk_dict = dict(k.split("=", 1) for k in args.key)
+        elif len(args.key) == len(pk_cols):
+            pk_dict = dict(zip(pk_cols, args.key))
+        else:
+            print(f"{args.table} has primary key ({', '.join(pk_cols)}).")
+            return 1
+        impact = delete_impact(conn, graph, args.table, pk_dict)
+    finally:
+        conn.close()
+    if impact is None:
+        print("Record not found.")
+        return 1
+    print(describe_impact(impact))
+    if impact["direct"]:
+        print("Referenced directly by: " + ", ".join(f"{t} {n:,}" for t, n in impact["direct"].items()))
+    print(f"{impact['levels']} levels, {impact['queries']} queries")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,335 @@
+import argparse
+import csv
+import datetime
+import decimal
+import getpass
+import importlib
+import json
+import sys
+import pymysql
+import db_utils
+
+# Parquet support is optional (pip install pyarrow). It is imported on first
+# use because pyarrow (and numpy with it) is slow to load.
+pa = None
+pq = None
+
+
+def _load_pyarrow():
+    global pa, pq
+    if pa is None:
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ImportError("Parquet export requires pyarrow (pip install pyarrow).")
+        pa, pq = pyarrow, pyarrow.parquet
+    return pa
+
+
+FORMATS = ("csv", "jsonl", "parquet")
+CHUNK_SIZE = 5000
+
+
+def _lazy_report(module_name, func_name):
+    """Reports from modules that pull in numpy are only imported when they run."""
+    def run(conn):
+        module = importlib.import_module(module_name)
+        return getattr(module, func_name)(conn)
+    return run
+
+
+# Reports that can be exported by name (CLI and TUI)
+REPORTS = {
+    "manages": db_utils.get_manages_report,
+    "assigned_to_gym": db_utils.get_assigned_to_gym_report,
+    "pokemon_abilities": db_utils.get_pokemon_abilities_report,
+    "gym_leader_cheat_sheet": db_utils.get_gym_leader_cheat_sheet,
+    "tournament_snapshot": db_utils.get_tournament_snapshot,
+    "underrated_trainers": db_utils.get_underrated_trainer_report,
+    "region_power": db_utils.get_region_power_report,
+    "species_mvp": db_utils.get_species_mvp_report,
+    "badge_leaderboard": db_utils.query_badge_leaderboard,
+    "elite_pokemon": db_utils.query_elite_pokemon,
+    "active_region_insights": db_utils.query_active_region_insights,
+    "gym_type_coverage": _lazy_report("matchups", "get_gym_coverage_report"),
+    "roster_type_coverage": _lazy_report("matchups", "get_trainer_coverage_report"),
+    "species_matchups": _lazy_report("matchups", "get_league_matchup_table"),
+    "rating_leaderboard": _lazy_report("ratings", "get_rating_leaderboard"),
+}
+
+# information_schema data types -> parquet column types
+ARROW_TYPES = {
+    'int': 'int64', 'bigint': 'int64', 'smallint': 'int64', 'mediumint': 'int64', 'tinyint': 'int64',
+    'year': 'int64', 'float': 'float64', 'double': 'float64', 'decimal': 'float64',
+    'date': 'date32', 'datetime': 'timestamp', 'timestamp': 'timestamp',
+}
+
+# =============================================================================
+# WRITERS
+# =============================================================================
+
+def _json_default(val):
+    if isinstance(val, (datetime.date, datetime.datetime, datetime.time)):
+        return val.isoformat()
+    if isinstance(val, datetime.timedelta):
+        return str(val)
+    if isinstance(val, decimal.Decimal):
+        return float(val)
+    if isinstance(val, bytes):
+        return val.hex()
+    return str(val)
+
+
+class CsvExportWriter:
+    def __init__(self, path, columns):
+        self.file = open(path, "w", newline="", encoding="utf-8")
+        self.columns = columns
+        self.writer = None
+
+    def write(self, rows):
+        if self.writer is None:
+            self.columns = self.columns or list(rows[0].keys())
+            self.writer = csv.DictWriter(self.file, fieldnames=self.columns, restval="", extrasaction="ignore")
+            self.writer.writeheader()
+        self.writer.writerows(rows)
+
+    def close(self):
+        if self.writer is None and self.columns:
+            csv.writer(self.file).writerow(self.columns)
+        self.file.close()
+
+
+class JsonlExportWriter:
+    def __init__(self, path, columns):
+        self.file = open(path, "w", encoding="utf-8")
+
+    def write(self, rows):
+        self.file.writelines(json.dumps(row, default=_json_default, ensure_ascii=False) + "\n" for row in rows)
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetExportWriter:
+    """
+    Writes one row group per chunk. The schema comes from the caller when it
+    is known (table exports); otherwise it is inferred from the first chunk,
+    with all-NULL columns stored as strings. An export without rows still
+    writes a file with the schema (string columns if it was never known).
+    """
+
+    def __init__(self, path, columns, schema=None):
+        _load_pyarrow()
+        self.path = path
+        self.columns = columns
+        self.schema = schema
+        self.writer = None
+
+    def _convert(self, rows):
+        names = self.schema.names
+        data = {name: [] for name in names}
+        for row in rows:
+            for field in self.schema:
+                val = row.get(field.name)
+                if val is not None:
+                    if isinstance(val, decimal.Decimal):
+                        val = float(val)
+                    if pa.types.is_string(field.type) and not isinstance(val, str):
+                        val = _json_default(val) if not isinstance(val, (int, float)) else str(val)
+                data[field.name].append(val)
+        return pa.Table.from_pydict(data, schema=self.schema)
+
+    def write(self, rows):
+        if self.schema is None:
+            columns = self.columns or list(rows[0].keys())
+            probe = pa.Table.from_pylist([{c: (float(r.get(c)) if isinstance(r.get(c), decimal.Decimal) else r.get(c))
+                                           for c in columns} for r in rows])
+            self.schema = pa.schema([
+                pa.field(f.name, pa.string() if pa.types.is_null(f.type) else f.type) for f in probe.schema
+            ])
+        if self.writer is None:
+            self.writer = pq.ParquetWriter(self.path, self.schema)
+        self.writer.write_table(self._convert(rows))
+
+    def close(self):
+        if self.writer is None:
+            if self.schema is None:
+                self.schema = pa.schema([pa.field(c, pa.string()) for c in self.columns or []])
+            self.writer = pq.ParquetWriter(self.path, self.schema)
+        self.writer.close()
+
+
+def open_writer(path, fmt, columns=None, column_types=None):
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    if fmt == "csv":
+        return CsvExportWriter(path, columns)
+    if fmt == "jsonl":
+        return JsonlExportWriter(path, columns)
+    schema = None
+    if columns and column_types:
+        _load_pyarrow()
+        schema = pa.schema([pa.field(c, _arrow_type(column_types.get(c))) for c in columns])
+    return ParquetExportWriter(path, columns, schema)
+
+
+def _arrow_type(data_type):
+    name = ARROW_TYPES.get(data_type, 'string')
+    if name == 'timestamp':
+        return pa.timestamp('us')
+    return getattr(pa, name)()
+
+# =============================================================================
+# EXPORT PIPELINE
+# =============================================================================
+
+def export_chunks(chunks, path, fmt, columns=None, column_types=None, total=None, progress=None):
+    """
+    Drains an iterable of row chunks into `path`. Only one chunk is held in
+    memory at a time. `progress(done, total)` is called after every chunk.
+    Returns the number of rows written.
+    """
+    writer = open_writer(path, fmt, columns, column_types)
+    done = 0
+    try:
+        for rows in chunks:
+            if not rows:
+                continue
+            writer.write(rows)
+            done += len(rows)
+            if progress:
+                progress(done, total)
+    finally:
+        writer.close()
+    return done
+
+
+def _table_columns(conn, table_name):
+    cols = db_utils.get_searchable_columns(conn, table_name)
+    return [c for c, _ in cols], {c: t for c, t in cols}
+
+
+def export_table(conn, table_name, path, fmt, progress=None, chunk_size=CHUNK_SIZE):
+    columns, types = _table_columns(conn, table_name)
+    total = db_utils.estimate_row_count(conn, table_name)
+    chunks = db_utils.stream_table(conn, table_name, chunk_size=chunk_size)
+    return export_chunks(chunks, path, fmt, columns or None, types, total, progress)
+
+
+def export_filter(conn, table_name, search_term, path, fmt, progress=None, chunk_size=CHUNK_SIZE):
+    """Exports the rows the Data Browser filter would show for `search_term`."""
+    columns, types = _table_columns(conn, table_name)
+    sql, params = db_utils.build_search_query(conn, table_name, search_term)
+    chunks = db_utils.stream_query(conn, sql, params, chunk_size) if sql else iter(())
+    return export_chunks(chunks, path, fmt, columns or None, types, None, progress)
+
+
+def export_search(conn, search_term, path, fmt, progress=None, chunk_size=CHUNK_SIZE):
+    """
+    Exports a global search. Rows from every table share one file with a
+    leading `_table` column; the header is the union of all table columns.
+    """
+    tables = db_utils.get_all_tables(conn)
+    columns = ["_table"]
+    types = {"_table": "varchar"}
+    for table in tables:
+        for col, dtype in db_utils.get_searchable_columns(conn, table):
+            if col not in types:
+                columns.append(col)
+                types[col] = dtype
+            elif ARROW_TYPES.get(types[col]) != ARROW_TYPES.get(dtype):
+                types[col] = "varchar"  # Same name, different types across tables
+
+    def chunks():
+        for table in tables:
+            sql, params = db_utils.build_search_query(conn, table, search_term)
+            if not sql:
+                continue
+            for rows in db_utils.stream_query(conn, sql, params, chunk_size):
+                yield [{"_table": table, **row} for row in rows]
+
+    return export_chunks(chunks(), path, fmt, columns, types, None, progress)
+
+
+def export_report(conn, report_name, path, fmt, progress=None, chunk_size=CHUNK_SIZE):
+    """
+    Reports are aggregates (most carry a LIMIT), so they are fetched through
+    their db_utils function and written out in chunks.
+    """
+    if report_name not in REPORTS:
+        raise ValueError(f"Unknown report: {report_name}")
+    rows = REPORTS[report_name](conn)
+    chunks = (rows[i:i + chunk_size] for i in range(0, len(rows), chunk_size))
+    return export_chunks(chunks, path, fmt, None, None, len(rows), progress)
+
+# =============================================================================
+# COMMAND LINE
+# =============================================================================
+
+def print_progress(done, total):
+    """Progress bar on stderr, so stdout stays clean for piping."""
+    if total:
+        frac = min(done / total, 1.0)
+        bar = "#" * int(frac * 30)
+        sys.stderr.write(f"\r[{bar:<30}] {frac * 100:5.1f}%  {done:,} rows")
+    else:
+        sys.stderr.write(f"\r{done:,} rows")
+    sys.stderr.flush()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stream league data to CSV, JSONL or Parquet.")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--user", default="root")
+    parser.add_argument("--password", default=None, help="Prompted for if omitted")
+    parser.add_argument("--db", default="pokemon_league_db")
+    parser.add_argument("--format", choices=FORMATS, default=None, help="Defaults to the output file extension")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    sub = parser.add_subparsers(dest="kind", required=True)
+
+    p = sub.add_parser("table", help="Export a whole table")
+    p.add_argument("table")
+    p = sub.add_parser("filter", help="Export a table filtered like the Data Browser")
+    p.add_argument("table")
+    p.add_argument("term")
+    p = sub.add_parser("search", help="Export a global search")
+    p.add_argument("term")
+    p = sub.add_parser("report", help="Export a report")
+    p.add_argument("report", choices=sorted(REPORTS))
+    for p in sub.choices.values():
+        p.add_argument("-o", "--output", required=True)
+
+    args = parser.parse_args(argv)
+    fmt = args.format or args.output.rsplit(".", 1)[-1].lower()
+    if fmt not in FORMATS:
+        parser.error(f"Cannot infer format from '{args.output}', use --format.")
+    password = args.password if args.password is not None else getpass.getpass("Password: ")
+
+    conn = db_utils.get_db_connection(args.host, args.user, password, args.db)
+    if not conn:
+        return 1
+
+    try:
+        if args.kind == "table":
+            count = export_table(conn, args.table, args.output, fmt, print_progress, args.chunk_size)
+        elif args.kind == "filter":
+            count = export_filter(conn, args.table, args.term, args.output, fmt, print_progress, args.chunk_size)
+        elif args.kind == "search":
+            count = export_search(conn, args.term, args.output, fmt, print_progress, args.chunk_size)
+        else:
+            count = export_report(conn, args.report, args.output, fmt, print_progress, args.chunk_size)
+    except (pymysql.Error, ValueError, ImportError, OSError) as e:
+        sys.stderr.write("\n")
+        print(f"Export Error: {e}")
+        return 1
+    finally:
+        conn.close()
+
+    sys.stderr.write("\n")
+    print(f"Exported {count:,} rows to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
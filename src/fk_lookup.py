@@ -0,0 +1,282 @@
+import bisect
+from array import array
+from collections import OrderedDict
+import db_utils
+from table_config import TABLE_CONFIG, get_display_source
+
+# =============================================================================
+# FK DISPLAY NAMES (LRU CACHE)
+# =============================================================================
+
+class DisplayNameCache:
+    """
+    LRU cache of FK id -> display name, per referenced table.
+    Misses are resolved in bulk (one IN (...) query per referenced table),
+    and CRUD on a table invalidates that table's entries.
+    """
+
+    def __init__(self, max_entries=20000):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # (ref_table, key) -> name (None = no such row)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def resolve(self, conn, ref_table, keys):
+        """Returns {key: name} for `keys`, querying only the ones not cached."""
+        source = get_display_source(ref_table)
+        if not source:
+            return {}
+        result = {}
+        misses = []
+        for key in dict.fromkeys(keys):
+            if key is None:
+                continue
+            cache_key = (ref_table, key)
+            if cache_key in self.entries:
+                self.entries.move_to_end(cache_key)
+                result[key] = self.entries[cache_key]
+            else:
+                misses.append(key)
+
+        if misses:
+            table, pk_col, display_col = source
+            found = db_utils.get_display_names(conn, table, pk_col, display_col, misses)
+            for key in misses:
+                name = found.get(key)
+                self.entries[(ref_table, key)] = name
+                result[key] = name
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return result
+
+    def resolve_rows(self, conn, table_name, rows):
+        """
+        Resolves every FK column of `rows` (dicts from table_name).
+        Returns {column: {key: name}} with one lookup per referenced table.
+        """
+        fk_cols = [c for c in TABLE_CONFIG.get(table_name, {}).get('columns', [])
+                   if c['type'] == 'fk' and get_display_source(c['ref_table'])]
+        by_ref = {}
+        for col_def in fk_cols:
+            keys = by_ref.setdefault(col_def['ref_table'], [])
+            keys.extend(row.get(col_def['col']) for row in rows)
+        names = {ref: self.resolve(conn, ref, keys) for ref, keys in by_ref.items()}
+        return {c['col']: names[c['ref_table']] for c in fk_cols}
+
+    def invalidate(self, table_name=None):
+        """Drops cached names that may be stale after CRUD on table_name (or everything)."""
+        if table_name is None:
+            self.entries.clear()
+            return
+        # Tables whose display value is borrowed from table_name are stale too
+        affected = {t for t in TABLE_CONFIG
+                    if t == table_name or TABLE_CONFIG[t].get('display_from') == table_name}
+        for cache_key in [k for k in self.entries if k[0] in affected]:
+            del self.entries[cache_key]
+
+# =============================================================================
+# FK AUTOCOMPLETE INDEX
+# =============================================================================
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class FKIndex:
+    """
+    In-memory search index over one referenced table's (id, display name).
+      - prefix matches: bisect over a sorted list of search terms (the id,
+        the full name and each later word of the name)
+      - substring matches: trigram posting lists, intersected smallest first
+    Built once by streaming the table, then kept current with add()/remove()
+    as records are saved, so typing in a form never queries the database.
+    """
+
+    def __init__(self, table_name):
+        self.table_name = table_name
+        self.ids = []        # row number -> id
+        self.names = []      # row number -> display name (None if the table has none)
+        self.alive = []      # row number -> False once removed
+        self.row_of = {}     # id -> row number
+        self.terms = []      # sorted (term, row number)
+        self.trigrams = {}   # trigram -> array of row numbers
+
+    def __len__(self):
+        return len(self.row_of)
+
+    @classmethod
+    def build(cls, conn, table_name, chunk_size=5000):
+        """Streams (id, name) for table_name. Errors are raised to the caller."""
+        index = cls(table_name)
+        pk_col = TABLE_CONFIG[table_name]['pk']
+        source = get_display_source(table_name)
+        names = {}
+        if source:
+            table, key_col, display_col = source
+            for rows in db_utils.stream_table(conn, table, chunk_size, columns=[key_col, display_col]):
+                names.update((row[key_col], row[display_col]) for row in rows)
+        for rows in db_utils.stream_table(conn, table_name, chunk_size, columns=[pk_col]):
+            for row in rows:
+                index._append(row[pk_col], names.get(row[pk_col]), sort=False)
+        index.terms.sort()
+        return index
+
+    def _append(self, key, name, sort=True):
+        row_no = len(self.ids)
+        self.row_of[key] = row_no
+        self.ids.append(key)
+        self.names.append(name)
+        self.alive.append(True)
+
+        key_text = str(key).lower()
+        terms = [key_text]
+        grams = _trigrams(key_text)
+        if name:
+            name_text = str(name).lower()
+            terms.append(name_text)
+            terms.extend(name_text.split()[1:])
+            grams |= _trigrams(name_text)
+        for term in terms:
+            if sort:
+                bisect.insort(self.terms, (term, row_no))
+            else:
+                self.terms.append((term, row_no))
+        for gram in grams:
+            self.trigrams.setdefault(gram, array('l')).append(row_no)
+
+    # --- INCREMENTAL MAINTENANCE ---
+    def add(self, key, name=None):
+        """Adds a key, or replaces it (e.g. after its name was updated)."""
+        self.remove(key)
+        self._append(key, name)
+
+    def remove(self, key):
+        """Tombstones a key; its stale terms are skipped at query time."""
+        row_no = self.row_of.pop(key, None)
+        if row_no is not None:
+            self.alive[row_no] = False
+
+    def name_of(self, key):
+        row_no = self.row_of.get(key)
+        return self.names[row_no] if row_no is not None else None
+
+    # --- QUERIES ---
+    def search(self, text, limit=8):
+        """
+        Returns up to `limit` (id, name) pairs matching `text`,
+        prefix matches first, then substring matches (3+ characters).
+        """
+        text = text.strip().lower()
+        if not text:
+            return []
+        found = []
+        seen = set()
+
+        pos = bisect.bisect_left(self.terms, (text,))
+        while pos < len(self.terms) and len(found) < limit:
+            term, row_no = self.terms[pos]
+            if not term.startswith(text):
+                break
+            if self.alive[row_no] and row_no not in seen:
+                seen.add(row_no)
+                found.append(row_no)
+            pos += 1
+
+        if len(found) < limit and len(text) >= 3:
+            postings = sorted((self.trigrams.get(g, ()) for g in _trigrams(text)), key=len)
+            candidates = set(postings[0])
+            for plist in postings[1:]:
+                if not candidates:
+                    break
+                candidates.intersection_update(plist)
+            for row_no in sorted(candidates):
+                if len(found) >= limit:
+                    break
+                if row_no in seen or not self.alive[row_no]:
+                    continue
+                # Trigrams can match out of order; confirm the substring
+                if text in str(self.ids[row_no]).lower() or text in str(self.names[row_no] or "").lower():
+                    seen.add(row_no)
+                    found.append(row_no)
+
+        return [(self.ids[r], self.names[r]) for r in found]
+
+    def complete_id(self, prefix):
+        """First live id starting with `prefix` (case-insensitive), or None."""
+        prefix = prefix.lower()
+        pos = bisect.bisect_left(self.terms, (prefix,))
+        while pos < len(self.terms):
+            term, row_no = self.terms[pos]
+            if not term.startswith(prefix):
+                return None
+            if self.alive[row_no] and str(self.ids[row_no]).lower() == term:
+                return str(self.ids[row_no])
+            pos += 1
+        return None
+
+
+class FKIndexRegistry:
+    """One FKIndex per referenced table, built on first use."""
+
+    def __init__(self):
+        self.indexes = {}
+
+    def get(self, table_name):
+        return self.indexes.get(table_name)
+
+    def ensure(self, conn, table_name):
+        """Returns the index for table_name, building it first if needed (blocking)."""
+        if table_name not in self.indexes:
+            self.indexes[table_name] = FKIndex.build(conn, table_name)
+        return self.indexes[table_name]
+
+    def record_saved(self, table_name, row, old_key=None):
+        """Applies an insert/update of `row` in table_name to the built indexes."""
+        pk_col = TABLE_CONFIG.get(table_name, {}).get('pk')
+        if not pk_col:
+            return
+        key = row.get(pk_col)
+        for ref_table, index in self.indexes.items():
+            config = TABLE_CONFIG[ref_table]
+            if ref_table == table_name:
+                name = index.name_of(old_key if old_key is not None else key)
+                if not config.get('display_from'):
+                    name = row.get(config.get('display'))
+                if old_key is not None:
+                    index.remove(old_key)
+                index.add(key, name)
+            elif config.get('display_from') == table_name and key in index.row_of:
+                # e.g. a Trainer rename shows up in the GymLeader index
+                index.add(key, row.get(config['display']))
+
+    def record_deleted(self, table_name, row):
+        """
+        Removes a deleted key. Cascades may have removed rows elsewhere, so
+        every other index is dropped and rebuilt on next use.
+        """
+        index = self.indexes.get(table_name)
+        pk_col = TABLE_CONFIG.get(table_name, {}).get('pk')
+        self.indexes = {table_name: index} if index is not None else {}
+        if index is not None and pk_col:
+            index.remove(row.get(pk_col))
+
+    def depends_on(self, table_name):
+        """True if a built index reads keys or names from table_name."""
+        return any(t == table_name or TABLE_CONFIG[t].get('display_from') == table_name for t in self.indexes)
+
+    def apply_changes(self, table_name, saved_rows, deleted_keys):
+        """Applies changes seen in the change log (rows that now exist, keys that are gone)."""
+        for row in saved_rows:
+            self.record_saved(table_name, row)
+        index = self.indexes.get(table_name)
+        if index is not None:
+            for key in deleted_keys:
+                index.remove(key)
+
+    def invalidate(self, table_name=None):
+        """Drops one index (or all) after changes made outside the forms, e.g. an import."""
+        if table_name is None:
+            self.indexes.clear()
+        else:
+            self.indexes.pop(table_name, None)
@@ -0,0 +1,438 @@
+import argparse
+import contextlib
+import csv
+import datetime
+import getpass
+import json
+import re
+import sys
+import time
+import pymysql
+import db_utils
+import ratings
+from table_config import TABLE_CONFIG, CHECK_RULES, get_pk_columns, get_id_pattern
+
+BATCH_SIZE = 5000
+# Referenced tables up to this size are preloaded in full; larger ones are
+# checked with one IN (...) query per batch.
+PRELOAD_KEY_LIMIT = 200000
+IN_CHUNK = 1000
+# Deadlock, lock wait timeout or lost connection: the batch is retried after
+# these delays instead of rejecting its rows
+RETRY_SECONDS = [1, 2, 5, 10]
+
+# =============================================================================
+# READING
+# =============================================================================
+
+def read_records(path):
+    """Yields (line_number, record) from a CSV (with header) or JSONL file."""
+    if path.lower().endswith((".jsonl", ".ndjson", ".json")):
+        with open(path, encoding="utf-8") as f:
+            for line_no, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield line_no, json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield line_no, {"__parse_error__": f"Invalid JSON: {e}"}
+    else:
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            # Line 1 is the header
+            for line_no, row in enumerate(csv.DictReader(f), 2):
+                yield line_no, row
+
+
+def get_import_columns(table_name):
+    """Columns a row of `table_name` may carry (same set RecordForm shows)."""
+    config = TABLE_CONFIG[table_name]
+    columns = [c['col'] for c in config.get('columns', [])]
+    for pk in get_pk_columns(table_name):
+        if pk not in columns:
+            columns.insert(0, pk)
+    return columns
+
+
+def _coerce(value, col_type):
+    """Converts a raw CSV/JSON value to the column's Python type."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = value.strip()
+        if value == "" or value.upper() == "NULL":
+            return None
+    if col_type == "int":
+        if isinstance(value, bool):
+            raise ValueError("expected an integer")
+        if isinstance(value, float) and not value.is_integer():
+            raise ValueError(f"expected an integer, got {value}")
+        return int(value)
+    if col_type == "date":
+        return datetime.date.fromisoformat(str(value)[:10])
+    return str(value)
+
+# =============================================================================
+# VALIDATION
+# =============================================================================
+
+class KeyCache:
+    """
+    Set of known primary keys for one referenced table. Small tables are
+    loaded once; for large ones unknown keys are looked up in batches and
+    remembered, so each key costs at most one round trip per import.
+    """
+
+    def __init__(self, conn, table_name, pk_col):
+        self.conn = conn
+        self.table = db_utils.validate_identifier(table_name)
+        self.pk = db_utils.validate_identifier(pk_col)
+        self.known = set()
+        self.preloaded = False
+        rows = db_utils.estimate_row_count(conn, table_name)
+        if rows is not None and rows <= PRELOAD_KEY_LIMIT:
+            with conn.cursor() as cursor:
+                cursor.execute(f"SELECT {self.pk} FROM {self.table}")
+                self.known = {row[self.pk] for row in cursor.fetchall()}
+            self.preloaded = True
+
+    def add(self, keys):
+        self.known.update(keys)
+
+    def missing(self, keys):
+        """Returns the subset of `keys` that does not exist in the table."""
+        unknown = [k for k in set(keys) if k not in self.known]
+        if not unknown or self.preloaded:
+            return set(unknown)
+        with self.conn.cursor() as cursor:
+            for i in range(0, len(unknown), IN_CHUNK):
+                chunk = unknown[i:i + IN_CHUNK]
+                placeholders = ", ".join(["%s"] * len(chunk))
+                cursor.execute(f"SELECT {self.pk} FROM {self.table} WHERE {self.pk} IN ({placeholders})", chunk)
+                self.known.update(row[self.pk] for row in cursor.fetchall())
+        return {k for k in unknown if k not in self.known}
+
+
+def check_row(table_name, row):
+    """Client-side CHECK/NOT NULL/ID pattern validation. Returns an error or None."""
+    rules = CHECK_RULES.get(table_name, {})
+    config = TABLE_CONFIG[table_name]
+
+    pattern = get_id_pattern(table_name)
+    pk_val = row.get(config.get('pk')) if config.get('pk') else None
+    if pattern and pk_val is not None and not re.match(pattern, pk_val):
+        return f"{config['pk']} '{pk_val}' does not match {pattern}"
+
+    for col in get_pk_columns(table_name):
+        if row.get(col) is None:
+            return f"{col} is required"
+    for col in rules.get("not_null", []):
+        if row.get(col) is None:
+            return f"{col} is required"
+    for col_def in config.get('columns', []):
+        val = row.get(col_def['col'])
+        if col_def['type'] == 'enum' and val is not None and val not in col_def.get('choices', []):
+            return f"{col_def['col']} must be one of {col_def['choices']}"
+    for rule in rules.get("range", []):
+        val = row.get(rule['col'])
+        if val is None:
+            continue
+        if 'min' in rule and val < rule['min']:
+            return f"{rule['col']} must be >= {rule['min']}"
+        if 'max' in rule and val > rule['max']:
+            return f"{rule['col']} must be <= {rule['max']}"
+    for rule in rules.get("order", []):
+        low, high = row.get(rule['low']), row.get(rule['high'])
+        if low is not None and high is not None and high < low:
+            return f"{rule['high']} must not be before {rule['low']}"
+    if rules.get("winner"):
+        try:
+            db_utils.validate_match_winner(row.get('trainer1_id'), row.get('trainer2_id'), row.get('winner_id'))
+        except ValueError as e:
+            return str(e)
+    return None
+
+# =============================================================================
+# IMPORT
+# =============================================================================
+
+class RejectWriter:
+    """Writes rejected rows with their line number and reason, opened lazily."""
+
+    def __init__(self, path, columns):
+        self.path = path
+        self.columns = ["_line", "_error"] + columns
+        self.file = None
+        self.writer = None
+        self.count = 0
+
+    def write(self, line_no, raw, reason):
+        if self.path is None:
+            self.count += 1
+            return
+        if self.file is None:
+            self.file = open(self.path, "w", newline="", encoding="utf-8")
+            if not self.path.lower().endswith(".jsonl"):
+                self.writer = csv.DictWriter(self.file, fieldnames=self.columns, extrasaction="ignore")
+                self.writer.writeheader()
+        record = {"_line": line_no, "_error": reason, **{k: v for k, v in raw.items() if k in self.columns}}
+        if self.writer:
+            self.writer.writerow(record)
+        else:
+            self.file.write(json.dumps(record, default=str) + "\n")
+        self.count += 1
+
+    def close(self):
+        if self.file:
+            self.file.close()
+
+
+class TableImporter:
+    """
+    Streams records into one TABLE_CONFIG table in batches:
+    coerce -> assign IDs -> validate (CHECK rules, FKs, duplicate keys)
+    -> multi-row INSERT in a transaction. Rows that fail are written to the
+    reject file instead of aborting the import.
+    """
+
+    def __init__(self, conn, table_name, reject_path=None, batch_size=BATCH_SIZE, progress=None):
+        if table_name not in TABLE_CONFIG:
+            raise ValueError(f"Unknown table: {table_name}")
+        self.conn = conn
+        self.table = db_utils.validate_identifier(table_name)
+        self.config = TABLE_CONFIG[table_name]
+        self.columns = [db_utils.validate_identifier(c) for c in get_import_columns(table_name)]
+        self.types = {c['col']: c['type'] for c in self.config.get('columns', [])}
+        self.pk_cols = get_pk_columns(table_name)
+        self.batch_size = batch_size
+        self.progress = progress
+        self.rejects = RejectWriter(reject_path, self.columns)
+        self.fk_caches = {}
+        self.seen_keys = set()
+        self.inserted = 0
+        self.processed = 0
+
+        placeholders = ", ".join(["%s"] * len(self.columns))
+        self.insert_sql = f"INSERT INTO {self.table} ({', '.join(self.columns)}) VALUES ({placeholders})"
+
+    def _fk_cache(self, col_def):
+        ref = col_def['ref_table']
+        if ref not in self.fk_caches:
+            self.fk_caches[ref] = KeyCache(self.conn, ref, col_def['ref_pk'])
+        return self.fk_caches[ref]
+
+    def run(self, records):
+        start = time.perf_counter()
+        batch = []
+        try:
+            for line_no, raw in records:
+                batch.append((line_no, raw))
+                if len(batch) >= self.batch_size:
+                    self._process_batch(batch)
+                    batch = []
+            if batch:
+                self._process_batch(batch)
+        finally:
+            self.rejects.close()
+        elapsed = time.perf_counter() - start
+        return {
+            "processed": self.processed,
+            "inserted": self.inserted,
+            "rejected": self.rejects.count,
+            "seconds": elapsed,
+            "rows_per_sec": self.processed / elapsed if elapsed > 0 else 0.0,
+        }
+
+    def _process_batch(self, batch):
+        rows = []
+        for line_no, raw in batch:
+            if "__parse_error__" in raw:
+                self.rejects.write(line_no, raw, raw["__parse_error__"])
+                continue
+            unknown = [k for k in raw if k not in self.columns]
+            if unknown:
+                self.rejects.write(line_no, raw, f"Unknown columns: {', '.join(map(str, unknown))}")
+                continue
+            try:
+                row = {c: _coerce(raw.get(c), self.types.get(c, "str")) for c in self.columns}
+            except (ValueError, TypeError) as e:
+                self.rejects.write(line_no, raw, f"Bad value: {e}")
+                continue
+            rows.append((line_no, raw, row))
+
+        self._assign_ids(rows)
+        rows = self._validate(rows)
+        self._insert(rows)
+        self.processed += len(batch)
+        if self.progress:
+            self.progress(self.processed, self.inserted, self.rejects.count)
+
+    def _assign_ids(self, rows):
+        pk, prefix = self.config.get('pk'), self.config.get('prefix')
+        if not (pk and prefix):
+            return
+        needs_id = [row for _, _, row in rows if row.get(pk) is None]
+        if not needs_id:
+            return
+        ids = db_utils.allocate_ids(self.conn, self.table, pk, prefix, len(needs_id))
+        for row, new_id in zip(needs_id, ids):
+            row[pk] = new_id
+
+    def _validate(self, rows):
+        valid = []
+        for line_no, raw, row in rows:
+            error = check_row(self.table, row)
+            key = tuple(row.get(c) for c in self.pk_cols)
+            if not error and key in self.seen_keys:
+                error = f"Duplicate key {key} in import file"
+            if error:
+                self.rejects.write(line_no, raw, error)
+            else:
+                self.seen_keys.add(key)
+                valid.append((line_no, raw, row))
+
+        # FK existence, one lookup per referenced table per batch
+        for col_def in self.config.get('columns', []):
+            if col_def['type'] != 'fk':
+                continue
+            col = col_def['col']
+            values = {row[col] for _, _, row in valid if row.get(col) is not None}
+            if not values:
+                continue
+            missing = self._fk_cache(col_def).missing(values)
+            if missing:
+                kept = []
+                for line_no, raw, row in valid:
+                    if row.get(col) in missing:
+                        self.seen_keys.discard(tuple(row.get(c) for c in self.pk_cols))
+                        self.rejects.write(line_no, raw, f"{col} '{row[col]}' not found in {col_def['ref_table']}")
+                    else:
+                        kept.append((line_no, raw, row))
+                valid = kept
+        return valid
+
+    def _insert(self, rows):
+        if not rows:
+            return
+        params = [tuple(row[c] for c in self.columns) for _, _, row in rows]
+        for attempt in range(len(RETRY_SECONDS) + 1):
+            try:
+                self.inserted += self._store(rows, params)
+                break
+            except pymysql.Error as e:
+                if not db_utils.is_transient_error(e) or attempt == len(RETRY_SECONDS):
+                    raise
+                sys.stderr.write(f"\nImport Error: {e}; retrying in {RETRY_SECONDS[attempt]}s\n")
+                time.sleep(RETRY_SECONDS[attempt])
+                with contextlib.suppress(pymysql.Error):
+                    self.conn.ping(reconnect=True)
+        self._remember_keys(rows)
+
+    def _store(self, rows, params):
+        """One batch in one transaction; returns the rows inserted. Transient errors leave nothing committed."""
+        try:
+            self.conn.begin()
+            with self.conn.cursor() as cursor:
+                # pymysql turns executemany on INSERT ... VALUES into multi-row statements
+                cursor.executemany(self.insert_sql, params)
+            self.conn.commit()
+            return len(rows)
+        except pymysql.Error as e:
+            with contextlib.suppress(pymysql.Error):
+                self.conn.rollback()
+            if db_utils.is_transient_error(e):
+                raise
+        return self._insert_row_by_row(rows, params)
+
+    def _insert_row_by_row(self, rows, params):
+        """Fallback after a rejected batch: isolates the rows the server rejects."""
+        inserted = 0
+        failed = []
+        self.conn.begin()
+        try:
+            with self.conn.cursor() as cursor:
+                for (line_no, raw, row), values in zip(rows, params):
+                    try:
+                        cursor.execute(self.insert_sql, values)
+                        inserted += 1
+                    except pymysql.Error as e:
+                        if db_utils.is_transient_error(e):
+                            raise
+                        failed.append((line_no, raw, row, e))
+            self.conn.commit()
+        except pymysql.Error:
+            with contextlib.suppress(pymysql.Error):
+                self.conn.rollback()
+            raise
+        # Written only once committed, so a retried batch does not reject twice
+        for line_no, raw, row, e in failed:
+            row["__failed__"] = True
+            self.rejects.write(line_no, raw, f"Database rejected row: {e.args[-1]}")
+        return inserted
+
+    def _remember_keys(self, rows):
+        # Rows inserted into a referenced table become valid FK targets
+        for col_def in self.config.get('columns', []):
+            if col_def['type'] == 'fk' and col_def['ref_table'] == self.table:
+                self._fk_cache(col_def).add(row[col_def['ref_pk']] for _, _, row in rows if not row.get("__failed__"))
+
+
+def import_file(conn, table_name, path, reject_path=None, batch_size=BATCH_SIZE, progress=None):
+    """
+    Imports a CSV/JSONL file into `table_name`. Returns the summary dict.
+    Imported results can be in any date order, so an import into Match_Table
+    or GymBattle rebuilds TrainerRating (summary["ratings"], None on failure).
+    """
+    importer = TableImporter(conn, table_name, reject_path, batch_size, progress)
+    summary = importer.run(read_records(path))
+    if table_name in db_utils.RESULT_EVENTS and summary["inserted"]:
+        summary["ratings"] = ratings.rebuild_ratings(conn)
+    return summary
+
+# =============================================================================
+# COMMAND LINE
+# =============================================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import a CSV/JSONL file into a league table.")
+    parser.add_argument("table", choices=sorted(TABLE_CONFIG))
+    parser.add_argument("file")
+    parser.add_argument("--rejects", default=None, help="Where to write rejected rows (default: <file>.rejects.csv)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--user", default="root")
+    parser.add_argument("--password", default=None, help="Prompted for if omitted")
+    parser.add_argument("--db", default="pokemon_league_db")
+    args = parser.parse_args(argv)
+
+    reject_path = args.rejects or f"{args.file}.rejects.csv"
+    password = args.password if args.password is not None else getpass.getpass("Password: ")
+    conn = db_utils.get_db_connection(args.host, args.user, password, args.db)
+    if not conn:
+        return 1
+
+    def progress(processed, inserted, rejected):
+        sys.stderr.write(f"\r{processed:,} rows read, {inserted:,} inserted, {rejected:,} rejected")
+        sys.stderr.flush()
+
+    try:
+        summary = import_file(conn, args.table, args.file, reject_path, args.batch_size, progress)
+    except (pymysql.Error, ValueError, OSError) as e:
+        sys.stderr.write("\n")
+        print(f"Import Error: {e}")
+        return 1
+    finally:
+        conn.close()
+
+    sys.stderr.write("\n")
+    print(f"Inserted {summary['inserted']:,} of {summary['processed']:,} rows "
+          f"in {summary['seconds']:.1f}s ({summary['rows_per_sec']:,.0f} rows/s)")
+    if summary["rejected"]:
+        print(f"{summary['rejected']:,} rejected rows written to {reject_path}")
+    if "ratings" in summary and summary["ratings"] is None:
+        print("Ratings were not rebuilt; run `python src/ratings.py rebuild`.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
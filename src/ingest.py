@@ -0,0 +1,553 @@
+import argparse
+import collections
+import contextlib
+import datetime
+import getpass
+import json
+import os
+import queue
+import signal
+import socket
+import sys
+import threading
+import time
+import pymysql
+import db_utils
+import ratings
+import routing
+from importer import check_row, get_import_columns
+from table_config import TABLE_CONFIG
+
+# =============================================================================
+# LIVE RESULT INGESTION
+# =============================================================================
+# Venues append one JSON object per line, e.g.
+#   {"type": "match", "tournament_id": "...", "match_number": 12, "trainer1_id": ...,
+#    "emitted_at": "2025-06-01T14:03:11"}
+#   {"type": "gym_battle", "challenger_id": "...", "gym_id": "...", "result": "Win"}
+# to a file (or send them to a local socket). A reader thread tails the source
+# into a bounded queue; when the queue is full the reader stops reading, so a
+# slow database pushes back on the file or the socket clients instead of
+# filling memory. The writer takes batches of up to batch_size events, or
+# whatever arrived within max_wait seconds, validates them with a few batched
+# lookups and inserts them in one transaction. For a file, that transaction
+# also moves the IngestCheckpoint row to the end of the batch, so after a
+# crash or restart reading resumes exactly after the last committed event.
+# Socket clients get "ack <n>" once their first n lines are committed and
+# resend anything unacknowledged after a reconnect.
+
+EVENT_TABLES = {"match": "Match_Table", "gym_battle": "GymBattle"}
+BATCH_SIZE = 2000
+MAX_WAIT = 0.5          # seconds the first event of a batch may wait for more
+MAX_PENDING = 20_000    # events read ahead of the database before the reader blocks
+POLL_SECONDS = 0.2
+METRICS_INTERVAL = 5.0
+THROUGHPUT_WINDOW = 60.0
+RETRY_SECONDS = [1, 2, 5, 10, 30]
+# Worth retrying the batch for: lost connection, lock wait timeout, deadlock
+TRANSIENT_ERRORS = routing.CONNECTION_ERRORS | {1205, 1213}
+
+# line: raw bytes; file_id/offset: position after the line (file sources);
+# client: (_Client, line number) for socket sources
+Event = collections.namedtuple("Event", "line file_id offset received_at client")
+
+
+def _transient(error):
+    return isinstance(error, pymysql.InterfaceError) or (bool(error.args) and error.args[0] in TRANSIENT_ERRORS)
+
+
+def _put(events, event, stop):
+    """Blocking put that gives up when stop is set (backpressure on the reader)."""
+    while not stop.is_set():
+        try:
+            events.put(event, timeout=POLL_SECONDS)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+# =============================================================================
+# SOURCES
+# =============================================================================
+
+class FileTail:
+    """
+    Follows a JSONL file like `tail -F`: only complete lines are read,
+    starting at offset if the file is still the one the checkpoint names.
+    A rotated file (new inode) is read from the start, a truncated one
+    from the start again.
+    """
+
+    def __init__(self, path, file_id=None, offset=0, exit_at_eof=False):
+        self.path = path
+        self.file_id = file_id
+        self.offset = offset
+        self.exit_at_eof = exit_at_eof
+
+    def _open(self):
+        f = open(self.path, "rb")
+        st = os.fstat(f.fileno())
+        return f, f"{st.st_dev}:{st.st_ino}"
+
+    def run(self, put, stop):
+        f = None
+        while f is None and not stop.is_set():
+            try:
+                f, file_id = self._open()
+            except FileNotFoundError:
+                stop.wait(POLL_SECONDS)
+        if f is None:
+            return
+        offset = self.offset if file_id == self.file_id else 0
+        if offset > os.fstat(f.fileno()).st_size:
+            offset = 0
+        f.seek(offset)
+        partial = b""
+        try:
+            while not stop.is_set():
+                line = f.readline()
+                if line.endswith(b"\n"):
+                    line, partial = partial + line, b""
+                    offset += len(line)
+                    if line.strip() and not put(Event(line, file_id, offset, time.time(), None)):
+                        return
+                    continue
+                partial += line  # a writer is half way through this line
+                try:
+                    st = os.stat(self.path)
+                except FileNotFoundError:
+                    st = None
+                if st is not None and f"{st.st_dev}:{st.st_ino}" != file_id:
+                    f.close()
+                    f, file_id = self._open()
+                    offset, partial = 0, b""
+                    continue
+                if st is not None and st.st_size < offset + len(partial):
+                    f.seek(0)
+                    offset, partial = 0, b""
+                    continue
+                if self.exit_at_eof:
+                    return
+                stop.wait(POLL_SECONDS)
+        finally:
+            f.close()
+
+
+class _Client:
+    def __init__(self, sock):
+        self.sock = sock
+        self.lines = 0
+        self.queued = 0   # last line number handed to the writer
+        self.acked = 0
+        self.lock = threading.Lock()
+
+    def send(self, text):
+        with self.lock, contextlib.suppress(OSError):
+            self.sock.sendall(text.encode("utf-8"))
+
+
+class SocketSource:
+    """Unix socket server; every connected client streams JSONL lines."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def run(self, put, stop):
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(self.path)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(self.path)
+        server.listen()
+        server.settimeout(POLL_SECONDS)
+        try:
+            while not stop.is_set():
+                try:
+                    sock, _ = server.accept()
+                except socket.timeout:
+                    continue
+                threading.Thread(target=self._read_client, args=(sock, put, stop), daemon=True).start()
+        finally:
+            server.close()
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(self.path)
+
+    def _read_client(self, sock, put, stop):
+        client = _Client(sock)
+        with sock, sock.makefile("rb") as f:
+            for line in f:
+                client.lines += 1
+                if not line.strip():
+                    continue
+                if not put(Event(line, None, None, time.time(), (client, client.lines))):
+                    return
+                client.queued = client.lines
+            # The client closed its sending side: stay open until everything is acknowledged
+            while client.acked < client.queued and not stop.is_set():
+                stop.wait(POLL_SECONDS)
+
+# =============================================================================
+# METRICS
+# =============================================================================
+
+class IngestMetrics:
+    """Counters plus lag and throughput, published as Prometheus text."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.received = self.inserted = self.rejected = self.batches = 0
+        self.lag_seconds = 0.0      # commit time - emit time of the oldest event in the last batch
+        self.commit_seconds = 0.0   # validation + transaction time of the last batch
+        self.window = collections.deque()  # (commit time, events)
+
+    def record_batch(self, events, inserted, rejected, oldest, seconds):
+        now = time.time()
+        with self.lock:
+            self.batches += 1
+            self.received += events
+            self.inserted += inserted
+            self.rejected += rejected
+            self.lag_seconds = max(0.0, now - oldest)
+            self.commit_seconds = seconds
+            self.window.append((now, events))
+
+    def throughput(self):
+        """Events committed per second over the last THROUGHPUT_WINDOW seconds."""
+        now = time.time()
+        with self.lock:
+            while self.window and self.window[0][0] < now - THROUGHPUT_WINDOW:
+                self.window.popleft()
+            return sum(n for _, n in self.window) / THROUGHPUT_WINDOW
+
+    def render(self, source, queue_depth, backlog_bytes):
+        label = f'{{source="{source}"}}'
+        lines = [
+            f"league_ingest_events_total{{source=\"{source}\",status=\"inserted\"}} {self.inserted}",
+            f"league_ingest_events_total{{source=\"{source}\",status=\"rejected\"}} {self.rejected}",
+            f"league_ingest_batches_total{label} {self.batches}",
+            f"league_ingest_lag_seconds{label} {self.lag_seconds:.3f}",
+            f"league_ingest_commit_seconds{label} {self.commit_seconds:.3f}",
+            f"league_ingest_events_per_second{label} {self.throughput():.1f}",
+            f"league_ingest_queue_depth{label} {queue_depth}",
+        ]
+        if backlog_bytes is not None:
+            lines.append(f"league_ingest_backlog_bytes{label} {backlog_bytes}")
+        return "\n".join(lines) + "\n"
+
+# =============================================================================
+# WRITER
+# =============================================================================
+
+def _emitted_at(record, default):
+    """Epoch seconds of the event's emitted_at (ISO 8601), or default."""
+    value = record.pop("emitted_at", None)
+    try:
+        moment = datetime.datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return default
+    return moment.timestamp()
+
+
+class Ingester:
+    def __init__(self, conn, source_name, batch_size=BATCH_SIZE, max_wait=MAX_WAIT,
+                 max_pending=MAX_PENDING, reject_path=None, metrics_path=None):
+        self.conn = conn
+        self.source_name = source_name
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.events = queue.Queue(maxsize=max_pending)
+        self.reject_path = reject_path
+        self.metrics_path = metrics_path
+        self.metrics = IngestMetrics()
+        self.committed_offset = None
+
+    # --- validation --------------------------------------------------------
+
+    def _parse(self, events):
+        """{table: [(event, record)]}, [(event, reason)], oldest emit time."""
+        by_table = {table: [] for table in EVENT_TABLES.values()}
+        rejects = []
+        oldest = time.time()
+        for event in events:
+            try:
+                record = json.loads(event.line)
+            except (json.JSONDecodeError, UnicodeDecodeError) as e:
+                rejects.append((event, f"Invalid JSON: {e}"))
+                continue
+            if not isinstance(record, dict):
+                rejects.append((event, "Event is not a JSON object"))
+                continue
+            oldest = min(oldest, _emitted_at(record, event.received_at))
+            table = EVENT_TABLES.get(record.pop("type", None))
+            if table is None:
+                rejects.append((event, f"type must be one of {sorted(EVENT_TABLES)}"))
+                continue
+            unknown = [k for k in record if k not in get_import_columns(table)]
+            if unknown:
+                rejects.append((event, f"Unknown columns: {', '.join(unknown)}"))
+                continue
+            by_table[table].append((event, record))
+        return by_table, rejects, oldest
+
+    def _validate_battles(self, items):
+        """Assigns missing battle_ids; returns (valid items, rejects)."""
+        config = TABLE_CONFIG["GymBattle"]
+        pk = config['pk']
+        needs_id = [record for _, record in items if record.get(pk) is None]
+        if needs_id:
+            ids = db_utils.allocate_ids(self.conn, "GymBattle", pk, config['prefix'], len(needs_id))
+            if len(ids) != len(needs_id):
+                raise pymysql.OperationalError("Could not allocate battle IDs.")
+            for record, new_id in zip(needs_id, ids):
+                record[pk] = new_id
+
+        rejects, valid, seen = [], [], set()
+        for event, record in items:
+            error = check_row("GymBattle", record)
+            if not error and record[pk] in seen:
+                error = f"Duplicate {pk} {record[pk]} in this batch"
+            if error:
+                rejects.append((event, error))
+            else:
+                seen.add(record[pk])
+                valid.append((event, record))
+
+        # Existing battles and FK targets, one lookup per column per batch
+        with db_utils.use_primary(self.conn), self.conn.cursor() as cursor:
+            taken = db_utils.existing_values(cursor, "GymBattle", pk, seen)
+            known = {}
+            for col_def in config['columns']:
+                if col_def['type'] == 'fk':
+                    values = {r[col_def['col']] for _, r in valid if r.get(col_def['col']) is not None}
+                    known[col_def['col']] = (col_def['ref_table'], db_utils.existing_values(
+                        cursor, col_def['ref_table'], col_def['ref_pk'], values))
+        kept = []
+        for event, record in valid:
+            if record[pk] in taken:
+                rejects.append((event, f"{pk} {record[pk]} already exists"))
+                continue
+            missing = [(col, ref) for col, (ref, found) in known.items()
+                       if record.get(col) is not None and record[col] not in found]
+            if missing:
+                col, ref = missing[0]
+                rejects.append((event, f"{col} '{record[col]}' not found in {ref}"))
+            else:
+                kept.append((event, record))
+        return kept, rejects
+
+    def validate(self, events):
+        """({table: [(event, record)]} ready to insert, [(event, reason)], oldest emit time)."""
+        by_table, rejects, oldest = self._parse(events)
+        matches = by_table["Match_Table"]
+        if matches:
+            with db_utils.use_primary(self.conn):
+                bad = dict(db_utils.validate_matches(self.conn, [r for _, r in matches]))
+            rejects += [(matches[i][0], reason) for i, reason in bad.items()]
+            by_table["Match_Table"] = [item for i, item in enumerate(matches) if i not in bad]
+        if by_table["GymBattle"]:
+            by_table["GymBattle"], battle_rejects = self._validate_battles(by_table["GymBattle"])
+            rejects += battle_rejects
+        return by_table, rejects, oldest
+
+    # --- storing ----------------------------------------------------------
+
+    def _insert(self, cursor, table_name, items):
+        """Inserts the items; returns the ones the server rejected as [(event, reason)]."""
+        groups = {}
+        for event, record in items:
+            groups.setdefault(tuple(record), []).append((event, record))
+        rejects = []
+        for cols, group in groups.items():
+            sql = (f"INSERT INTO {table_name} ({', '.join(db_utils.validate_identifier(c) for c in cols)}) "
+                   f"VALUES ({', '.join(['%s'] * len(cols))})")
+            cursor.execute("SAVEPOINT ingest_group")
+            try:
+                cursor.executemany(sql, [[r[c] for c in cols] for _, r in group])
+            except pymysql.Error as e:
+                if _transient(e):
+                    raise
+                # executemany may have sent several statements and only the last
+                # failed: undo the whole group, then isolate the bad rows
+                cursor.execute("ROLLBACK TO SAVEPOINT ingest_group")
+                for event, record in group:
+                    try:
+                        cursor.execute(sql, [record[c] for c in cols])
+                    except pymysql.Error as row_error:
+                        if _transient(row_error):
+                            raise
+                        rejects.append((event, f"Database rejected row: {row_error.args[-1]}"))
+        return rejects
+
+    def _store(self, events):
+        by_table, rejects, oldest = self.validate(events)
+        last = events[-1]
+        self.conn.begin()
+        try:
+            with db_utils.use_primary(self.conn), self.conn.cursor() as cursor:
+                for table, items in by_table.items():
+                    rejects += self._insert(cursor, table, items)
+                if last.file_id is not None:
+                    db_utils.save_ingest_checkpoint(cursor, self.source_name, last.file_id, last.offset, len(events))
+            self.conn.commit()
+        except pymysql.Error:
+            with contextlib.suppress(pymysql.Error):
+                self.conn.rollback()
+            raise
+        if last.file_id is not None:
+            self.committed_offset = last.offset
+        self._rate(events, by_table, rejects)
+        return len(events) - len(rejects), rejects, oldest
+
+    def _rate(self, events, by_table, rejects):
+        """Rates the committed results in arrival order (on failure ratings lag until a rebuild)."""
+        position = {id(event): i for i, event in enumerate(events)}
+        rejected = {id(event) for event, _ in rejects}
+        games = sorted((position[id(event)], ratings.result_game(table, record))
+                       for table, items in by_table.items()
+                       for event, record in items if id(event) not in rejected)
+        ratings.apply_results(self.conn, [game for _, game in games if game])
+
+    def process(self, events, stop):
+        """Commits one batch, retrying while the database is unreachable. Returns False if stopped first."""
+        start = time.perf_counter()
+        for attempt in range(len(RETRY_SECONDS) + 1):
+            try:
+                inserted, rejects, oldest = self._store(events)
+                break
+            except pymysql.Error as e:
+                if not _transient(e):
+                    raise
+                delay = RETRY_SECONDS[min(attempt, len(RETRY_SECONDS) - 1)]
+                print(f"Ingest Error: {e}; retrying in {delay}s", file=sys.stderr)
+                if stop.wait(delay):
+                    return False
+                with contextlib.suppress(pymysql.Error):
+                    self.conn.ping(reconnect=True)
+        else:
+            raise pymysql.OperationalError("Database unavailable; giving up on the batch.")
+        self._report(events, rejects)
+        self.metrics.record_batch(len(events), inserted, len(rejects), oldest, time.perf_counter() - start)
+        return True
+
+    def _report(self, events, rejects):
+        if rejects and self.reject_path:
+            with open(self.reject_path, "a", encoding="utf-8") as f:
+                for event, reason in rejects:
+                    f.write(json.dumps({"offset": event.offset, "error": reason,
+                                        "event": event.line.decode("utf-8", "replace").strip()}) + "\n")
+        # Socket clients: reasons first, then the highest line now committed
+        acks = {}
+        for event, reason in rejects:
+            if event.client:
+                event.client[0].send(f"reject {event.client[1]} {reason}\n")
+        for event in events:
+            if event.client:
+                acks[event.client[0]] = max(acks.get(event.client[0], 0), event.client[1])
+        for client, line in acks.items():
+            client.send(f"ack {line}\n")
+            client.acked = line
+
+    # --- main loop --------------------------------------------------------
+
+    def _next_batch(self, stop):
+        try:
+            batch = [self.events.get(timeout=POLL_SECONDS)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.events.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def publish(self, source):
+        backlog = None
+        if isinstance(source, FileTail) and self.committed_offset is not None:
+            with contextlib.suppress(OSError):
+                backlog = max(0, os.stat(source.path).st_size - self.committed_offset)
+        text = self.metrics.render(self.source_name, self.events.qsize(), backlog)
+        if self.metrics_path:
+            tmp = self.metrics_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(tmp, self.metrics_path)  # readers never see a half-written file
+        m = self.metrics
+        print(f"{m.inserted:,} inserted, {m.rejected:,} rejected, {m.throughput():,.0f} events/s, "
+              f"lag {m.lag_seconds:.1f}s, queue {self.events.qsize():,}", file=sys.stderr)
+
+    def run(self, source, stop):
+        """Runs until stop is set (or a --once file ends), then commits what was already read."""
+        reader = threading.Thread(target=source.run, args=(lambda e: _put(self.events, e, stop), stop),
+                                  daemon=True)
+        reader.start()
+        next_publish = time.monotonic() + METRICS_INTERVAL
+        while reader.is_alive() or not self.events.empty():
+            batch = self._next_batch(stop)
+            if batch and not self.process(batch, stop):
+                break
+            if time.monotonic() >= next_publish:
+                self.publish(source)
+                next_publish = time.monotonic() + METRICS_INTERVAL
+        stop.set()
+        reader.join(timeout=1)
+        self.publish(source)
+
+# =============================================================================
+# COMMAND LINE
+# =============================================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ingest match and gym battle results from a JSONL file or socket.")
+    parser.add_argument("--host", default="localhost", help="host[:port]")
+    parser.add_argument("--user", default="root")
+    parser.add_argument("--password", default=None, help="Prompted for if omitted")
+    parser.add_argument("--db", default="pokemon_league_db")
+    source_group = parser.add_mutually_exclusive_group(required=True)
+    source_group.add_argument("--file", help="JSONL file to tail")
+    source_group.add_argument("--socket", help="Unix socket path to listen on")
+    parser.add_argument("--source-name", default=None, help="Checkpoint name (default: the file's absolute path)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--max-wait", type=float, default=MAX_WAIT, help="Seconds to wait for a batch to fill")
+    parser.add_argument("--max-pending", type=int, default=MAX_PENDING, help="Events read ahead before the reader blocks")
+    parser.add_argument("--rejects", default=None, help="Append rejected events here (JSONL)")
+    parser.add_argument("--metrics-file", default=None, help="Prometheus text file to rewrite every few seconds")
+    parser.add_argument("--once", action="store_true", help="Stop at the end of the file instead of following it")
+
+    args = parser.parse_args(argv)
+    password = args.password if args.password is not None else getpass.getpass("Password: ")
+    host, port = routing.parse_host(args.host)
+    conn = db_utils.get_db_connection(host, args.user, password, args.db, port)
+    if not conn:
+        return 1
+
+    source_name = args.source_name or (os.path.abspath(args.file) if args.file else f"socket:{args.socket}")
+    if args.file:
+        checkpoint = db_utils.get_ingest_checkpoint(conn, source_name)
+        if checkpoint is None:
+            conn.close()
+            return 1
+        source = FileTail(args.file, *checkpoint, exit_at_eof=args.once)
+    else:
+        source = SocketSource(args.socket)
+
+    stop = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stop.set())
+    ingester = Ingester(conn, source_name, args.batch_size, args.max_wait, args.max_pending,
+                        args.rejects, args.metrics_file)
+    try:
+        ingester.run(source, stop)
+    except pymysql.Error as e:
+        print(f"Ingest Error: {e}")
+        return 1
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
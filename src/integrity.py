@@ -0,0 +1,290 @@
+import argparse
+import collections
+import csv
+import getpass
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import pymysql
+import db_utils
+import routing
+from backup import list_tables
+from pool import ConnectionPool
+from table_config import CHECK_RULES, TABLE_CONFIG, get_id_pattern, get_pk_columns
+
+# NumPy is optional: without it the integrity checker is simply unavailable.
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# =============================================================================
+# OFFLINE INTEGRITY CHECK
+# =============================================================================
+# schema.sql only enforces its CHECKs, ID patterns and winner triggers when a
+# row is written, and pop_gen.py loads with FOREIGN_KEY_CHECKS = 0. This scans
+# the data that is already there:
+#   1. The key column of every referenced table is streamed once into memory:
+#      an exact set, or a Bloom filter for tables above EXACT_KEY_LIMIT rows.
+#   2. Every table is cut into primary-key ranges of about chunk_rows rows and
+#      the ranges are checked in parallel on pooled connections.
+#   3. Each range is fetched once and checked column by column with NumPy
+#      (NOT NULL, enum, range, date order, ID pattern, winner rule, FKs).
+# A Bloom filter never misses a key that exists, so every orphan it reports is
+# real; about BLOOM_FP_RATE of the orphans in such a table go unreported.
+
+CHUNK_ROWS = 100_000
+KEY_FETCH = 50_000
+EXACT_KEY_LIMIT = 2_000_000
+BLOOM_BITS_PER_KEY = 10
+BLOOM_HASHES = 7   # ~1% false positives at 10 bits per key
+BLOOM_FP_RATE = 0.01
+MAX_SAMPLES = 1000  # violations written to the report per (table, column, rule)
+
+Violation = collections.namedtuple("Violation", "table key column rule value")
+
+
+class ExactKeys:
+    def __init__(self):
+        self.keys = set()
+
+    def add(self, values):
+        self.keys.update(values)
+
+    def missing(self, values):
+        """Boolean mask: value is not NULL and not a key."""
+        keys = self.keys
+        return np.fromiter((v is not None and v not in keys for v in values), bool, len(values))
+
+
+class BloomKeys:
+    """Bloom filter over the hashes of the keys (valid for this process only)."""
+
+    def __init__(self, expected):
+        self.size = max(64, int(expected * BLOOM_BITS_PER_KEY))
+        self.bits = np.zeros((self.size + 7) // 8, dtype=np.uint8)
+
+    def _positions(self, values):
+        h1 = np.fromiter(map(hash, values), np.int64, len(values)).view(np.uint64)
+        h2 = (h1 * np.uint64(0x9E3779B97F4A7C15)) >> np.uint64(29) | np.uint64(1)
+        size = np.uint64(self.size)
+        for i in range(BLOOM_HASHES):
+            yield (h1 + np.uint64(i) * h2) % size
+
+    def add(self, values):
+        for pos in self._positions(values):
+            np.bitwise_or.at(self.bits, pos >> np.uint64(3), np.left_shift(np.uint8(1), (pos & np.uint64(7)).astype(np.uint8)))
+
+    def missing(self, values):
+        values = list(values)
+        present = np.ones(len(values), dtype=bool)
+        for pos in self._positions(values):
+            present &= (self.bits[pos >> np.uint64(3)] >> (pos & np.uint64(7)).astype(np.uint8)) & 1 == 1
+        return ~present & ~_nulls(np.array(values, dtype=object))
+
+
+def load_keys(conn, table_name, column, exact_limit=EXACT_KEY_LIMIT):
+    """Streams one key column into an ExactKeys, or a BloomKeys past exact_limit rows."""
+    table = db_utils.validate_identifier(table_name)
+    col = db_utils.validate_identifier(column)
+    with conn.cursor() as cursor:
+        cursor.execute(f"SELECT COUNT(*) AS n FROM {table}")
+        count = cursor.fetchone()['n']
+    keys = ExactKeys() if count <= exact_limit else BloomKeys(count)
+    for chunk in db_utils.stream_query(conn, f"SELECT {col} FROM {table}", chunk_size=KEY_FETCH):
+        keys.add([row[column] for row in chunk])
+    return keys
+
+# =============================================================================
+# RULES
+# =============================================================================
+# A rule is (column, rule name, columns it reads, kind of each, check) where
+# check(*arrays) returns a boolean mask of the violating rows.
+#   kinds: "obj" -> object array, "num" -> float (NULL = NaN),
+#          "date" -> datetime64 (NULL = NaT)
+
+
+def _nulls(arr):
+    if arr.dtype.kind == "f":
+        return np.isnan(arr)
+    if arr.dtype.kind == "M":
+        return np.isnat(arr)
+    return np.equal(arr, None)
+
+
+def _as_array(values, kind):
+    if kind == "num":
+        return np.array(values, dtype=float)
+    if kind == "date":
+        return np.array(values, dtype="datetime64[s]")
+    return np.array(values, dtype=object)
+
+
+def table_rules(table_name, key_sets):
+    """Every rule for table_name; key_sets maps (ref_table, ref_pk) to loaded keys."""
+    config = TABLE_CONFIG[table_name]
+    checks = CHECK_RULES.get(table_name, {})
+    rules = []
+    for col in get_pk_columns(table_name) + checks.get("not_null", []):
+        rules.append((col, "not_null", [col], ["obj"], _nulls))
+    pattern = get_id_pattern(table_name)
+    if pattern:
+        match = re.compile(pattern).match
+        rules.append((config['pk'], "id_pattern", [config['pk']], ["obj"],
+                      lambda a: np.fromiter((v is not None and match(v) is None for v in a), bool, len(a))))
+    for col_def in config.get('columns', []):
+        col = col_def['col']
+        if col_def['type'] == 'enum':
+            choices = list(col_def.get('choices', []))
+            rules.append((col, "enum", [col], ["obj"], lambda a, c=choices: ~_nulls(a) & ~np.isin(a, c)))
+        elif col_def['type'] == 'fk':
+            keys = key_sets.get((col_def['ref_table'], col_def['ref_pk']))
+            if keys is not None:
+                rules.append((col, f"fk:{col_def['ref_table']}", [col], ["obj"], keys.missing))
+    for rule in checks.get("range", []):
+        low, high = rule.get('min', -np.inf), rule.get('max', np.inf)
+        rules.append((rule['col'], "range", [rule['col']], ["num"], lambda a, lo=low, hi=high: (a < lo) | (a > hi)))
+    for rule in checks.get("order", []):
+        rules.append((rule['high'], "order", [rule['low'], rule['high']], ["date", "date"], lambda lo, hi: hi < lo))
+    if checks.get("winner"):
+        # Same as db_utils.validate_match_winner / trg_match_winner_check_*
+        rules.append(("winner_id", "winner", ["trainer1_id", "trainer2_id", "winner_id"], ["obj"] * 3,
+                      lambda t1, t2, w: ~_nulls(w) & (w != t1) & (w != t2)))
+    return rules
+
+
+def check_chunk(conn, table_name, pk_cols, rules, low, high):
+    """(rows checked, [Violation]) for low < pk <= high."""
+    columns = list(dict.fromkeys(pk_cols + [c for rule in rules for c in rule[2]]))
+    where, params = db_utils.pk_range_where(pk_cols, low, high)
+    sql = (f"SELECT {', '.join(db_utils.validate_identifier(c) for c in columns)} "
+           f"FROM {db_utils.validate_identifier(table_name)}{where}")
+    with conn.cursor(pymysql.cursors.Cursor) as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    if not rows:
+        return 0, []
+    values = dict(zip(columns, zip(*rows)))
+    arrays = {}
+    violations = []
+    for column, name, reads, kinds, check in rules:
+        args = []
+        for col, kind in zip(reads, kinds):
+            if (col, kind) not in arrays:
+                arrays[col, kind] = _as_array(values[col], kind)
+            args.append(arrays[col, kind])
+        for i in np.flatnonzero(check(*args)):
+            key = "|".join(str(values[c][i]) for c in pk_cols)
+            violations.append(Violation(table_name, key, column, name, values[column][i]))
+    return len(rows), violations
+
+
+def check_database(conn, tables=None, jobs=4, chunk_rows=CHUNK_ROWS, exact_limit=EXACT_KEY_LIMIT,
+                   on_violation=None, progress=None):
+    """
+    Checks every configured table (or `tables`). Calls on_violation(Violation)
+    for each violation and progress(table, rows) as ranges finish. Returns
+    {'rows': {table: rows checked}, 'violations': Counter{(table, column, rule): n},
+     'bloom': [tables checked against a Bloom filter], 'seconds': wall time}.
+    """
+    if np is None:
+        raise ImportError("The integrity checker requires numpy (pip install numpy).")
+    start = time.perf_counter()
+    existing = set(list_tables(conn))
+    tables = [t for t in (tables or TABLE_CONFIG) if t in TABLE_CONFIG and t in existing]
+
+    refs = {(c['ref_table'], c['ref_pk']) for t in tables for c in TABLE_CONFIG[t].get('columns', [])
+            if c['type'] == 'fk' and c['ref_table'] in existing}
+    key_sets = {ref: load_keys(conn, *ref, exact_limit=exact_limit) for ref in sorted(refs)}
+    bloom = sorted({t for t, _ in key_sets if isinstance(key_sets[t, _], BloomKeys)})
+
+    result = {"rows": dict.fromkeys(tables, 0), "violations": collections.Counter(), "bloom": bloom}
+    pool = ConnectionPool(conn, size=jobs)
+    try:
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            futures = {}
+            for table in tables:
+                pk_cols = get_pk_columns(table)
+                rules = table_rules(table, key_sets)
+                with pool.connection() as pooled:
+                    ranges = db_utils.chunk_bounds(pooled, table, pk_cols, chunk_rows)
+
+                def run(table=table, pk_cols=pk_cols, rules=rules, rng=None):
+                    with pool.connection() as pooled:
+                        return check_chunk(pooled, table, pk_cols, rules, *rng)
+
+                for rng in ranges:
+                    futures[executor.submit(run, rng=rng)] = table
+            for future in as_completed(futures):
+                table = futures[future]
+                count, violations = future.result()
+                result["rows"][table] += count
+                for v in violations:
+                    result["violations"][v.table, v.column, v.rule] += 1
+                    if on_violation:
+                        on_violation(v)
+                if progress:
+                    progress(table, result["rows"][table])
+    finally:
+        pool.close()
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+# =============================================================================
+# COMMAND LINE
+# =============================================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scan the database for FK orphans and schema rule violations.")
+    parser.add_argument("--host", default="localhost", help="host[:port]")
+    parser.add_argument("--user", default="root")
+    parser.add_argument("--password", default=None, help="Prompted for if omitted")
+    parser.add_argument("--db", default="pokemon_league_db")
+    parser.add_argument("--tables", nargs="*", default=None)
+    parser.add_argument("--jobs", type=int, default=4)
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--exact-limit", type=int, default=EXACT_KEY_LIMIT,
+                        help="Referenced tables with more rows use a Bloom filter")
+    parser.add_argument("--max-samples", type=int, default=MAX_SAMPLES,
+                        help="Violations written per table/column/rule (all are counted)")
+    parser.add_argument("-o", "--output", default="integrity_report.csv")
+
+    args = parser.parse_args(argv)
+    password = args.password if args.password is not None else getpass.getpass("Password: ")
+    host, port = routing.parse_host(args.host)
+    conn = db_utils.get_db_connection(host, args.user, password, args.db, port)
+    if not conn:
+        return 1
+
+    written = collections.Counter()
+    with open(args.output, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(Violation._fields)
+
+        def on_violation(v):
+            if written[v.table, v.column, v.rule] < args.max_samples:
+                written[v.table, v.column, v.rule] += 1
+                writer.writerow(v)
+
+        try:
+            result = check_database(conn, args.tables, args.jobs, args.chunk_rows, args.exact_limit, on_violation)
+        except (pymysql.Error, ValueError, ImportError) as e:
+            print(f"Integrity Error: {e}")
+            return 1
+        finally:
+            conn.close()
+
+    for (table, column, rule), n in sorted(result["violations"].items()):
+        print(f"{table:<20} {column:<24} {rule:<22} {n:>10,}")
+    if result["bloom"]:
+        print(f"Bloom filter used for {', '.join(result['bloom'])}: "
+              f"about {BLOOM_FP_RATE:.0%} of orphans pointing there may go unreported.")
+    total = sum(result["violations"].values())
+    print(f"{sum(result['rows'].values()):,} rows in {len(result['rows'])} tables checked in "
+          f"{result['seconds']:.1f}s: {total:,} violations (report: {args.output})")
+    return 1 if total else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,410 @@
+import argparse
+import bisect
+import collections
+import decimal
+import getpass
+import sys
+import threading
+import time
+import pymysql
+import db_utils
+import routing
+
+# =============================================================================
+# IN-MEMORY LEADERBOARDS
+# =============================================================================
+# The badge leaderboard, elite Pokemon and species MVP reports each run a
+# GROUP BY / ORDER BY over a whole table. LeaderboardService loads the rows
+# behind them once, keeps the per-trainer / per-species aggregates in dicts
+# and every ranked entity in a RankedSet (a list kept sorted with bisect),
+# so a top-k read is a slice of that list: microseconds instead of a scan.
+# apply_changes() updates it from saved rows and deleted keys (the TUI feeds
+# it its own writes and the ChangeLog), and reconcile() periodically compares
+# it with the SQL reports and reloads if they drifted apart, e.g. after
+# ON DELETE CASCADE changes that were never logged.
+
+ELITE_LIMIT = 50        # query_elite_pokemon returns at most this many rows
+MVP_MIN_REGISTERED = 5  # get_species_mvp_report's HAVING COUNT(*) >= 5
+RECONCILE_TOP = 100     # ranks compared with SQL by reconcile()
+RECONCILE_SECONDS = 300
+FETCH_CHUNK = 10000
+
+# Tables whose rows the leaderboards are built from
+SOURCE_TABLES = ("Trainer", "PokemonSpecies", "Gym", "GymBadge", "RegisteredPokemon")
+
+
+class RankedSet:
+    """
+    Items ordered by a sort key (smallest first), ties broken by the item.
+    set()/discard() cost a binary search plus a list shift; iterating the
+    best entries is a slice.
+    """
+
+    def __init__(self, pairs=()):
+        self._entries = sorted((key, item) for item, key in pairs)
+        self._key_of = {item: key for key, item in self._entries}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def set(self, item, key):
+        old = self._key_of.get(item)
+        if old == key:
+            return
+        if old is not None:
+            del self._entries[bisect.bisect_left(self._entries, (old, item))]
+        bisect.insort(self._entries, (key, item))
+        self._key_of[item] = key
+
+    def discard(self, item):
+        old = self._key_of.pop(item, None)
+        if old is not None:
+            del self._entries[bisect.bisect_left(self._entries, (old, item))]
+
+    def __iter__(self):
+        """(key, item) pairs, best first."""
+        return iter(self._entries)
+
+
+def _round_avg(total, count):
+    """ROUND(AVG(int_col), 2) as MySQL computes it: a 4-place DECIMAL rounded half up."""
+    avg = (decimal.Decimal(total) / count).quantize(decimal.Decimal("0.0001"), decimal.ROUND_HALF_UP)
+    return avg.quantize(decimal.Decimal("0.01"), decimal.ROUND_HALF_UP)
+
+
+class _Boards:
+    """The state behind the three leaderboards; replaced as a whole on reload."""
+
+    def __init__(self):
+        self.trainer_names = {}
+        self.species_names = {}
+        self.badge_owner = {}      # (gym_id, badge_number) -> trainer_id
+        self.trainer_gyms = {}     # trainer_id -> Counter(gym_id -> badges)
+        self.pokemon = {}          # pokemon_id -> (species_id, trainer_id, nickname, level)
+        self.species_stats = {}    # species_id -> [registered, level_sum, levels_counted, Counter(level)]
+        self.badges = RankedSet()  # trainer_id by (-badges, -gyms)
+        self.levels = RankedSet()  # pokemon_id by (-level,)
+        self.mvp = RankedSet()     # species_id by (has no average, -avg_level, -registered)
+
+    # --- badges ---
+    def _rank_trainer(self, trainer_id):
+        gyms = self.trainer_gyms.get(trainer_id)
+        if gyms:
+            self.badges.set(trainer_id, (-sum(gyms.values()), -len(gyms)))
+        else:
+            self.trainer_gyms.pop(trainer_id, None)
+            self.badges.discard(trainer_id)
+
+    def save_badge(self, row):
+        key = (row['gym_id'], row['badge_number'])
+        self.delete_badge(key)
+        if row.get('trainer_id') is not None:
+            self.badge_owner[key] = row['trainer_id']
+            self.trainer_gyms.setdefault(row['trainer_id'], collections.Counter())[row['gym_id']] += 1
+            self._rank_trainer(row['trainer_id'])
+
+    def delete_badge(self, key):
+        owner = self.badge_owner.pop(key, None)
+        if owner is not None:
+            gyms = self.trainer_gyms[owner]
+            gyms[key[0]] -= 1
+            if not gyms[key[0]]:
+                del gyms[key[0]]
+            self._rank_trainer(owner)
+
+    # --- pokemon and species ---
+    def _rank_species(self, species_id):
+        stats = self.species_stats.get(species_id)
+        if not stats or stats[0] < MVP_MIN_REGISTERED:
+            self.mvp.discard(species_id)
+            if stats and not stats[0]:
+                del self.species_stats[species_id]
+            return
+        registered, level_sum, counted, _ = stats
+        if counted:
+            self.mvp.set(species_id, (0, -_round_avg(level_sum, counted), -registered))
+        else:
+            self.mvp.set(species_id, (1, 0, -registered))  # NULL average sorts last, as in MySQL
+
+    def save_pokemon(self, row):
+        self.delete_pokemon(row['pokemon_id'])
+        level = row.get('level')
+        self.pokemon[row['pokemon_id']] = (row.get('species_id'), row.get('trainer_id'), row.get('nickname'), level)
+        if level is not None:
+            self.levels.set(row['pokemon_id'], (-level,))
+        if row.get('species_id') is not None:
+            stats = self.species_stats.setdefault(row['species_id'], [0, 0, 0, collections.Counter()])
+            stats[0] += 1
+            if level is not None:
+                stats[1] += level
+                stats[2] += 1
+                stats[3][level] += 1
+            self._rank_species(row['species_id'])
+
+    def delete_pokemon(self, pokemon_id):
+        old = self.pokemon.pop(pokemon_id, None)
+        if old is None:
+            return
+        species_id, _, _, level = old
+        self.levels.discard(pokemon_id)
+        stats = self.species_stats.get(species_id)
+        if stats:
+            stats[0] -= 1
+            if level is not None:
+                stats[1] -= level
+                stats[2] -= 1
+                stats[3][level] -= 1
+                if not stats[3][level]:
+                    del stats[3][level]
+            self._rank_species(species_id)
+
+
+class LeaderboardService:
+    def __init__(self, conn):
+        self.conn = conn
+        self.boards = _Boards()
+        self.lock = threading.RLock()
+        self.loaded_at = None
+        self._replay = None  # changes applied while a reload runs, replayed onto the new boards
+
+    # --- LOADING ---
+    def _stream(self, sql):
+        for chunk in db_utils.stream_query(self.conn, sql, chunk_size=FETCH_CHUNK):
+            yield from chunk
+
+    def reload(self):
+        """(Re)builds every board from the database; reads keep using the old ones meanwhile."""
+        with self.lock:
+            self._replay = []
+        try:
+            boards = _Boards()
+            boards.trainer_names = {r['trainer_id']: r['name'] for r in self._stream("SELECT trainer_id, name FROM Trainer")}
+            boards.species_names = {r['species_id']: r['species_name']
+                                    for r in self._stream("SELECT species_id, species_name FROM PokemonSpecies")}
+            for row in self._stream("SELECT gym_id, badge_number, trainer_id FROM GymBadge WHERE trainer_id IS NOT NULL"):
+                boards.badge_owner[(row['gym_id'], row['badge_number'])] = row['trainer_id']
+                boards.trainer_gyms.setdefault(row['trainer_id'], collections.Counter())[row['gym_id']] += 1
+            for row in self._stream("SELECT pokemon_id, species_id, trainer_id, nickname, level FROM RegisteredPokemon"):
+                level = row['level']
+                boards.pokemon[row['pokemon_id']] = (row['species_id'], row['trainer_id'], row['nickname'], level)
+                if row['species_id'] is not None:
+                    stats = boards.species_stats.setdefault(row['species_id'], [0, 0, 0, collections.Counter()])
+                    stats[0] += 1
+                    if level is not None:
+                        stats[1] += level
+                        stats[2] += 1
+                        stats[3][level] += 1
+            # Sort each board once instead of inserting entry by entry
+            boards.badges = RankedSet((t, (-sum(g.values()), -len(g))) for t, g in boards.trainer_gyms.items())
+            boards.levels = RankedSet((p, (-v[3],)) for p, v in boards.pokemon.items() if v[3] is not None)
+            for species_id in list(boards.species_stats):
+                boards._rank_species(species_id)
+        except Exception:
+            with self.lock:
+                self._replay = None
+            raise
+        with self.lock:
+            for change in self._replay:
+                self._apply(boards, *change)
+            self._replay = None
+            self.boards = boards
+            self.loaded_at = time.time()
+
+    # --- UPDATES ---
+    def depends_on(self, table_name):
+        return table_name in SOURCE_TABLES
+
+    def apply_changes(self, table_name, saved_rows, deleted_pks):
+        """
+        Applies rows that now exist and primary keys ({col: value}) that are
+        gone. Saving a row that is already applied changes nothing, so the
+        same write may arrive from the form and from the ChangeLog.
+        """
+        if not self.depends_on(table_name):
+            return
+        with self.lock:
+            self._apply(self.boards, table_name, list(saved_rows), list(deleted_pks))
+            if self._replay is not None:
+                self._replay.append((table_name, list(saved_rows), list(deleted_pks)))
+
+    def _apply(self, boards, table_name, saved_rows, deleted_pks):
+        if table_name == "GymBadge":
+            for row in saved_rows:
+                boards.save_badge(row)
+            for pk in deleted_pks:
+                boards.delete_badge((pk['gym_id'], pk['badge_number']))
+        elif table_name == "RegisteredPokemon":
+            for row in saved_rows:
+                boards.save_pokemon(row)
+            for pk in deleted_pks:
+                boards.delete_pokemon(pk['pokemon_id'])
+        elif table_name == "Trainer":
+            for row in saved_rows:
+                boards.trainer_names[row['trainer_id']] = row.get('name')
+            gone = {pk['trainer_id'] for pk in deleted_pks}
+            for trainer_id in gone:
+                boards.trainer_names.pop(trainer_id, None)
+            if gone:
+                # ON DELETE SET NULL on GymBadge / RegisteredPokemon (not in the ChangeLog)
+                for key in [k for k, owner in boards.badge_owner.items() if owner in gone]:
+                    boards.delete_badge(key)
+                for pokemon_id, (species_id, trainer_id, nickname, level) in list(boards.pokemon.items()):
+                    if trainer_id in gone:
+                        boards.pokemon[pokemon_id] = (species_id, None, nickname, level)
+        elif table_name == "PokemonSpecies":
+            for row in saved_rows:
+                boards.species_names[row['species_id']] = row.get('species_name')
+            gone = {pk['species_id'] for pk in deleted_pks}
+            for species_id in gone:
+                boards.species_names.pop(species_id, None)
+            if gone:
+                # ON DELETE CASCADE on RegisteredPokemon
+                for pokemon_id in [p for p, v in boards.pokemon.items() if v[0] in gone]:
+                    boards.delete_pokemon(pokemon_id)
+        elif table_name == "Gym":
+            gone = {pk['gym_id'] for pk in deleted_pks}
+            if gone:
+                # ON DELETE CASCADE on GymBadge
+                for key in [k for k in boards.badge_owner if k[0] in gone]:
+                    boards.delete_badge(key)
+
+    # --- READS (same output as the db_utils versions) ---
+    def badge_leaderboard(self, limit=10):
+        with self.lock:
+            boards = self.boards
+            rows = []
+            for (badges, gyms), trainer_id in boards.badges:
+                if len(rows) >= limit:
+                    break
+                if trainer_id in boards.trainer_names:  # inner join on Trainer
+                    rows.append({"trainer_id": trainer_id, "name": boards.trainer_names[trainer_id],
+                                 "badges_collected": -badges, "gyms_conquered": -gyms})
+            return rows
+
+    def elite_pokemon(self, min_level=85):
+        with self.lock:
+            boards = self.boards
+            rows = []
+            for (level,), pokemon_id in boards.levels:
+                if len(rows) >= ELITE_LIMIT or -level < min_level:
+                    break
+                species_id, trainer_id, nickname, _ = boards.pokemon[pokemon_id]
+                if species_id not in boards.species_names or trainer_id not in boards.trainer_names:
+                    continue
+                species_name = boards.species_names[species_id]
+                rows.append({"pokemon_id": pokemon_id,
+                             "display_name": nickname if nickname is not None else species_name,
+                             "species_name": species_name, "level": -level,
+                             "trainer_name": boards.trainer_names[trainer_id]})
+            return rows
+
+    def species_mvp(self, limit=15):
+        with self.lock:
+            boards = self.boards
+            rows = []
+            for (no_avg, avg, registered), species_id in boards.mvp:
+                if len(rows) >= limit:
+                    break
+                if species_id not in boards.species_names:
+                    continue
+                levels = boards.species_stats[species_id][3]
+                rows.append({"species_name": boards.species_names[species_id], "registered_count": -registered,
+                             "avg_level": None if no_avg else -avg, "max_level": max(levels) if levels else None})
+            return rows
+
+    # --- RECONCILIATION ---
+    def reconcile(self, conn=None):
+        """
+        Compares the top RECONCILE_TOP ranks and the row counts with SQL and
+        reloads if anything differs. Ties may be listed in another order, so
+        the ranked values are compared, not the IDs.
+        Returns the names of the boards that had drifted ([] if all matched).
+        """
+        conn = conn or self.conn
+        sql_rows = {
+            "badges": db_utils.query_badge_leaderboard(conn, RECONCILE_TOP),
+            "elite": db_utils.query_elite_pokemon(conn, min_level=0),
+            "mvp": db_utils.get_species_mvp_report(conn, RECONCILE_TOP),
+        }
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT (SELECT COUNT(*) FROM GymBadge WHERE trainer_id IS NOT NULL) AS badges, "
+                           "(SELECT COUNT(*) FROM RegisteredPokemon) AS pokemon")
+            counts = cursor.fetchone()
+        mine = {
+            "badges": self.badge_leaderboard(RECONCILE_TOP),
+            "elite": self.elite_pokemon(min_level=0),
+            "mvp": self.species_mvp(RECONCILE_TOP),
+        }
+        ranked = {
+            "badges": lambda r: (r['badges_collected'], r['gyms_conquered']),
+            "elite": lambda r: r['level'],
+            "mvp": lambda r: (None if r['avg_level'] is None else round(float(r['avg_level']), 2), r['registered_count']),
+        }
+        drifted = [name for name, values in ranked.items()
+                   if [values(r) for r in sql_rows[name]] != [values(r) for r in mine[name]]]
+        with self.lock:
+            if int(counts['badges']) != len(self.boards.badge_owner) and "badges" not in drifted:
+                drifted.append("badges")
+            if int(counts['pokemon']) != len(self.boards.pokemon) and "elite" not in drifted:
+                drifted.append("elite")
+        if drifted:
+            self.reload()
+        return drifted
+
+
+def create_service(conn):
+    """Builds and loads a service, or returns None if the load fails."""
+    try:
+        service = LeaderboardService(conn)
+        service.reload()
+        return service
+    except (pymysql.Error, ValueError) as e:
+        print(f"Leaderboard Error: {e}")
+        return None
+
+# =============================================================================
+# COMMAND LINE
+# =============================================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load the in-memory leaderboards and compare them with SQL.")
+    parser.add_argument("--host", default="localhost", help="host[:port]")
+    parser.add_argument("--user", default="root")
+    parser.add_argument("--password", default=None, help="Prompted for if omitted")
+    parser.add_argument("--db", default="pokemon_league_db")
+    parser.add_argument("--limit", type=int, default=10)
+
+    args = parser.parse_args(argv)
+    password = args.password if args.password is not None else getpass.getpass("Password: ")
+    host, port = routing.parse_host(args.host)
+    conn = db_utils.get_db_connection(host, args.user, password, args.db, port)
+    if not conn:
+        return 1
+    try:
+        start = time.perf_counter()
+        service = create_service(conn)
+        if service is None:
+            return 1
+        print(f"Loaded in {time.perf_counter() - start:.2f}s")
+        boards = [("Badge Leaderboard", lambda: service.badge_leaderboard(args.limit), db_utils.query_badge_leaderboard, (args.limit,)),
+                  ("Elite Pokemon", lambda: service.elite_pokemon(), db_utils.query_elite_pokemon, ()),
+                  ("Species MVP", lambda: service.species_mvp(args.limit), db_utils.get_species_mvp_report, (args.limit,))]
+        for title, read, sql_read, sql_args in boards:
+            t0 = time.perf_counter()
+            rows = read()
+            memory_us = (time.perf_counter() - t0) * 1e6
+            t0 = time.perf_counter()
+            sql_read(conn, *sql_args)
+            sql_ms = (time.perf_counter() - t0) * 1e3
+            print(f"\n{title}: {memory_us:.0f} us in memory, {sql_ms:.1f} ms in SQL")
+            for row in rows[:args.limit]:
+                print("  " + "  ".join(str(v) for v in row.values()))
+        drifted = service.reconcile()
+        print("\nReconcile: " + (f"reloaded {', '.join(drifted)}" if drifted else "matches SQL"))
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
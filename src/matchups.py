@@ -0,0 +1,330 @@
+import pymysql
+import db_utils
+
+# NumPy is optional, as in analytics.py: without it the matchup reports are
+# unavailable and everything else keeps working.
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# =============================================================================
+# TYPE CHART
+# =============================================================================
+# TypeStrength and TypeWeakness store the chart as pair rows. They are folded
+# into one dense matrix EFF[attacking type, defending type]:
+#   TypeStrength (A, B)  -> A attacking B is super effective       EFF[A, B] = 2
+#   TypeWeakness (A, B)  -> A is weak against B, so B hits A hard   EFF[B, A] = 2
+#   reverse of a strength (B attacking A), unless already 2x        EFF[B, A] = 0.5
+# Everything else is neutral (1). A dual-typed defender multiplies the two
+# entries, so the possible values are 0.25, 0.5, 1, 2 and 4.
+
+SUPER_EFFECTIVE = 2.0
+NOT_VERY_EFFECTIVE = 0.5
+
+# Tables the analyzer reads; a change to any of them triggers a rebuild
+MATCHUP_TABLES = ("Type", "TypeStrength", "TypeWeakness", "PokemonSpecies", "Gym",
+                  "Trainer", "RegisteredPokemon")
+
+
+def _fetch(conn, sql):
+    with conn.cursor() as cursor:
+        cursor.execute(sql)
+        return cursor.fetchall()
+
+
+def build_effectiveness_matrix(type_ids, strengths, weaknesses):
+    """
+    Dense effectiveness matrix from pair rows.
+    `strengths` / `weaknesses` are (type_id, other_type_id) pairs; pairs that
+    mention unknown types are ignored. Returns a float64 array (N x N).
+    """
+    index = {t: i for i, t in enumerate(type_ids)}
+    eff = np.ones((len(type_ids), len(type_ids)), dtype=np.float64)
+
+    def codes(pairs):
+        pairs = [(index[a], index[b]) for a, b in pairs if a in index and b in index]
+        if not pairs:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        arr = np.array(pairs, dtype=np.int64)
+        return arr[:, 0], arr[:, 1]
+
+    strong_a, strong_b = codes(strengths)
+    weak_a, weak_b = codes(weaknesses)
+    eff[strong_b, strong_a] = NOT_VERY_EFFECTIVE
+    eff[strong_a, strong_b] = SUPER_EFFECTIVE
+    eff[weak_b, weak_a] = SUPER_EFFECTIVE
+    return eff
+
+
+def load_type_chart(conn):
+    """(type_ids, type_names, effectiveness matrix) straight from the database."""
+    types = _fetch(conn, "SELECT type_id, type_name FROM Type ORDER BY type_id")
+    type_ids = [r['type_id'] for r in types]
+    strengths = [(r['type_id'], r['strong_against_type_id'])
+                 for r in _fetch(conn, "SELECT type_id, strong_against_type_id FROM TypeStrength")]
+    weaknesses = [(r['type_id'], r['weak_against_type_id'])
+                  for r in _fetch(conn, "SELECT type_id, weak_against_type_id FROM TypeWeakness")]
+    return type_ids, [r['type_name'] for r in types], build_effectiveness_matrix(type_ids, strengths, weaknesses)
+
+
+class MatchupAnalyzer:
+    """
+    Cached type-matchup engine. refresh() loads the type chart, species typing,
+    gym specialties and rosters into NumPy arrays and only rebuilds when one of
+    MATCHUP_TABLES changed; every report is then computed locally.
+    """
+
+    def __init__(self, conn):
+        if np is None:
+            raise ImportError("Matchup analysis requires numpy (pip install numpy).")
+        self.conn = conn
+        self.fingerprints = None
+        self.generation = 0
+        self._cache = {}
+
+    # --- LOADING ---
+    def refresh(self, force=False):
+        """Reloads everything if a matchup table changed. Returns True if it did."""
+        current = db_utils.get_change_fingerprints(self.conn, MATCHUP_TABLES)
+        stale = any(p is None for p in current.values())
+        if not force and not stale and current == self.fingerprints:
+            return False
+        self._load()
+        self.fingerprints = current
+        self.generation += 1
+        self._cache.clear()
+        return True
+
+    def _load(self):
+        self.type_ids, type_names, self.eff = load_type_chart(self.conn)
+        self.type_names = np.array(type_names, dtype=object)
+        self.type_index = {t: i for i, t in enumerate(self.type_ids)}
+
+        species = _fetch(self.conn, """
+            SELECT species_id, species_name, primary_type_id, secondary_type_id
+            FROM PokemonSpecies ORDER BY species_id
+        """)
+        self.species_ids = [r['species_id'] for r in species]
+        self.species_names = np.array([r['species_name'] for r in species], dtype=object)
+        self.species_index = {s: i for i, s in enumerate(self.species_ids)}
+        self.primary = self.encode_types([r['primary_type_id'] for r in species])
+        self.secondary = self.encode_types([r['secondary_type_id'] for r in species])
+
+        gyms = _fetch(self.conn, "SELECT gym_id, gym_name, specialization_type_id FROM Gym ORDER BY gym_id")
+        self.gym_names = np.array([r['gym_name'] for r in gyms], dtype=object)
+        self.gym_types = self.encode_types([r['specialization_type_id'] for r in gyms])
+
+        trainers = _fetch(self.conn, "SELECT trainer_id, name FROM Trainer ORDER BY trainer_id")
+        self.trainer_ids = [r['trainer_id'] for r in trainers]
+        self.trainer_names = np.array([r['name'] for r in trainers], dtype=object)
+        trainer_index = {t: i for i, t in enumerate(self.trainer_ids)}
+
+        # Roster as two parallel code arrays (one entry per registered Pokémon)
+        roster_trainers, roster_species = [], []
+        with self.conn.cursor(pymysql.cursors.SSCursor) as cursor:
+            cursor.execute("SELECT trainer_id, species_id FROM RegisteredPokemon")
+            while True:
+                rows = cursor.fetchmany(10000)
+                if not rows:
+                    break
+                for trainer_id, species_id in rows:
+                    t = trainer_index.get(trainer_id)
+                    s = self.species_index.get(species_id)
+                    if t is not None and s is not None:
+                        roster_trainers.append(t)
+                        roster_species.append(s)
+        self.roster_trainers = np.array(roster_trainers, dtype=np.int64)
+        self.roster_species = np.array(roster_species, dtype=np.int64)
+
+    def encode_types(self, type_ids):
+        """type_id values -> codes into the chart (-1 for NULL or unknown)."""
+        return np.array([self.type_index.get(t, -1) for t in type_ids], dtype=np.int64)
+
+    # --- VECTORISED CORE ---
+    def defense_multipliers(self, attack_types, primary, secondary):
+        """
+        Multiplier of each attacking type against each defender typing.
+        attack_types: (A,) type codes; primary/secondary: (D,) codes, -1 = none.
+        Returns an (A, D) array.
+        """
+        attack_types = np.asarray(attack_types, dtype=np.int64)
+        primary = np.asarray(primary, dtype=np.int64)
+        secondary = np.asarray(secondary, dtype=np.int64)
+        result = np.ones((len(attack_types), len(primary)), dtype=np.float64)
+        known = attack_types >= 0
+        for codes in (primary, secondary):
+            has = codes >= 0
+            block = self.eff[np.ix_(attack_types[known], codes[has])]
+            result[np.ix_(known, has)] *= block
+        return result
+
+    def _cached(self, name, builder):
+        if name not in self._cache:
+            self._cache[name] = builder()
+        return self._cache[name]
+
+    def type_vs_species(self):
+        """(types x species) multiplier of every attacking type on every species."""
+        return self._cached("type_vs_species", lambda: self.defense_multipliers(
+            np.arange(len(self.type_ids)), self.primary, self.secondary))
+
+    def species_matchups(self):
+        """
+        (species x species) matrix: the best multiplier the row species gets
+        against the column species using either of its own types (STAB moves).
+        Species without a type are neutral attackers.
+        """
+        def build():
+            by_type = self.type_vs_species()
+            if not len(self.type_ids):
+                return np.ones((len(self.species_ids), len(self.species_ids)))
+            with_primary = (self.primary >= 0)[:, None]
+            with_secondary = (self.secondary >= 0)[:, None]
+            best = np.where(with_primary, by_type[np.maximum(self.primary, 0)], 1.0)
+            return np.where(with_secondary, np.maximum(best, by_type[np.maximum(self.secondary, 0)]), best)
+        return self._cached("species_matchups", build)
+
+    # --- LOOKUPS ---
+    def type_multiplier(self, attack_type_id, defend_type_id, defend_secondary_id=None):
+        a = self.type_index.get(attack_type_id, -1)
+        p = self.type_index.get(defend_type_id, -1)
+        s = self.type_index.get(defend_secondary_id, -1)
+        return float(self.defense_multipliers([a], [p], [s])[0, 0])
+
+    def species_multiplier(self, attacker_id, defender_id):
+        """Best STAB multiplier of one species against another, or None if either is unknown."""
+        a = self.species_index.get(attacker_id)
+        d = self.species_index.get(defender_id)
+        if a is None or d is None:
+            return None
+        return float(self.species_matchups()[a, d])
+
+    # --- REPORTS ---
+    def get_league_matchup_table(self, limit=20):
+        """
+        Every species against the whole league: how many species it hits
+        super effectively and how many hit it super effectively.
+        """
+        rows = self._cached("league_matchups", self._build_league_matchups)
+        return rows[:limit] if limit else rows
+
+    def _build_league_matchups(self):
+        m = self.species_matchups()
+        offense = (m > 1).sum(axis=1)
+        threats = (m > 1).sum(axis=0)
+        order = np.lexsort((threats, -offense))
+        return [
+            {
+                "species_name": self.species_names[i],
+                "hits_super_effectively": int(offense[i]),
+                "threatened_by": int(threats[i]),
+                "net_advantage": int(offense[i]) - int(threats[i]),
+            }
+            for i in order
+        ]
+
+    def get_gym_coverage_report(self):
+        """
+        For each gym's specialty type: how much of the species pool it hits
+        super effectively / is resisted by, and the best counter types.
+        """
+        return self._cached("gym_coverage", self._build_gym_coverage)
+
+    def _build_gym_coverage(self):
+        by_type = self.type_vs_species()
+        n_species = max(len(self.species_ids), 1)
+        rows = []
+        for g, t in enumerate(self.gym_types):
+            if t < 0:
+                continue
+            hits = by_type[t]
+            # Counters: attacking types that are super effective on the specialty
+            counters = np.flatnonzero(self.eff[:, t] > 1)
+            rows.append({
+                "gym_name": self.gym_names[g],
+                "specialty": self.type_names[t],
+                "species_hit_super_effectively": int((hits > 1).sum()),
+                "species_resisting": int((hits < 1).sum()),
+                "coverage_pct": round(100.0 * int((hits > 1).sum()) / n_species, 1),
+                "counter_types": ", ".join(sorted(self.type_names[counters])),
+            })
+        rows.sort(key=lambda r: (-r["coverage_pct"], r["gym_name"]))
+        return rows
+
+    def get_trainer_coverage_report(self, limit=20, trainer_id=None):
+        """
+        Per-trainer roster coverage: how many defending types the roster's
+        STAB types hit super effectively, and the attacking types that hit
+        at least half the roster super effectively (shared weaknesses).
+        """
+        rows = self._cached("trainer_coverage", self._build_trainer_coverage)
+        if trainer_id is not None:
+            return [r for r in rows if r["trainer_id"] == trainer_id]
+        return rows[:limit] if limit else rows
+
+    def _build_trainer_coverage(self):
+        n_trainers, n_types = len(self.trainer_ids), len(self.type_ids)
+        t_codes, s_codes = self.roster_trainers, self.roster_species
+
+        # Which attacking types each trainer has access to (trainers x types)
+        has_type = np.zeros((n_trainers, n_types), dtype=bool)
+        for codes in (self.primary[s_codes], self.secondary[s_codes]):
+            keep = codes >= 0
+            has_type[t_codes[keep], codes[keep]] = True
+        covered = (has_type.astype(np.int64) @ (self.eff > 1).astype(np.int64)) > 0
+
+        # How many roster members each attacking type hits super effectively
+        roster_size = np.bincount(t_codes, minlength=n_trainers)
+        weak_hits = self.type_vs_species()[:, s_codes] > 1
+        weak_counts = np.stack([np.bincount(t_codes, weights=weak_hits[t], minlength=n_trainers)
+                                for t in range(n_types)], axis=1) if n_types else np.zeros((n_trainers, 0))
+        shared = (weak_counts * 2 >= roster_size[:, None]) & (roster_size[:, None] > 0)
+
+        trainers = np.flatnonzero(roster_size)
+        coverage = covered.sum(axis=1)
+        order = trainers[np.lexsort((shared[trainers].sum(axis=1), -coverage[trainers]))]
+
+        # Materialise rows from plain lists; per-row NumPy calls dominate otherwise
+        alpha = np.argsort(self.type_names.astype(str)) if n_types else np.empty(0, dtype=np.int64)
+        alpha_names = self.type_names[alpha].tolist()
+        shared_rows = shared[order][:, alpha].tolist()
+        pct = np.round(100.0 * coverage[order] / max(n_types, 1), 1).tolist()
+        return [
+            {
+                "trainer_id": self.trainer_ids[i],
+                "trainer_name": self.trainer_names[i],
+                "roster_size": size,
+                "types_covered": covered_count,
+                "coverage_pct": p,
+                "shared_weaknesses": ", ".join(n for n, flag in zip(alpha_names, flags) if flag),
+            }
+            for i, size, covered_count, p, flags in zip(order.tolist(), roster_size[order].tolist(),
+                                                         coverage[order].tolist(), pct, shared_rows)
+        ]
+
+
+def create_analyzer(conn):
+    """Builds a MatchupAnalyzer. Returns None (and prints why) if it cannot be built."""
+    try:
+        analyzer = MatchupAnalyzer(conn)
+        analyzer.refresh(force=True)
+        return analyzer
+    except (ImportError, pymysql.Error) as e:
+        print(f"Matchup Error: {e}")
+        return None
+
+# --- One-shot helpers (exporter CLI) ---
+def get_gym_coverage_report(conn):
+    analyzer = create_analyzer(conn)
+    return analyzer.get_gym_coverage_report() if analyzer else []
+
+
+def get_trainer_coverage_report(conn, limit=None):
+    analyzer = create_analyzer(conn)
+    return analyzer.get_trainer_coverage_report(limit) if analyzer else []
+
+
+def get_league_matchup_table(conn, limit=None):
+    analyzer = create_analyzer(conn)
+    return analyzer.get_league_matchup_table(limit) if analyzer else []
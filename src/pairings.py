@@ -0,0 +1,266 @@
+import argparse
+import datetime
+import getpass
+import sys
+import time
+import pymysql
+import db_utils
+import ratings
+
+# =============================================================================
+# TOURNAMENT PAIRINGS
+# =============================================================================
+# Generates the next round for a tournament from TournamentEntry and the
+# matches already in Match_Table, then stores it with db_utils.insert_matches.
+#   single_elimination: round 1 is a seeded bracket (1 v N, 2 v N-1, ... with
+#       byes for the top seeds up to the next power of two); later rounds
+#       pair the winners of consecutive matches of the previous round.
+#   swiss: players are ordered by points, then seed, and paired top-down
+#       with the closest opponent they have not met yet.
+# A bye is stored as a match with no trainer2_id that trainer1 wins, so it
+# counts as a win in standings and ratings ignore it.
+
+SYSTEMS = ("swiss", "single_elimination")
+# How far down the standings Swiss looks for an opponent not met before;
+# keeps pairing O(n log n) for large opens (bounded scan per player)
+REMATCH_WINDOW = 64
+
+
+def _fetch(conn, sql, params=None):
+    with conn.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def load_entrants(conn, tournament_id):
+    """
+    Entrants in seed order: highest rating first, then earliest registration.
+    Falls back to registration order if ratings are not available.
+    """
+    try:
+        rows = _fetch(conn, """
+            SELECT TE.trainer_id
+            FROM TournamentEntry TE
+            LEFT JOIN TrainerRating R ON R.trainer_id = TE.trainer_id
+            WHERE TE.tournament_id = %s
+            ORDER BY COALESCE(R.rating, 0) DESC, TE.registration_date, TE.trainer_id
+        """, (tournament_id,))
+    except pymysql.Error:
+        rows = _fetch(conn, """
+            SELECT trainer_id FROM TournamentEntry
+            WHERE tournament_id = %s
+            ORDER BY registration_date, trainer_id
+        """, (tournament_id,))
+    return [r['trainer_id'] for r in rows]
+
+
+def load_history(conn, tournament_id):
+    """Matches already played in the tournament, in round/match order."""
+    return _fetch(conn, """
+        SELECT match_number, round_number, trainer1_id, trainer2_id, winner_id
+        FROM Match_Table
+        WHERE tournament_id = %s
+        ORDER BY round_number, match_number
+    """, (tournament_id,))
+
+
+def bracket_order(size):
+    """Seed positions for a bracket of `size` (a power of two): [1, 8, 4, 5, 2, 7, 3, 6] for 8."""
+    order = [1]
+    while len(order) < size:
+        total = len(order) * 2 + 1
+        order = [s for seed in order for s in (seed, total - seed)]
+    return order
+
+# =============================================================================
+# PAIRING SYSTEMS
+# =============================================================================
+
+def pair_single_elimination(entrants, history, round_number):
+    """Returns [(trainer1_id, trainer2_id or None)] for the round."""
+    if round_number == 1:
+        size = 1
+        while size < len(entrants):
+            size *= 2
+        seeds = bracket_order(size)
+        slots = [entrants[s - 1] if s <= len(entrants) else None for s in seeds]
+        return [(a, b) if a is not None else (b, None) for a, b in zip(slots[0::2], slots[1::2])
+                if a is not None or b is not None]
+
+    previous = [m for m in history if m['round_number'] == round_number - 1]
+    if not previous:
+        raise ValueError(f"Round {round_number - 1} has not been played.")
+    undecided = [m['match_number'] for m in previous if m['winner_id'] is None]
+    if undecided:
+        raise ValueError(f"Round {round_number - 1} is not finished (matches {undecided[:5]} have no winner).")
+    winners = [m['winner_id'] for m in previous]
+    if len(winners) < 2:
+        raise ValueError("The tournament is already decided.")
+    pairs = list(zip(winners[0::2], winners[1::2]))
+    if len(winners) % 2:
+        pairs.append((winners[-1], None))
+    return pairs
+
+
+def pair_swiss(entrants, history, window=REMATCH_WINDOW):
+    """
+    Returns [(trainer1_id, trainer2_id or None)].
+    Sort by standings (O(n log n)), then pair top-down with the nearest
+    unpaired player not met before, looking at most `window` places down;
+    if everyone in the window is a rematch the nearest player is used.
+    """
+    seed = {t: i for i, t in enumerate(entrants)}
+    points = dict.fromkeys(entrants, 0.0)
+    met = {t: set() for t in entrants}
+    had_bye = set()
+    for m in history:
+        a, b, w = m['trainer1_id'], m['trainer2_id'], m['winner_id']
+        if b is None:
+            had_bye.add(a)
+        elif a in met and b in met:
+            met[a].add(b)
+            met[b].add(a)
+        if w in points:
+            points[w] += 1.0
+
+    standings = sorted(entrants, key=lambda t: (-points[t], seed[t]))
+    pairs = []
+    if len(standings) % 2:
+        # Bye goes to the lowest-ranked player who has not had one
+        bye = next((t for t in reversed(standings) if t not in had_bye), standings[-1])
+        standings.remove(bye)
+    else:
+        bye = None
+
+    taken = [False] * len(standings)
+    nxt = 0  # first position that may still be unpaired
+    for i, player in enumerate(standings):
+        if taken[i]:
+            continue
+        taken[i] = True
+        while nxt < len(standings) and taken[nxt]:
+            nxt += 1
+        choice = None
+        scanned = 0
+        j = nxt
+        while j < len(standings) and scanned < window:
+            if not taken[j]:
+                if standings[j] not in met[player]:
+                    choice = j
+                    break
+                scanned += 1
+            j += 1
+        if choice is None:
+            choice = nxt  # only rematches nearby: take the closest
+        if choice >= len(standings):
+            break
+        taken[choice] = True
+        pairs.append((player, standings[choice]))
+
+    if bye is not None:
+        pairs.append((bye, None))
+    return pairs
+
+# =============================================================================
+# SCHEDULING
+# =============================================================================
+
+def generate_round(conn, tournament_id, system="swiss", round_number=None, match_date=None):
+    """
+    Builds (but does not store) the next round's Match_Table records.
+    Raises ValueError when the round cannot be paired.
+    """
+    if system not in SYSTEMS:
+        raise ValueError(f"Unknown pairing system: {system}")
+    entrants = load_entrants(conn, tournament_id)
+    if len(entrants) < 2:
+        raise ValueError("A tournament needs at least two entrants.")
+    history = load_history(conn, tournament_id)
+    played_rounds = [m['round_number'] for m in history if m['round_number'] is not None]
+    if round_number is None:
+        round_number = max(played_rounds, default=0) + 1
+    elif round_number in played_rounds:
+        raise ValueError(f"Round {round_number} already has matches.")
+
+    if system == "single_elimination":
+        pairs = pair_single_elimination(entrants, history, round_number)
+    else:
+        pairs = pair_swiss(entrants, history)
+
+    next_number = max((m['match_number'] for m in history), default=0) + 1
+    match_date = match_date or datetime.date.today()
+    return [
+        {
+            "tournament_id": tournament_id,
+            "match_number": next_number + i,
+            "trainer1_id": a,
+            "trainer2_id": b,
+            "winner_id": a if b is None else None,  # byes are decided on creation
+            "match_date": match_date,
+            "round_number": round_number,
+        }
+        for i, (a, b) in enumerate(pairs)
+    ]
+
+
+def schedule_round(conn, tournament_id, system="swiss", round_number=None, match_date=None):
+    """
+    Pairs the next round and inserts it in one transaction.
+    Returns the inserted records ([] and a printed reason on failure).
+    """
+    try:
+        records = generate_round(conn, tournament_id, system, round_number, match_date)
+    except (ValueError, pymysql.Error) as e:
+        print(f"Pairing Error: {e}")
+        return []
+    _, rejects = db_utils.insert_matches(conn, records, all_or_nothing=True)
+    if rejects:
+        print(f"Pairing Error: match {records[rejects[0][0]]['match_number']}: {rejects[0][1]}")
+        return []
+    return records
+
+# =============================================================================
+# COMMAND LINE
+# =============================================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pair the next round of a tournament.")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--user", default="root")
+    parser.add_argument("--password", default=None, help="Prompted for if omitted")
+    parser.add_argument("--db", default="pokemon_league_db")
+    parser.add_argument("tournament_id")
+    parser.add_argument("--system", choices=SYSTEMS, default="swiss")
+    parser.add_argument("--round", type=int, default=None, help="Defaults to the next round")
+    parser.add_argument("--dry-run", action="store_true", help="Print pairings without inserting them")
+
+    args = parser.parse_args(argv)
+    password = args.password if args.password is not None else getpass.getpass("Password: ")
+    conn = db_utils.get_db_connection(args.host, args.user, password, args.db)
+    if not conn:
+        return 1
+    ratings.enable_live_updates()
+    try:
+        start = time.perf_counter()
+        if args.dry_run:
+            try:
+                records = generate_round(conn, args.tournament_id, args.system, args.round)
+            except (ValueError, pymysql.Error) as e:
+                print(f"Pairing Error: {e}")
+                return 1
+        else:
+            records = schedule_round(conn, args.tournament_id, args.system, args.round)
+            if not records:
+                return 1
+        elapsed = time.perf_counter() - start
+    finally:
+        conn.close()
+
+    for r in records:
+        print(f"R{r['round_number']} #{r['match_number']}: {r['trainer1_id']} vs {r['trainer2_id'] or '(bye)'}")
+    print(f"{len(records):,} pairings {'generated' if args.dry_run else 'scheduled'} in {elapsed:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+import contextlib
+import queue
+import threading
+import pymysql
+import db_utils
+
+# =============================================================================
+# CONNECTION POOL
+# =============================================================================
+# A pymysql connection runs one statement at a time, so work that should run
+# in parallel needs one connection per thread. ConnectionPool hands out
+# clones of the login connection (opened on demand, at most `size`) and
+# keeps them open for the next caller instead of reconnecting every time.
+
+
+class ConnectionPool:
+    def __init__(self, conn, size=4, for_read=True):
+        """for_read=True clones from the replica reads are routed to (if any)."""
+        self.conn = conn
+        self.size = size
+        self.for_read = for_read
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._closed = False
+
+    @contextlib.contextmanager
+    def connection(self, timeout=None):
+        """Borrows a connection; raises pymysql.OperationalError if none can be opened."""
+        conn = self._acquire(timeout)
+        broken = False
+        try:
+            yield conn
+        except pymysql.OperationalError:
+            broken = True  # connection lost/killed: don't hand it out again
+            raise
+        finally:
+            self._release(conn, broken)
+
+    def _acquire(self, timeout):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            can_open = self._created < self.size
+            if can_open:
+                self._created += 1
+        if not can_open:
+            try:
+                return self._idle.get(timeout=timeout)
+            except queue.Empty:
+                raise pymysql.OperationalError("No pooled connection became free in time.")
+        conn = db_utils.clone_connection(self.conn, for_read=self.for_read)
+        if conn is None:
+            with self._lock:
+                self._created -= 1
+            raise pymysql.OperationalError("Could not open a pooled connection.")
+        return conn
+
+    def _release(self, conn, broken):
+        if broken or self._closed:
+            with contextlib.suppress(pymysql.Error):
+                conn.close()
+            with self._lock:
+                self._created -= 1
+        else:
+            self._idle.put(conn)
+
+    def close(self):
+        """Closes idle connections; ones still borrowed are closed when they are returned."""
+        self._closed = True
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            with contextlib.suppress(pymysql.Error):
+                conn.close()
+            with self._lock:
+                self._created -= 1
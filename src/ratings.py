@@ -0,0 +1,491 @@
+import argparse
+import datetime
+import getpass
+import math
+import sys
+import time
+import pymysql
+import db_utils
+
+# NumPy is only needed for the full rebuild; live updates are plain Python.
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# =============================================================================
+# GLICKO-1
+# =============================================================================
+# Every result is rated as it happens (one game = one rating period), in
+# match_date order. Between games a trainer's deviation grows with the time
+# since they last played, so long absences make the next results count more.
+# Because each game only reads and writes its two participants, the live
+# updates and the full rebuild produce the same numbers as long as results
+# arrive in date order.
+#
+# What keeps TrainerRating current:
+#   - insert_match(es), insert_gym_battle, update_match_winner, update_record
+#     and delete_record report Match_Table and GymBattle writes to the match
+#     listeners (enable_live_updates; the TUI and pairings.py register it)
+#   - ingest.py rates each committed batch with apply_results
+#   - importer.py rebuilds after loading Match_Table or GymBattle rows
+# Still drifting until the next `python src/ratings.py rebuild`: corrected or
+# removed results (shifted from current ratings, later games not replayed),
+# results that arrive out of date order, rows removed by cascades (deleting
+# a tournament, gym or trainer), and writes made with raw SQL.
+
+INITIAL_RATING = 1500.0
+INITIAL_RD = 350.0
+MIN_RD = 30.0
+RD_GROWTH = 70.0          # c: an inactive trainer goes from RD 50 to 350 in ~2 years
+PERIOD_DAYS = 30          # time unit for RD growth
+Q = math.log(10) / 400.0
+
+# Match_Table / GymBattle result -> score for the first trainer
+GYM_RESULT_SCORES = {"Win": 1.0, "Loss": 0.0, "Draw": 0.5}
+
+
+def _g(rd, xp):
+    return 1.0 / xp.sqrt(1.0 + 3.0 * Q * Q * rd * rd / (math.pi * math.pi))
+
+
+def _inflate(rd, days_idle, xp):
+    """Pre-game deviation after `days_idle` days without games (NaN/None = first game)."""
+    grown = xp.sqrt(rd * rd + RD_GROWTH * RD_GROWTH * (days_idle / PERIOD_DAYS))
+    return xp.minimum(grown, INITIAL_RD) if xp is not math else min(grown, INITIAL_RD)
+
+
+def _expected(r, r_opp, rd_opp, xp):
+    return 1.0 / (1.0 + 10.0 ** (-_g(rd_opp, xp) * (r - r_opp) / 400.0))
+
+
+def _update_factor(rd, rd_opp, expected, xp):
+    """(step, new_rd): the rating moves by step * g(RD_opp) * (score - expected)."""
+    g_opp = _g(rd_opp, xp)
+    d2_inv = Q * Q * g_opp * g_opp * expected * (1.0 - expected)
+    denom = 1.0 / (rd * rd) + d2_inv
+    new_rd = xp.sqrt(1.0 / denom)
+    new_rd = xp.maximum(new_rd, MIN_RD) if xp is not math else max(new_rd, MIN_RD)
+    return Q / denom * g_opp, new_rd
+
+
+def glicko_game(r_a, rd_a, r_b, rd_b, score_a, xp=math):
+    """
+    One game between A and B (score_a = 1 win, 0.5 draw, 0 loss), both
+    updated from their pre-game values. Works on floats (xp=math) or on
+    NumPy arrays of independent games (xp=np).
+    Returns (r_a, rd_a, r_b, rd_b).
+    """
+    e_a = _expected(r_a, r_b, rd_b, xp)
+    e_b = _expected(r_b, r_a, rd_a, xp)
+    step_a, new_rd_a = _update_factor(rd_a, rd_b, e_a, xp)
+    step_b, new_rd_b = _update_factor(rd_b, rd_a, e_b, xp)
+    return (r_a + step_a * (score_a - e_a), new_rd_a,
+            r_b + step_b * ((1.0 - score_a) - e_b), new_rd_b)
+
+# =============================================================================
+# LIVE UPDATES (called through db_utils match listeners)
+# =============================================================================
+
+def _as_date(value):
+    """Match dates arrive as date objects from the driver or ISO strings from forms."""
+    if isinstance(value, str):
+        try:
+            return datetime.date.fromisoformat(value[:10])
+        except ValueError:
+            return None
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    return value
+
+
+def _days_between(last, current):
+    if last is None or current is None:
+        return 0.0
+    return float(max((current - last).days, 0))
+
+
+def _lock_ratings(cursor, trainer_ids):
+    cursor.execute(
+        f"SELECT * FROM TrainerRating WHERE trainer_id IN ({', '.join(['%s'] * len(trainer_ids))}) FOR UPDATE",
+        list(trainer_ids)
+    )
+    found = {row['trainer_id']: {**row, "last_played": _as_date(row['last_played'])} for row in cursor.fetchall()}
+    for t in trainer_ids:
+        found.setdefault(t, {"trainer_id": t, "rating": INITIAL_RATING, "rating_deviation": INITIAL_RD,
+                             "games_played": 0, "wins": 0, "losses": 0, "draws": 0, "last_played": None})
+    return found
+
+
+def _save_ratings(cursor, rows):
+    cursor.executemany("""
+        INSERT INTO TrainerRating
+            (trainer_id, rating, rating_deviation, games_played, wins, losses, draws, last_played)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            rating = VALUES(rating), rating_deviation = VALUES(rating_deviation),
+            games_played = VALUES(games_played), wins = VALUES(wins), losses = VALUES(losses),
+            draws = VALUES(draws), last_played = VALUES(last_played)
+    """, [(r['trainer_id'], r['rating'], r['rating_deviation'], r['games_played'],
+           r['wins'], r['losses'], r['draws'], r['last_played']) for r in rows])
+
+
+def _tally(row, score, sign=1):
+    key = "wins" if score == 1.0 else "losses" if score == 0.0 else "draws"
+    row[key] += sign
+    row["games_played"] += sign
+
+
+def _match_score(record, winner_id):
+    """Score for trainer1, or None if the match has no result."""
+    if winner_id is None:
+        return None
+    return 1.0 if winner_id == record['trainer1_id'] else 0.0
+
+
+def result_game(table_name, record):
+    """
+    The rated game in a Match_Table or GymBattle row as
+    (trainer_a, trainer_b, score_a, played_on), or None if it is not rated
+    (no result, a bye, or a trainer playing themselves).
+    """
+    if table_name == "GymBattle":
+        a, b = record.get('challenger_id'), record.get('leader_id')
+        score = GYM_RESULT_SCORES.get(record.get('result'), 0.5)
+        played_on = record.get('battle_date')
+    else:
+        a, b = record.get('trainer1_id'), record.get('trainer2_id')
+        score = _match_score(record, record.get('winner_id'))
+        played_on = record.get('match_date')
+    if not a or not b or a == b or score is None:
+        return None
+    return a, b, score, _as_date(played_on)
+
+
+def apply_results(conn, games):
+    """
+    Rates new games in the given order, (trainer_a, trainer_b, score_a,
+    played_on) each, in one transaction. Returns True on success.
+    """
+    games = [g for g in games if g[0] and g[1] and g[0] != g[1]]
+    if not games:
+        return True
+    try:
+        conn.begin()
+        with conn.cursor() as cursor:
+            rows = _lock_ratings(cursor, sorted({t for g in games for t in g[:2]}))
+            for trainer_a, trainer_b, score, played_on in games:
+                a, b = rows[trainer_a], rows[trainer_b]
+                rd_a = _inflate(a['rating_deviation'], _days_between(a['last_played'], played_on), math)
+                rd_b = _inflate(b['rating_deviation'], _days_between(b['last_played'], played_on), math)
+                a['rating'], a['rating_deviation'], b['rating'], b['rating_deviation'] = \
+                    glicko_game(a['rating'], rd_a, b['rating'], rd_b, score)
+                _tally(a, score)
+                _tally(b, 1.0 - score)
+                for row in (a, b):
+                    if played_on is not None and (row['last_played'] is None or played_on > row['last_played']):
+                        row['last_played'] = played_on
+            _save_ratings(cursor, rows.values())
+        conn.commit()
+        return True
+    except pymysql.Error as e:
+        conn.rollback()
+        print(f"Rating Error: {e}")
+        return False
+
+
+def apply_result(conn, trainer1_id, trainer2_id, score, played_on=None):
+    """Rates one new game (score for trainer1). Returns True on success."""
+    if not trainer1_id or not trainer2_id or trainer1_id == trainer2_id:
+        return False
+    return apply_results(conn, [(trainer1_id, trainer2_id, score, played_on)])
+
+
+def correct_result(conn, trainer1_id, trainer2_id, old_score, new_score, played_on=None):
+    """
+    A recorded result changed (old/new score for trainer1, None = no result).
+    Shifts both ratings by the difference the new score makes, using the
+    current ratings; later games are not replayed, so values converge to
+    the exact ones on the next rebuild.
+    """
+    if old_score is None and new_score is None:
+        return True
+    if old_score is None:
+        return apply_result(conn, trainer1_id, trainer2_id, new_score, played_on)
+    if not trainer1_id or not trainer2_id or trainer1_id == trainer2_id:
+        return False
+    try:
+        conn.begin()
+        with conn.cursor() as cursor:
+            rows = _lock_ratings(cursor, (trainer1_id, trainer2_id))
+            a, b = rows[trainer1_id], rows[trainer2_id]
+            # Removing a result undoes it down to its expected score
+            target = new_score if new_score is not None else _expected(
+                a['rating'], b['rating'], b['rating_deviation'], math)
+            shifts = []
+            for row, opp, old, new in ((a, b, old_score, target), (b, a, 1.0 - old_score, 1.0 - target)):
+                expected = _expected(row['rating'], opp['rating'], opp['rating_deviation'], math)
+                step, _ = _update_factor(row['rating_deviation'], opp['rating_deviation'], expected, math)
+                shifts.append(step * (new - old))
+            a['rating'] += shifts[0]
+            b['rating'] += shifts[1]
+            _tally(a, old_score, -1)
+            _tally(b, 1.0 - old_score, -1)
+            if new_score is not None:
+                _tally(a, new_score)
+                _tally(b, 1.0 - new_score)
+            _save_ratings(cursor, (a, b))
+        conn.commit()
+        return True
+    except pymysql.Error as e:
+        conn.rollback()
+        print(f"Rating Error: {e}")
+        return False
+
+
+def replace_result(conn, old_game, new_game):
+    """
+    A stored game changed (either may be None: not rated). Same pairing:
+    corrected in place; otherwise the old game is undone and the new one rated.
+    """
+    if old_game and new_game and old_game[:2] == new_game[:2]:
+        return correct_result(conn, *old_game[:2], old_game[2], new_game[2], new_game[3])
+    ok = True
+    if old_game:
+        ok = correct_result(conn, *old_game[:2], old_game[2], None, old_game[3])
+    if new_game:
+        ok = apply_result(conn, *new_game) and ok
+    return ok
+
+
+def on_match_event(conn, event, record):
+    """db_utils match listener (Match_Table and GymBattle writes)."""
+    table_name = "GymBattle" if event.startswith("gym_battle") else "Match_Table"
+    if event.endswith("_inserted"):
+        game = result_game(table_name, record)
+        if game:
+            apply_result(conn, *game)
+    elif event == "match_winner_changed":
+        correct_result(conn, record['trainer1_id'], record['trainer2_id'],
+                       _match_score(record, record['old_winner_id']), _match_score(record, record['winner_id']),
+                       _as_date(record.get('match_date')))
+    elif event.endswith("_changed"):
+        replace_result(conn, result_game(table_name, record['old']), result_game(table_name, record))
+    elif event.endswith("_deleted"):
+        replace_result(conn, result_game(table_name, record), None)
+
+
+def enable_live_updates():
+    """Keeps TrainerRating current on every Match_Table / GymBattle write db_utils reports."""
+    db_utils.register_match_listener(on_match_event)
+
+# =============================================================================
+# FULL REBUILD
+# =============================================================================
+
+def load_games(conn):
+    """
+    Every rated game in order: (trainer_a, trainer_b, score_a, played_on).
+    Match_Table is ordered by match_date, round_number; GymBattle results are
+    merged in by date (challenger vs leader).
+    """
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            SELECT trainer1_id, trainer2_id, winner_id, match_date AS played_on,
+                   0 AS source, round_number AS seq, match_number AS seq2
+            FROM Match_Table
+            WHERE trainer1_id IS NOT NULL AND trainer2_id IS NOT NULL AND winner_id IS NOT NULL
+              AND trainer1_id <> trainer2_id
+        """)
+        matches = cursor.fetchall()
+        cursor.execute("""
+            SELECT challenger_id, leader_id, result, battle_date AS played_on, battle_id
+            FROM GymBattle
+            WHERE challenger_id IS NOT NULL AND leader_id IS NOT NULL AND challenger_id <> leader_id
+        """)
+        battles = cursor.fetchall()
+
+    games = []
+    for row in matches + battles:
+        row['played_on'] = _as_date(row['played_on'])
+    for m in matches:
+        games.append(((m['played_on'] is None, m['played_on'] or datetime.date.min, 0, m['seq'] or 0, m['seq2'] or 0),
+                      m['trainer1_id'], m['trainer2_id'], 1.0 if m['winner_id'] == m['trainer1_id'] else 0.0,
+                      m['played_on']))
+    for b in battles:
+        games.append(((b['played_on'] is None, b['played_on'] or datetime.date.min, 1, 0, b['battle_id']),
+                      b['challenger_id'], b['leader_id'], GYM_RESULT_SCORES.get(b['result'], 0.5),
+                      b['played_on']))
+    games.sort(key=lambda g: g[0])
+    return [g[1:] for g in games]
+
+
+def schedule_waves(a_codes, b_codes):
+    """
+    Splits an ordered game list into waves of games that can be rated at the
+    same time: a game goes one wave after the latest earlier game of either
+    of its trainers, so every trainer still sees their games in order.
+    Returns the wave number of each game.
+    """
+    last = {}
+    waves = np.empty(len(a_codes), dtype=np.int64)
+    for i, (a, b) in enumerate(zip(a_codes.tolist(), b_codes.tolist())):
+        w = max(last.get(a, -1), last.get(b, -1)) + 1
+        waves[i] = w
+        last[a] = last[b] = w
+    return waves
+
+
+def compute_ratings(games):
+    """
+    Rates `games` (from load_games) and returns TrainerRating rows.
+    Games are grouped into dependency waves and every wave is rated as one
+    vectorised NumPy step, which gives exactly the sequential result.
+    """
+    if np is None:
+        raise ImportError("Rebuilding ratings requires numpy (pip install numpy).")
+    codes = {}
+    a = np.array([codes.setdefault(g[0], len(codes)) for g in games], dtype=np.int64)
+    b = np.array([codes.setdefault(g[1], len(codes)) for g in games], dtype=np.int64)
+    score = np.array([g[2] for g in games], dtype=np.float64)
+    day = np.array([g[3].toordinal() if g[3] is not None else np.nan for g in games], dtype=np.float64)
+
+    n = len(codes)
+    rating = np.full(n, INITIAL_RATING)
+    rd = np.full(n, INITIAL_RD)
+    last_day = np.full(n, np.nan)
+    wins = np.zeros(n, dtype=np.int64)
+    losses = np.zeros(n, dtype=np.int64)
+    draws = np.zeros(n, dtype=np.int64)
+
+    waves = schedule_waves(a, b) if len(games) else np.empty(0, dtype=np.int64)
+    order = np.argsort(waves, kind="stable")
+    bounds = np.flatnonzero(np.diff(waves[order])) + 1
+    for idx in np.split(order, bounds) if len(order) else []:
+        wa, wb, s, d = a[idx], b[idx], score[idx], day[idx]
+        idle_a = np.nan_to_num(d - last_day[wa], nan=0.0).clip(min=0)
+        idle_b = np.nan_to_num(d - last_day[wb], nan=0.0).clip(min=0)
+        rd_a = _inflate(rd[wa], idle_a, np)
+        rd_b = _inflate(rd[wb], idle_b, np)
+        rating[wa], rd[wa], rating[wb], rd[wb] = glicko_game(rating[wa], rd_a, rating[wb], rd_b, s, np)
+        for side, side_score in ((wa, s), (wb, 1.0 - s)):
+            wins[side] += side_score == 1.0
+            losses[side] += side_score == 0.0
+            draws[side] += side_score == 0.5
+            last_day[side] = np.fmax(last_day[side], d)
+
+    trainer_ids = list(codes)
+    return [
+        {
+            "trainer_id": trainer_ids[i],
+            "rating": float(rating[i]),
+            "rating_deviation": float(rd[i]),
+            "games_played": int(wins[i] + losses[i] + draws[i]),
+            "wins": int(wins[i]), "losses": int(losses[i]), "draws": int(draws[i]),
+            "last_played": datetime.date.fromordinal(int(last_day[i])) if not np.isnan(last_day[i]) else None,
+        }
+        for i in range(n)
+    ]
+
+
+def rebuild_ratings(conn, batch_size=5000):
+    """
+    Recomputes TrainerRating from scratch in one transaction.
+    Returns a summary dict, or None (and prints why) on error.
+    """
+    start = time.perf_counter()
+    try:
+        games = load_games(conn)
+        rows = compute_ratings(games)
+        rated = time.perf_counter()
+        conn.begin()
+        with conn.cursor() as cursor:
+            cursor.execute("DELETE FROM TrainerRating")
+            for i in range(0, len(rows), batch_size):
+                _save_ratings(cursor, rows[i:i + batch_size])
+        conn.commit()
+    except (pymysql.Error, ImportError) as e:
+        try:
+            conn.rollback()
+        except pymysql.Error:
+            pass
+        print(f"Rating Error: {e}")
+        return None
+    return {
+        "games": len(games),
+        "trainers": len(rows),
+        "rating_seconds": round(rated - start, 3),
+        "total_seconds": round(time.perf_counter() - start, 3),
+    }
+
+# =============================================================================
+# READS
+# =============================================================================
+
+def get_rating_leaderboard(conn, limit=20, offset=0):
+    """Top trainers by rating; reads walk idx_rating_leaderboard, so cost is O(limit + offset)."""
+    sql = """
+        SELECT R.trainer_id, T.name, ROUND(R.rating, 1) AS rating,
+               ROUND(R.rating_deviation, 1) AS rating_deviation,
+               R.games_played, R.wins, R.losses, R.draws, R.last_played
+        FROM TrainerRating R
+        JOIN Trainer T ON T.trainer_id = R.trainer_id
+        ORDER BY R.rating DESC, R.trainer_id
+        LIMIT %s OFFSET %s
+    """
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(sql, (limit, offset))
+            return cursor.fetchall()
+    except pymysql.Error as e:
+        print(f"Report Error: {e}")
+        return []
+
+
+def get_trainer_rating(conn, trainer_id):
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT * FROM TrainerRating WHERE trainer_id = %s", (trainer_id,))
+            return cursor.fetchone()
+    except pymysql.Error as e:
+        print(f"Query Error: {e}")
+        return None
+
+# =============================================================================
+# COMMAND LINE
+# =============================================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Trainer ratings (Glicko) over Match_Table and GymBattle.")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--user", default="root")
+    parser.add_argument("--password", default=None, help="Prompted for if omitted")
+    parser.add_argument("--db", default="pokemon_league_db")
+    sub = parser.add_subparsers(dest="kind", required=True)
+    sub.add_parser("rebuild", help="Recompute every rating from the match history")
+    p = sub.add_parser("top", help="Show the leaderboard")
+    p.add_argument("-n", type=int, default=20)
+
+    args = parser.parse_args(argv)
+    password = args.password if args.password is not None else getpass.getpass("Password: ")
+    conn = db_utils.get_db_connection(args.host, args.user, password, args.db)
+    if not conn:
+        return 1
+    try:
+        if args.kind == "rebuild":
+            summary = rebuild_ratings(conn)
+            if summary is None:
+                return 1
+            print(f"Rated {summary['games']:,} games for {summary['trainers']:,} trainers "
+                  f"in {summary['total_seconds']}s")
+        else:
+            for rank, row in enumerate(get_rating_leaderboard(conn, args.n), 1):
+                print(f"{rank:>4}. {row['name']:<30} {row['rating']:>7} ±{row['rating_deviation']:<6} "
+                      f"({row['wins']}-{row['losses']}-{row['draws']})")
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
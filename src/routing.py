@@ -0,0 +1,286 @@
+import contextlib
+import itertools
+import re
+import threading
+import time
+import pymysql
+
+# =============================================================================
+# PRIMARY / REPLICA ROUTING
+# =============================================================================
+# RoutedConnection looks like a pymysql connection, so every db_utils
+# function works with it unchanged. Each cursor.execute() is routed by its
+# SQL verb:
+#   SELECT / SHOW / DESCRIBE / EXPLAIN / WITH ... SELECT -> a replica
+#   session SET statements -> the primary and every replica (not a write)
+#   everything else, locking reads and anything inside begin()/commit() -> the primary
+# Replicas are used round-robin and skipped while their replication lag is
+# above max_lag (checked at most every lag_check_interval seconds) or while
+# they are unreachable. After a write, reads stay on the primary for
+# sticky_seconds so the user always sees their own change.
+# Lag is measured on a separate probe connection per replica, so read_target()
+# never runs a statement on a connection another thread may be using; worker
+# threads call it (through clone_connection) to pick the server they clone.
+
+READ_VERBS = {"SELECT", "SHOW", "DESCRIBE", "DESC", "EXPLAIN", "WITH"}
+_FIRST_WORD = re.compile(r"^\s*(?:(?:/\*.*?\*/|--[^\n]*\n|#[^\n]*\n)\s*)*(\w+)", re.S)
+_LOCKING_READ = re.compile(r"\bFOR\s+(?:UPDATE|SHARE)\b|\bLOCK\s+IN\s+SHARE\s+MODE\b", re.I)
+_CTE_WRITE = re.compile(r"\b(?:INSERT|UPDATE|DELETE|REPLACE)\b", re.I)
+_SESSION_SET = re.compile(r"^\s*SET\s+(?!GLOBAL\b|PERSIST(?:_ONLY)?\b|@@GLOBAL\.|@@PERSIST|PASSWORD\b|"
+                          r"(?:DEFAULT\s+)?ROLE\b|TRANSACTION\b|RESOURCE\s+GROUP\b)", re.I)
+# Client-side "connection lost / refused" errors: safe to retry a read on the primary
+CONNECTION_ERRORS = {2003, 2006, 2013, 2055}
+
+
+def is_read(sql):
+    """True if the statement can be served by a replica."""
+    match = _FIRST_WORD.match(sql)
+    if not match:
+        return False
+    verb = match.group(1).upper()
+    if verb not in READ_VERBS or _LOCKING_READ.search(sql):
+        return False
+    return verb != "WITH" or not _CTE_WRITE.search(sql)
+
+
+def is_session_set(sql):
+    """True for SET statements that only change the current session (variables, NAMES, ...)."""
+    return bool(_SESSION_SET.match(sql))
+
+
+def parse_host(text, default_port=3306):
+    """'host' or 'host:port' -> (host, port)."""
+    host, _, port = text.strip().partition(":")
+    return host or "localhost", int(port) if port else default_port
+
+
+class Replica:
+    def __init__(self, conn, name):
+        self.conn = conn
+        self.name = name
+        self.lag = None          # seconds behind the primary; None = not measured yet
+        self.checked_at = 0.0
+        self.down_until = 0.0    # skipped until then after a connection error
+        self.probe = None        # connection used only for lag checks
+        self.probing = False     # a thread is measuring the lag right now
+
+
+class RoutedCursor:
+    """Cursor proxy: opens the real cursor on whichever server the statement is routed to."""
+
+    def __init__(self, router, cursorclass=None):
+        self.router = router
+        self.cursorclass = cursorclass
+        self._conn = None
+        self._cursor = None
+
+    def _cursor_on(self, conn):
+        if conn is not self._conn:
+            self.close()
+            self._cursor = conn.cursor(self.cursorclass) if self.cursorclass else conn.cursor()
+            self._conn = conn
+        return self._cursor
+
+    def execute(self, sql, params=None):
+        if is_session_set(sql):
+            result = self._cursor_on(self.router.primary).execute(sql, params)
+            self.router.set_session(sql, params)
+            return result
+        read = is_read(sql)
+        target = self.router.read_target() if read else self.router.primary
+        try:
+            result = self._cursor_on(target).execute(sql, params)
+        except pymysql.OperationalError as e:
+            if target is self.router.primary or e.args[0] not in CONNECTION_ERRORS:
+                raise
+            self.router.mark_down(target)
+            result = self._cursor_on(self.router.primary).execute(sql, params)
+            with contextlib.suppress(pymysql.Error):
+                target.ping(reconnect=True)  # usable again once the replica is back
+                self.router.replay_session(target)
+        if not read:
+            self.router.mark_write()
+        return result
+
+    def executemany(self, sql, args):
+        result = self._cursor_on(self.router.primary).executemany(sql, args)
+        self.router.mark_write()
+        return result
+
+    def close(self):
+        if self._cursor is not None:
+            self._cursor.close()
+        self._cursor = None
+        self._conn = None
+
+    def __getattr__(self, name):
+        # fetchone/fetchall/fetchmany/rowcount/lastrowid/description
+        if self._cursor is None:
+            raise AttributeError(name)
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor.fetchone, None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class RoutedConnection:
+    """A primary connection plus read replicas behind the pymysql connection interface."""
+
+    def __init__(self, primary, replicas, max_lag=5.0, sticky_seconds=5.0,
+                 lag_check_interval=2.0, retry_down_seconds=30.0):
+        self.primary = primary
+        self.replicas = list(replicas)
+        self.max_lag = max_lag
+        self.sticky_seconds = sticky_seconds
+        self.lag_check_interval = lag_check_interval
+        self.retry_down_seconds = retry_down_seconds
+        self.sticky_until = 0.0
+        self._in_transaction = False
+        self._pins = 0
+        self._rotation = itertools.cycle(self.replicas) if self.replicas else None
+        self._lock = threading.Lock()  # rotation and lag state (not held during probes); read_target() runs on worker threads
+        self._session_sets = []        # session SETs, replayed on a reconnected replica
+
+    # --- pymysql connection interface ---
+    def cursor(self, cursorclass=None):
+        return RoutedCursor(self, cursorclass)
+
+    def begin(self):
+        self.primary.begin()
+        self._in_transaction = True
+
+    def commit(self):
+        self.primary.commit()
+        self._in_transaction = False
+        self.mark_write()
+
+    def rollback(self):
+        self.primary.rollback()
+        self._in_transaction = False
+
+    def close(self):
+        for replica in self.replicas:
+            for conn in (replica.conn, replica.probe):
+                if conn is not None:
+                    with contextlib.suppress(pymysql.Error):
+                        conn.close()
+        self.primary.close()
+
+    def __getattr__(self, name):
+        # host/port/user/password/db (used by clone_connection), ping, open, ...
+        if name == "primary":
+            raise AttributeError(name)
+        return getattr(self.primary, name)
+
+    # --- routing ---
+    @contextlib.contextmanager
+    def pinned(self):
+        """Routes every statement in the block to the primary (e.g. read-then-insert)."""
+        self._pins += 1
+        try:
+            yield self
+        finally:
+            self._pins -= 1
+
+    def set_session(self, sql, params=None):
+        """Repeats a session SET (already run on the primary) on every replica."""
+        if (sql, params) not in self._session_sets:
+            self._session_sets.append((sql, params))
+        for replica in self.replicas:
+            self._run_session(replica.conn, [(sql, params)])
+
+    def replay_session(self, conn):
+        self._run_session(conn, self._session_sets)
+
+    def _run_session(self, conn, statements):
+        try:
+            with conn.cursor() as cursor:
+                for sql, params in statements:
+                    cursor.execute(sql, params)
+        except pymysql.OperationalError as e:
+            if e.args[0] not in CONNECTION_ERRORS:
+                raise
+            self.mark_down(conn)
+
+    def mark_write(self):
+        self.sticky_until = time.monotonic() + self.sticky_seconds
+
+    def mark_down(self, conn):
+        with self._lock:
+            for replica in self.replicas:
+                if replica.conn is conn:
+                    replica.down_until = time.monotonic() + self.retry_down_seconds
+                    replica.lag = None
+
+    def read_target(self):
+        """Connection the next read should use."""
+        if (self._in_transaction or self._pins or not self.replicas
+                or time.monotonic() < self.sticky_until):
+            return self.primary
+        with self._lock:
+            candidates = [next(self._rotation) for _ in range(len(self.replicas))]
+        for replica in candidates:
+            if self._healthy(replica):
+                return replica.conn
+        return self.primary  # every replica is down or too far behind
+
+    def _healthy(self, replica):
+        """
+        Whether reads may go to the replica. A due lag check runs outside the
+        lock, by one thread per replica; the others use the last measurement.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if now < replica.down_until:
+                return False
+            due = replica.lag is None or now - replica.checked_at >= self.lag_check_interval
+            if not due or replica.probing:
+                return replica.lag is not None and replica.lag <= self.max_lag
+            replica.probing = True
+        lag = None
+        try:
+            lag = self._measure_lag(replica)
+        finally:
+            with self._lock:
+                replica.probing = False
+                replica.lag = lag
+                replica.checked_at = time.monotonic()
+                if lag is None:
+                    replica.down_until = replica.checked_at + self.retry_down_seconds
+        return lag is not None and lag <= self.max_lag
+
+    def _measure_lag(self, replica):
+        """Seconds behind the primary; inf if replication is stopped, None if unreachable."""
+        try:
+            if replica.probe is None:
+                conn = replica.conn
+                replica.probe = pymysql.connect(host=conn.host, port=conn.port, user=conn.user,
+                                                password=conn.password, connect_timeout=5, autocommit=True)
+            else:
+                replica.probe.ping(reconnect=True)
+            with replica.probe.cursor(pymysql.cursors.DictCursor) as cursor:
+                try:
+                    cursor.execute("SHOW REPLICA STATUS")  # MySQL 8.0.22+
+                except pymysql.Error:
+                    cursor.execute("SHOW SLAVE STATUS")
+                status = cursor.fetchone()
+        except pymysql.Error:
+            return None
+        if not status:
+            return 0.0  # not configured as a replica (e.g. a restored read-only copy)
+        lag = status.get('Seconds_Behind_Source', status.get('Seconds_Behind_Master'))
+        return float(lag) if lag is not None else float("inf")
+
+    def status(self):
+        """[{'name', 'lag', 'healthy'}] for each replica (for display)."""
+        rows = []
+        for replica in self.replicas:
+            healthy = self._healthy(replica)  # refreshes replica.lag first
+            rows.append({"name": replica.name, "lag": replica.lag, "healthy": healthy})
+        return rows
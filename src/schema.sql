@@ -293,4 +293,381 @@ BEGIN
         SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'winner_id must be either trainer1_id or trainer2_id';
     END IF;
 END$$
-DELIMITER ;
\ No newline at end of file
+DELIMITER ;
+
+-- ---------------------------------------------------
+-- TRAINER RATINGS (Glicko, maintained by ratings.py)
+-- ---------------------------------------------------
+-- Derived from Match_Table and GymBattle; rebuilt with `python src/ratings.py rebuild`.
+CREATE TABLE TrainerRating (
+    trainer_id VARCHAR(25) PRIMARY KEY,
+    rating DOUBLE NOT NULL DEFAULT 1500,
+    rating_deviation DOUBLE NOT NULL DEFAULT 350,
+    games_played INT NOT NULL DEFAULT 0,
+    wins INT NOT NULL DEFAULT 0,
+    losses INT NOT NULL DEFAULT 0,
+    draws INT NOT NULL DEFAULT 0,
+    last_played DATE,
+    FOREIGN KEY (trainer_id) REFERENCES Trainer(trainer_id) ON DELETE CASCADE ON UPDATE CASCADE,
+    -- Leaderboard reads walk this index: top-k costs O(k)
+    INDEX idx_rating_leaderboard (rating DESC, trainer_id)
+);
+
+
+-- ---------------------------------------------------
+-- CHANGE LOG (change data capture for live TUI views)
+-- ---------------------------------------------------
+-- One row per insert/update/delete on the TABLE_CONFIG tables. The triggers
+-- are generated from TABLE_CONFIG: install them with `python src/cdc.py install`.
+CREATE TABLE ChangeLog (
+    seq BIGINT AUTO_INCREMENT PRIMARY KEY,
+    table_name VARCHAR(64) NOT NULL,
+    pk_value JSON NOT NULL,
+    operation ENUM('INSERT', 'UPDATE', 'DELETE') NOT NULL,
+    changed_at TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6),
+    INDEX idx_changelog_table (table_name, seq),
+    INDEX idx_changelog_time (changed_at)
+);
+
+
+-- ---------------------------------------------------
+-- INGEST CHECKPOINTS (live result ingestion)
+-- ---------------------------------------------------
+-- Written by `python src/ingest.py` in the same transaction as the rows it
+-- inserts, so a restarted daemon resumes exactly after the last committed event.
+CREATE TABLE IngestCheckpoint (
+    source VARCHAR(255) PRIMARY KEY,
+    file_id VARCHAR(64),
+    byte_offset BIGINT NOT NULL DEFAULT 0,
+    events BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6)
+);
+
+
+-- ---------------------------------------------------
+-- HEAD-TO-HEAD (per trainer pair, maintained by triggers)
+-- ---------------------------------------------------
+-- One row per pair of trainers that have met, keyed with the smaller ID first
+-- (trainer_a < trainer_b), so "A vs B" is a single primary-key lookup however
+-- large Match_Table grows. Matches without two distinct trainers (byes) are
+-- not counted. Match_Table has no draws: a match without a winner (not played
+-- yet, or no result entered) counts in matches and undecided, not in the wins.
+-- Rebuild from Match_Table with db_utils.rebuild_head_to_head(conn), e.g.
+-- after changing trainer or tournament IDs (ON UPDATE CASCADE fires no triggers).
+-- A session that sets @skip_derived_tables (backup.restore does, for its bulk
+-- load) is not counted here or in ActivityRollup; rebuild both afterwards.
+CREATE TABLE HeadToHead (
+    trainer_a VARCHAR(25) NOT NULL,
+    trainer_b VARCHAR(25) NOT NULL,
+    matches INT NOT NULL DEFAULT 0,
+    a_wins INT NOT NULL DEFAULT 0,
+    b_wins INT NOT NULL DEFAULT 0,
+    undecided INT NOT NULL DEFAULT 0,
+    last_match_date DATE,
+    last_tournament_id VARCHAR(25),
+    last_match_number INT,
+    PRIMARY KEY (trainer_a, trainer_b),
+    -- Rivals of a trainer: trainer_a = ? uses the primary key, trainer_b = ? this index
+    INDEX idx_h2h_trainer_b (trainer_b, trainer_a),
+    FOREIGN KEY (trainer_a) REFERENCES Trainer(trainer_id) ON DELETE CASCADE ON UPDATE CASCADE,
+    FOREIGN KEY (trainer_b) REFERENCES Trainer(trainer_id) ON DELETE CASCADE ON UPDATE CASCADE
+);
+
+DELIMITER $$
+-- Adds (delta = 1) or removes (delta = -1) one match from its pair's totals
+CREATE PROCEDURE h2h_apply(IN t1 VARCHAR(25), IN t2 VARCHAR(25), IN winner VARCHAR(25),
+                           IN played DATE, IN tid VARCHAR(25), IN num INT, IN delta INT)
+BEGIN
+    DECLARE a VARCHAR(25) DEFAULT LEAST(t1, t2);
+    DECLARE b VARCHAR(25) DEFAULT GREATEST(t1, t2);
+    IF @skip_derived_tables IS NULL AND t1 IS NOT NULL AND t2 IS NOT NULL AND t1 <> t2 THEN
+        IF delta > 0 THEN
+            INSERT INTO HeadToHead (trainer_a, trainer_b, matches, a_wins, b_wins, undecided,
+                                    last_match_date, last_tournament_id, last_match_number)
+            VALUES (a, b, 1, winner <=> a, winner <=> b, winner IS NULL, played, tid, num)
+            ON DUPLICATE KEY UPDATE
+                matches = matches + 1,
+                a_wins = a_wins + VALUES(a_wins),
+                b_wins = b_wins + VALUES(b_wins),
+                undecided = undecided + VALUES(undecided),
+                -- last_match_date is compared before it is overwritten, so it goes last
+                last_tournament_id = IF(last_match_date IS NULL OR VALUES(last_match_date) >= last_match_date,
+                                        VALUES(last_tournament_id), last_tournament_id),
+                last_match_number = IF(last_match_date IS NULL OR VALUES(last_match_date) >= last_match_date,
+                                       VALUES(last_match_number), last_match_number),
+                last_match_date = IF(last_match_date IS NULL OR VALUES(last_match_date) >= last_match_date,
+                                     VALUES(last_match_date), last_match_date);
+        ELSE
+            UPDATE HeadToHead
+            SET matches = matches - 1, a_wins = a_wins - (winner <=> a), b_wins = b_wins - (winner <=> b),
+                undecided = undecided - (winner IS NULL)
+            WHERE trainer_a = a AND trainer_b = b;
+            DELETE FROM HeadToHead WHERE trainer_a = a AND trainer_b = b AND matches <= 0;
+            -- The removed match was the latest one: look up the new latest
+            IF EXISTS (SELECT 1 FROM HeadToHead WHERE trainer_a = a AND trainer_b = b
+                       AND last_tournament_id <=> tid AND last_match_number <=> num) THEN
+                UPDATE HeadToHead H,
+                       (SELECT match_date, tournament_id, match_number FROM Match_Table
+                        WHERE (trainer1_id = a AND trainer2_id = b) OR (trainer1_id = b AND trainer2_id = a)
+                        ORDER BY match_date DESC, round_number DESC, match_number DESC LIMIT 1) L
+                SET H.last_match_date = L.match_date, H.last_tournament_id = L.tournament_id,
+                    H.last_match_number = L.match_number
+                WHERE H.trainer_a = a AND H.trainer_b = b;
+            END IF;
+        END IF;
+    END IF;
+END$$
+
+CREATE TRIGGER trg_h2h_after_insert
+AFTER INSERT ON Match_Table FOR EACH ROW
+BEGIN
+    CALL h2h_apply(NEW.trainer1_id, NEW.trainer2_id, NEW.winner_id, NEW.match_date,
+                   NEW.tournament_id, NEW.match_number, 1);
+END$$
+
+CREATE TRIGGER trg_h2h_after_update
+AFTER UPDATE ON Match_Table FOR EACH ROW
+BEGIN
+    CALL h2h_apply(OLD.trainer1_id, OLD.trainer2_id, OLD.winner_id, OLD.match_date,
+                   OLD.tournament_id, OLD.match_number, -1);
+    CALL h2h_apply(NEW.trainer1_id, NEW.trainer2_id, NEW.winner_id, NEW.match_date,
+                   NEW.tournament_id, NEW.match_number, 1);
+END$$
+
+CREATE TRIGGER trg_h2h_after_delete
+AFTER DELETE ON Match_Table FOR EACH ROW
+BEGIN
+    CALL h2h_apply(OLD.trainer1_id, OLD.trainer2_id, OLD.winner_id, OLD.match_date,
+                   OLD.tournament_id, OLD.match_number, -1);
+END$$
+
+-- Foreign key cascades do not fire triggers: delete a tournament's matches
+-- explicitly so trg_h2h_after_delete sees them
+CREATE TRIGGER trg_h2h_tournament_before_delete
+BEFORE DELETE ON Tournament FOR EACH ROW
+BEGIN
+    DELETE FROM Match_Table WHERE tournament_id = OLD.tournament_id;
+END$$
+DELIMITER ;
+
+
+-- ---------------------------------------------------
+-- ACTIVITY ROLLUPS (per-day and per-month counters, maintained by triggers)
+-- ---------------------------------------------------
+-- Event counts per day and per month for each dimension value, so a date
+-- range is a sum over a few hundred rows instead of a scan of the source
+-- table (db_utils.get_rollup_totals / get_rollup_series):
+--   match                 Match_Table.match_date          tournament, region, season
+--   gym_battle            GymBattle.battle_date           gym, region
+--   pokemon_registration  RegisteredPokemon.registration_date  species, region
+--   tournament_entry      TournamentEntry.registration_date    tournament, season
+-- Every metric also has dimension 'all' (dim_id ''). Regions and seasons are
+-- looked up when the event is written (a tournament's or gym's city, a
+-- trainer's home region). Rows without a date are not counted.
+-- Rebuild with db_utils.rebuild_rollups(conn), e.g. after a bulk load, after
+-- moving a city to another region or after changing IDs.
+CREATE TABLE ActivityRollup (
+    metric ENUM('match', 'gym_battle', 'pokemon_registration', 'tournament_entry') NOT NULL,
+    dimension ENUM('all', 'tournament', 'gym', 'region', 'species', 'season') NOT NULL,
+    dim_id VARCHAR(25) NOT NULL DEFAULT '',
+    grain ENUM('day', 'month') NOT NULL,
+    bucket DATE NOT NULL, -- the day, or the first day of the month
+    events INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (metric, dimension, grain, dim_id, bucket),
+    -- Every dim_id of a dimension over a date range
+    INDEX idx_rollup_bucket (metric, dimension, grain, bucket)
+);
+
+DELIMITER $$
+-- Adds delta events on day d to the day and month rows of one dimension value
+CREATE PROCEDURE rollup_add(IN m VARCHAR(25), IN dim VARCHAR(25), IN id VARCHAR(25), IN d DATE, IN delta INT)
+BEGIN
+    IF d IS NOT NULL AND id IS NOT NULL THEN
+        INSERT INTO ActivityRollup (metric, dimension, dim_id, grain, bucket, events)
+        VALUES (m, dim, id, 'day', d, delta), (m, dim, id, 'month', DATE_FORMAT(d, '%Y-%m-01'), delta)
+        ON DUPLICATE KEY UPDATE events = events + VALUES(events);
+        DELETE FROM ActivityRollup
+        WHERE metric = m AND dimension = dim AND dim_id = id AND events <= 0
+          AND ((grain = 'day' AND bucket = d) OR (grain = 'month' AND bucket = DATE_FORMAT(d, '%Y-%m-01')));
+    END IF;
+END$$
+
+CREATE PROCEDURE rollup_match(IN tid VARCHAR(25), IN d DATE, IN delta INT)
+BEGIN
+    DECLARE r VARCHAR(25);
+    DECLARE s VARCHAR(25);
+    IF @skip_derived_tables IS NULL THEN
+        SELECT C.region_id, T.season_id INTO r, s
+        FROM Tournament T LEFT JOIN City C ON C.city_id = T.city_id WHERE T.tournament_id = tid;
+        CALL rollup_add('match', 'all', '', d, delta);
+        CALL rollup_add('match', 'tournament', tid, d, delta);
+        CALL rollup_add('match', 'region', r, d, delta);
+        CALL rollup_add('match', 'season', s, d, delta);
+    END IF;
+END$$
+
+CREATE PROCEDURE rollup_gym_battle(IN gid VARCHAR(25), IN d DATE, IN delta INT)
+BEGIN
+    DECLARE r VARCHAR(25);
+    IF @skip_derived_tables IS NULL THEN
+        SELECT C.region_id INTO r FROM Gym G LEFT JOIN City C ON C.city_id = G.city_id WHERE G.gym_id = gid;
+        CALL rollup_add('gym_battle', 'all', '', d, delta);
+        CALL rollup_add('gym_battle', 'gym', gid, d, delta);
+        CALL rollup_add('gym_battle', 'region', r, d, delta);
+    END IF;
+END$$
+
+CREATE PROCEDURE rollup_pokemon(IN sid VARCHAR(25), IN trainer VARCHAR(25), IN d DATE, IN delta INT)
+BEGIN
+    DECLARE r VARCHAR(25);
+    IF @skip_derived_tables IS NULL THEN
+        SELECT region_id INTO r FROM Trainer WHERE trainer_id = trainer;
+        CALL rollup_add('pokemon_registration', 'all', '', d, delta);
+        CALL rollup_add('pokemon_registration', 'species', sid, d, delta);
+        CALL rollup_add('pokemon_registration', 'region', r, d, delta);
+    END IF;
+END$$
+
+CREATE PROCEDURE rollup_entry(IN tid VARCHAR(25), IN d DATE, IN delta INT)
+BEGIN
+    DECLARE s VARCHAR(25);
+    IF @skip_derived_tables IS NULL THEN
+        SELECT season_id INTO s FROM Tournament WHERE tournament_id = tid;
+        CALL rollup_add('tournament_entry', 'all', '', d, delta);
+        CALL rollup_add('tournament_entry', 'tournament', tid, d, delta);
+        CALL rollup_add('tournament_entry', 'season', s, d, delta);
+    END IF;
+END$$
+
+CREATE TRIGGER trg_rollup_match_after_insert
+AFTER INSERT ON Match_Table FOR EACH ROW
+BEGIN
+    CALL rollup_match(NEW.tournament_id, NEW.match_date, 1);
+END$$
+
+-- Only a changed date or tournament moves the event to another bucket
+CREATE TRIGGER trg_rollup_match_after_update
+AFTER UPDATE ON Match_Table FOR EACH ROW
+BEGIN
+    IF NOT (OLD.match_date <=> NEW.match_date AND OLD.tournament_id <=> NEW.tournament_id) THEN
+        CALL rollup_match(OLD.tournament_id, OLD.match_date, -1);
+        CALL rollup_match(NEW.tournament_id, NEW.match_date, 1);
+    END IF;
+END$$
+
+CREATE TRIGGER trg_rollup_match_after_delete
+AFTER DELETE ON Match_Table FOR EACH ROW
+BEGIN
+    CALL rollup_match(OLD.tournament_id, OLD.match_date, -1);
+END$$
+
+CREATE TRIGGER trg_rollup_gym_battle_after_insert
+AFTER INSERT ON GymBattle FOR EACH ROW
+BEGIN
+    CALL rollup_gym_battle(NEW.gym_id, NEW.battle_date, 1);
+END$$
+
+CREATE TRIGGER trg_rollup_gym_battle_after_update
+AFTER UPDATE ON GymBattle FOR EACH ROW
+BEGIN
+    IF NOT (OLD.battle_date <=> NEW.battle_date AND OLD.gym_id <=> NEW.gym_id) THEN
+        CALL rollup_gym_battle(OLD.gym_id, OLD.battle_date, -1);
+        CALL rollup_gym_battle(NEW.gym_id, NEW.battle_date, 1);
+    END IF;
+END$$
+
+CREATE TRIGGER trg_rollup_gym_battle_after_delete
+AFTER DELETE ON GymBattle FOR EACH ROW
+BEGIN
+    CALL rollup_gym_battle(OLD.gym_id, OLD.battle_date, -1);
+END$$
+
+CREATE TRIGGER trg_rollup_pokemon_after_insert
+AFTER INSERT ON RegisteredPokemon FOR EACH ROW
+BEGIN
+    CALL rollup_pokemon(NEW.species_id, NEW.trainer_id, NEW.registration_date, 1);
+END$$
+
+-- The region stays the one counted at registration unless the date or species changes
+CREATE TRIGGER trg_rollup_pokemon_after_update
+AFTER UPDATE ON RegisteredPokemon FOR EACH ROW
+BEGIN
+    IF NOT (OLD.registration_date <=> NEW.registration_date AND OLD.species_id <=> NEW.species_id) THEN
+        CALL rollup_pokemon(OLD.species_id, OLD.trainer_id, OLD.registration_date, -1);
+        CALL rollup_pokemon(NEW.species_id, NEW.trainer_id, NEW.registration_date, 1);
+    END IF;
+END$$
+
+CREATE TRIGGER trg_rollup_pokemon_after_delete
+AFTER DELETE ON RegisteredPokemon FOR EACH ROW
+BEGIN
+    CALL rollup_pokemon(OLD.species_id, OLD.trainer_id, OLD.registration_date, -1);
+END$$
+
+CREATE TRIGGER trg_rollup_entry_after_insert
+AFTER INSERT ON TournamentEntry FOR EACH ROW
+BEGIN
+    CALL rollup_entry(NEW.tournament_id, NEW.registration_date, 1);
+END$$
+
+CREATE TRIGGER trg_rollup_entry_after_update
+AFTER UPDATE ON TournamentEntry FOR EACH ROW
+BEGIN
+    IF NOT (OLD.registration_date <=> NEW.registration_date AND OLD.tournament_id <=> NEW.tournament_id) THEN
+        CALL rollup_entry(OLD.tournament_id, OLD.registration_date, -1);
+        CALL rollup_entry(NEW.tournament_id, NEW.registration_date, 1);
+    END IF;
+END$$
+
+CREATE TRIGGER trg_rollup_entry_after_delete
+AFTER DELETE ON TournamentEntry FOR EACH ROW
+BEGIN
+    CALL rollup_entry(OLD.tournament_id, OLD.registration_date, -1);
+END$$
+
+-- Foreign key cascades do not fire triggers: delete the counted child rows
+-- explicitly (Match_Table rows of a tournament are already deleted by
+-- trg_h2h_tournament_before_delete)
+CREATE TRIGGER trg_rollup_tournament_before_delete
+BEFORE DELETE ON Tournament FOR EACH ROW
+BEGIN
+    DELETE FROM TournamentEntry WHERE tournament_id = OLD.tournament_id;
+END$$
+
+CREATE TRIGGER trg_rollup_gym_before_delete
+BEFORE DELETE ON Gym FOR EACH ROW
+BEGIN
+    DELETE FROM GymBattle WHERE gym_id = OLD.gym_id;
+END$$
+
+CREATE TRIGGER trg_rollup_species_before_delete
+BEFORE DELETE ON PokemonSpecies FOR EACH ROW
+BEGIN
+    DELETE FROM RegisteredPokemon WHERE species_id = OLD.species_id;
+END$$
+
+CREATE TRIGGER trg_rollup_trainer_before_delete
+BEFORE DELETE ON Trainer FOR EACH ROW
+BEGIN
+    DELETE FROM GymBattle WHERE challenger_id = OLD.trainer_id;
+    DELETE FROM TournamentEntry WHERE trainer_id = OLD.trainer_id;
+END$$
+
+-- Region -> City -> Gym -> GymBattle cascade: deleting the gyms fires
+-- trg_rollup_gym_before_delete for their battles. Tournaments and trainers
+-- only lose their city/region (SET NULL), so their events stay counted under
+-- the region they had; a deleted region's own rows are dropped here, a
+-- deleted city's region totals are corrected by rebuild_rollups.
+CREATE TRIGGER trg_rollup_city_before_delete
+BEFORE DELETE ON City FOR EACH ROW
+BEGIN
+    DELETE FROM Gym WHERE city_id = OLD.city_id;
+END$$
+
+CREATE TRIGGER trg_rollup_region_before_delete
+BEFORE DELETE ON Region FOR EACH ROW
+BEGIN
+    DELETE FROM City WHERE region_id = OLD.region_id;
+    DELETE FROM ActivityRollup WHERE dimension = 'region' AND dim_id = OLD.region_id;
+END$$
+DELIMITER ;
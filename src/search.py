@@ -0,0 +1,137 @@
+import argparse
+import getpass
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import pymysql
+import db_utils
+import routing
+from pool import ConnectionPool
+
+# =============================================================================
+# PROGRESSIVE GLOBAL SEARCH
+# =============================================================================
+# search_global searches one table after another, so one big table delays
+# every hit from the small ones. run_search spreads the tables over pooled
+# connections instead, smallest tables first:
+#   1. The first limit + 1 matching rows of every table, in primary-key order;
+#      the scan stops as soon as it has them.
+#   2. A COUNT only for the tables that had more than `limit` matches. It
+#      scans every row of the table, so it runs after all the first pages.
+# Results are passed to the callbacks (on the calling thread) as each query
+# finishes; more rows of a table are fetched with db_utils.search_table(...,
+# limit, offset).
+
+SEARCH_PAGE = 50
+SEARCH_JOBS = 4
+
+
+def run_search(pool, search_term, on_count, on_rows, limit=SEARCH_PAGE, tables=None,
+               should_stop=None, running=None):
+    """
+    Searches every table (or `tables`) on up to pool.size connections.
+    on_rows(table, rows) is called with the first `limit` rows of each table
+    with matches, and on_count(table, n) once its number of matches is known:
+    before on_rows if all of them fit in the first page, otherwise when the
+    COUNT finishes (n is None if it failed).
+    should_stop() is checked before every query and callback; `running`
+    (a set) holds the connections with a query in flight, for KILL QUERY.
+    Returns (total matches, seconds).
+    """
+    start = time.perf_counter()
+    stopped = lambda: should_stop is not None and should_stop()
+    with pool.connection() as conn:
+        if tables is None:
+            tables = db_utils.get_all_tables(conn)
+        try:
+            sizes = {t: rows or 0 for t, (_, rows) in db_utils.get_table_fingerprints(conn).items()}
+        except pymysql.Error:
+            sizes = {}
+    tables = sorted(tables, key=lambda t: sizes.get(t, 0))
+
+    def query(func, *args):
+        if stopped():
+            return None
+        with pool.connection() as conn:
+            if running is not None:
+                running.add(conn)
+            try:
+                return func(conn, *args)
+            finally:
+                if running is not None:
+                    running.discard(conn)
+
+    def result(future, table):
+        try:
+            return future.result()
+        except Exception as e:
+            print(f"Search Error ({table}): {e}")
+            return None
+
+    total = 0
+    with ThreadPoolExecutor(max_workers=max(1, pool.size)) as executor:
+        pending = {executor.submit(query, db_utils.search_table, t, search_term, limit + 1): ("rows", t) for t in tables}
+        while pending and not stopped():
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                kind, table = pending.pop(future)
+                value = result(future, table)
+                if stopped():
+                    break
+                if kind == "count":
+                    on_count(table, value)
+                    total += value or 0
+                elif value and len(value) > limit:
+                    on_rows(table, value[:limit])
+                    pending[executor.submit(query, db_utils.count_search_matches, table, search_term)] = ("count", table)
+                else:
+                    on_count(table, len(value or []))
+                    total += len(value or [])
+                    if value:
+                        on_rows(table, value)
+    return total, time.perf_counter() - start
+
+# =============================================================================
+# COMMAND LINE
+# =============================================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Search every table in parallel and print hits as they arrive.")
+    parser.add_argument("term")
+    parser.add_argument("--host", default="localhost", help="host[:port]")
+    parser.add_argument("--user", default="root")
+    parser.add_argument("--password", default=None, help="Prompted for if omitted")
+    parser.add_argument("--db", default="pokemon_league_db")
+    parser.add_argument("--jobs", type=int, default=SEARCH_JOBS, help="Pool size (1 = one table at a time)")
+    parser.add_argument("--limit", type=int, default=SEARCH_PAGE, help="Rows fetched per table")
+
+    args = parser.parse_args(argv)
+    password = args.password if args.password is not None else getpass.getpass("Password: ")
+    host, port = routing.parse_host(args.host)
+    conn = db_utils.get_db_connection(host, args.user, password, args.db, port)
+    if not conn:
+        return 1
+    search_pool = ConnectionPool(conn, size=args.jobs)
+    start = time.perf_counter()
+    elapsed = lambda: f"{(time.perf_counter() - start) * 1000:8.1f} ms"
+
+    def on_count(table, n):
+        if n:
+            print(f"{elapsed()}  {table:<24} {n:>10,} matches")
+        elif n is None:
+            print(f"{elapsed()}  {table:<24} {'failed':>10}")
+
+    def on_rows(table, rows):
+        print(f"{elapsed()}  {table:<24} {len(rows):>10,} rows fetched")
+
+    try:
+        total, seconds = run_search(search_pool, args.term, on_count, on_rows, args.limit)
+    finally:
+        search_pool.close()
+        conn.close()
+    print(f"{total:,} matches in {seconds:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
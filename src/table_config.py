@@ -0,0 +1,288 @@
+# =============================================================================
+# CONFIGURATION (ALL TABLES)
+# =============================================================================
+# Shared by the TUI and the command-line tools (import, export, ...).
+# Keep in sync with schema.sql.
+# "display" names the human-readable column shown in place of raw FK IDs;
+# "display_from" borrows it from another table sharing the same key
+# (GymLeader/Champion IDs are Trainer IDs).
+
+TABLE_CONFIG = {
+    # --- LEVEL 0 (Independent) ---
+    "Region": {
+        "pk": "region_id", "prefix": "R", "display": "region_name",
+        "columns": [
+            {"col": "region_name", "type": "str"},
+            {"col": "main_city", "type": "str"}
+        ]
+    },
+    "Type": {
+        "pk": "type_id", "prefix": "Y", "display": "type_name",
+        "columns": [{"col": "type_name", "type": "str"}]
+    },
+    "Ability": {
+        "pk": "ability_id", "prefix": "A", "display": "ability_name",
+        "columns": [{"col": "ability_name", "type": "str"}, {"col": "effect_description", "type": "str"}]
+    },
+
+    # --- LEVEL 1 ---
+    "City": {
+        "pk": "city_id", "prefix": "C", "display": "city_name",
+        "columns": [
+            {"col": "city_name", "type": "str"},
+            {"col": "region_id", "type": "fk", "ref_table": "Region", "ref_pk": "region_id"}
+        ]
+    },
+    "Move": {
+        "pk": "move_id", "prefix": "M", "display": "move_name",
+        "columns": [
+            {"col": "move_name", "type": "str"},
+            {"col": "power", "type": "int"},
+            {"col": "accuracy", "type": "int"},
+            {"col": "pp", "type": "int"},
+            {"col": "type_id", "type": "fk", "ref_table": "Type", "ref_pk": "type_id"},
+            {"col": "category", "type": "enum", "choices": ["Physical", "Special", "Status"]}
+        ]
+    },
+    "TypeStrength": {
+        "pks": ["type_id", "strong_against_type_id"],
+        "columns": [
+            {"col": "type_id", "type": "fk", "ref_table": "Type", "ref_pk": "type_id"},
+            {"col": "strong_against_type_id", "type": "fk", "ref_table": "Type", "ref_pk": "type_id"}
+        ]
+    },
+    "TypeWeakness": {
+        "pks": ["type_id", "weak_against_type_id"],
+        "columns": [
+            {"col": "type_id", "type": "fk", "ref_table": "Type", "ref_pk": "type_id"},
+            {"col": "weak_against_type_id", "type": "fk", "ref_table": "Type", "ref_pk": "type_id"}
+        ]
+    },
+    "PokemonSpecies": {
+        "pk": "species_id", "prefix": "S", "display": "species_name",
+        "columns": [
+            {"col": "species_name", "type": "str"},
+            {"col": "base_hp", "type": "int"},
+            {"col": "base_attack", "type": "int"},
+            {"col": "base_defense", "type": "int"},
+            {"col": "base_speed", "type": "int"},
+            {"col": "primary_type_id", "type": "fk", "ref_table": "Type", "ref_pk": "type_id"},
+            {"col": "secondary_type_id", "type": "fk", "ref_table": "Type", "ref_pk": "type_id"},
+        ]
+    },
+    "Trainer": {
+        "pk": "trainer_id", "prefix": "T", "display": "name",
+        "columns": [
+            {"col": "name", "type": "str"},
+            {"col": "gender", "type": "enum", "choices": ["Male", "Female", "Other"]},
+            {"col": "birth_date", "type": "date"},
+            {"col": "contact_info_email", "type": "str"},
+            {"col": "contact_info_phone", "type": "str"},
+            {"col": "region_id", "type": "fk", "ref_table": "Region", "ref_pk": "region_id"}
+        ]
+    },
+    "LeagueSeason": {
+        "pk": "season_id", "prefix": "L", "display": "theme",
+        "columns": [
+            {"col": "year", "type": "int"},
+            {"col": "region_id", "type": "fk", "ref_table": "Region", "ref_pk": "region_id"},
+            {"col": "theme", "type": "str"},
+        ]
+    },
+
+    # --- LEVEL 2 ---
+    "PokemonSpeciesAbility": {
+        "pks": ["species_id", "ability_id"],
+        "columns": [
+            {"col": "species_id", "type": "fk", "ref_table": "PokemonSpecies", "ref_pk": "species_id"},
+            {"col": "ability_id", "type": "fk", "ref_table": "Ability", "ref_pk": "ability_id"}
+        ]
+    },
+    "Gym": {
+        "pk": "gym_id", "prefix": "G", "display": "gym_name",
+        "columns": [
+            {"col": "gym_name", "type": "str"},
+            {"col": "city_id", "type": "fk", "ref_table": "City", "ref_pk": "city_id"},
+            {"col": "specialization_type_id", "type": "fk", "ref_table": "Type", "ref_pk": "type_id"},
+        ]
+    },
+    "GymLeader": {
+         "pk": "leader_id", "display": "name", "display_from": "Trainer", 
+         "columns": [
+             {"col": "leader_id", "type": "fk", "ref_table": "Trainer", "ref_pk": "trainer_id"},
+             {"col": "specialty_type_id", "type": "fk", "ref_table": "Type", "ref_pk": "type_id"}, 
+             {"col": "years_of_experience", "type": "int"}
+         ]
+    },
+    "Champion": {
+        "pk": "champion_id", "display": "name", "display_from": "Trainer",
+        "columns": [
+            {"col": "champion_id", "type": "fk", "ref_table": "Trainer", "ref_pk": "trainer_id"},
+            {"col": "title_year", "type": "int"}
+        ]
+    },
+    "RegisteredPokemon": {
+        "pk": "pokemon_id", "prefix": "P", "display": "nickname",
+        "columns": [
+            {"col": "species_id", "type": "fk", "ref_table": "PokemonSpecies", "ref_pk": "species_id"},
+            {"col": "trainer_id", "type": "fk", "ref_table": "Trainer", "ref_pk": "trainer_id"},
+            {"col": "nickname", "type": "str"},
+            {"col": "level", "type": "int"},
+            {"col": "experience_points", "type": "int"},
+            {"col": "registration_date", "type": "date"},
+        ]
+    },
+    "Tournament": {
+        "pk": "tournament_id", "prefix": "O", "display": "tournament_name",
+        "columns": [
+            {"col": "tournament_name", "type": "str"},
+            {"col": "start_date", "type": "date"},
+            {"col": "end_date", "type": "date"},
+            {"col": "city_id", "type": "fk", "ref_table": "City", "ref_pk": "city_id"},
+            {"col": "season_id", "type": "fk", "ref_table": "LeagueSeason", "ref_pk": "season_id"},
+        ]
+    },
+
+    # --- LEVEL 3 ---
+    "RegisteredPokemonMove": {
+        "pks": ["pokemon_id", "move_id"],
+        "columns": [
+            {"col": "pokemon_id", "type": "fk", "ref_table": "RegisteredPokemon", "ref_pk": "pokemon_id"},
+            {"col": "move_id", "type": "fk", "ref_table": "Move", "ref_pk": "move_id"}
+        ]
+    },
+    "GymSeasonRegistry": {
+        "pk": "registry_id", "prefix": "E",
+        "columns": [
+            {"col": "season_id", "type": "fk", "ref_table": "LeagueSeason", "ref_pk": "season_id"},
+            {"col": "gym_id", "type": "fk", "ref_table": "Gym", "ref_pk": "gym_id"},
+            {"col": "leader_id", "type": "fk", "ref_table": "GymLeader", "ref_pk": "leader_id"},
+        ]
+    },
+    "GymBattle": {
+        "pk": "battle_id", "prefix": "B",
+        "columns": [
+            {"col": "challenger_id", "type": "fk", "ref_table": "Trainer", "ref_pk": "trainer_id"},
+            {"col": "gym_id", "type": "fk", "ref_table": "Gym", "ref_pk": "gym_id"},
+            {"col": "leader_id", "type": "fk", "ref_table": "GymLeader", "ref_pk": "leader_id"},
+            {"col": "battle_date", "type": "date"},
+            {"col": "result", "type": "enum", "choices": ["Win", "Loss", "Draw"]},
+        ]
+    },
+    "GymBadge": {
+        "pks": ["gym_id", "badge_number"],
+        "columns": [
+            {"col": "gym_id", "type": "fk", "ref_table": "Gym", "ref_pk": "gym_id"},
+            {"col": "badge_number", "type": "int"},
+            {"col": "date_earned", "type": "date"},
+            {"col": "trainer_id", "type": "fk", "ref_table": "Trainer", "ref_pk": "trainer_id"},
+        ]
+    },
+    "GymBadgeName": {
+        "pk": "gym_id",
+        "columns": [
+            {"col": "gym_id", "type": "fk", "ref_table": "Gym", "ref_pk": "gym_id"},
+            {"col": "badge_name", "type": "str"}
+        ]
+    },
+    "TournamentEntry": {
+        "pks": ["tournament_id", "trainer_id"],
+        "columns": [
+            {"col": "tournament_id", "type": "fk", "ref_table": "Tournament", "ref_pk": "tournament_id"},
+            {"col": "trainer_id", "type": "fk", "ref_table": "Trainer", "ref_pk": "trainer_id"},
+            {"col": "registration_date", "type": "date"},
+        ]
+    },
+    "Match_Table": {
+        "pks": ["tournament_id", "match_number"],
+        "columns": [
+            {"col": "tournament_id", "type": "fk", "ref_table": "Tournament", "ref_pk": "tournament_id"},
+            {"col": "match_number", "type": "int"},
+            {"col": "trainer1_id", "type": "fk", "ref_table": "Trainer", "ref_pk": "trainer_id"},
+            {"col": "trainer2_id", "type": "fk", "ref_table": "Trainer", "ref_pk": "trainer_id"},
+            {"col": "winner_id", "type": "fk", "ref_table": "Trainer", "ref_pk": "trainer_id"},
+            {"col": "match_date", "type": "date"},
+            {"col": "round_number", "type": "int"},
+        ]
+    },
+}
+
+# =============================================================================
+# CHECK RULES (mirrors the constraints in schema.sql)
+# =============================================================================
+# Used to validate rows client-side before they reach the database.
+#   "not_null": columns declared NOT NULL
+#   "range":    {"col", "min", "max"} inclusive bounds, NULL allowed
+#   "order":    {"low", "high"} -> high >= low when both are set
+#   "winner":   winner_id must be NULL or one of the participants
+# ID patterns (^<prefix>[A-Z]{3,16}[0-9]{3}$) are derived from "prefix".
+
+CHECK_RULES = {
+    "Region": {"not_null": ["region_name"]},
+    "Type": {"not_null": ["type_name"]},
+    "Ability": {"not_null": ["ability_name"]},
+    "City": {"not_null": ["city_name"]},
+    "Move": {
+        "not_null": ["move_name", "category"],
+        "range": [
+            {"col": "accuracy", "min": 0, "max": 100},
+            {"col": "power", "min": 0},
+            {"col": "pp", "min": 1},
+        ],
+    },
+    "PokemonSpecies": {
+        "not_null": ["species_name", "base_hp", "base_attack", "base_defense", "base_speed"],
+        "range": [
+            {"col": "base_hp", "min": 1},
+            {"col": "base_attack", "min": 1},
+            {"col": "base_defense", "min": 1},
+            {"col": "base_speed", "min": 1},
+        ],
+    },
+    "Trainer": {"not_null": ["name", "gender"]},
+    "LeagueSeason": {"not_null": ["year"]},
+    "Gym": {"not_null": ["gym_name"]},
+    "GymLeader": {"range": [{"col": "years_of_experience", "min": 0}]},
+    "RegisteredPokemon": {
+        "range": [
+            {"col": "level", "min": 1, "max": 100},
+            {"col": "experience_points", "min": 0},
+        ],
+    },
+    "Tournament": {
+        "not_null": ["tournament_name"],
+        "order": [{"low": "start_date", "high": "end_date"}],
+    },
+    "GymBattle": {"not_null": ["result"]},
+    "GymBadgeName": {"not_null": ["badge_name"]},
+    "Match_Table": {"winner": True},
+}
+
+
+def get_pk_columns(table_name):
+    """Primary key column(s) of a configured table, in order."""
+    config = TABLE_CONFIG.get(table_name, {})
+    if config.get('pks'):
+        return list(config['pks'])
+    if config.get('pk'):
+        return [config['pk']]
+    return []
+
+
+def get_id_pattern(table_name):
+    """Regex for generated IDs (chk_*_id in schema.sql), or None."""
+    prefix = TABLE_CONFIG.get(table_name, {}).get('prefix')
+    if not prefix:
+        return None
+    return rf"^{prefix}[A-Z]{{3,16}}[0-9]{{3}}$"
+
+
+def get_display_source(table_name):
+    """(table, key column, display column) used to label FKs into table_name, or None."""
+    config = TABLE_CONFIG.get(table_name, {})
+    if not config.get('display') or not config.get('pk'):
+        return None
+    source = config.get('display_from')
+    if source:
+        return source, TABLE_CONFIG[source]['pk'], config['display']
+    return table_name, config['pk'], config['display']
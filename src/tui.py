@@ -1,217 +1,93 @@
 import sys
-from datetime import datetime
+import time
+import calendar
+import datetime
+import importlib.util
+
+# =============================================================================
+# STARTUP PROFILING & LAZY IMPORTS
+# =============================================================================
+# Marks are always recorded (they are cheap); --profile-startup prints them.
+
+STARTUP_MARKS = [("tui.py loading", time.perf_counter())]
+
+def mark_startup(label):
+    STARTUP_MARKS.append((label, time.perf_counter()))
+
+def lazy_import(name):
+    """
+    Returns a module object whose real import is deferred until the first
+    attribute access. Keeps pymysql, pyarrow and numpy off the path to the
+    login prompt.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
 from textual.app import App, ComposeResult
-from textual.containers import Container, Horizontal, Vertical, Grid, VerticalScroll
-from textual.widgets import Header, Footer, Button, Static, DataTable, Input, Label, ListView, ListItem, TabbedContent, TabPane, SelectionList
-from textual.screen import ModalScreen, Screen
+from textual.containers import Container, Horizontal, Grid, VerticalScroll
+from textual.widgets import Header, Footer, Button, Static, DataTable, Input, Label, ListView, ListItem, TabbedContent, TabPane, ProgressBar, OptionList
+from textual.widgets.option_list import Option
+from textual.suggester import Suggester
+from textual.screen import ModalScreen
 from textual import on
 from textual.binding import Binding
-from textual.validation import Number, Function
+from textual.coordinate import Coordinate
 from rich.text import Text
-import db_utils
+from rich.table import Table
+mark_startup("textual imported")
+
+db_utils = lazy_import("db_utils")
+exporter = lazy_import("exporter")
+importer = lazy_import("importer")
+fk_lookup = lazy_import("fk_lookup")
+matchups = lazy_import("matchups")
+ratings = lazy_import("ratings")
+dashboard = lazy_import("dashboard")
+dependencies = lazy_import("dependencies")
+pool = lazy_import("pool")
+routing = lazy_import("routing")
+search = lazy_import("search")
+leaderboards = lazy_import("leaderboards")
+analytics = lazy_import("analytics")
+from table_config import TABLE_CONFIG, get_pk_columns
+mark_startup("app modules imported")
 
 # =============================================================================
-# CONFIGURATION (ALL TABLES)
+# CONFIGURATION
 # =============================================================================
+# Table definitions live in table_config.py so non-UI tools can share them.
 
-TABLE_CONFIG = {
-    # --- LEVEL 0 (Independent) ---
-    "Region": {
-        "pk": "region_id", "prefix": "R",
-        "columns": [
-            {"col": "region_name", "type": "str"},
-            {"col": "main_city", "type": "str"}
-        ]
-    },
-    "Type": {
-        "pk": "type_id", "prefix": "Y",
-        "columns": [{"col": "type_name", "type": "str"}]
-    },
-    "Ability": {
-        "pk": "ability_id", "prefix": "A",
-        "columns": [{"col": "ability_name", "type": "str"}, {"col": "effect_description", "type": "str"}]
-    },
-
-    # --- LEVEL 1 ---
-    "City": {
-        "pk": "city_id", "prefix": "C",
-        "columns": [
-            {"col": "city_name", "type": "str"},
-            {"col": "region_id", "type": "fk", "ref_table": "Region", "ref_pk": "region_id"}
-        ]
-    },
-    "Move": {
-        "pk": "move_id", "prefix": "M",
-        "columns": [
-            {"col": "move_name", "type": "str"},
-            {"col": "power", "type": "int"},
-            {"col": "accuracy", "type": "int"},
-            {"col": "pp", "type": "int"},
-            {"col": "type_id", "type": "fk", "ref_table": "Type", "ref_pk": "type_id"},
-            {"col": "category", "type": "enum", "choices": ["Physical", "Special", "Status"]}
-        ]
-    },
-    "TypeStrength": {
-        "pks": ["type_id", "strength"],
-        "columns": [
-            {"col": "type_id", "type": "fk", "ref_table": "Type", "ref_pk": "type_id"},
-            {"col": "strength", "type": "str"}
-        ]
-    },
-    "TypeWeakness": {
-        "pks": ["type_id", "weakness"],
-        "columns": [
-            {"col": "type_id", "type": "fk", "ref_table": "Type", "ref_pk": "type_id"},
-            {"col": "weakness", "type": "str"}
-        ]
-    },
-    "PokemonSpecies": {
-        "pk": "species_id", "prefix": "S",
-        "columns": [
-            {"col": "species_name", "type": "str"},
-            {"col": "base_hp", "type": "int"},
-            {"col": "base_attack", "type": "int"},
-            {"col": "base_defense", "type": "int"},
-            {"col": "base_speed", "type": "int"},
-            {"col": "primary_type_id", "type": "fk", "ref_table": "Type", "ref_pk": "type_id"},
-            {"col": "secondary_type_id", "type": "fk", "ref_table": "Type", "ref_pk": "type_id"},
-        ]
-    },
-    "Trainer": {
-        "pk": "trainer_id", "prefix": "T",
-        "columns": [
-            {"col": "name", "type": "str"},
-            {"col": "gender", "type": "enum", "choices": ["Male", "Female", "Other"]},
-            {"col": "birth_date", "type": "date"},
-            {"col": "contact_info_email", "type": "str"},
-            {"col": "contact_info_phone", "type": "str"},
-            {"col": "region_id", "type": "fk", "ref_table": "Region", "ref_pk": "region_id"}
-        ]
-    },
-    "LeagueSeason": {
-        "pk": "season_id", "prefix": "L",
-        "columns": [
-            {"col": "year", "type": "int"},
-            {"col": "region_id", "type": "fk", "ref_table": "Region", "ref_pk": "region_id"},
-            {"col": "theme", "type": "str"},
-        ]
-    },
-
-    # --- LEVEL 2 ---
-    "PokemonSpeciesAbility": {
-        "pks": ["species_id", "ability_id"],
-        "columns": [
-            {"col": "species_id", "type": "fk", "ref_table": "PokemonSpecies", "ref_pk": "species_id"},
-            {"col": "ability_id", "type": "fk", "ref_table": "Ability", "ref_pk": "ability_id"}
-        ]
-    },
-    "Gym": {
-        "pk": "gym_id", "prefix": "G",
-        "columns": [
-            {"col": "gym_name", "type": "str"},
-            {"col": "city_id", "type": "fk", "ref_table": "City", "ref_pk": "city_id"},
-            {"col": "specialization_type_id", "type": "fk", "ref_table": "Type", "ref_pk": "type_id"},
-        ]
-    },
-    "GymLeader": {
-         "pk": "leader_id", 
-         "columns": [
-             {"col": "leader_id", "type": "fk", "ref_table": "Trainer", "ref_pk": "trainer_id"},
-             {"col": "specialty_type_id", "type": "fk", "ref_table": "Type", "ref_pk": "type_id"}, 
-             {"col": "years_of_experience", "type": "int"}
-         ]
-    },
-    "Champion": {
-        "pk": "champion_id",
-        "columns": [
-            {"col": "champion_id", "type": "fk", "ref_table": "Trainer", "ref_pk": "trainer_id"},
-            {"col": "title_year", "type": "int"}
-        ]
-    },
-    "RegisteredPokemon": {
-        "pk": "pokemon_id", "prefix": "P",
-        "columns": [
-            {"col": "species_id", "type": "fk", "ref_table": "PokemonSpecies", "ref_pk": "species_id"},
-            {"col": "trainer_id", "type": "fk", "ref_table": "Trainer", "ref_pk": "trainer_id"},
-            {"col": "nickname", "type": "str"},
-            {"col": "level", "type": "int"},
-            {"col": "experience_points", "type": "int"},
-            {"col": "registration_date", "type": "date"},
-        ]
-    },
-    "Tournament": {
-        "pk": "tournament_id", "prefix": "O",
-        "columns": [
-            {"col": "tournament_name", "type": "str"},
-            {"col": "start_date", "type": "date"},
-            {"col": "end_date", "type": "date"},
-            {"col": "city_id", "type": "fk", "ref_table": "City", "ref_pk": "city_id"},
-            {"col": "season_id", "type": "fk", "ref_table": "LeagueSeason", "ref_pk": "season_id"},
-        ]
-    },
-
-    # --- LEVEL 3 ---
-    "RegisteredPokemonMove": {
-        "pks": ["pokemon_id", "move_id"],
-        "columns": [
-            {"col": "pokemon_id", "type": "fk", "ref_table": "RegisteredPokemon", "ref_pk": "pokemon_id"},
-            {"col": "move_id", "type": "fk", "ref_table": "Move", "ref_pk": "move_id"}
-        ]
-    },
-    "GymSeasonRegistry": {
-        "pk": "registry_id", "prefix": "E",
-        "columns": [
-            {"col": "season_id", "type": "fk", "ref_table": "LeagueSeason", "ref_pk": "season_id"},
-            {"col": "gym_id", "type": "fk", "ref_table": "Gym", "ref_pk": "gym_id"},
-            {"col": "leader_id", "type": "fk", "ref_table": "GymLeader", "ref_pk": "leader_id"},
-        ]
-    },
-    "GymBattle": {
-        "pk": "battle_id", "prefix": "B",
-        "columns": [
-            {"col": "challenger_id", "type": "fk", "ref_table": "Trainer", "ref_pk": "trainer_id"},
-            {"col": "gym_id", "type": "fk", "ref_table": "Gym", "ref_pk": "gym_id"},
-            {"col": "leader_id", "type": "fk", "ref_table": "GymLeader", "ref_pk": "leader_id"},
-            {"col": "battle_date", "type": "date"},
-            {"col": "result", "type": "enum", "choices": ["Win", "Loss", "Draw"]},
-        ]
-    },
-    "GymBadge": {
-        "pks": ["gym_id", "badge_number"],
-        "columns": [
-            {"col": "gym_id", "type": "fk", "ref_table": "Gym", "ref_pk": "gym_id"},
-            {"col": "badge_number", "type": "int"},
-            {"col": "date_earned", "type": "date"},
-            {"col": "trainer_id", "type": "fk", "ref_table": "Trainer", "ref_pk": "trainer_id"},
-        ]
-    },
-    "GymBadgeName": {
-        "pk": "gym_id",
-        "columns": [
-            {"col": "gym_id", "type": "fk", "ref_table": "Gym", "ref_pk": "gym_id"},
-            {"col": "badge_name", "type": "str"}
-        ]
-    },
-    "TournamentEntry": {
-        "pks": ["tournament_id", "trainer_id"],
-        "columns": [
-            {"col": "tournament_id", "type": "fk", "ref_table": "Tournament", "ref_pk": "tournament_id"},
-            {"col": "trainer_id", "type": "fk", "ref_table": "Trainer", "ref_pk": "trainer_id"},
-            {"col": "registration_date", "type": "date"},
-        ]
-    },
-    "Match_Table": {
-        "pks": ["tournament_id", "match_number"],
-        "columns": [
-            {"col": "tournament_id", "type": "fk", "ref_table": "Tournament", "ref_pk": "tournament_id"},
-            {"col": "match_number", "type": "int"},
-            {"col": "trainer1_id", "type": "fk", "ref_table": "Trainer", "ref_pk": "trainer_id"},
-            {"col": "trainer2_id", "type": "fk", "ref_table": "Trainer", "ref_pk": "trainer_id"},
-            {"col": "winner_id", "type": "fk", "ref_table": "Trainer", "ref_pk": "trainer_id"},
-            {"col": "match_date", "type": "date"},
-            {"col": "round_number", "type": "int"},
-        ]
-    },
+# Change-log polling for the Data Browser (needs `python src/cdc.py install`)
+CHANGE_POLL_SECONDS = 2.0
+CHANGE_BATCH = 500  # more changes than this in one tick -> reload instead of patching
+
+# Reports streamed chunk by chunk (cancellable with Esc; rows so far stay on screen)
+STREAMED_REPORTS = {
+    "rep_1": "MANAGES_REPORT_SQL",
+    "rep_2": "ASSIGNED_TO_GYM_REPORT_SQL",
+    "rep_3": "POKEMON_ABILITIES_REPORT_SQL",
+}
+REPORT_CHUNK = 200
+RIVALS_LIMIT = 50
+
+# Rows formatted and added to a grid at a time (see PagedDataTable)
+GRID_PAGE = 200
+
+# Report buttons -> exporter.REPORTS names
+REPORT_EXPORT_NAMES = {
+    "rep_1": "manages",
+    "rep_2": "assigned_to_gym",
+    "rep_3": "pokemon_abilities",
+    "rep_4": "gym_type_coverage",
+    "rep_5": "roster_type_coverage",
+    "rep_6": "rating_leaderboard",
 }
 
 LOGO_ASCII = r"""
@@ -224,6 +100,119 @@ LOGO_ASCII = r"""
    DB MANAGER v2.0 - [bold yellow]Phase 4[/bold yellow]
 """
 
+# =============================================================================
+# PAGED GRIDS
+# =============================================================================
+# A DataTable measures and renders every cell it is given, so 50,000 rows
+# freeze the UI for seconds. PagedDataTable keeps the rows as data and adds
+# them a page at a time, formatting only those, whenever the cursor or the
+# scroll position comes within a page of the last row shown.
+
+class PagedDataTable(DataTable):
+    def __init__(self, *args, **kwargs):
+        self.source = [] # every row; source[:shown] are in the DataTable
+        self.shown = 0
+        self.format_row = lambda row: [str(v) for v in row.values()]
+        self.key_of = None # row -> DataTable row key
+        self.inserting = False # add_row moves the cursor, which must not fill() mid-insert
+        super().__init__(*args, **kwargs)
+
+    def set_rows(self, rows, format_row=None, key_of=None):
+        """Replaces the rows but keeps the columns. `rows` is kept, not copied."""
+        self.clear()
+        self.source = rows
+        if format_row is not None:
+            self.format_row = format_row
+        self.key_of = key_of
+        self.fill()
+
+    def append_rows(self, rows):
+        self.source.extend(rows)
+        self.fill()
+
+    def show_row(self, index):
+        """Adds rows up to source[index], e.g. before moving the cursor there."""
+        self.fill(index + 1)
+
+    def replace_row(self, index, row):
+        self.source[index] = row
+        if index < self.shown:
+            for column, cell in enumerate(self.format_row(row)):
+                self.update_cell_at(Coordinate(index, column), cell)
+
+    def refresh_row(self, key):
+        """Formats the row with this key again (a row not added yet is formatted when it is)."""
+        if key in self.rows:
+            index = self.get_row_index(key)
+            self.replace_row(index, self.source[index])
+
+    def insert_rows(self, index, rows):
+        """Inserts rows before source[index] without re-adding the rows already shown."""
+        self.source[index:index] = rows
+        if index >= self.shown:
+            self.fill()
+            return
+        # Add them at the bottom, then move them into place in one pass over
+        # the row positions (what DataTable.remove_row() does)
+        start = self.shown
+        self.inserting = True
+        try:
+            for row in rows:
+                self.add_row(*self.format_row(row), key=self.key_of(row) if self.key_of else None)
+        finally:
+            self.inserting = False
+        self.shown += len(rows)
+        moved = {}
+        for key in self._row_locations:
+            at = self._row_locations.get(key)
+            if at >= start:
+                at = index + at - start
+            elif at >= index:
+                at += len(rows)
+            moved[key] = at
+        self._row_locations = type(self._row_locations)(moved)
+        self._update_count += 1
+        self.refresh()
+
+    def remove_rows(self, indexes):
+        """Removes rows by position (source is changed in place)."""
+        gone = set(indexes)
+        keys = [self.coordinate_to_cell_key(Coordinate(i, 0)).row_key for i in gone if i < self.shown]
+        for key in keys:
+            self.remove_row(key)
+        self.shown -= len(keys)
+        self.source[:] = [row for i, row in enumerate(self.source) if i not in gone]
+
+    def fill(self, upto=None):
+        """Adds the next rows, up to one page past the cursor or the bottom of the view."""
+        if self.inserting:
+            return
+        if upto is None:
+            upto = max(self.cursor_row, int(self.scroll_y) + self.size.height) + GRID_PAGE
+        upto = min(upto, len(self.source))
+        if upto <= self.shown:
+            return
+        batch = self.source[self.shown:upto]
+        self.shown = upto
+        if self.key_of is None:
+            self.add_rows([self.format_row(row) for row in batch])
+        else:
+            for row in batch:
+                self.add_row(*self.format_row(row), key=self.key_of(row))
+
+    def clear(self, columns=False):
+        self.source = []
+        self.shown = 0
+        return super().clear(columns)
+
+    def watch_scroll_y(self, old_value, new_value):
+        super().watch_scroll_y(old_value, new_value)
+        self.fill()
+
+    def watch_cursor_coordinate(self, old_coordinate, new_coordinate):
+        super().watch_cursor_coordinate(old_coordinate, new_coordinate)
+        self.fill()
+
 # =============================================================================
 # SCREENS & MODALS
 # =============================================================================
@@ -248,12 +237,17 @@ class LoginScreen(ModalScreen):
             Label("User:"), Input(placeholder="root", id="user", value="root"),
             Label("Password:"), Input(placeholder="", password=True, id="password"),
             Label("Database:"), Input(placeholder="pokemon_league_db", id="db_name", value="pokemon_league_db"),
+            Label("Replicas:"), Input(placeholder="optional: host:port, host:port", id="replicas"),
             Button("Connect", variant="success", id="btn_connect"),
             id="login_dialog"
         )
 
     def on_mount(self) -> None:
         self.query_one("#host").focus()
+        mark_startup("login prompt ready")
+        if getattr(self.app, "profile_startup", False):
+            total = (STARTUP_MARKS[-1][1] - STARTUP_MARKS[0][1]) * 1000
+            self.notify(f"Login prompt ready after {total:.0f} ms", title="Startup")
 
     def action_cancel(self):
         self.dismiss(None)
@@ -269,7 +263,23 @@ class LoginScreen(ModalScreen):
         user = self.query_one("#user", Input).value
         password = self.query_one("#password", Input).value
         db_name = self.query_one("#db_name", Input).value
-        self.dismiss((host, user, password, db_name))
+        replicas = [r for r in self.query_one("#replicas", Input).value.split(",") if r.strip()]
+        self.dismiss((host, user, password, db_name, replicas))
+
+
+class FKSuggester(Suggester):
+    """Inline completion of FK ids from the referenced table's FKIndex."""
+
+    def __init__(self, registry, ref_table):
+        super().__init__(use_cache=False)
+        self.registry = registry
+        self.ref_table = ref_table
+
+    async def get_suggestion(self, value):
+        index = self.registry.get(self.ref_table) if self.registry else None
+        if index is None or not value:
+            return None
+        return index.complete_id(value)
 
 
 class RecordForm(ModalScreen):
@@ -286,17 +296,21 @@ class RecordForm(ModalScreen):
     .pk_container { height: auto; margin-bottom: 1; }
     .pk_input { width: 80%; }
     .pk_unlock_btn { width: 20%; min-width: 10; margin-left: 1; }
+    .fk_options { height: auto; max-height: 8; display: none; }
     """
     
     BINDINGS = [("escape", "cancel", "Cancel")]
 
-    def __init__(self, conn, table_name, record_data=None, mode="add"):
+    def __init__(self, conn, table_name, record_data=None, mode="add", fk_index=None):
         super().__init__()
         self.conn = conn
         self.table_name = table_name
         self.record_data = record_data or {}
         self.mode = mode
         self.pk_cols = [] # Track PK columns to toggle them
+        self.fk_index = fk_index # fk_lookup.FKIndexRegistry for FK suggestions
+        self.fk_refs = {c['col']: c['ref_table'] for c in TABLE_CONFIG.get(table_name, {}).get('columns', [])
+                        if c['type'] == 'fk'}
 
     def action_cancel(self):
         self.dismiss(None)
@@ -348,7 +362,10 @@ class RecordForm(ModalScreen):
                     # DISABLE INPUT if it is a PK and we are in UPDATE mode
                     is_pk_in_update = (self.mode == "update" and col_name in pk_set)
                     
-                    inp = Input(value=value, id=f"inp_{col_name}", disabled=is_pk_in_update)
+                    suggester = None
+                    if col_type == 'fk' and self.fk_index is not None:
+                        suggester = FKSuggester(self.fk_index, col_def['ref_table'])
+                    inp = Input(value=value, id=f"inp_{col_name}", disabled=is_pk_in_update, suggester=suggester)
                     
                     if is_pk_in_update:
                         # Render input alongside a small "Unlock" button
@@ -358,11 +375,49 @@ class RecordForm(ModalScreen):
                             yield Button("Unlock", id=f"unlock_{col_name}", variant="warning", classes="pk_unlock_btn")
                     else:
                         yield inp
+                    if suggester is not None:
+                        yield OptionList(id=f"fk_opts_{col_name}", classes="fk_options")
             
             with Horizontal(id="form_buttons"):
                 yield Button("Save", variant="success", id="btn_save")
                 yield Button("Cancel", variant="error", id="btn_cancel")
 
+    def on_mount(self) -> None:
+        missing = [t for t in set(self.fk_refs.values()) if self.fk_index is not None and self.fk_index.get(t) is None]
+        if missing:
+            self.run_worker(lambda: self.build_fk_indexes(missing), thread=True)
+
+    def build_fk_indexes(self, tables):
+        """Builds missing FK indexes on a separate connection (large tables take a moment)."""
+        index_conn = db_utils.clone_connection(self.conn, for_read=True)
+        if index_conn is None:
+            return
+        try:
+            for table in tables:
+                self.fk_index.ensure(index_conn, table)
+        except Exception as e:
+            self.app.call_from_thread(self.notify, f"FK suggestions unavailable: {e}", severity="warning")
+        finally:
+            index_conn.close()
+
+    def on_input_changed(self, event: Input.Changed) -> None:
+        col_name = (event.input.id or "")[len("inp_"):]
+        if col_name not in self.fk_refs or self.fk_index is None:
+            return
+        options = self.query_one(f"#fk_opts_{col_name}", OptionList)
+        index = self.fk_index.get(self.fk_refs[col_name])
+        matches = index.search(event.value, limit=6) if index is not None and event.input.has_focus else []
+        options.clear_options()
+        options.add_options([Option(f"{key}  {name or ''}", id=str(key)) for key, name in matches])
+        options.display = bool(matches) and matches[0][0] != event.value
+
+    def on_option_list_option_selected(self, event: OptionList.OptionSelected) -> None:
+        col_name = event.option_list.id[len("fk_opts_"):]
+        inp = self.query_one(f"#inp_{col_name}", Input)
+        inp.value = event.option.id
+        event.option_list.display = False
+        inp.focus()
+
     def on_button_pressed(self, event: Button.Pressed) -> None:
         if event.button.id == "btn_cancel":
             self.dismiss(None)
@@ -402,21 +457,29 @@ class ConfirmationModal(ModalScreen):
     """Simple confirmation dialog."""
     CSS = """
     ConfirmationModal { align: center middle; background: $background 80%; }
-    #confirm_box { width: 40; height: auto; background: $surface; border: thick $error; padding: 2; }
-    #confirm_text { text-align: center; margin-bottom: 2; }
+    #confirm_box { width: 60; height: auto; background: $surface; border: thick $error; padding: 2; }
+    #confirm_text { text-align: center; margin-bottom: 1; }
+    #confirm_details { margin-bottom: 2; color: $text-muted; }
     """
     BINDINGS = [("escape", "cancel", "Cancel")]
     
-    def __init__(self, message):
+    def __init__(self, message, details=""):
         super().__init__()
         self.message = message
+        self.details = details
         
     def action_cancel(self):
         self.dismiss(False)
 
+    def set_details(self, details):
+        """Fills in information that arrives after the modal opened (e.g. delete impact)."""
+        if self.is_attached:
+            self.query_one("#confirm_details", Label).update(details)
+
     def compose(self) -> ComposeResult:
         with Container(id="confirm_box"):
             yield Label(self.message, id="confirm_text")
+            yield Label(self.details, id="confirm_details")
             with Horizontal():
                 yield Button("Yes", variant="error", id="btn_yes")
                 yield Button("No", variant="primary", id="btn_no")
@@ -425,6 +488,149 @@ class ConfirmationModal(ModalScreen):
         self.dismiss(event.button.id == "btn_yes")
 
 
+class ExportModal(ModalScreen):
+    """Streams the current view (table, filter, search or report) to a file."""
+    CSS = """
+    ExportModal { align: center middle; background: $background 80%; }
+    #export_box { width: 70; height: auto; background: $surface; border: thick $primary; padding: 2; }
+    #export_title { text-style: bold; margin-bottom: 1; }
+    #export_formats Button { width: 1fr; margin-right: 1; }
+    #export_progress { margin-top: 1; }
+    #export_status { margin-top: 1; }
+    """
+    BINDINGS = [("escape", "cancel", "Cancel")]
+
+    def __init__(self, description, default_name, job):
+        super().__init__()
+        self.description = description
+        self.default_name = default_name
+        # job(path, fmt, progress) -> rows written; runs in a worker thread
+        self.job = job
+        self.running = False
+
+    def action_cancel(self):
+        if not self.running:
+            self.dismiss(None)
+
+    def compose(self) -> ComposeResult:
+        with Container(id="export_box"):
+            yield Label(f"Export: {self.description}", id="export_title")
+            yield Label("File path (extension is added if missing):")
+            yield Input(value=self.default_name, id="export_path")
+            with Horizontal(id="export_formats"):
+                for fmt in exporter.FORMATS:
+                    yield Button(fmt.upper(), id=f"fmt_{fmt}", variant="primary")
+            yield ProgressBar(id="export_progress", show_eta=False)
+            yield Label("", id="export_status")
+            yield Button("Close", variant="error", id="btn_export_close")
+
+    def on_button_pressed(self, event: Button.Pressed) -> None:
+        if event.button.id == "btn_export_close":
+            self.action_cancel()
+        elif event.button.id.startswith("fmt_") and not self.running:
+            fmt = event.button.id.split("_", 1)[1]
+            path = self.query_one("#export_path", Input).value.strip() or self.default_name
+            if not path.lower().endswith(f".{fmt}"):
+                path = f"{path}.{fmt}"
+            self.running = True
+            self.query_one("#export_status", Label).update(f"Exporting to {path}...")
+            self.run_worker(lambda: self.run_export(path, fmt), thread=True, exclusive=True)
+
+    def run_export(self, path, fmt):
+        bar = self.query_one("#export_progress", ProgressBar)
+        status = self.query_one("#export_status", Label)
+
+        def progress(done, total):
+            self.app.call_from_thread(bar.update, total=total, progress=done)
+            self.app.call_from_thread(status.update, f"{done:,} rows written...")
+
+        try:
+            count = self.job(path, fmt, progress)
+            message = f"Done: {count:,} rows written to {path}"
+        except Exception as e:
+            message = f"Export failed: {e}"
+        self.running = False
+        self.app.call_from_thread(status.update, message)
+
+
+class ImportModal(ModalScreen):
+    """Bulk-loads a CSV/JSONL file into a table through importer.py."""
+    CSS = """
+    ImportModal { align: center middle; background: $background 80%; }
+    #import_box { width: 70; height: auto; background: $surface; border: thick $primary; padding: 2; }
+    #import_title { text-style: bold; margin-bottom: 1; }
+    #import_status { margin-top: 1; }
+    """
+    BINDINGS = [("escape", "cancel", "Cancel")]
+
+    def __init__(self, conn, table_name):
+        super().__init__()
+        self.conn = conn
+        self.table_name = table_name or ""
+        self.running = False
+        self.summary = None
+
+    def action_cancel(self):
+        if not self.running:
+            self.dismiss(self.summary)
+
+    def compose(self) -> ComposeResult:
+        with Container(id="import_box"):
+            yield Label("Bulk Import (CSV with header, or JSONL)", id="import_title")
+            yield Label("Table:")
+            yield Input(value=self.table_name, id="import_table")
+            yield Label("File path:")
+            yield Input(placeholder="trainers.csv", id="import_path")
+            yield Label("Rejected rows file (optional):")
+            yield Input(placeholder="<file>.rejects.csv", id="import_rejects")
+            yield Label("", id="import_status")
+            with Horizontal():
+                yield Button("Start", variant="success", id="btn_import_start")
+                yield Button("Close", variant="error", id="btn_import_close")
+
+    def on_button_pressed(self, event: Button.Pressed) -> None:
+        if event.button.id == "btn_import_close":
+            self.action_cancel()
+        elif event.button.id == "btn_import_start" and not self.running:
+            table = self.query_one("#import_table", Input).value.strip()
+            path = self.query_one("#import_path", Input).value.strip()
+            rejects = self.query_one("#import_rejects", Input).value.strip() or f"{path}.rejects.csv"
+            if table not in TABLE_CONFIG:
+                self.notify(f"Unknown table: {table}", severity="error")
+                return
+            if not path:
+                self.notify("Enter a file path.", severity="warning")
+                return
+            self.running = True
+            self.run_worker(lambda: self.run_import(table, path, rejects), thread=True, exclusive=True)
+
+    def run_import(self, table, path, rejects):
+        status = self.query_one("#import_status", Label)
+
+        def progress(processed, inserted, rejected):
+            self.app.call_from_thread(status.update, f"{processed:,} read, {inserted:,} inserted, {rejected:,} rejected...")
+
+        # Imports commit in their own transactions, so use a separate connection
+        import_conn = db_utils.clone_connection(self.conn)
+        if import_conn is None:
+            message = "Import failed: could not open a connection."
+        else:
+            try:
+                self.summary = importer.import_file(import_conn, table, path, rejects, progress=progress)
+                message = (f"Done: {self.summary['inserted']:,} inserted, {self.summary['rejected']:,} rejected "
+                           f"({self.summary['rows_per_sec']:,.0f} rows/s)")
+                if self.summary['rejected']:
+                    message += f"\nRejected rows: {rejects}"
+                if "ratings" in self.summary and self.summary["ratings"] is None:
+                    message += "\nRatings were not rebuilt; run `python src/ratings.py rebuild`."
+            except Exception as e:
+                message = f"Import failed: {e}"
+            finally:
+                import_conn.close()
+        self.running = False
+        self.app.call_from_thread(status.update, message)
+
+
 class DetailModal(ModalScreen):
     """Detail view for drilling down."""
     
@@ -456,6 +662,276 @@ class DetailModal(ModalScreen):
 # MAIN APPLICATION
 # =============================================================================
 
+class DashboardScreen(ModalScreen):
+    """Runs every dashboard report at once on pooled connections; panels fill in as they finish."""
+    CSS = """
+    DashboardScreen { align: center middle; background: $background 80%; }
+    #dash_box { width: 95%; height: 95%; background: $surface; border: thick $primary; padding: 1; }
+    #dash_title { text-style: bold; margin-bottom: 1; }
+    #dash_grid { grid-size: 2; grid-gutter: 1 2; height: 1fr; }
+    .dash_panel { border: solid $secondary; height: 100%; }
+    .dash_panel DataTable { height: 1fr; border: none; }
+    .dash_status { color: $text-muted; }
+    """
+    BINDINGS = [("escape", "close", "Close")]
+
+    def __init__(self, conn, boards=None, snapshot=None):
+        super().__init__()
+        self.conn = conn
+        self.boards = boards # leaderboards.LeaderboardService; its panels are served from memory
+        self.snapshot = snapshot # analytics.AnalyticsSnapshot; serves region power, underrated trainers, species MVP
+        self.closed = False
+        self.started = None
+        self.pending = len(dashboard.PANELS)
+
+    def compose(self) -> ComposeResult:
+        with Container(id="dash_box"):
+            yield Label(f"Dashboard: running {len(dashboard.PANELS)} reports in parallel...", id="dash_title")
+            with Grid(id="dash_grid"):
+                for key, title, _, _ in dashboard.PANELS:
+                    with Container(classes="dash_panel"):
+                        yield Label(title)
+                        yield Label("Running...", id=f"dash_status_{key}", classes="dash_status")
+                        yield DataTable(id=f"dash_table_{key}")
+
+    def on_mount(self) -> None:
+        self.started = time.perf_counter()
+        self.run_worker(self.run_dashboard, thread=True)
+
+    def run_dashboard(self):
+        in_memory = {}
+        if self.snapshot is not None:
+            for key, report in (("region_power", self.snapshot.get_region_power_report),
+                                ("underrated_trainers", self.snapshot.get_underrated_trainer_report),
+                                ("species_mvp", self.snapshot.get_species_mvp_report)):
+                in_memory[key] = lambda report=report, **kw: self.read_snapshot(report, **kw)
+        if self.boards is not None:
+            in_memory.update({"badge_leaderboard": self.boards.badge_leaderboard,
+                              "elite_pokemon": self.boards.elite_pokemon,
+                              "species_mvp": self.boards.species_mvp})
+        panels = [(key, title, (lambda conn, read=in_memory[key], **kw: read(**kw)) if key in in_memory else func, kwargs)
+                  for key, title, func, kwargs in dashboard.PANELS]
+        panel_pool = pool.ConnectionPool(self.conn, size=len(dashboard.PANELS))
+        try:
+            dashboard.run_panels(panel_pool,
+                                 lambda key, rows, seconds: self.app.call_from_thread(self.fill_panel, key, rows, seconds),
+                                 panels, should_stop=lambda: self.closed)
+        finally:
+            panel_pool.close()
+
+    def read_snapshot(self, report, **kwargs):
+        with self.snapshot.lock:
+            # Reloads only the tables written since the last dashboard
+            self.snapshot.conn.ping(reconnect=True)
+            self.snapshot.refresh()
+            return report(**kwargs)
+
+    def fill_panel(self, key, rows, seconds):
+        if self.closed:
+            return
+        status = self.query_one(f"#dash_status_{key}", Label)
+        table = self.query_one(f"#dash_table_{key}", DataTable)
+        if rows is None:
+            status.update(f"Failed after {seconds:.2f}s")
+        else:
+            status.update(f"{len(rows):,} rows in {seconds:.2f}s")
+            if rows:
+                table.add_columns(*rows[0].keys())
+                table.add_rows([[str(v) for v in row.values()] for row in rows])
+        self.pending -= 1
+        if self.pending == 0:
+            total = time.perf_counter() - self.started
+            self.query_one("#dash_title", Label).update(f"Dashboard: {len(dashboard.PANELS)} reports ready in {total:.2f}s")
+
+    def action_close(self):
+        self.closed = True
+        self.dismiss(None)
+
+
+class RivalryScreen(ModalScreen):
+    """Head-to-head drill-down for one trainer: top rivals, and the record against any opponent."""
+    CSS = """
+    RivalryScreen { align: center middle; background: $background 80%; }
+    #rival_box { width: 85%; height: 85%; background: $surface; border: thick $primary; padding: 1; }
+    #rival_title { text-style: bold; margin-bottom: 1; }
+    #rival_record { margin: 1 0; }
+    #rival_table { height: 1fr; }
+    """
+    BINDINGS = [("escape", "close", "Close")]
+
+    def __init__(self, conn, trainer_id, trainer_name=None):
+        super().__init__()
+        self.conn = conn
+        self.trainer_id = trainer_id
+        self.trainer_name = trainer_name or trainer_id
+        self.rivals = []
+
+    def compose(self) -> ComposeResult:
+        with Container(id="rival_box"):
+            yield Label(f"Head-to-head: {self.trainer_name} ({self.trainer_id})", id="rival_title")
+            yield Input(placeholder="Opponent trainer ID (Enter to look up)", id="rival_opponent")
+            yield Label("Select a rival or enter an opponent ID.", id="rival_record")
+            yield DataTable(id="rival_table", cursor_type="row")
+
+    def on_mount(self) -> None:
+        self.rivals = db_utils.get_rivals(self.conn, self.trainer_id, RIVALS_LIMIT)
+        names = db_utils.get_display_names(self.conn, "Trainer", "trainer_id", "name",
+                                           [r['opponent_id'] for r in self.rivals])
+        table = self.query_one("#rival_table", DataTable)
+        table.add_columns("Opponent", "Name", "Matches", "W", "L", "Undecided", "Win %", "Last Match")
+        for r in self.rivals:
+            decided = r['wins'] + r['losses']
+            table.add_row(r['opponent_id'], str(names.get(r['opponent_id'], "")), str(r['matches']),
+                          str(r['wins']), str(r['losses']), str(r['undecided']),
+                          f"{100 * r['wins'] / decided:.0f}%" if decided else "-", str(r['last_match_date'] or ""))
+        if not self.rivals:
+            self.show_record(None, None)
+
+    def show_record(self, opponent_id, record):
+        label = self.query_one("#rival_record", Label)
+        if opponent_id is None:
+            label.update("No matches against other trainers yet.")
+        elif record is None:
+            label.update("Head-to-head could not be read.")
+        elif not record['matches']:
+            label.update(f"{self.trainer_id} has never played {opponent_id}.")
+        else:
+            last = f"{record['last_tournament_id']} #{record['last_match_number']}"
+            if record['last_match_date']:
+                last += f" on {record['last_match_date']}"
+            undecided = f", {record['undecided']} undecided" if record['undecided'] else ""
+            label.update(f"vs {opponent_id}: {record['matches']} matches, {record['wins']}-{record['losses']} (W-L)"
+                         f"{undecided}, last {last}")
+
+    def on_input_submitted(self, event: Input.Submitted) -> None:
+        opponent = event.value.strip()
+        if opponent:
+            self.show_record(opponent, db_utils.get_head_to_head(self.conn, self.trainer_id, opponent))
+
+    def on_data_table_row_highlighted(self, event: DataTable.RowHighlighted) -> None:
+        if event.cursor_row < len(self.rivals):
+            rival = self.rivals[event.cursor_row]
+            self.show_record(rival['opponent_id'], rival)
+
+    def action_close(self):
+        self.dismiss(None)
+
+
+class CalendarScreen(ModalScreen):
+    """Month calendar of matches, gym battles or registrations, read from the ActivityRollup counters."""
+    CSS = """
+    CalendarScreen { align: center middle; background: $background 80%; }
+    #cal_box { width: 85%; height: 85%; background: $surface; border: thick $primary; padding: 1; }
+    #cal_controls { height: auto; margin-bottom: 1; }
+    #cal_controls Button { width: auto; min-width: 5; margin: 0 1 0 0; }
+    #cal_filter { width: 1fr; }
+    #cal_title { text-style: bold; margin-bottom: 1; }
+    #cal_grid { height: auto; margin-bottom: 1; }
+    """
+    BINDINGS = [("escape", "close", "Close"),
+                ("pageup", "prev_month", "Previous Month"),
+                ("pagedown", "next_month", "Next Month")]
+    METRICS = [("match", "Matches"), ("gym_battle", "Gym Battles"),
+               ("pokemon_registration", "Pokemon Registrations"), ("tournament_entry", "Tournament Entries")]
+
+    def __init__(self, conn, month=None):
+        super().__init__()
+        self.conn = conn
+        self.month = (month or datetime.date.today()).replace(day=1)
+        self.metric_index = 0
+        self.dim_id = ""
+
+    def compose(self) -> ComposeResult:
+        with Container(id="cal_box"):
+            with Horizontal(id="cal_controls"):
+                yield Button("<", id="cal_prev")
+                yield Button(">", id="cal_next")
+                yield Button(self.METRICS[0][1], id="cal_metric", variant="primary")
+                yield Input(placeholder="Tournament, gym, region, species or season ID (Enter; blank = all)", id="cal_filter")
+            yield Label("", id="cal_title")
+            yield Static(id="cal_grid")
+            yield Static(id="cal_year")
+
+    def on_mount(self) -> None:
+        self.refresh_calendar()
+
+    def dimension_for(self, metric, dim_id):
+        """Rollup dimension of an ID, from its table prefix ('all' if blank, None if not rolled up)."""
+        if not dim_id:
+            return "all"
+        for dimension, table in db_utils.ROLLUP_DIMENSION_TABLES.items():
+            if dimension in db_utils.ROLLUP_SOURCES[metric][2] and dim_id.startswith(TABLE_CONFIG[table]['prefix']):
+                return dimension
+        return None
+
+    def refresh_calendar(self):
+        metric, label = self.METRICS[self.metric_index]
+        self.query_one("#cal_metric", Button).label = label
+        dimension = self.dimension_for(metric, self.dim_id)
+        if dimension is None:
+            self.query_one("#cal_title", Label).update(f"{label} are not counted per {self.dim_id}.")
+            self.query_one("#cal_grid", Static).update("")
+            self.query_one("#cal_year", Static).update("")
+            return
+        month_end = calendar.monthrange(self.month.year, self.month.month)[1]
+        days = {r['bucket']: r['events'] for r in db_utils.get_rollup_series(
+            self.conn, metric, self.month, self.month.replace(day=month_end), "day", dimension, self.dim_id)}
+        year_start = self.month.replace(month=1)
+        months = {r['bucket'].month: r['events'] for r in db_utils.get_rollup_series(
+            self.conn, metric, year_start, year_start.replace(month=12, day=31), "month", dimension, self.dim_id)}
+
+        scope = f"{dimension} {self.dim_id}" if self.dim_id else "all"
+        self.query_one("#cal_title", Label).update(
+            f"{label} in {self.month:%B %Y} ({scope}): {sum(days.values()):,}")
+        busiest = max(days.values(), default=0)
+        grid = Table(expand=True, show_lines=True)
+        for name in calendar.day_abbr:
+            grid.add_column(name, justify="center")
+        for week in calendar.Calendar().monthdatescalendar(self.month.year, self.month.month):
+            cells = []
+            for day in week:
+                if day.month != self.month.month:
+                    cells.append("")
+                    continue
+                events = days.get(day, 0)
+                style = "dim" if not events else ("bold reverse" if events * 2 > busiest else "bold")
+                cells.append(Text(f"{day.day}\n{events:,}" if events else f"{day.day}\n-", style=style))
+            grid.add_row(*cells)
+        self.query_one("#cal_grid", Static).update(grid)
+
+        year = Table(title=f"{self.month.year} by month", expand=True)
+        for number in range(1, 13):
+            year.add_column(calendar.month_abbr[number], justify="right",
+                            style="bold" if number == self.month.month else None)
+        year.add_column("Total", justify="right")
+        year.add_row(*[f"{months.get(number, 0):,}" for number in range(1, 13)], f"{sum(months.values()):,}")
+        self.query_one("#cal_year", Static).update(year)
+
+    def on_button_pressed(self, event: Button.Pressed) -> None:
+        if event.button.id == "cal_prev":
+            self.action_prev_month()
+        elif event.button.id == "cal_next":
+            self.action_next_month()
+        elif event.button.id == "cal_metric":
+            self.metric_index = (self.metric_index + 1) % len(self.METRICS)
+            self.refresh_calendar()
+
+    def on_input_submitted(self, event: Input.Submitted) -> None:
+        self.dim_id = event.value.strip()
+        self.refresh_calendar()
+
+    def action_prev_month(self):
+        self.month = (self.month - datetime.timedelta(days=1)).replace(day=1)
+        self.refresh_calendar()
+
+    def action_next_month(self):
+        self.month = (self.month + datetime.timedelta(days=32)).replace(day=1)
+        self.refresh_calendar()
+
+    def action_close(self):
+        self.dismiss(None)
+
+
 class PokemonTUI(App):
     CSS = """
     Screen { align: center middle; }
@@ -479,19 +955,44 @@ class PokemonTUI(App):
         Binding("d", "delete_record", "Delete"),
         Binding("u", "update_record", "Update"),
         Binding("r", "refresh_table", "Refresh"),
+        Binding("e", "export_view", "Export"),
+        Binding("i", "import_file", "Import"),
+        Binding("n", "toggle_fk_names", "FK Names"),
+        Binding("escape", "cancel_query", "Cancel Query"),
+        Binding("g", "open_dashboard", "Dashboard"),
+        Binding("v", "open_rivals", "Rivals"),
+        Binding("c", "open_calendar", "Calendar"),
         Binding("j", "cursor_down", "Down", show=False),
         Binding("k", "cursor_up", "Up", show=False),
         Binding("h", "cursor_left", "Left", show=False),
         Binding("l", "cursor_right", "Right", show=False),
     ]
 
-    def __init__(self):
+    def __init__(self, profile_startup=False):
         super().__init__()
+        self.profile_startup = profile_startup
+        self.built_tabs = set()
         self.conn = None
         self.current_table = None
         self.current_table_data = [] # Ensure initialized
+        self.fk_names = None # fk_lookup.DisplayNameCache, created after login
+        self.fk_index = None # fk_lookup.FKIndexRegistry, created after login
+        self.show_fk_names = True
+        self.current_filter = None
+        self.last_search_term = None
+        self.last_report_id = None
+        self.matchups = None # matchups.MatchupAnalyzer, built on first matchup report
+        self.change_cursor = None # ChangeLog watermark and gaps; None = change capture not installed
+        self.change_poll_running = False
+        self.poll_conn = None # the change poll's own connection (polls run on a worker thread)
+        self.main_fk_names = {} # {column: {id: name}} for the Data Browser's FK cells
+        self.inflight = None # running report/search: {"conn": connection to KILL, "cancelled": bool}
+        self.dep_graph = None # dependencies.DependencyGraph, loaded on the first delete
+        self.leaderboards = None # leaderboards.LeaderboardService, loaded in the background after login
+        self.analytics = None # analytics.AnalyticsSnapshot, loaded in the background after login if numpy is installed
 
     def on_mount(self) -> None:
+        mark_startup("main screen mounted")
         self.title = "Pokemon League DB Manager"
         # Set Default Theme to Tokyo Night
         self.theme = "tokyo-night"
@@ -501,15 +1002,32 @@ class PokemonTUI(App):
         if not credentials:
             self.exit()
             return
-        host, user, password, db_name = credentials
-        self.conn = db_utils.get_db_connection(host, user, password, db_name)
+        host, user, password, db_name, replicas = credentials
+        host, port = routing.parse_host(host)
+        if replicas:
+            # Reads go to the replicas, writes (and reads right after a write) to the primary
+            self.conn = db_utils.get_routed_connection(host, user, password, db_name, replicas, port=port)
+        else:
+            self.conn = db_utils.get_db_connection(host, user, password, db_name, port)
         if self.conn:
-            self.notify("Connected Successfully!", severity="success")
+            self.fk_names = fk_lookup.DisplayNameCache()
+            self.fk_index = fk_lookup.FKIndexRegistry()
+            ratings.enable_live_updates()
+            change_seq = db_utils.get_change_watermark(self.conn)
+            if change_seq is not None:
+                self.change_cursor = db_utils.ChangeCursor(change_seq)
+                self.set_interval(CHANGE_POLL_SECONDS, self.poll_changes)
+            self.run_worker(self.load_leaderboards, thread=True)
+            self.run_worker(self.load_analytics, thread=True)
+            replica_count = len(getattr(self.conn, "replicas", []))
+            self.notify(f"Connected Successfully! ({replica_count} read replicas)" if replica_count
+                        else "Connected Successfully!", severity="success")
         else:
             self.notify("Connection Failed. Retrying...", severity="error")
             self.push_screen(LoginScreen(), self.login_callback)
 
     def compose(self) -> ComposeResult:
+        mark_startup("compose started")
         yield Header(show_clock=True)
         with Container():
             with Horizontal():
@@ -529,6 +1047,7 @@ class PokemonTUI(App):
                     yield Button("Delete (d)", id="btn_delete", variant="error")
                     yield Button("Refresh (r)", id="btn_refresh", variant="primary")
                     yield Button("Recent 5", id="btn_recent", variant="default")
+                    yield Button("Import (i)", id="btn_import", variant="default")
                     yield Button("Quit (q)", id="btn_quit", variant="error")
 
                 with Container(id="main_content"):
@@ -536,29 +1055,56 @@ class PokemonTUI(App):
                         with TabPane("Data Browser", id="tab_data"):
                             yield Label("Select a table from the sidebar...", id="table_label")
                             # CHANGED: cursor_type="cell" (From Code 2) for better navigation
-                            yield DataTable(id="main_table", cursor_type="cell")
+                            yield PagedDataTable(id="main_table", cursor_type="cell")
 
                             # PER-TABLE SEARCH BAR MOVED BELOW TABLE
                             with Horizontal(id="data_search_row", classes="search_row"):
                                 yield Input(placeholder="Filter current table...", id="filter_input")
                                 yield Button("Filter", id="btn_filter", variant="primary")
                         
-                        with TabPane("Global Search", id="tab_search"):
-                            yield Label("Search Keywords:")
-                            with Horizontal(id="search_row", classes="search_row"):
-                                yield Input(placeholder="Search term...", id="search_input", classes="search_box")
-                                yield Button("Go", id="btn_do_search", classes="search_btn", variant="primary")
-                            yield DataTable(id="search_results_table")
-                        
-                        with TabPane("Reports", id="tab_reports"):
-                            yield Label("Available Reports:")
-                            with Horizontal():
-                                yield Button("Region Management", id="rep_1", classes="report_box")
-                                yield Button("Assignments", id="rep_2", classes="report_box")
-                                yield Button("Abilities", id="rep_3", classes="report_box")
-                            yield DataTable(id="report_table")
+                        # Built on first activation (see on_tabbed_content_tab_activated)
+                        yield TabPane("Global Search", id="tab_search")
+                        yield TabPane("Reports", id="tab_reports")
         yield Footer()
 
+    # --- LAZY TABS ---
+    def build_search_tab(self):
+        return [
+            Label("Search Keywords:"),
+            Horizontal(
+                Input(placeholder="Search term...", id="search_input", classes="search_box"),
+                Button("Go", id="btn_do_search", classes="search_btn", variant="primary"),
+                id="search_row", classes="search_row",
+            ),
+            Label("", id="search_counts"),
+            PagedDataTable(id="search_results_table"),
+        ]
+
+    def build_reports_tab(self):
+        return [
+            Label("Available Reports:"),
+            Horizontal(
+                Button("Region Management", id="rep_1", classes="report_box"),
+                Button("Assignments", id="rep_2", classes="report_box"),
+                Button("Abilities", id="rep_3", classes="report_box"),
+                Button("Gym Type Coverage", id="rep_4", classes="report_box"),
+                Button("Roster Coverage", id="rep_5", classes="report_box"),
+                Button("Ratings", id="rep_6", classes="report_box"),
+                Button("Dashboard (g)", id="btn_dashboard", classes="report_box", variant="primary"),
+                Button("Calendar (c)", id="btn_calendar", classes="report_box", variant="primary"),
+            ),
+            PagedDataTable(id="report_table"),
+        ]
+
+    LAZY_TABS = {"tab_search": "build_search_tab", "tab_reports": "build_reports_tab"}
+
+    def on_tabbed_content_tab_activated(self, event: TabbedContent.TabActivated) -> None:
+        pane = event.pane
+        if pane.id in self.LAZY_TABS and pane.id not in self.built_tabs:
+            self.built_tabs.add(pane.id)
+            pane.mount_all(getattr(self, self.LAZY_TABS[pane.id])())
+            mark_startup(f"{pane.id} built")
+
     def _is_input_focused(self):
         """Check if user is currently typing in an Input field."""
         return isinstance(self.focused, Input)
@@ -580,6 +1126,72 @@ class PokemonTUI(App):
         if not self._is_input_focused():
             self.on_button_pressed(Button(id="btn_refresh"))
 
+    def action_export_view(self):
+        if self._is_input_focused() or not self.conn:
+            return
+        active = self.query_one(TabbedContent).active
+        conn = self.conn
+
+        if active == "tab_search":
+            term = self.last_search_term
+            if not term:
+                self.notify("Run a global search first.", severity="warning")
+                return
+            description, name = f"global search '{term}'", "search_export"
+            job = lambda path, fmt, progress: exporter.export_search(conn, term, path, fmt, progress)
+        elif active == "tab_reports":
+            report = REPORT_EXPORT_NAMES.get(self.last_report_id)
+            if not report:
+                self.notify("Run a report first.", severity="warning")
+                return
+            description, name = f"report {report}", f"{report}_report"
+            job = lambda path, fmt, progress: exporter.export_report(conn, report, path, fmt, progress)
+        else:
+            table, term = self.current_table, self.current_filter
+            if not table:
+                self.notify("Select a table first.", severity="warning")
+                return
+            if term:
+                description, name = f"{table} filtered by '{term}'", f"{table}_filtered"
+                job = lambda path, fmt, progress: exporter.export_filter(conn, table, term, path, fmt, progress)
+            else:
+                description, name = f"table {table}", table
+                job = lambda path, fmt, progress: exporter.export_table(conn, table, path, fmt, progress)
+
+        self.push_screen(ExportModal(description, name, job))
+
+    def action_open_dashboard(self):
+        if self._is_input_focused() or not self.conn:
+            return
+        self.push_screen(DashboardScreen(self.conn, self.leaderboards, self.analytics))
+
+    def action_open_calendar(self):
+        if self._is_input_focused() or not self.conn:
+            return
+        self.push_screen(CalendarScreen(self.conn))
+
+    def action_open_rivals(self):
+        if self._is_input_focused() or not self.conn:
+            return
+        row = getattr(self, "current_row_data", None)
+        if self.current_table != "Trainer" or not row:
+            self.notify("Select a Trainer row first.", severity="warning")
+            return
+        self.push_screen(RivalryScreen(self.conn, row['trainer_id'], row.get('name')))
+
+    def action_import_file(self):
+        if self._is_input_focused() or not self.conn:
+            return
+        self.push_screen(ImportModal(self.conn, self.current_table), self.handle_import_done)
+
+    def handle_import_done(self, summary):
+        if summary and summary.get("inserted"):
+            self.invalidate_fk_names()
+            if self.fk_index is not None:
+                self.fk_index.invalidate()
+            if self.current_table:
+                self.load_table_data(self.current_table)
+
     def action_cursor_down(self):
         if not self._is_input_focused():
             if isinstance(self.focused, (DataTable, ListView)):
@@ -633,6 +1245,7 @@ class PokemonTUI(App):
 
                 if row_val == target_val:
                     table = self.query_one("#main_table", DataTable)
+                    table.show_row(index)
                     table.move_cursor(row=index, animate=True)
                     self.notify(f"Jumped to {table_name}: {pk_val}")
                     found = True
@@ -700,13 +1313,195 @@ class PokemonTUI(App):
         table.add_columns(*styled_headers)
         table.misc_col_map = headers 
 
-        for row in data:
-            table.add_row(*[str(row.get(h, "")) for h in headers])
-        
+        # Resolve FK IDs to display names: one query per referenced table
+        self.main_fk_names = {}
+        if self.show_fk_names and self.fk_names is not None:
+            self.main_fk_names = self.fk_names.resolve_rows(self.conn, table_name, data)
+
+        # Cells are formatted a page at a time; the grid shares the data list
+        pk_cols = get_pk_columns(table_name)
+        table.set_rows(data, lambda row: [self.format_cell(row.get(h, ""), self.main_fk_names.get(h)) for h in headers],
+                       (lambda row: self.row_key(row, pk_cols)) if pk_cols else None)
         self.current_table_data = data 
         
         # Clear filter input on fresh load/refresh
         self.query_one("#filter_input").value = ""
+        self.current_filter = None
+
+    def format_cell(self, value, names=None):
+        """Cell text; FK values show the referenced row's name next to the ID."""
+        if names and value is not None and names.get(value):
+            return f"{names[value]} ({value})"
+        return str(value)
+
+    def action_toggle_fk_names(self):
+        if self._is_input_focused():
+            return
+        self.show_fk_names = not self.show_fk_names
+        if self.current_table:
+            current_filter = self.current_filter
+            self.load_table_data(self.current_table, data=self.current_table_data)
+            self.current_filter = current_filter
+        self.notify("FK names " + ("shown" if self.show_fk_names else "hidden"))
+
+    def invalidate_fk_names(self, table_name=None):
+        if self.fk_names is not None:
+            self.fk_names.invalidate(table_name)
+
+    # --- LIVE UPDATES (CHANGE LOG) ---
+    def row_key(self, row, pk_cols):
+        """DataTable row key for a row (or ChangeLog pk dict)."""
+        return "\x1f".join(str(row.get(c)) for c in pk_cols)
+
+    def poll_changes(self):
+        """Timer: reads other operators' edits in the background; one poll at a time."""
+        if not self.conn or self.change_cursor is None or self.change_poll_running or len(self.screen_stack) > 1:
+            return  # Never patch rows under an open form
+        self.change_poll_running = True
+        since_seq, table_name, filtered = self.change_cursor.seq, self.current_table, self.current_filter is not None
+        self.run_worker(lambda: self.read_changes(since_seq, table_name, filtered),
+                        thread=True, group="changes", exclusive=True)
+
+    def read_changes(self, since_seq, current_table, filtered):
+        """Worker: one indexed ChangeLog read, then the changed rows and FK names, on the poll connection."""
+        result = None
+        try:
+            if self.poll_conn is None:
+                self.poll_conn = db_utils.clone_connection(self.conn)
+            else:
+                self.poll_conn.ping(reconnect=True)
+            if self.poll_conn is not None:
+                result = self.fetch_changes(self.poll_conn, current_table, filtered)
+        except Exception as e:
+            print(f"Change Poll Error: {e}")
+            self.poll_conn = None # reopened on the next tick
+        finally:
+            self.call_from_thread(self.apply_changes, since_seq, result)
+
+    def fetch_changes(self, conn, current_table, filtered):
+        changes = self.change_cursor.read(conn, limit=CHANGE_BATCH)
+        if not changes:
+            return {"changes": changes}
+        by_table = {}
+        for change in changes:
+            by_table.setdefault(change['table_name'], []).append(change)
+        # Bulk change (e.g. an import) to an unfiltered view: cheaper to reload than to patch
+        patch = current_table in by_table and (filtered or len(changes) < CHANGE_BATCH)
+        fetched = {}
+        for table_name, table_changes in by_table.items():
+            if ((patch and table_name == current_table)
+                    or (self.fk_index is not None and self.fk_index.depends_on(table_name))
+                    or (self.leaderboards is not None and self.leaderboards.depends_on(table_name))):
+                fetched[table_name] = self.fetch_changed_rows(conn, table_name, table_changes)
+        names = {}
+        if patch and self.show_fk_names:
+            # A private cache: the shared one belongs to the UI thread
+            names = fk_lookup.DisplayNameCache().resolve_rows(conn, current_table, fetched[current_table][0])
+        return {"changes": changes, "by_table": by_table, "fetched": fetched,
+                "table": current_table, "patch": patch, "names": names}
+
+    def apply_changes(self, since_seq, result):
+        """Applies a poll's result on the UI thread (dropped if a form opened meanwhile; read again later)."""
+        self.change_poll_running = False
+        if result is None or since_seq != self.change_cursor.seq or len(self.screen_stack) > 1:
+            return
+        self.change_cursor.advance(result["changes"])
+        if not result["changes"]:
+            return
+        for table_name, (saved, deleted) in result["fetched"].items():
+            if self.fk_index is not None and self.fk_index.depends_on(table_name):
+                pk_col = TABLE_CONFIG.get(table_name, {}).get('pk')
+                self.fk_index.apply_changes(table_name, saved, [k[pk_col] for k in deleted if pk_col])
+            if self.leaderboards is not None:
+                self.leaderboards.apply_changes(table_name, saved, deleted)
+        for table_name in result["by_table"]:
+            self.invalidate_fk_names(table_name)
+
+        if self.current_table in result["by_table"]:
+            if result["patch"] and self.current_table == result["table"]:
+                self.apply_row_changes(*result["fetched"][self.current_table], result["names"])
+            elif self.current_filter is None:
+                self.load_table_data(self.current_table) # bulk change, or another table was opened meanwhile
+
+    # --- IN-MEMORY LEADERBOARDS ---
+    def load_leaderboards(self):
+        """Worker: loads the leaderboards once, then reconciles them with SQL every few minutes."""
+        service = leaderboards.create_service(self.conn)
+        if service is not None:
+            self.leaderboards = service
+            self.call_from_thread(self.set_interval, leaderboards.RECONCILE_SECONDS,
+                                  lambda: self.run_worker(self.reconcile_leaderboards, thread=True,
+                                                          group="leaderboards", exclusive=True))
+
+    def load_analytics(self):
+        """Worker: builds the NumPy snapshot behind the dashboard's heavy panels, on its own connection."""
+        if analytics.np is None:
+            return # without numpy those panels keep running on the server
+        snapshot_conn = db_utils.clone_connection(self.conn, for_read=True)
+        if snapshot_conn is None:
+            return
+        snapshot = analytics.create_snapshot(snapshot_conn)
+        if snapshot is None:
+            snapshot_conn.close()
+        else:
+            self.analytics = snapshot
+
+    def reconcile_leaderboards(self):
+        check_conn = db_utils.clone_connection(self.conn, for_read=True)
+        if check_conn is None:
+            return
+        try:
+            self.leaderboards.reconcile(check_conn)
+        except Exception as e:
+            print(f"Leaderboard Error: {e}")
+        finally:
+            check_conn.close()
+
+    def reload_leaderboards(self):
+        try:
+            self.leaderboards.reload()
+        except Exception as e:
+            print(f"Leaderboard Error: {e}")
+
+    def update_leaderboards(self, table_name, saved_pks, deleted_pks=()):
+        """Feeds a CRUD write to the leaderboards (rows are re-read so values have their SQL types)."""
+        if self.leaderboards is None or not self.leaderboards.depends_on(table_name):
+            return
+        rows = self.normalize_data_keys(db_utils.get_rows_by_pk(self.conn, table_name, list(saved_pks)))
+        self.leaderboards.apply_changes(table_name, rows, list(deleted_pks))
+
+    def fetch_changed_rows(self, conn, table_name, changes):
+        """(rows that exist now, pk dicts that no longer exist) for a table's changes."""
+        pk_cols = get_pk_columns(table_name)
+        latest = {self.row_key(c['pk'], pk_cols): c['pk'] for c in changes}
+        rows = self.normalize_data_keys(db_utils.get_rows_by_pk(conn, table_name, list(latest.values())))
+        found = {self.row_key(r, pk_cols) for r in rows}
+        return rows, [pk for key, pk in latest.items() if key not in found]
+
+    def apply_row_changes(self, rows, deleted, fk_names):
+        """Patches the Data Browser in place: update, append or remove only the changed rows."""
+        if not self.current_table_data:
+            if self.current_filter is None:
+                self.load_table_data(self.current_table)
+            return
+        table = self.query_one("#main_table", DataTable)
+        pk_cols = get_pk_columns(self.current_table)
+        for col, names in fk_names.items():
+            self.main_fk_names.setdefault(col, {}).update(names)
+        positions = {self.row_key(r, pk_cols): i for i, r in enumerate(self.current_table_data)}
+
+        # current_table_data is the grid's own row list, so these update both
+        for row in rows:
+            key = self.row_key(row, pk_cols)
+            if key in positions:
+                table.replace_row(positions[key], row)
+            elif self.current_filter is None:
+                # New rows are appended; a filtered view only tracks the rows it matched
+                table.append_rows([row])
+
+        gone = {self.row_key(pk, pk_cols) for pk in deleted} & set(positions)
+        if gone:
+            table.remove_rows(positions[key] for key in gone)
 
     # --- SELECTION & DRILL DOWN ---
     def on_data_table_row_selected(self, event: DataTable.RowSelected) -> None:
@@ -722,6 +1517,14 @@ class PokemonTUI(App):
             
     def on_data_table_cell_selected(self, event: DataTable.CellSelected) -> None:
         """Handle foreign key jump AND capture row selection for CRUD."""
+        if event.data_table.id == "search_results_table":
+            row = event.coordinate.row
+            if row < len(event.data_table.source) and event.data_table.source[row][0] == "more":
+                group = event.data_table.source[row][1]
+                if not group.get("loading"):
+                    group["loading"] = True
+                    self.run_worker(lambda: self.load_more_search_rows(group), thread=True)
+            return
         if event.data_table.id != "main_table": return
         if not self.current_table: return
 
@@ -749,7 +1552,10 @@ class PokemonTUI(App):
 
         if col_def and col_def['type'] == 'fk':
             ref_table = col_def['ref_table']
-            val = str(event.value).strip() # Ensure we have a clean string value
+            # Use the raw ID, not the rendered "Name (ID)" cell text
+            raw_val = self.current_table_data[event.coordinate.row].get(col_name) \
+                if event.coordinate.row < len(self.current_table_data) else event.value
+            val = str(raw_val).strip() # Ensure we have a clean string value
             self.notify(f"Jumping to {ref_table}...", title="Navigation")
             self.switch_to_table(ref_table, val)
 
@@ -778,6 +1584,7 @@ class PokemonTUI(App):
                 results = db_utils.search_table(self.conn, self.current_table, term)
                 # Manually update table with search results
                 self.load_table_data(self.current_table, data=results)
+                self.current_filter = term
                 self.notify(f"Filter applied: {len(results)} records")
             else:
                 self.load_table_data(self.current_table) # Clear filter
@@ -790,11 +1597,14 @@ class PokemonTUI(App):
                 self.load_table_data(self.current_table, data)
                 self.notify(f"Showing last 5 entries for {self.current_table}")
         
+        elif bid == "btn_import":
+            self.action_import_file()
+
         elif bid == "btn_add":
             if not self.current_table:
                 self.notify("Select a table first!", severity="warning")
                 return
-            self.push_screen(RecordForm(self.conn, self.current_table, mode="add"), self.handle_add_submit)
+            self.push_screen(RecordForm(self.conn, self.current_table, mode="add", fk_index=self.fk_index), self.handle_add_submit)
             
         elif bid == "btn_update":
             if not self.current_table:
@@ -810,7 +1620,7 @@ class PokemonTUI(App):
                 return
             
             row_data = self.current_table_data[row_index]
-            self.push_screen(RecordForm(self.conn, self.current_table, row_data, mode="update"), self.handle_update_submit)
+            self.push_screen(RecordForm(self.conn, self.current_table, row_data, mode="update", fk_index=self.fk_index), self.handle_update_submit)
             
         elif bid == "btn_delete":
             if not self.current_table: return
@@ -825,17 +1635,26 @@ class PokemonTUI(App):
             
             # Temporarily store for confirmation handler
             self.row_to_delete = self.current_table_data[row_index]
-            self.push_screen(ConfirmationModal("Delete this record?"), self.handle_delete_confirm)
+            modal = ConfirmationModal("Delete this record?", "Checking dependent rows...")
+            self.push_screen(modal, self.handle_delete_confirm)
+            table_name, pk_dict = self.current_table, self.pk_dict_for(self.current_table, self.row_to_delete)
+            self.run_worker(lambda: self.preview_delete_impact(modal, table_name, pk_dict), thread=True)
 
         elif bid == "btn_do_search":
             term = self.query_one("#search_input").value
             if term and self.conn:
-                res = db_utils.search_global(self.conn, term)
-                self.populate_search_table(res)
+                self.last_search_term = term
+                self.start_global_search(term)
         
         elif bid.startswith("rep_"):
             if self.conn: self.run_report(bid)
 
+        elif bid == "btn_dashboard":
+            self.action_open_dashboard()
+
+        elif bid == "btn_calendar":
+            self.action_open_calendar()
+
     def on_input_submitted(self, event: Input.Submitted) -> None:
         if event.input.id == "filter_input":
             self.on_button_pressed(Button(id="btn_filter"))
@@ -860,9 +1679,23 @@ class PokemonTUI(App):
         sql = f"INSERT INTO {self.current_table} ({', '.join(columns)}) VALUES ({', '.join(placeholders)})"
         
         try:
-            with self.conn.cursor() as cursor:
-                cursor.execute(sql, list(data.values()))
+            if self.current_table == "Match_Table":
+                # Goes through insert_match so ratings are updated with the result
+                if not db_utils.insert_match(self.conn, data):
+                    self.notify("Error adding match. Check the participants and winner.", severity="error")
+                    return
+            elif self.current_table == "GymBattle":
+                if not db_utils.insert_gym_battle(self.conn, data):
+                    self.notify("Error adding gym battle. Check the challenger, gym and leader.", severity="error")
+                    return
+            else:
+                with self.conn.cursor() as cursor:
+                    cursor.execute(sql, list(data.values()))
             self.notify("Record Added!", severity="success")
+            self.invalidate_fk_names(self.current_table)
+            if self.fk_index is not None:
+                self.fk_index.record_saved(self.current_table, data)
+            self.update_leaderboards(self.current_table, [self.pk_dict_for(self.current_table, data)])
             self.load_table_data(self.current_table)
         except Exception as e:
             self.notify(f"Error adding record: {e}", severity="error")
@@ -910,8 +1743,24 @@ class PokemonTUI(App):
              self.notify("No changes detected.", severity="warning")
              return
 
-        if db_utils.update_record(self.conn, self.current_table, pk_dict, updates):
+        if self.current_table == "Match_Table" and set(updates) == {"winner_id"}:
+            # Result corrections go through update_match_winner so ratings follow
+            updated = db_utils.update_match_winner(self.conn, pk_dict["tournament_id"], pk_dict["match_number"],
+                                                   updates["winner_id"])
+        else:
+            updated = db_utils.update_record(self.conn, self.current_table, pk_dict, updates)
+        if updated:
             self.notify("Record Updated!", severity="success")
+            self.invalidate_fk_names(self.current_table)
+            if self.fk_index is not None:
+                old_key = original_row_data.get(single_pk) if single_pk in updates else None
+                self.fk_index.record_saved(self.current_table, {**original_row_data, **updates}, old_key)
+            new_pk = self.pk_dict_for(self.current_table, {**original_row_data, **updates})
+            if new_pk != pk_dict and self.leaderboards is not None and self.leaderboards.depends_on(self.current_table):
+                # ON UPDATE CASCADE renamed the key in child rows too: reload rather than emulate it
+                self.run_worker(self.reload_leaderboards, thread=True, group="leaderboards", exclusive=True)
+            else:
+                self.update_leaderboards(self.current_table, [new_pk])
             self.load_table_data(self.current_table)
         else:
             self.notify("Update failed. Check database constraints.", severity="error")
@@ -919,50 +1768,271 @@ class PokemonTUI(App):
     def handle_delete_confirm(self, confirmed):
         if not confirmed or not hasattr(self, 'row_to_delete'): return
         
-        config = TABLE_CONFIG.get(self.current_table, {})
-        pk_dict = {}
-        
-        if config.get('pk'):
-            pk_key = config['pk']
-            pk_dict[pk_key] = self.row_to_delete.get(pk_key)
-        elif config.get('pks'):
-            for k in config['pks']:
-                pk_dict[k] = self.row_to_delete.get(k)
-                
+        pk_dict = self.pk_dict_for(self.current_table, self.row_to_delete)
         if db_utils.delete_record(self.conn, self.current_table, pk_dict):
             self.notify("Record Deleted!", severity="success")
+            # Cascades may have removed rows in other tables too
+            self.invalidate_fk_names()
+            if self.fk_index is not None:
+                self.fk_index.record_deleted(self.current_table, self.row_to_delete)
+            self.update_leaderboards(self.current_table, [], [pk_dict])
             self.load_table_data(self.current_table)
         else:
             self.notify("Delete failed.", severity="error")
 
-    # --- HELPERS ---
-    def populate_search_table(self, results):
-        table = self.query_one("#search_results_table", DataTable)
-        table.clear(columns=True)
-        if not results:
-            self.notify("No matches.")
+    def pk_dict_for(self, table_name, row):
+        return {k: row.get(k) for k in get_pk_columns(table_name)}
+
+    def preview_delete_impact(self, modal, table_name, pk_dict):
+        """Worker: counts what the delete would cascade to and shows it in the confirmation."""
+        impact_conn = db_utils.clone_connection(self.conn, for_read=True)
+        if impact_conn is None:
+            self.call_from_thread(modal.set_details, "Dependent rows could not be checked.")
             return
-        table.add_columns("Table", "Row Data")
-        for t_name, rows in results.items():
-            for row in rows:
-                table.add_row(t_name, str(row))
+        try:
+            if self.dep_graph is None:
+                self.dep_graph = dependencies.load_graph(impact_conn)
+            impact = None
+            if self.dep_graph is not None:
+                impact = dependencies.delete_impact(impact_conn, self.dep_graph, table_name, pk_dict)
+        finally:
+            impact_conn.close()
+        self.call_from_thread(modal.set_details, dependencies.describe_impact(impact))
 
+    # --- HELPERS ---
     def run_report(self, rep_id):
         data = []
-        if rep_id == "rep_1": data = db_utils.get_manages_report(self.conn)
-        elif rep_id == "rep_2": data = db_utils.get_assigned_to_gym_report(self.conn)
-        elif rep_id == "rep_3": data = db_utils.get_pokemon_abilities_report(self.conn)
+        if rep_id in STREAMED_REPORTS:
+            self.last_report_id = rep_id
+            self.start_streamed_report(getattr(db_utils, STREAMED_REPORTS[rep_id]))
+            return
+        elif rep_id == "rep_6": data = ratings.get_rating_leaderboard(self.conn, limit=100)
+        elif rep_id in ("rep_4", "rep_5"):
+            analyzer = self.get_matchups()
+            if analyzer is None:
+                self.notify("Matchup reports need numpy (pip install numpy).", severity="error")
+                return
+            if rep_id == "rep_4": data = analyzer.get_gym_coverage_report()
+            else: data = analyzer.get_trainer_coverage_report(limit=200)
+        self.last_report_id = rep_id
         
         table = self.query_one("#report_table", DataTable)
         table.clear(columns=True)
         if data:
-            headers = list(data[0].keys())
-            table.add_columns(*headers)
-            for row in data:
-                table.add_row(*[str(v) for v in row.values()])
+            table.add_columns(*data[0].keys())
+            table.set_rows(data)
         else:
             self.notify("No data.")
 
+    # --- CANCELLABLE QUERIES ---
+    def begin_query(self):
+        """Cancels whatever is still running and returns a handle for the new query."""
+        self.action_cancel_query(quiet=True)
+        self.inflight = {"conn": None, "cancelled": False, "running": set()}
+        return self.inflight
+
+    def action_cancel_query(self, quiet=False):
+        job = self.inflight
+        if job is None or job["cancelled"]:
+            return
+        job["cancelled"] = True
+        conns = list(job["running"]) + ([job["conn"]] if job["conn"] is not None else [])
+        for conn in conns:
+            # KILL QUERY needs its own connection; don't block the UI opening it
+            self.run_worker(lambda conn=conn: db_utils.kill_query(conn), thread=True)
+        if not quiet:
+            self.notify("Cancelling query...")
+
+    def finish_query(self, job, message, severity="information"):
+        if job is self.inflight:
+            self.inflight = None
+            self.notify(message, severity=severity)
+
+    def query_failed_message(self, job, error, shown):
+        reason = "cancelled" if job["cancelled"] else db_utils.query_stop_reason(error)
+        if reason:
+            return f"Query {reason} after {shown:,} rows (kept on screen).", "warning"
+        return f"Query failed: {error}", "error"
+
+    def start_streamed_report(self, sql):
+        table = self.query_one("#report_table", DataTable)
+        table.clear(columns=True)
+        job = self.begin_query()
+        self.run_worker(lambda: self.stream_report(job, sql), thread=True)
+
+    def stream_report(self, job, sql):
+        shown = 0
+        message, severity = None, "information"
+        def started(stream_conn):
+            job["conn"] = stream_conn
+        try:
+            for chunk in db_utils.stream_query(self.conn, sql, chunk_size=REPORT_CHUNK,
+                                               timeout_ms=db_utils.QUERY_TIMEOUT_MS, on_connect=started):
+                if job["cancelled"]:
+                    break
+                self.call_from_thread(self.append_report_rows, job, chunk, shown == 0)
+                shown += len(chunk)
+            if job["cancelled"]:
+                message, severity = f"Query cancelled after {shown:,} rows (kept on screen).", "warning"
+            else:
+                message = f"{shown:,} rows." if shown else "No data."
+        except Exception as e:
+            message, severity = self.query_failed_message(job, e, shown)
+        finally:
+            self.call_from_thread(self.finish_query, job, message or "Query stopped.", severity)
+
+    def append_report_rows(self, job, rows, first):
+        if job is not self.inflight:
+            return  # a newer query replaced this one
+        table = self.query_one("#report_table", DataTable)
+        if first:
+            table.add_columns(*rows[0].keys())
+        table.append_rows(rows)
+
+    def start_global_search(self, term):
+        table = self.query_one("#search_results_table", DataTable)
+        table.clear(columns=True)
+        table.add_column("Table")
+        table.set_rows([], self.format_search_row, self.search_row_key)
+        self.query_one("#search_counts", Label).update("Counting matches...")
+        job = self.begin_query()
+        job.update(term=term, counts={}, groups={})
+        self.run_worker(lambda: self.stream_global_search(job, term), thread=True)
+
+    def stream_global_search(self, job, term):
+        """First pages, then counts, of every table on pooled connections; each shows up as it finishes."""
+        search_pool = pool.ConnectionPool(self.conn, size=search.SEARCH_JOBS)
+        message, severity = "Search stopped.", "information"
+        try:
+            total, seconds = search.run_search(
+                search_pool, term,
+                lambda table, n: self.call_from_thread(self.show_search_count, job, table, n),
+                lambda table, rows: self.call_from_thread(self.append_search_rows, job, table, rows),
+                should_stop=lambda: job["cancelled"], running=job["running"])
+            if job["cancelled"]:
+                message, severity = "Search cancelled (results so far kept on screen).", "warning"
+            else:
+                message = f"{total:,} matches in {seconds:.2f}s." if total else "No matches."
+        except Exception as e:
+            message, severity = f"Search failed: {e}", "error"
+        finally:
+            search_pool.close()
+            self.call_from_thread(self.finish_query, job, message, severity)
+
+    def show_search_count(self, job, t_name, n):
+        if job is not self.inflight:
+            return
+        job["counts"][t_name] = n
+        group = job["groups"].get(t_name)
+        if group is not None and n is not None:
+            # Its first page arrived before the count: refresh the header and "load more" rows
+            group["count"] = n
+            table = self.query_one("#search_results_table", DataTable)
+            table.refresh_row(self.search_row_key(group["header"]))
+            table.refresh_row(self.search_row_key(group["more"]))
+        hits = sorted(((n, t) for t, n in job["counts"].items() if n), reverse=True)
+        failed = [t for t, n in job["counts"].items() if n is None]
+        summary = f"{sum(n for n, _ in hits):,} matches in {len(hits)} tables"
+        summary += f" ({len(job['counts'])} searched)"
+        if hits:
+            summary += ": " + ", ".join(f"{t} {n:,}" for n, t in hits)
+        if failed:
+            summary += f"; failed: {', '.join(failed)}"
+        self.query_one("#search_counts", Label).update(summary)
+
+    def append_search_rows(self, job, t_name, rows):
+        """Adds a table's first page as a group: a row with the table and its columns, the rows, then 'load more'."""
+        if job is not self.inflight:
+            return
+        table = self.query_one("#search_results_table", DataTable)
+        # count is None until the COUNT of a table with more than one page finishes
+        group = {"table": t_name, "term": job["term"], "columns": list(rows[0].keys()),
+                 "count": job["counts"].get(t_name), "shown": len(rows)}
+        group["header"], group["more"] = ("header", group, None), ("more", group, None)
+        job["groups"][t_name] = group
+        for _ in range(len(table.columns) - 1, len(group["columns"])):
+            table.add_column("")
+        items = [group["header"]] + [("row", group, row) for row in rows]
+        if self.search_has_more(group):
+            items.append(group["more"])
+        table.append_rows(items)
+
+    def search_has_more(self, group):
+        return group["count"] is None or group["shown"] < group["count"]
+
+    def search_row_key(self, item):
+        """DataTable key of a group's header and "load more" rows, so they can be found without a scan."""
+        kind, group, _ = item
+        return None if kind == "row" else f"{kind}\x1f{group['table']}"
+
+    def format_search_row(self, item):
+        kind, group, row = item
+        if kind == "header":
+            if group["count"] is None:
+                shown = f"{group['shown']:,}+"
+            elif group["shown"] >= group["count"]:
+                shown = f"{group['count']:,}"
+            else:
+                shown = f"{group['shown']:,} of {group['count']:,}"
+            return ([Text(f"{group['table']} ({shown})", style="bold yellow")]
+                    + [Text(c, style="bold cyan") for c in group["columns"]])
+        if kind == "more":
+            more = search.SEARCH_PAGE if group["count"] is None else min(search.SEARCH_PAGE, group["count"] - group["shown"])
+            return [Text(f"Enter: load {more:,} more", style="italic")]
+        return [""] + [str(row[c]) for c in group["columns"]]
+
+    def load_more_search_rows(self, group):
+        """Worker: fetches the next page of a table's search matches."""
+        more_conn = db_utils.clone_connection(self.conn, for_read=True)
+        rows = []
+        if more_conn is not None:
+            try:
+                rows = db_utils.search_table(more_conn, group["table"], group["term"], search.SEARCH_PAGE, group["shown"])
+            finally:
+                more_conn.close()
+        self.call_from_thread(self.insert_search_rows, group, rows)
+
+    def insert_search_rows(self, group, rows):
+        group["loading"] = False
+        table = self.query_one("#search_results_table", DataTable)
+        try:
+            at = table.source.index(group["more"])  # no formatting, unlike a set_rows
+        except ValueError:
+            return  # a new search replaced the results
+        group["shown"] += len(rows)
+        if len(rows) < search.SEARCH_PAGE:
+            group["count"] = group["shown"]  # last page (or fewer matches now than counted)
+        # The new rows go above "load more"; the cursor stays put, so it lands on the first of them
+        table.insert_rows(at, [("row", group, row) for row in rows])
+        if self.search_has_more(group):
+            table.refresh_row(self.search_row_key(group["more"]))
+        else:
+            table.remove_rows([at + len(rows)])
+        table.refresh_row(self.search_row_key(group["header"]))
+
+    def get_matchups(self):
+        """Shared MatchupAnalyzer; refresh() is a cheap no-op unless a matchup table changed."""
+        if self.matchups is None:
+            self.matchups = matchups.create_analyzer(self.conn)
+        else:
+            try:
+                self.matchups.refresh()
+            except Exception as e:
+                self.notify(f"Matchup refresh failed: {e}", severity="warning")
+        return self.matchups
+
+def print_startup_profile():
+    start = STARTUP_MARKS[0][1]
+    prev = start
+    sys.stderr.write("Startup profile (ms since tui.py started loading / since previous mark):\n")
+    for label, t in STARTUP_MARKS:
+        sys.stderr.write(f"  {(t - start) * 1000:9.1f}  {(t - prev) * 1000:+9.1f}  {label}\n")
+        prev = t
+
+
 if __name__ == "__main__":
-    app = PokemonTUI()
-    app.run()
\ No newline at end of file
+    profile = "--profile-startup" in sys.argv[1:]
+    app = PokemonTUI(profile_startup=profile)
+    app.run()
+    if profile:
+        print_startup_profile()
\ No newline at end of file